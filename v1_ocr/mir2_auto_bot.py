@@ -45,14 +45,17 @@ logger = logging.getLogger(__name__)
 class Mir2AutoBot:
     """传奇2自动挂机机器人 - OCR监测版"""
 
-    def __init__(self, config_file: str = None):
+    def __init__(self, config_file: str = None, frame_source=None):
         """
         初始化挂机机器人
 
         Args:
             config_file: 配置文件路径
+            frame_source: 截图源（v2 frame_source.FrameSource，需提供open/grab/close），
+                          为None时使用pyautogui截图
         """
         self.running = False
+        self.frame_source = frame_source
         if config_file is None:
             config_file = CONFIG_FILE
         self.config = self._load_config(config_file)
@@ -204,6 +207,9 @@ class Mir2AutoBot:
         if not self.window_rect or not self.client_rect:
             return None
 
+        if self.frame_source is not None:
+            return self._capture_with_frame_source()
+
         try:
             # 使用客户区的屏幕坐标进行截图
             # 客户区的屏幕坐标 = 窗口左上角 + 客户区偏移
@@ -230,6 +236,18 @@ class Mir2AutoBot:
             logger.error(f"截图失败: {e}")
             return None
 
+    def _capture_with_frame_source(self) -> Optional[np.ndarray]:
+        """使用外部截图源截取客户区（回放、模拟或win32后端）"""
+        try:
+            if self.frame_source.hwnd != self.hwnd:
+                self.frame_source.close()
+                if not self.frame_source.open(self.hwnd):
+                    return None
+            return self.frame_source.grab()
+        except Exception as e:
+            logger.error(f"截图失败: {e}")
+            return None
+
     def detect_players_opencv(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """
         使用OCR检测画面中是否包含特定文字"人物斩杀"
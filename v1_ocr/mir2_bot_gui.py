@@ -23,6 +23,7 @@ from typing import Optional, Tuple, List
 import pytesseract
 from PIL import Image
 from dependency_manager import DependencyManager
+from template_matcher import TemplateMatcher
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -36,7 +37,8 @@ pyautogui.FAILSAFE = False
 class Mir2AutoBot:
     """传奇2自动挂机机器人 - OCR监测版"""
 
-    def __init__(self, config_file: str = None, log_callback=None, screenshot_mode: str = 'win32'):
+    def __init__(self, config_file: str = None, log_callback=None, screenshot_mode: str = 'win32',
+                 frame_source=None):
         """
         初始化挂机机器人
 
@@ -44,6 +46,8 @@ class Mir2AutoBot:
             config_file: 配置文件路径
             log_callback: 日志回调函数
             screenshot_mode: 截图模式 ('win32' 或 'pyautogui')
+            frame_source: 截图源（v2 frame_source.FrameSource，需提供open/grab/close），
+                          提供时优先于screenshot_mode
         """
         self.running = False
         self.paused = False
@@ -51,6 +55,7 @@ class Mir2AutoBot:
         self.hwnd = None
         self.window_rect = None
         self.screenshot_mode = screenshot_mode  # 截图模式
+        self.frame_source = frame_source
 
         if config_file is None:
             config_file = CONFIG_FILE
@@ -73,6 +78,9 @@ class Mir2AutoBot:
             'start_time': None
         }
 
+        # 模板匹配（模板图片缓存，文件变化时才重新读取）
+        self.template_matcher = TemplateMatcher()
+
         self._log("传奇2自动挂机机器人(OCR版本)初始化完成")
 
     def _log(self, message: str, level: str = "INFO"):
@@ -230,11 +238,25 @@ class Mir2AutoBot:
         Returns:
             游戏画面(numpy数组)
         """
+        if self.frame_source is not None:
+            return self._capture_with_frame_source()
         if self.screenshot_mode == 'pyautogui':
             return self._capture_with_pyautogui()
         else:
             return self._capture_with_win32()
 
+    def _capture_with_frame_source(self) -> Optional[np.ndarray]:
+        """使用外部截图源截取客户区（回放、模拟或win32后端）"""
+        try:
+            if self.frame_source.hwnd != self.hwnd:
+                self.frame_source.close()
+                if not self.frame_source.open(self.hwnd):
+                    return None
+            return self.frame_source.grab()
+        except Exception as e:
+            self._log(f"截图失败: {e}", "ERROR")
+            return None
+
     def _capture_with_pyautogui(self) -> Optional[np.ndarray]:
         """
         使用PyAutoGUI截取游戏窗口（需要窗口在最前端）
@@ -329,13 +351,13 @@ class Mir2AutoBot:
             return None
 
     def _load_template(self) -> Optional[np.ndarray]:
-        """加载目标模板图片"""
+        """加载目标模板图片（只在首次或文件变化时读取）"""
         template_path = os.path.join(SCRIPT_DIR, 'target', '1.png')
-        if os.path.exists(template_path):
-            template = cv2.imread(template_path)
-            if template is not None:
+        previous = self.template_matcher.template_mtime
+        if self.template_matcher.load(template_path):
+            if self.template_matcher.template_mtime != previous:
                 self._log(f"已加载模板图片: {template_path}")
-                return template
+            return self.template_matcher.template
         return None
 
     def detect_players_opencv(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
@@ -388,59 +410,16 @@ class Mir2AutoBot:
             # 加载模板
             template = self._load_template()
             if template is not None:
-                template_h, template_w = template.shape[:2]
-
-                # 转换为灰度图进行模板匹配
-                gray_region = cv2.cvtColor(detection_region, cv2.COLOR_BGR2GRAY)
-                gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-
-                # 模板匹配
-                result = cv2.matchTemplate(gray_region, gray_template, cv2.TM_CCOEFF_NORMED)
-
                 # 获取匹配阈值
                 threshold = self.config.getfloat('Detection', 'confidence_threshold', fallback=0.75)
 
-                # 找到所有匹配位置
-                locations = np.where(result >= threshold)
-
-                # 合并重叠的匹配结果
-                matches = []
-                for pt in zip(*locations[::-1]):  # (x, y) 格式
-                    confidence = result[pt[1], pt[0]]
-                    matches.append((pt[0], pt[1], template_w, template_h, confidence))
-
-                # 非极大值抑制，合并重叠的检测框
-                if matches:
-                    # 按置信度排序
-                    matches.sort(key=lambda x: x[4], reverse=True)
-
-                    # 合并重叠的框
-                    keep = []
-                    for m in matches:
-                        x1, y1, w, h, conf = m
-                        overlap = False
-                        for k in keep:
-                            kx1, ky1, kw, kh, kconf = k
-                            # 计算重叠
-                            x_overlap = max(0, min(x1 + w, kx1 + kw) - max(x1, kx1))
-                            y_overlap = max(0, min(y1 + h, ky1 + kh) - max(y1, ky1))
-                            overlap_area = x_overlap * y_overlap
-                            area1 = w * h
-                            area2 = kw * kh
-
-                            if overlap_area > 0.5 * min(area1, area2):
-                                overlap = True
-                                break
-
-                        if not overlap:
-                            keep.append(m)
-
+                # 模板匹配（已合并重叠的检测框）
+                for x, y, w, h, conf in self.template_matcher.match(detection_region, threshold):
                     # 转换为原图坐标
-                    for x, y, w, h, conf in keep:
-                        orig_x = x + left_x
-                        orig_y = y + top_y
-                        target_rects.append((orig_x, orig_y, w, h))
-                        self._log(f"模板匹配检测到目标在位置 ({orig_x}, {orig_y}), 置信度: {conf:.2f}")
+                    orig_x = x + left_x
+                    orig_y = y + top_y
+                    target_rects.append((orig_x, orig_y, w, h))
+                    self._log(f"模板匹配检测到目标在位置 ({orig_x}, {orig_y}), 置信度: {conf:.2f}")
 
             # 如果模板匹配没有找到，尝试OCR检测作为备选
             if not target_rects:
@@ -651,10 +630,9 @@ class Mir2AutoBot:
             # 激活游戏窗口
             self.activate_game_window()
 
-            # 按下传送快捷键
+            # 按下传送快捷键，0.1秒后由定时器抬起（不阻塞检测线程）
             keyboard.press(teleport_key)
-            time.sleep(0.1)
-            keyboard.release(teleport_key)
+            threading.Timer(0.1, keyboard.release, args=(teleport_key,)).start()
 
             self.last_teleport_time = current_time
             self.stats['teleports_used'] += 1
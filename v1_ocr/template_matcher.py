@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+模板匹配检测模块
+提供目标模板图片的缓存加载和带重叠合并的模板匹配
+"""
+
+import os
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+
+class TemplateMatcher:
+    """模板匹配检测器"""
+
+    def __init__(self):
+        self.template = None        # BGR模板
+        self.gray_template = None   # 灰度模板（匹配用）
+        self.template_path = None
+        self.template_mtime = None
+
+    def load(self, template_path: str) -> bool:
+        """
+        加载模板图片（文件未变化时直接使用缓存）
+
+        Args:
+            template_path: 模板图片路径
+
+        Returns:
+            是否有可用模板
+        """
+        try:
+            mtime = os.path.getmtime(template_path)
+        except OSError:
+            self.template = self.gray_template = None
+            self.template_path = self.template_mtime = None
+            return False
+
+        if template_path == self.template_path and mtime == self.template_mtime:
+            return self.template is not None
+
+        template = cv2.imread(template_path)
+        self.template_path = template_path
+        self.template_mtime = mtime
+        self.template = template
+        self.gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY) if template is not None else None
+        return template is not None
+
+    def set_template(self, template: np.ndarray):
+        """直接设置模板（BGR图像）"""
+        self.template = template
+        self.gray_template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        self.template_path = self.template_mtime = None
+
+    def match(self, image: np.ndarray, threshold: float = 0.75) -> List[Tuple[int, int, int, int, float]]:
+        """
+        模板匹配
+
+        Args:
+            image: BGR格式的检测区域
+            threshold: 匹配阈值
+
+        Returns:
+            合并重叠后的匹配结果 [(x, y, w, h, confidence), ...]，按置信度从高到低
+        """
+        if self.gray_template is None:
+            return []
+
+        template_h, template_w = self.gray_template.shape[:2]
+        if image.shape[0] < template_h or image.shape[1] < template_w:
+            return []
+
+        # 转换为灰度图进行模板匹配
+        gray_region = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        result = cv2.matchTemplate(gray_region, self.gray_template, cv2.TM_CCOEFF_NORMED)
+
+        # 找到所有匹配位置
+        ys, xs = np.where(result >= threshold)
+        if len(xs) == 0:
+            return []
+
+        # 按置信度排序
+        confidences = result[ys, xs]
+        order = np.argsort(-confidences, kind='stable')
+
+        # 非极大值抑制，合并重叠的检测框
+        keep = []
+        area = template_w * template_h
+        for i in order:
+            x1, y1 = int(xs[i]), int(ys[i])
+            overlap = False
+            for kx1, ky1, _, _, _ in keep:
+                x_overlap = max(0, min(x1 + template_w, kx1 + template_w) - max(x1, kx1))
+                y_overlap = max(0, min(y1 + template_h, ky1 + template_h) - max(y1, ky1))
+                if x_overlap * y_overlap > 0.5 * area:
+                    overlap = True
+                    break
+            if not overlap:
+                keep.append((x1, y1, template_w, template_h, float(confidences[i])))
+
+        return keep
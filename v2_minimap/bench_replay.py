@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+离线回放性能基准
+功能: 从磁盘回放录制的小地图和全屏画面，测量各检测流程的吞吐量、延迟分位数和内存峰值
+特性: 无需游戏窗口和win32，可在Linux无界面环境运行，结果输出为JSON便于在不同提交间对比
+
+使用方法:
+  python bench_replay.py --synthetic 200 --output bench.json
+  python bench_replay.py --minimaps debug/ --screens recordings.zip --output bench.json
+  python bench_replay.py --synthetic 200 --compare bench_baseline.json
+  python bench_replay.py --region-sizes 150 300 600 1000   # 不同小地图尺寸下整幅扫描与粗到细扫描对比
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+V1_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'v1_ocr')
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.insert(0, V1_DIR)
+
+from minimap_detector import MinimapDetector, build_color_lut
+from minimap_classifier import MinimapClassifier
+from frame_source import FrameSource, ReplaySource, load_frames
+from image_preprocessor import ImagePreprocessor
+from template_matcher import TemplateMatcher
+
+# v1检测区域（与bot_config.ini的默认百分比一致）
+V1_DETECTION_PERCENT = (20, 60, 5, 95)  # top, bottom, left, right
+
+
+def synthetic_minimaps(count: int, size: int = 150, max_dots: int = 4, seed: int = 0) -> List[Tuple[str, np.ndarray]]:
+    """生成模拟小地图（深色背景、绿色怪物点、黄色玩家点）"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        image = np.full((size, size, 3), (30, 30, 40), dtype=np.uint8)
+        for _ in range(10):
+            x, y = rng.integers(5, size - 5, 2)
+            cv2.circle(image, (int(x), int(y)), 2, (0, 150, 0), -1)
+        for _ in range(int(rng.integers(0, max_dots + 1))):
+            x, y = rng.integers(5, size - 5, 2)
+            cv2.circle(image, (int(x), int(y)), 2, (0, 255, 255), -1)
+        frames.append((f'synthetic_minimap_{i:05d}', image))
+    return frames
+
+
+def synthetic_screens(count: int, width: int = 800, height: int = 600, seed: int = 0) -> List[Tuple[str, np.ndarray]]:
+    """生成模拟全屏画面（噪声背景、右上角小地图、若干白色文字）"""
+    rng = np.random.default_rng(seed)
+    minimaps = synthetic_minimaps(count, seed=seed)
+    frames = []
+    for i in range(count):
+        image = rng.integers(0, 90, (height, width, 3), dtype=np.uint8)
+        image[10:160, width - 160:width - 10] = minimaps[i][1]
+        for _ in range(int(rng.integers(1, 4))):
+            x = int(rng.integers(50, width - 200))
+            y = int(rng.integers(int(height * 0.25), int(height * 0.55)))
+            cv2.putText(image, 'KILL', (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        frames.append((f'synthetic_screen_{i:05d}', image))
+    return frames
+
+
+def detection_region(image: np.ndarray, percent=V1_DETECTION_PERCENT) -> np.ndarray:
+    """裁剪v1的检测区域"""
+    height, width = image.shape[:2]
+    top, bottom, left, right = percent
+    return image[int(height * top / 100):int(height * bottom / 100),
+                 int(width * left / 100):int(width * right / 100)]
+
+
+def region_size_stages(sizes: List[int], count: int = 20,
+                       seed: int = 0) -> Tuple[Dict[str, List], Dict[str, Tuple[str, Callable]]]:
+    """
+    不同小地图区域尺寸下的整幅扫描和粗到细扫描阶段（点数不随尺寸变化）
+
+    Returns:
+        (画面类型 -> 模拟小地图, 阶段名 -> (画面类型, 函数))
+    """
+    full = MinimapDetector()
+    coarse = MinimapDetector()
+    coarse.coarse_min_side = 1
+    sources, stages = {}, {}
+    for size in sizes:
+        kind = f'minimap_{size}'
+        sources[kind] = synthetic_minimaps(count, size=size, seed=seed)
+        stages[f'detect_full_{size}'] = (kind, full.detect_blobs)
+        stages[f'detect_coarse_{size}'] = (kind, coarse.detect_blobs)
+    return sources, stages
+
+
+def run_stage(func: Callable[[np.ndarray], object], source: FrameSource, iterations: int,
+              warmup: int = 5, memory_iterations: int = 20) -> Dict[str, float]:
+    """
+    运行单个阶段并统计
+
+    计时时不开启 tracemalloc（跟踪每次分配会明显拖慢NumPy/OpenCV调用），
+    计时结束后再单独运行 memory_iterations 帧测内存峰值
+
+    Returns:
+        吞吐量(fps)、延迟分位数(毫秒)、tracemalloc内存峰值(KB)
+    """
+    for _ in range(min(warmup, iterations)):
+        func(source.grab())
+
+    samples = np.empty(iterations, dtype=np.float64)
+    started = time.perf_counter()
+    for i in range(iterations):
+        frame = source.grab()
+        t0 = time.perf_counter()
+        func(frame)
+        samples[i] = time.perf_counter() - t0
+    total = time.perf_counter() - started
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(max(1, min(memory_iterations, iterations))):
+        func(source.grab())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = samples * 1000.0
+    return {
+        'frames': iterations,
+        'fps': iterations / total if total > 0 else 0.0,
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'peak_tracemalloc_kb': peak / 1024.0,
+    }
+
+
+def _ocr_stage() -> Tuple[Optional[Callable], str]:
+    """OCR阶段（需要pytesseract和Tesseract引擎，缺失时跳过）"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        return None, f"skipped: {e.__class__.__name__}"
+    preprocessor = ImagePreprocessor()
+
+    def ocr(frame):
+        pytesseract.image_to_data(preprocessor.auto_preprocess(detection_region(frame)),
+                                  lang='chi_sim', config='--psm 6 --oem 3',
+                                  output_type=pytesseract.Output.DICT)
+    return ocr, 'ok'
+
+
+def build_stages(screens: List[Tuple[str, np.ndarray]], template: np.ndarray = None) -> Dict[str, Tuple[str, Callable]]:
+    """构建各阶段: 名称 -> (画面类型, 函数)"""
+    detector = MinimapDetector()
+    lut_detector = MinimapDetector()  # 同样的颜色范围，改为查表
+    lut_detector.color_lut = build_color_lut([(tuple(detector.yellow_lower_rgb), tuple(detector.yellow_upper_rgb))])
+    classifier = MinimapClassifier([('player', [((250, 250, 0), (255, 255, 5))]),
+                                    ('guild', [((200, 0, 200), (255, 60, 255))]),
+                                    ('monster', [((0, 120, 0), (40, 180, 40))]),
+                                    ('npc', [((0, 200, 200), (40, 255, 255))])])
+    preprocessor = ImagePreprocessor()
+    matcher = TemplateMatcher()
+    if template is None and screens:
+        # 未提供模板时，从第一帧检测区域中心截取一块作为模板
+        region = detection_region(screens[0][1])
+        h, w = region.shape[:2]
+        template = region[h // 2 - 10:h // 2 + 10, w // 2 - 40:w // 2 + 40].copy()
+    if template is not None:
+        matcher.set_template(template)
+
+    stages = {
+        'minimap_detect': ('minimap', detector.detect),
+        'minimap_detect_lut': ('minimap', lut_detector.detect),
+        'minimap_classify': ('minimap', classifier.classify),
+        'preprocess_auto': ('screen', lambda frame: preprocessor.auto_preprocess(detection_region(frame))),
+        'template_match': ('screen', lambda frame: matcher.match(detection_region(frame), 0.75)),
+    }
+    ocr, _ = _ocr_stage()
+    if ocr is not None:
+        stages['ocr'] = ('screen', ocr)
+    return stages
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def _peak_rss_kb() -> Optional[float]:
+    """进程内存峰值（Linux为KB，macOS为字节换算）"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024.0 if sys.platform == 'darwin' else float(peak)
+    except ImportError:
+        return None
+
+
+def run_benchmark(minimaps: List[Tuple[str, np.ndarray]], screens: List[Tuple[str, np.ndarray]],
+                  iterations: int, template: np.ndarray = None, only: List[str] = None,
+                  region_sizes: List[int] = None) -> Dict:
+    """运行所有阶段，返回可序列化为JSON的结果；region_sizes 为各小地图尺寸的扫描方式对比"""
+    sources = {'minimap': minimaps, 'screen': screens}
+    stages = build_stages(screens, template)
+    if region_sizes:
+        region_sources, region_stages = region_size_stages(region_sizes)
+        sources.update(region_sources)
+        stages.update(region_stages)
+    results = {}
+    for name, (kind, func) in stages.items():
+        if only and name not in only:
+            continue
+        if not sources[kind]:
+            results[name] = {'skipped': f'no {kind} frames'}
+            continue
+        results[name] = run_stage(func, ReplaySource(sources[kind]), iterations)
+    if not only or 'ocr' in only:
+        results.setdefault('ocr', {'skipped': _ocr_stage()[1]})
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'minimap_frames': len(minimaps),
+            'screen_frames': len(screens),
+            'iterations': iterations,
+            'region_sizes': region_sizes or [],
+        },
+        'stages': results,
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.2) -> List[str]:
+    """
+    与基准结果对比
+
+    Returns:
+        退化超过阈值的阶段说明列表
+    """
+    regressions = []
+    print(f"{'stage':<18}{'fps':>12}{'base fps':>12}{'p95 ms':>10}{'base p95':>10}")
+    for name, result in current['stages'].items():
+        base = baseline.get('stages', {}).get(name)
+        if 'fps' not in result or not base or 'fps' not in base:
+            continue
+        print(f"{name:<18}{result['fps']:>12.1f}{base['fps']:>12.1f}{result['p95_ms']:>10.3f}{base['p95_ms']:>10.3f}")
+        if base['fps'] > 0 and result['fps'] < base['fps'] * (1 - threshold):
+            regressions.append(f"{name}: fps {base['fps']:.1f} -> {result['fps']:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线回放性能基准（无需游戏窗口）')
+    parser.add_argument('--minimaps', help='录制的小地图图片目录或zip')
+    parser.add_argument('--screens', help='录制的全屏画面目录或zip')
+    parser.add_argument('--synthetic', type=int, default=0, help='缺少录制画面时生成的模拟帧数')
+    parser.add_argument('--template', help='v1模板图片路径（默认从画面中截取）')
+    parser.add_argument('--iterations', type=int, default=300, help='每个阶段的测量次数')
+    parser.add_argument('--stages', nargs='*', help='只运行指定阶段')
+    parser.add_argument('--region-sizes', type=int, nargs='*', help='对比各小地图尺寸下整幅扫描和粗到细扫描')
+    parser.add_argument('--output', help='结果JSON输出路径')
+    parser.add_argument('--compare', help='与之前的结果JSON对比')
+    parser.add_argument('--fail-threshold', type=float, default=0.2, help='吞吐量下降超过该比例视为退化')
+    args = parser.parse_args()
+
+    minimaps = load_frames(args.minimaps) if args.minimaps else []
+    screens = load_frames(args.screens) if args.screens else []
+    if args.synthetic:
+        if not minimaps:
+            minimaps = synthetic_minimaps(args.synthetic)
+        if not screens:
+            screens = synthetic_screens(args.synthetic)
+    if not minimaps and not screens and not args.region_sizes:
+        parser.error("请指定 --minimaps/--screens、--synthetic 或 --region-sizes")
+
+    template = cv2.imread(args.template) if args.template else None
+    result = run_benchmark(minimaps, screens, args.iterations, template, args.stages, args.region_sizes)
+
+    for name, stage in result['stages'].items():
+        if 'fps' in stage:
+            print(f"{name:<18} {stage['fps']:>10.1f} fps  p50={stage['p50_ms']:.3f}ms  "
+                  f"p95={stage['p95_ms']:.3f}ms  p99={stage['p99_ms']:.3f}ms  "
+                  f"peak={stage['peak_tracemalloc_kb']:.0f}KB")
+        else:
+            print(f"{name:<18} {stage['skipped']}")
+    if result['peak_rss_kb'] is not None:
+        print(f"peak RSS: {result['peak_rss_kb'] / 1024:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"结果已保存: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.fail_threshold)
+        if regressions:
+            print("性能退化:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+连通块统计（黄点的亚像素中心、面积和外接框）
+功能: 一次调用提取掩码中所有连通块的浮点中心、像素面积和外接框，结果保存在NumPy数组中
+特性: 连通域分析由 connectedComponentsWithStats 完成，不逐个轮廓计算矩；
+      给出权重图时用 np.bincount 按标签整体累加加权一阶矩，得到加权中心（如按颜色接近程度加权）；
+      结果可直接交给跟踪器（DotTracker.update）和调试图绘制，不再转换成逐点的元组
+
+使用方法:
+  blobs = extract_blobs(mask, min_area=2)
+  for x, y, area in blobs:
+      ...
+  blobs.centroids   # (N, 2) float64
+
+粗到细扫描（很大的小地图区域）:
+  blobs = extract_blobs_coarse(mask, factor=4)
+  掩码按 factor 倍最大值池化后找出候选块，只在候选块内做全分辨率连通域分析；
+  结果与 extract_blobs 相同，连通域分析的耗时随点数而不是区域面积增长
+"""
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+class Blobs:
+    """
+    一帧的连通块（按标签顺序，即从上到下、从左到右首次出现的顺序）
+
+    centroids: (N, 2) float64 亚像素中心 (x, y)
+    areas:     (N,) int64 像素面积
+    bboxes:    (N, 4) int32 外接框 (x, y, 宽, 高)
+    """
+
+    __slots__ = ('centroids', 'areas', 'bboxes')
+
+    def __init__(self, centroids: np.ndarray, areas: np.ndarray, bboxes: np.ndarray):
+        self.centroids = centroids
+        self.areas = areas
+        self.bboxes = bboxes
+
+    @classmethod
+    def empty(cls) -> 'Blobs':
+        return cls(np.zeros((0, 2)), np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.int32))
+
+    @classmethod
+    def concatenate(cls, parts: Sequence['Blobs']) -> 'Blobs':
+        if not parts:
+            return cls.empty()
+        return cls(np.concatenate([part.centroids for part in parts]),
+                   np.concatenate([part.areas for part in parts]),
+                   np.concatenate([part.bboxes for part in parts]))
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def __iter__(self) -> Iterator[Tuple[float, float, int]]:
+        return iter(self.to_dots())
+
+    def select(self, index) -> 'Blobs':
+        """按布尔掩码或下标取子集"""
+        return Blobs(self.centroids[index], self.areas[index], self.bboxes[index])
+
+    def offset(self, x: int, y: int) -> 'Blobs':
+        """平移坐标（区域内提取的结果换算到整幅图像，原地修改并返回）"""
+        self.centroids += (x, y)
+        self.bboxes[:, :2] += (x, y)
+        return self
+
+    def pixel_centers(self) -> np.ndarray:
+        """中心所在的像素 (N, 2) intp（用于按中心取标签、绘制）"""
+        return np.rint(self.centroids).astype(np.intp)
+
+    def detections(self) -> np.ndarray:
+        """(N, 3) float64 数组 [x, y, 面积]，与 detect() 返回的点顺序相同"""
+        return np.column_stack([self.centroids, self.areas])
+
+    def to_dots(self) -> List[Tuple[float, float, int]]:
+        """[(x, y, 面积), ...]，x、y 为浮点"""
+        return list(zip(*self.centroids.T.tolist(), self.areas.tolist())) if len(self) else []
+
+
+def label_blobs(mask: np.ndarray, weights: Optional[np.ndarray] = None) -> Tuple[int, np.ndarray, Blobs]:
+    """
+    连通域分析（8连通），返回所有连通块（不按面积过滤）
+
+    Args:
+        mask: 前景掩码（非0为前景），uint8
+        weights: 与 mask 同尺寸的权重图，给出时中心为加权中心（权重和为0的连通块使用几何中心）
+
+    Returns:
+        (标签数（含背景）, 标签图（0为背景，连通块 i 的标签为 i + 1）, 连通块)
+    """
+    # 单核上Grana算法比默认的并行实现快约3倍
+    count, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+        mask, 8, cv2.CV_32S, cv2.CCL_GRANA)
+    centroids = centroids[1:]
+    if weights is not None and count > 1:
+        flat_labels = labels.ravel()
+        weights = weights.astype(np.float64)
+        height, width = mask.shape
+        m00 = np.bincount(flat_labels, weights.ravel(), minlength=count)[1:]
+        m10 = np.bincount(flat_labels, (weights * np.arange(width)).ravel(), minlength=count)[1:]
+        m01 = np.bincount(flat_labels, (weights * np.arange(height)[:, None]).ravel(), minlength=count)[1:]
+        weighted = m00 > 0
+        centroids = centroids.copy()
+        centroids[weighted, 0] = m10[weighted] / m00[weighted]
+        centroids[weighted, 1] = m01[weighted] / m00[weighted]
+    blobs = Blobs(centroids, stats[1:, cv2.CC_STAT_AREA].astype(np.int64),
+                  stats[1:, :cv2.CC_STAT_AREA])
+    return count, labels, blobs
+
+
+def extract_blobs(mask: np.ndarray, min_area: int = 1, weights: Optional[np.ndarray] = None) -> Blobs:
+    """
+    提取面积不小于 min_area 的连通块
+
+    Args:
+        mask: 前景掩码（非0为前景），uint8
+        min_area: 最小像素面积
+        weights: 权重图（见 label_blobs）
+    """
+    if mask.size == 0:
+        return Blobs.empty()
+    count, _, blobs = label_blobs(mask, weights)
+    if count <= 1:
+        return Blobs.empty()
+    if min_area > 1:
+        blobs = blobs.select(blobs.areas >= min_area)
+    return blobs
+
+
+def coarse_regions(mask: np.ndarray, factor: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    按 factor 倍最大值池化掩码，找出含前景的候选区域
+
+    Args:
+        mask: 前景掩码（非0为前景），uint8
+        factor: 降采样倍数
+
+    Returns:
+        (候选区域标签图（降采样尺寸，区域 i 的标签为 i + 1）,
+         区域 (N, 4) 的降采样坐标 (x0, y0, x1, y1)，乘以 factor 即为原图坐标)
+    """
+    # 锚点在左上角时膨胀后的 (factor*i, factor*j) 为该块的最大值
+    pooled = cv2.dilate(mask, np.ones((factor, factor), dtype=np.uint8), anchor=(0, 0))
+    pooled = np.ascontiguousarray(pooled[::factor, ::factor])
+    count, labels, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(pooled, 8, cv2.CV_32S, cv2.CCL_GRANA)
+    rects = np.empty((count - 1, 4), dtype=np.intp)
+    rects[:, :2] = stats[1:, :2]
+    rects[:, 2:] = stats[1:, :2] + stats[1:, 2:4]
+    return labels, rects
+
+
+def extract_blobs_coarse(mask: np.ndarray, factor: int = 4, min_area: int = 1,
+                         max_fill: float = 0.5) -> Optional[Blobs]:
+    """
+    粗到细提取连通块（结果与 extract_blobs 相同，顺序按候选区域）
+
+    同一个点的像素所在的块8连通，一定属于同一个候选区域；每个区域只保留属于自己的块，
+    外接框相交的区域不会重复或截断提取
+
+    Args:
+        mask: 前景掩码（非0为前景），uint8
+        factor: 降采样倍数
+        min_area: 最小像素面积
+        max_fill: 候选区域总面积超过图像面积的该比例时返回None（点很多时整幅提取更快）
+    """
+    labels, rects = coarse_regions(mask, factor)
+    if not len(rects):
+        return Blobs.empty()
+    if ((rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])).sum() > max_fill * labels.size:
+        return None
+
+    height, width = mask.shape
+    parts = []
+    for region, (cx0, cy0, cx1, cy1) in enumerate(rects.tolist(), 1):
+        x0, y0 = cx0 * factor, cy0 * factor
+        x1, y1 = min(cx1 * factor, width), min(cy1 * factor, height)
+        own = (labels[cy0:cy1, cx0:cx1] == region).view(np.uint8)
+        own = cv2.resize(own, ((cx1 - cx0) * factor, (cy1 - cy0) * factor),
+                         interpolation=cv2.INTER_NEAREST)[:y1 - y0, :x1 - x0]
+        blobs = extract_blobs(np.multiply(mask[y0:y1, x0:x1], own), min_area)
+        if len(blobs):
+            parts.append(blobs.offset(x0, y0))
+    return Blobs.concatenate(parts)
@@ -0,0 +1,710 @@
+# -*- coding: utf-8 -*-
+"""
+无界面挂机守护进程
+功能: 在独立进程中运行多窗口监控，通过本机TCP端口提供控制命令和批量状态推送，GUI只作为客户端连接
+特性: 协议为每行一个紧凑JSON（UTF-8）；状态快照按固定间隔只生成一次、编码一次后发给所有订阅者，
+      每个客户端有独立的发送线程和有界队列，慢客户端只会丢弃旧的状态更新，检测线程从不接触套接字
+
+协议:
+  请求  {"id": 1, "cmd": "status", ...参数}
+  响应  {"id": 1, "ok": true, "result": ...} 或 {"id": 1, "ok": false, "error": "..."}
+  推送  {"event": "update", "seq": 12, "state": {...}, "logs": ["..."]}（订阅后按间隔推送）
+
+使用方法:
+  python bot_daemon.py
+  python bot_daemon.py --port 9109 --workers 2
+  python bot_daemon.py --host 0.0.0.0 --token secret --node pc-2 --capacity 8   （农场节点）
+  python mir2_multi_window_gui.py --connect 127.0.0.1:9109
+"""
+
+import argparse
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from bot_metrics import LatencyHistogram, WindowMetrics, STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 9109
+DEFAULT_UPDATE_INTERVAL = 0.5  # 状态推送间隔（秒）
+CLIENT_QUEUE_LIMIT = 8         # 每个客户端最多积压的消息数，超出丢弃最旧的
+LOG_BUFFER_LIMIT = 500         # 两次推送之间最多缓存的日志条数
+MAX_LINE_BYTES = 1 << 20
+
+# configure 命令的快捷参数 -> (节, 键)
+CONFIG_SHORTCUTS = {
+    'teleport_key': ('Teleport', 'teleport_key'),
+    'cooldown': ('Teleport', 'cooldown'),
+    'detection_interval': ('Detection', 'detection_interval'),
+}
+NUMERIC_OPTIONS = {('Teleport', 'cooldown'), ('Detection', 'detection_interval')}
+
+
+class DaemonError(Exception):
+    """守护进程返回的错误"""
+
+
+def is_loopback(host: str) -> bool:
+    """监听地址是否只能从本机访问"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def encode_message(message: Dict) -> bytes:
+    """编码为一行紧凑JSON"""
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode_message(line: bytes) -> Dict:
+    """解码一行JSON"""
+    message = json.loads(line.decode('utf-8'))
+    if not isinstance(message, dict):
+        raise ValueError("消息必须是JSON对象")
+    return message
+
+
+def parse_address(address: str, default_port: int = DEFAULT_PORT):
+    """解析 host:port（可只写端口或只写地址）"""
+    if not address:
+        return '127.0.0.1', default_port
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host or '127.0.0.1', int(port)
+    if address.isdigit():
+        return '127.0.0.1', int(address)
+    return address, default_port
+
+
+def _p95_ms(histogram) -> Optional[float]:
+    return round(histogram.percentile(95) * 1000.0, 2) if histogram.count else None
+
+
+def collect_state(bot) -> Dict:
+    """
+    生成发给客户端的状态快照（在推送线程中调用）
+
+    窗口计数、直方图和运行状态取自 bot.window_rows()（多进程模式下为工作进程上报的值），直方图在锁外复制
+    """
+    merged = WindowMetrics()
+    rows = []
+    for gw, stats, gauges, metrics, state in bot.window_rows():
+        snapshot = metrics.snapshot()
+        for stage, histogram in snapshot.items():
+            merged.histograms.setdefault(stage, LatencyHistogram()).merge(histogram)
+        rows.append({
+            'hwnd': gw.hwnd,
+            'title': gw.title,
+            'running': bool(gauges['running']),
+            'state': state,
+            'stats': stats,
+            'capture_p95_ms': _p95_ms(snapshot[STAGE_CAPTURE]),
+            'detect_p95_ms': _p95_ms(snapshot[STAGE_DETECT]),
+        })
+
+    start_time = bot.stats.get('start_time')
+    return {
+        'running': bot.running,
+        'started': start_time.isoformat(timespec='seconds') if start_time else None,
+        'workers': bot.supervisor.worker_count if bot.supervisor is not None else 0,
+        'windows': rows,
+        'totals': bot._collect_counters(),
+        'history': len(bot.history),
+        'latency': merged.format_compact((STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION)),
+    }
+
+
+class LogBuffer(logging.Handler):
+    """
+    缓存日志记录，由推送线程批量格式化后发给客户端
+
+    emit 只做一次 deque.append，不在检测线程中格式化或做I/O
+    """
+
+    def __init__(self, limit: int = LOG_BUFFER_LIMIT, level: int = logging.INFO):
+        super().__init__(level)
+        self.records: Deque[logging.LogRecord] = deque(maxlen=limit)
+        self.setFormatter(logging.Formatter('[%(asctime)s] [%(levelname)s] %(message)s', '%H:%M:%S'))
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+    def drain(self) -> List[str]:
+        """取出并格式化缓存的日志"""
+        lines = []
+        while True:
+            try:
+                record = self.records.popleft()
+            except IndexError:
+                return lines
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                pass
+
+
+class _ClientConnection:
+    """守护进程一侧的客户端连接：读取线程处理请求，发送线程写出有界队列中的消息"""
+
+    def __init__(self, server: 'DaemonServer', sock: socket.socket, address):
+        self.server = server
+        self.sock = sock
+        self.address = address
+        self.subscribed = False
+        self.authenticated = not server.token
+        self.dropped = 0
+        self.cond = threading.Condition()
+        self._outbox: Deque[bytes] = deque()
+        self._closed = False
+        self.reader = threading.Thread(target=self._read_loop, name=f'daemon-client-{address[1]}', daemon=True)
+        self.writer = threading.Thread(target=self._write_loop, name=f'daemon-send-{address[1]}', daemon=True)
+
+    def start(self):
+        self.reader.start()
+        self.writer.start()
+
+    def send(self, data: bytes, droppable: bool = False):
+        """排队发送（不阻塞）；队列已满时丢弃最旧的可丢弃消息"""
+        with self.cond:
+            if self._closed:
+                return
+            if droppable and len(self._outbox) >= CLIENT_QUEUE_LIMIT:
+                self._outbox.popleft()
+                self.dropped += 1
+            self._outbox.append(data)
+            self.cond.notify()
+
+    def _write_loop(self):
+        while True:
+            with self.cond:
+                while not self._outbox and not self._closed:
+                    self.cond.wait()
+                if self._closed:
+                    return
+                data = self._outbox.popleft()
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.close()
+                return
+
+    def _read_loop(self):
+        reader = self.sock.makefile('rb')
+        try:
+            for line in reader:
+                if len(line) > MAX_LINE_BYTES:
+                    break
+                if not line.strip():
+                    continue
+                self.send(encode_message(self.server.handle_line(self, line)))
+        except (OSError, ValueError):
+            pass
+        finally:
+            reader.close()
+            self.close()
+
+    def close(self):
+        with self.cond:
+            if self._closed:
+                return
+            self._closed = True
+            self.cond.notify_all()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.server._discard(self)
+
+
+class DaemonServer:
+    """守护进程的本机控制/推送服务"""
+
+    def __init__(self, bot, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 update_interval: float = DEFAULT_UPDATE_INTERVAL, node_name: str = None,
+                 capacity: int = None, token: str = None):
+        """
+        Args:
+            bot: MultiWindowBot实例
+            host: 监听地址，默认只监听本机
+            port: 监听端口，0表示自动分配
+            update_interval: 状态推送间隔（秒）
+            node_name: 节点名称（农场协调器显示用），默认读取 [Daemon] node_name，未配置时为主机名
+            capacity: 本节点最多同时监控的窗口数，默认读取 [Daemon] capacity，0为不限
+            token: 连接口令，默认读取 [Daemon] token；设置后客户端必须先发送带口令的hello（监听局域网地址时使用）
+        """
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.update_interval = update_interval
+        config = bot.config if bot is not None else None
+        if node_name is None and config is not None:
+            node_name = config.get('Daemon', 'node_name', fallback='')
+        self.node_name = node_name or socket.gethostname()
+        if capacity is None:
+            capacity = config.getint('Daemon', 'capacity', fallback=0) if config is not None else 0
+        self.capacity = capacity
+        if token is None and config is not None:
+            token = config.get('Daemon', 'token', fallback='')
+        self.token = token or ''
+        self.clients: List[_ClientConnection] = []
+        self.clients_lock = threading.Lock()
+        self.log_buffer = LogBuffer()
+        self.seq = 0
+        self.updates_sent = 0
+
+        self._sock: Optional[socket.socket] = None
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.commands: Dict[str, Callable[[Dict], object]] = {
+            'hello': self._cmd_hello,
+            'status': lambda args: collect_state(self.bot),
+            'metrics': self._cmd_metrics,
+            'subscribe': None,  # 在 handle_line 中处理（需要连接对象）
+            'scan': self._cmd_scan,
+            'start': self._cmd_start,
+            'stop': self._cmd_stop,
+            'remove': self._cmd_remove,
+            'test': self._cmd_test,
+            'profile': self._cmd_profile,
+            'configure': self._cmd_configure,
+            'reload': self._cmd_reload,
+            'shutdown': self._cmd_shutdown,
+        }
+
+    # ==================== 服务 ====================
+
+    def start(self) -> bool:
+        """开始监听并启动推送线程（监听非本机地址时必须设置口令）"""
+        if self._sock is not None:
+            return True
+        if not self.token and not is_loopback(self.host):
+            logger.error(f"控制端口监听在非本机地址 {self.host} 时必须设置口令（--token 或 [Daemon] token），"
+                         f"否则局域网内任何人都可以修改配置或关闭本节点")
+            return False
+        try:
+            sock = socket.create_server((self.host, self.port))
+        except OSError as e:
+            logger.error(f"守护进程控制端口启动失败 ({self.host}:{self.port}): {e}")
+            return False
+        self._sock = sock
+        self.port = sock.getsockname()[1]
+        self._stop_event.clear()
+        logging.getLogger().addHandler(self.log_buffer)
+        self._threads = [
+            threading.Thread(target=self._accept_loop, name='daemon-accept', daemon=True),
+            threading.Thread(target=self._publish_loop, name='daemon-publish', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"守护进程控制端口已启动: {self.host}:{self.port}")
+        return True
+
+    def stop(self):
+        """停止服务并断开所有客户端"""
+        if self._sock is None:
+            return
+        self._stop_event.set()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        self._sock = None
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        logging.getLogger().removeHandler(self.log_buffer)
+        logger.info("守护进程控制端口已停止")
+
+    def _accept_loop(self):
+        sock = self._sock
+        while not self._stop_event.is_set():
+            try:
+                conn, address = sock.accept()
+            except OSError:
+                return
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = _ClientConnection(self, conn, address)
+            with self.clients_lock:
+                self.clients.append(client)
+            client.start()
+
+    def _discard(self, client: _ClientConnection):
+        with self.clients_lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def _publish_loop(self):
+        """按间隔生成一次状态快照，编码后发给所有订阅的客户端"""
+        while not self._stop_event.wait(self.update_interval):
+            with self.clients_lock:
+                subscribers = [client for client in self.clients if client.subscribed]
+            if not subscribers:
+                self.log_buffer.records.clear()  # 没有客户端时不积压日志
+                continue
+            try:
+                self.publish(subscribers)
+            except Exception as e:
+                logger.error(f"状态推送失败: {e}")
+
+    def publish(self, subscribers: List[_ClientConnection] = None):
+        """立即推送一次状态"""
+        if subscribers is None:
+            with self.clients_lock:
+                subscribers = [client for client in self.clients if client.subscribed]
+        self.seq += 1
+        data = encode_message({'event': 'update', 'seq': self.seq, 'state': collect_state(self.bot),
+                               'logs': self.log_buffer.drain()})
+        for client in subscribers:
+            client.send(data, droppable=True)
+        self.updates_sent += 1
+
+    # ==================== 命令 ====================
+
+    def handle_line(self, client: Optional[_ClientConnection], line: bytes) -> Dict:
+        """处理一行请求，返回响应消息"""
+        request_id = None
+        try:
+            request = decode_message(line)
+            request_id = request.get('id')
+            cmd = request.get('cmd')
+            if client is not None and not client.authenticated:
+                if cmd != 'hello' or not hmac.compare_digest(str(request.get('token', '')), self.token):
+                    raise DaemonError("口令错误或未认证")
+                client.authenticated = True
+            if cmd == 'subscribe':
+                if client is not None:
+                    client.subscribed = bool(request.get('enabled', True))
+                return {'id': request_id, 'ok': True, 'result': {'update_interval': self.update_interval}}
+            handler = self.commands.get(cmd)
+            if handler is None:
+                raise DaemonError(f"未知命令: {cmd}")
+            return {'id': request_id, 'ok': True, 'result': handler(request)}
+        except Exception as e:
+            return {'id': request_id, 'ok': False, 'error': f"{e.__class__.__name__}: {e}"}
+
+    def _windows(self, args: Dict) -> List:
+        """请求中的 hwnds（缺省为全部窗口）"""
+        hwnds = args.get('hwnds')
+        with self.bot.windows_lock:
+            if hwnds is None:
+                return list(self.bot.windows.values())
+            return [self.bot.windows[int(hwnd)] for hwnd in hwnds if int(hwnd) in self.bot.windows]
+
+    def _require_threads(self):
+        if self.bot.supervisor is not None:
+            raise DaemonError("多进程模式不支持单独启停窗口")
+
+    def _cmd_hello(self, args: Dict) -> Dict:
+        return {'protocol': PROTOCOL_VERSION, 'pid': os.getpid(), 'update_interval': self.update_interval,
+                'node': self.node_name, 'hostname': socket.gethostname(), 'cpu_count': os.cpu_count(),
+                'capacity': self.capacity}
+
+    def _cmd_metrics(self, args: Dict) -> Dict:
+        """所有窗口合并后的分阶段耗时直方图（可序列化格式）"""
+        merged: Dict[str, LatencyHistogram] = {}
+        rows = self.bot.window_rows()  # 多进程模式下为工作进程上报的直方图
+        for _, _, _, metrics, _ in rows:
+            for stage, histogram in metrics.snapshot().items():
+                merged.setdefault(stage, LatencyHistogram()).merge(histogram)
+        return {'windows': len(rows), 'stages': {stage: h.to_dict() for stage, h in merged.items()}}
+
+    def _cmd_scan(self, args: Dict) -> int:
+        return self.bot.scan_windows()
+
+    def _cmd_start(self, args: Dict) -> List[int]:
+        self._require_threads()
+        interval = self.bot.config.getfloat('Detection', 'detection_interval', fallback=0.3)
+        started = []
+        for gw in self._windows(args):
+            if not gw.running:
+                gw.start(interval)
+                started.append(gw.hwnd)
+        return started
+
+    def _cmd_stop(self, args: Dict) -> List[int]:
+        self._require_threads()
+        windows = [gw for gw in self._windows(args) if gw.running]
+        for gw in windows:
+            gw.running = False
+        for gw in windows:
+            gw.stop()
+        return [gw.hwnd for gw in windows]
+
+    def _cmd_remove(self, args: Dict) -> List[int]:
+        from window_watcher import REASON_REMOVED
+
+        removed = []
+        for gw in self._windows(args):
+            self.bot.remove_window(gw.hwnd, REASON_REMOVED)
+            removed.append(gw.hwnd)
+        return removed
+
+    def _cmd_test(self, args: Dict) -> Dict:
+        """截图并检测一次（不发送按键）"""
+        hwnd = int(args['hwnd'])
+        gw = self.bot.windows.get(hwnd)
+        if gw is None:
+            raise DaemonError(f"窗口不存在: {hwnd}")
+        minimap = gw.test_capture()  # 不与监控线程争用截图源和环形缓冲区
+        if minimap is None:
+            return {'captured': False, 'dots': 0}
+        dots = gw.detector.detect(minimap)
+        result = {'captured': True, 'dots': len(dots)}
+        if args.get('save'):
+            import cv2
+            debug_dir = os.path.join(SCRIPT_DIR, 'debug')
+            os.makedirs(debug_dir, exist_ok=True)
+            path = os.path.join(debug_dir, f"test_{hwnd}_{time.strftime('%Y%m%d_%H%M%S')}.jpg")
+            cv2.imwrite(path, minimap)
+            result['image'] = path
+        return result
+
+    def _cmd_profile(self, args: Dict) -> bool:
+        if self.bot.supervisor is not None:
+            raise DaemonError("多进程模式不支持性能分析")
+        hwnd = args.get('hwnd')
+        return self.bot.start_profiling(float(args.get('duration', 10.0)), None if hwnd is None else int(hwnd))
+
+    def _cmd_configure(self, args: Dict) -> Dict:
+        """
+        修改配置（冷却、小地图区域和窗口标题立即生效，检测间隔对之后启动的窗口生效）
+
+        参数为 teleport_key/cooldown/detection_interval 快捷项，或 sections={节: {键: 值}}（农场协调器下发）
+        """
+        from window_registry import game_title_keywords
+
+        updates: Dict[str, Dict[str, str]] = {}
+        for section, values in (args.get('sections') or {}).items():
+            updates.setdefault(section, {}).update({key: str(value) for key, value in values.items()})
+        for name, (section, key) in CONFIG_SHORTCUTS.items():
+            if name in args:
+                updates.setdefault(section, {})[key] = str(args[name])
+        # 先全部校验再修改，避免只应用一部分
+        for section, values in updates.items():
+            for key, value in values.items():
+                if (section, key) in NUMERIC_OPTIONS:
+                    float(value)
+
+        config = self.bot.config
+        for section, values in updates.items():
+            if not config.has_section(section):
+                config.add_section(section)
+            for key, value in values.items():
+                config.set(section, key, value)
+
+        cooldown = config.getfloat('Teleport', 'cooldown', fallback=4.0)
+        for gw in self._windows({}):
+            gw.config = config
+            gw.teleport_cooldown = cooldown
+            if 'Minimap' in updates:
+                gw._init_window()
+        if 'Game' in updates:
+            self.bot.window_registry.set_titles(game_title_keywords(config))
+        if args.get('save'):
+            with open(self.bot.config_file, 'w', encoding='utf-8') as f:
+                config.write(f)
+        return {name: config.get(section, key, fallback=None) for name, (section, key) in CONFIG_SHORTCUTS.items()}
+
+    def _cmd_reload(self, args: Dict) -> int:
+        """重新读取配置文件，重新计算各窗口的小地图区域并重新加载检测参数（如重新校准的颜色查找表）"""
+        self.bot.config = self.bot._load_config(self.bot.config_file)
+        base_dir = os.path.dirname(os.path.abspath(self.bot.config_file))
+        windows = self._windows({})
+        for gw in windows:
+            gw.config = self.bot.config
+            gw.detector.configure(self.bot.config, base_dir)
+            gw._init_window()
+        return len(windows)
+
+    def _cmd_shutdown(self, args: Dict) -> bool:
+        # run() 的主循环检测到后在主线程中完成停止
+        self.bot.running = False
+        return True
+
+
+class DaemonClient:
+    """
+    守护进程客户端
+
+    读取线程接收响应和推送；推送的状态保存在 latest_state，日志积累在 logs，
+    由调用方（如GUI的after循环）在自己的线程中读取，回调不会在读取线程中操作界面
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT, timeout: float = 5.0,
+                 token: str = None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token = token
+        self.sock: Optional[socket.socket] = None
+        self.latest_state: Optional[Dict] = None
+        self.state_received = threading.Event()  # 收到第一次推送后置位
+        self.state_seq = 0
+        self.state_time = 0.0  # 收到最新推送的时间（time.monotonic()）
+        self.logs: Deque[str] = deque(maxlen=LOG_BUFFER_LIMIT)
+        self.connected = False
+
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._pending: Dict[int, list] = {}  # id -> [Event, 响应]
+        self._pending_lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+
+    def connect(self, subscribe: bool = True) -> Dict:
+        """连接守护进程，返回hello信息"""
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connected = True
+        self._reader = threading.Thread(target=self._read_loop, name='daemon-client', daemon=True)
+        self._reader.start()
+        try:
+            hello = self.request('hello', token=self.token) if self.token else self.request('hello')
+        except DaemonError:
+            self.close()
+            raise
+        if hello.get('protocol') != PROTOCOL_VERSION:
+            self.close()
+            raise DaemonError(f"协议版本不一致: {hello.get('protocol')} != {PROTOCOL_VERSION}")
+        if subscribe:
+            self.request('subscribe')
+        return hello
+
+    def request(self, cmd: str, timeout: float = None, **args):
+        """发送命令并等待响应，返回result；守护进程返回错误时抛出 DaemonError"""
+        if not self.connected:
+            raise DaemonError("未连接守护进程")
+        request_id = next(self._ids)
+        slot = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[request_id] = slot
+        try:
+            with self._send_lock:
+                self.sock.sendall(encode_message(dict(args, id=request_id, cmd=cmd)))
+            if not slot[0].wait(self.timeout if timeout is None else timeout):
+                raise DaemonError(f"命令超时: {cmd}")
+        except OSError as e:
+            raise DaemonError(f"连接已断开: {e}")
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        response = slot[1]
+        if response is None:
+            raise DaemonError("连接已断开")
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'unknown error'))
+        return response.get('result')
+
+    def _read_loop(self):
+        reader = self.sock.makefile('rb')
+        try:
+            for line in reader:
+                try:
+                    message = decode_message(line)
+                except ValueError:
+                    continue
+                if message.get('event') == 'update':
+                    self.latest_state = message.get('state')
+                    self.state_seq = message.get('seq', 0)
+                    self.state_time = time.monotonic()
+                    self.logs.extend(message.get('logs', ()))
+                    self.state_received.set()
+                    continue
+                with self._pending_lock:
+                    slot = self._pending.get(message.get('id'))
+                if slot is not None:
+                    slot[1] = message
+                    slot[0].set()
+        except (OSError, ValueError):
+            pass
+        finally:
+            reader.close()
+            self.connected = False
+            with self._pending_lock:
+                for slot in self._pending.values():
+                    slot[0].set()
+
+    def wait_state(self, timeout: float = None) -> Optional[Dict]:
+        """等待第一次状态推送，返回最新状态（超时返回None）"""
+        self.state_received.wait(self.timeout if timeout is None else timeout)
+        return self.latest_state
+
+    def drain_logs(self) -> List[str]:
+        """取出已收到的日志"""
+        lines = []
+        while self.logs:
+            lines.append(self.logs.popleft())
+        return lines
+
+    def close(self):
+        self.connected = False
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        if self._reader is not None:
+            self._reader.join(timeout=1.0)
+            self._reader = None
+
+
+def main():
+    """主函数"""
+    from mir2_multi_window_bot import MultiWindowBot
+
+    parser = argparse.ArgumentParser(description='传奇2自动挂机 - 无界面守护进程（GUI通过本机端口连接）')
+    parser.add_argument('--config', default=None, help='配置文件路径（默认 bot_config_v2.ini）')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='监听地址（默认只监听本机；作为农场节点时用 0.0.0.0，此时必须设置口令）')
+    parser.add_argument('--token', default=None, help='连接口令（默认读取 [Daemon] token）')
+    parser.add_argument('--port', type=int, default=None, help=f'控制端口（默认读取 [Daemon] port，{DEFAULT_PORT}）')
+    parser.add_argument('--workers', type=int, default=None, help='多进程模式的工作进程数')
+    parser.add_argument('--node', default=None, help='节点名称（默认读取 [Daemon] node_name 或主机名）')
+    parser.add_argument('--capacity', type=int, default=None,
+                        help='本节点最多同时监控的窗口数（默认读取 [Daemon] capacity，0为不限）')
+    parser.add_argument('--metrics-port', type=int, default=None, help='同时启动Prometheus指标服务的端口')
+    args = parser.parse_args()
+
+    bot = MultiWindowBot(args.config)
+    port = args.port if args.port is not None else bot.config.getint('Daemon', 'port', fallback=DEFAULT_PORT)
+    server = DaemonServer(bot, args.host, port,
+                          bot.config.getfloat('Daemon', 'update_interval', fallback=DEFAULT_UPDATE_INTERVAL),
+                          node_name=args.node, capacity=args.capacity, token=args.token)
+    if not server.start():
+        sys.exit(1)
+
+    count = bot.scan_windows()
+    logger.info(f"找到 {count} 个游戏窗口")
+    if args.metrics_port is not None:
+        bot.start_metrics_server(args.metrics_port)
+    try:
+        bot.run(args.workers)
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
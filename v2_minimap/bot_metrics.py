@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+性能统计模块
+功能: 为截图、检测、传送、休眠等阶段记录耗时，使用固定内存的对数分桶直方图
+特性: 每个窗口独立一份，记录开销为常数级，可随时输出 p50/p95/p99/max
+"""
+
+import math
+import time
+from typing import Dict, List, Optional
+
+# 直方图分桶参数：从1微秒开始，每个2倍区间分16个子桶，共32个区间（约1微秒到70分钟）
+HISTOGRAM_MIN_VALUE = 1e-6
+HISTOGRAM_SUB_BUCKETS = 16
+HISTOGRAM_OCTAVES = 32
+
+# 各阶段名称（按显示顺序）
+STAGE_CAPTURE = 'capture'
+STAGE_DETECT = 'detect'
+STAGE_TELEPORT = 'teleport'
+STAGE_SLEEP = 'sleep'
+STAGE_REACTION = 'reaction'  # 截图开始到按键发出的延迟
+STAGES = (STAGE_CAPTURE, STAGE_DETECT, STAGE_TELEPORT, STAGE_SLEEP, STAGE_REACTION)
+
+
+class LatencyHistogram:
+    """对数分桶延迟直方图（单线程写入，其他线程可随时读取快照）"""
+
+    __slots__ = ('counts', 'count', 'total', 'max_value', 'min_value')
+
+    def __init__(self):
+        # 第0个桶存放小于最小值的数据，其余按对数分桶
+        self.counts = [0] * (1 + HISTOGRAM_SUB_BUCKETS * HISTOGRAM_OCTAVES)
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+        self.min_value = 0.0
+
+    @staticmethod
+    def bucket_index(value: float) -> int:
+        """计算数值所在的桶序号"""
+        scaled = value / HISTOGRAM_MIN_VALUE
+        if scaled < 1.0:
+            return 0
+        mantissa, exponent = math.frexp(scaled)
+        # scaled 位于 [2^(exponent-1), 2^exponent)，mantissa 位于 [0.5, 1)
+        index = 1 + (exponent - 1) * HISTOGRAM_SUB_BUCKETS + int((mantissa * 2.0 - 1.0) * HISTOGRAM_SUB_BUCKETS)
+        last = HISTOGRAM_SUB_BUCKETS * HISTOGRAM_OCTAVES
+        return index if index < last else last
+
+    @staticmethod
+    def bucket_upper_bound(index: int) -> float:
+        """桶的上界（秒）"""
+        if index <= 0:
+            return HISTOGRAM_MIN_VALUE
+        octave, sub = divmod(index - 1, HISTOGRAM_SUB_BUCKETS)
+        return HISTOGRAM_MIN_VALUE * (2.0 ** octave) * (1.0 + (sub + 1) / HISTOGRAM_SUB_BUCKETS)
+
+    def record(self, value: float):
+        """记录一个耗时（秒）"""
+        if value < 0:
+            value = 0.0
+        self.counts[self.bucket_index(value)] += 1
+        if self.count == 0 or value < self.min_value:
+            self.min_value = value
+        if value > self.max_value:
+            self.max_value = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: 'LatencyHistogram'):
+        """合并另一个直方图（分桶布局相同）"""
+        if other.count == 0:
+            return
+        counts = other.counts
+        for i, c in enumerate(counts):
+            if c:
+                self.counts[i] += c
+        if self.count == 0 or other.min_value < self.min_value:
+            self.min_value = other.min_value
+        self.max_value = max(self.max_value, other.max_value)
+        self.count += other.count
+        self.total += other.total
+
+    def copy(self) -> 'LatencyHistogram':
+        """复制一份快照"""
+        snapshot = LatencyHistogram()
+        snapshot.counts = list(self.counts)
+        snapshot.count = self.count
+        snapshot.total = self.total
+        snapshot.max_value = self.max_value
+        snapshot.min_value = self.min_value
+        return snapshot
+
+    def to_dict(self) -> Dict:
+        """转换为可JSON序列化的字典（只保存非空桶）"""
+        return {
+            'buckets': [[i, c] for i, c in enumerate(self.counts) if c],
+            'count': self.count,
+            'total': self.total,
+            'max': self.max_value,
+            'min': self.min_value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        """从 to_dict() 的结果恢复"""
+        histogram = cls()
+        for index, count in data.get('buckets', ()):
+            histogram.counts[int(index)] += int(count)
+        histogram.count = int(data.get('count', 0))
+        histogram.total = float(data.get('total', 0.0))
+        histogram.max_value = float(data.get('max', 0.0))
+        histogram.min_value = float(data.get('min', 0.0))
+        return histogram
+
+    def reset(self):
+        """清空数据"""
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.max_value = 0.0
+        self.min_value = 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        计算百分位数（秒）
+
+        Args:
+            p: 百分位，0-100
+
+        Returns:
+            所在桶的上界，不超过实际最大值；无数据时返回0
+        """
+        if self.count == 0:
+            return 0.0
+        target = max(1, int(math.ceil(self.count * p / 100.0)))
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                cumulative += c
+                if cumulative >= target:
+                    return min(self.bucket_upper_bound(i), self.max_value)
+        return self.max_value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """返回常用统计值（秒）"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max_value,
+        }
+
+
+class WindowMetrics:
+    """单个窗口的分阶段耗时统计"""
+
+    def __init__(self, stages=STAGES):
+        self.histograms: Dict[str, LatencyHistogram] = {name: LatencyHistogram() for name in stages}
+        # 最近一次截图开始时间，用于计算检测到按键的延迟
+        self.last_capture_started: Optional[float] = None
+
+    def record(self, stage: str, value: float):
+        """记录某个阶段的耗时（秒）"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.record(value)
+
+    def mark_capture_start(self) -> float:
+        """标记截图开始，返回当前时间"""
+        now = time.perf_counter()
+        self.last_capture_started = now
+        return now
+
+    def record_reaction(self, now: float = None):
+        """记录从截图开始到按键发出的延迟"""
+        if self.last_capture_started is None:
+            return
+        if now is None:
+            now = time.perf_counter()
+        self.record(STAGE_REACTION, now - self.last_capture_started)
+
+    def snapshot(self) -> Dict[str, LatencyHistogram]:
+        """复制所有直方图，供其他线程读取"""
+        return {name: h.copy() for name, h in list(self.histograms.items())}
+
+    def merge(self, other: 'WindowMetrics'):
+        """合并另一个窗口的统计"""
+        for name, histogram in other.snapshot().items():
+            if name not in self.histograms:
+                self.histograms[name] = LatencyHistogram()
+            self.histograms[name].merge(histogram)
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def format_lines(self) -> List[str]:
+        """格式化为多行文本（毫秒）"""
+        return [format_histogram(name, h) for name, h in self.snapshot().items() if h.count]
+
+    def format_compact(self, stages=(STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION)) -> str:
+        """格式化为单行文本（p95，毫秒），用于GUI状态栏"""
+        parts = []
+        snapshot = self.snapshot()
+        for name in stages:
+            histogram = snapshot.get(name)
+            if histogram is not None and histogram.count:
+                parts.append(f"{name} p95={histogram.percentile(95) * 1000:.1f}ms")
+        return " | ".join(parts) if parts else "no samples"
+
+
+def format_histogram(name: str, histogram: LatencyHistogram) -> str:
+    """格式化单个直方图（毫秒）"""
+    s = histogram.summary()
+    return (f"{name}: n={s['count']} p50={s['p50'] * 1000:.2f}ms p95={s['p95'] * 1000:.2f}ms "
+            f"p99={s['p99'] * 1000:.2f}ms max={s['max'] * 1000:.2f}ms")
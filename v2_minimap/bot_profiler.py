@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+运行时性能分析模块
+功能: 对所有机器人线程做定时堆栈采样，或对单个检测循环做限时cProfile分析
+特性: 关闭时不产生任何开销，可通过热键、命令行或GUI按钮随时开启，结果写入文件
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.join(SCRIPT_DIR, 'profiles')
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+class StackSampler:
+    """定时采样所有线程的调用栈，输出折叠栈格式（可直接生成火焰图）"""
+
+    def __init__(self, duration: float, output_path: str, interval: float = 0.01,
+                 on_done: Callable[[str], None] = None):
+        """
+        Args:
+            duration: 采样时长（秒）
+            output_path: 输出文件路径
+            interval: 采样间隔（秒）
+            on_done: 完成后回调，参数为输出文件路径
+        """
+        self.duration = duration
+        self.output_path = output_path
+        self.interval = interval
+        self.on_done = on_done
+        self.samples = 0
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """在后台线程中开始采样"""
+        self.thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + self.duration
+
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"堆栈采样完成: {self.samples} 次采样 -> {self.output_path}")
+        if self.on_done:
+            self.on_done(self.output_path)
+
+
+class LoopProfileCapture:
+    """
+    对单个检测循环做限时cProfile分析
+
+    由循环线程在每次迭代开始时调用 poll()，cProfile只能在目标线程内启用
+    """
+
+    def __init__(self, duration: float, output_path: str, on_done: Callable[[str], None] = None):
+        self.duration = duration
+        self.output_path = output_path
+        self.on_done = on_done
+        self.profiler: Optional[cProfile.Profile] = None
+        self.deadline = 0.0
+
+    def poll(self) -> bool:
+        """
+        在循环线程中调用
+
+        Returns:
+            是否已完成（完成后调用方应清除请求）
+        """
+        now = time.monotonic()
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.deadline = now + self.duration
+            self.profiler.enable()
+            return False
+        if now < self.deadline:
+            return False
+        self.finish()
+        return True
+
+    def finish(self):
+        """停止分析并写入文件（循环提前退出时也要调用）"""
+        if self.profiler is None:
+            return
+        profiler, self.profiler = self.profiler, None
+        profiler.disable()
+
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        profiler.dump_stats(self.output_path)
+
+        # 同时输出文本摘要，方便直接查看
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(30)
+        with open(os.path.splitext(self.output_path)[0] + '.txt', 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+
+        logger.info(f"循环性能分析完成 -> {self.output_path}")
+        if self.on_done:
+            self.on_done(self.output_path)
+
+
+class BotProfiler:
+    """性能分析入口"""
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir or PROFILE_DIR
+
+    def sample_stacks(self, duration: float = 5.0, interval: float = 0.01,
+                      on_done: Callable[[str], None] = None) -> str:
+        """
+        开始采样所有线程的调用栈
+
+        Returns:
+            输出文件路径（采样在后台完成）
+        """
+        path = os.path.join(self.output_dir, f'stacks_{_timestamp()}.txt')
+        StackSampler(duration, path, interval, on_done).start()
+        logger.info(f"开始堆栈采样 {duration} 秒")
+        return path
+
+    def profile_loop(self, target, duration: float = 10.0, label: str = 'loop',
+                     on_done: Callable[[str], None] = None) -> Optional[str]:
+        """
+        请求对目标对象的检测循环做限时cProfile分析
+
+        Args:
+            target: 带有 profile_request 属性的对象（GameWindow、Mir2AutoBotV2）
+            duration: 分析时长（秒）
+            label: 文件名标签
+
+        Returns:
+            输出文件路径；目标已在分析中时返回None
+        """
+        if getattr(target, 'profile_request', None) is not None:
+            logger.warning("该循环已在进行性能分析")
+            return None
+        path = os.path.join(self.output_dir, f'loop_{label}_{_timestamp()}.prof')
+        target.profile_request = LoopProfileCapture(duration, path, on_done)
+        logger.info(f"开始循环性能分析 [{label}] {duration} 秒")
+        return path
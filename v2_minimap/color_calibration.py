@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+黄点颜色自动校准
+功能: 从录制的小地图画面统计颜色直方图，对黄点颜色聚类，把紧凑的颜色范围和预计算的颜色查找表写入配置
+特性: 不同客户端渲染的黄色略有差异时无需手动调 [YellowColor]；查找表可表示多个不相连的颜色簇，
+      检测时每个像素只查一次表（见 MinimapDetector.configure）
+
+原理: 1. 只统计接近种子颜色（默认RGB(255,255,0)）且属于小连通块（点状）的像素，排除大片的黄色界面元素
+      2. 去掉占比过低的颜色（抗锯齿边缘、压缩噪声），剩余颜色按通道距离相连聚成簇
+      3. 每个簇取各通道的最小/最大值再放宽 margin，作为一个颜色框；查找表为所有颜色框的并集，
+         [YellowColor] 的范围为包含所有颜色框的最小范围（未使用查找表时的回退）
+
+使用方法:
+  python color_calibration.py debug/ --config bot_config_v2.ini
+  python color_calibration.py recordings.zip --config bot_config_instance_1.ini --dry-run
+  python color_calibration.py debug/ --seed 0,255,255 --class guild   # 写入 [MinimapClasses] 的一个类别
+"""
+
+import argparse
+import configparser
+import os
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from minimap_detector import ColorBox, build_color_lut, color_index, save_color_lut
+from minimap_classifier import format_boxes
+from frame_source import load_frames
+
+DEFAULT_SEED_RGB = (255, 255, 0)
+DEFAULT_SEARCH_RADIUS = 60   # 与种子颜色各通道的最大差值
+DEFAULT_MAX_DOT_AREA = 80    # 点状连通块的最大面积，更大的视为界面元素
+DEFAULT_MIN_SHARE = 0.005    # 颜色占候选像素的最小比例
+DEFAULT_CLUSTER_RADIUS = 8   # 聚类时相连颜色的最大通道差
+DEFAULT_MARGIN = 2           # 颜色框各通道的放宽量
+MAX_COLORS = 512             # 参与聚类的最多颜色数（按频次）
+
+
+def collect_histogram(frames: Sequence[np.ndarray], seed_rgb: Tuple[int, int, int] = DEFAULT_SEED_RGB,
+                      search_radius: int = DEFAULT_SEARCH_RADIUS,
+                      max_dot_area: int = DEFAULT_MAX_DOT_AREA) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    统计点状候选像素的颜色直方图
+
+    Returns:
+        (颜色 (N, 3) RGB, 像素数 (N,))，按像素数降序
+    """
+    seed_bgr = np.array(seed_rgb[::-1], dtype=np.int16)
+    indices = []
+    for frame in frames:
+        near = np.abs(frame.astype(np.int16) - seed_bgr).max(axis=2) <= search_radius
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(near.astype(np.uint8), connectivity=8)
+        dot_labels = np.flatnonzero(stats[:, cv2.CC_STAT_AREA] <= max_dot_area)
+        dot_labels = dot_labels[dot_labels > 0]
+        if dot_labels.size == 0:
+            continue
+        indices.append(color_index(frame)[np.isin(labels, dot_labels)])
+
+    if not indices:
+        return np.empty((0, 3), dtype=np.int32), np.empty(0, dtype=np.int64)
+    values, counts = np.unique(np.concatenate(indices), return_counts=True)
+    order = np.argsort(counts)[::-1]
+    values, counts = values[order], counts[order]
+    colors = np.stack([values >> 16, (values >> 8) & 0xFF, values & 0xFF], axis=1).astype(np.int32)
+    return colors, counts
+
+
+def cluster_colors(colors: np.ndarray, counts: np.ndarray, min_share: float = DEFAULT_MIN_SHARE,
+                   radius: int = DEFAULT_CLUSTER_RADIUS, margin: int = DEFAULT_MARGIN) -> List[Dict]:
+    """
+    把颜色聚成簇
+
+    Returns:
+        [{'lower': (r, g, b), 'upper': (r, g, b), 'pixels': 像素数, 'share': 占比}, ...]，按像素数降序
+    """
+    total = int(counts.sum())
+    if total == 0:
+        return []
+    keep = counts >= min_share * total
+    colors, counts = colors[keep][:MAX_COLORS], counts[keep][:MAX_COLORS]
+    if len(colors) == 0:
+        return []
+
+    # 通道距离不超过 radius 的颜色相连，反复取邻居的最小标签直到稳定（颜色数很少，直接用距离矩阵）
+    adjacent = np.abs(colors[:, None, :] - colors[None, :, :]).max(axis=2) <= radius
+    labels = np.arange(len(colors))
+    while True:
+        merged = np.where(adjacent, labels[None, :], len(colors)).min(axis=1)
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+
+    clusters = []
+    for label in np.unique(labels):
+        members = labels == label
+        lower = np.clip(colors[members].min(axis=0) - margin, 0, 255)
+        upper = np.clip(colors[members].max(axis=0) + margin, 0, 255)
+        pixels = int(counts[members].sum())
+        clusters.append({
+            'lower': tuple(int(v) for v in lower),
+            'upper': tuple(int(v) for v in upper),
+            'pixels': pixels,
+            'share': pixels / total,
+        })
+    clusters.sort(key=lambda cluster: cluster['pixels'], reverse=True)
+    return clusters
+
+
+def cluster_boxes(clusters: Sequence[Dict]) -> List[ColorBox]:
+    return [(cluster['lower'], cluster['upper']) for cluster in clusters]
+
+
+def bounding_box(boxes: Sequence[ColorBox]) -> ColorBox:
+    """包含所有颜色框的最小范围"""
+    lower = tuple(min(box[0][i] for box in boxes) for i in range(3))
+    upper = tuple(max(box[1][i] for box in boxes) for i in range(3))
+    return lower, upper
+
+
+def write_class(config_file: str, class_name: str, boxes: Sequence[ColorBox]):
+    """把颜色框写入 [MinimapClasses] 的一个类别（分类查找表在加载配置时构建）"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.has_section('MinimapClasses'):
+        config.add_section('MinimapClasses')
+    config.set('MinimapClasses', class_name, format_boxes(boxes))
+    with open(config_file, 'w', encoding='utf-8') as f:
+        config.write(f)
+
+
+def write_calibration(config_file: str, boxes: Sequence[ColorBox], lut_name: str = None) -> str:
+    """
+    写入 [YellowColor] 颜色范围并保存查找表（与配置文件同目录）
+
+    Returns:
+        查找表路径
+    """
+    if lut_name is None:
+        lut_name = os.path.splitext(os.path.basename(config_file))[0] + '_yellow_lut.npz'
+    lut_path = os.path.join(os.path.dirname(os.path.abspath(config_file)), lut_name)
+    save_color_lut(lut_path, build_color_lut(boxes), boxes)
+
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.has_section('YellowColor'):
+        config.add_section('YellowColor')
+    (r_lower, g_lower, b_lower), (r_upper, g_upper, b_upper) = bounding_box(boxes)
+    for key, value in (('r_lower', r_lower), ('r_upper', r_upper), ('g_lower', g_lower),
+                       ('g_upper', g_upper), ('b_lower', b_lower), ('b_upper', b_upper)):
+        config.set('YellowColor', key, str(value))
+    config.set('YellowColor', 'lut_file', lut_name)
+    with open(config_file, 'w', encoding='utf-8') as f:
+        config.write(f)
+    return lut_path
+
+
+def _parse_rgb(text: str) -> Tuple[int, int, int]:
+    values = tuple(int(v) for v in text.split(','))
+    if len(values) != 3 or not all(0 <= v <= 255 for v in values):
+        raise argparse.ArgumentTypeError(f"颜色格式应为 R,G,B: {text}")
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从录制的小地图校准黄点颜色范围和颜色查找表')
+    parser.add_argument('recordings', nargs='+', help='录制的小地图（图片目录或zip）')
+    parser.add_argument('--config', default=os.path.join(SCRIPT_DIR, 'bot_config_v2.ini'), help='写入的配置文件')
+    parser.add_argument('--seed', type=_parse_rgb, default=DEFAULT_SEED_RGB, help='种子颜色 R,G,B')
+    parser.add_argument('--radius', type=int, default=DEFAULT_SEARCH_RADIUS, help='与种子颜色的最大通道差')
+    parser.add_argument('--max-dot-area', type=int, default=DEFAULT_MAX_DOT_AREA, help='点状连通块最大面积')
+    parser.add_argument('--min-share', type=float, default=DEFAULT_MIN_SHARE, help='颜色最小占比')
+    parser.add_argument('--margin', type=int, default=DEFAULT_MARGIN, help='颜色框放宽量')
+    parser.add_argument('--class', dest='class_name', help='写入 [MinimapClasses] 的类别名（默认写入 [YellowColor]）')
+    parser.add_argument('--dry-run', action='store_true', help='只显示结果，不写入配置')
+    args = parser.parse_args()
+
+    frames = [image for path in args.recordings for _, image in load_frames(path)]
+    colors, counts = collect_histogram(frames, args.seed, args.radius, args.max_dot_area)
+    print(f"{len(frames)} 帧，候选像素 {int(counts.sum())}，颜色 {len(colors)} 种")
+    clusters = cluster_colors(colors, counts, args.min_share, margin=args.margin)
+    if not clusters:
+        print("未找到黄点颜色，请检查录制画面或放宽 --radius")
+        sys.exit(1)
+    for cluster in clusters:
+        print(f"  RGB {cluster['lower']} - {cluster['upper']}: {cluster['pixels']} 像素 ({cluster['share']:.1%})")
+
+    if args.dry_run:
+        return
+    if args.class_name:
+        write_class(args.config, args.class_name, cluster_boxes(clusters))
+        print(f"已写入 {args.config} [MinimapClasses] {args.class_name}")
+    else:
+        lut_path = write_calibration(args.config, cluster_boxes(clusters))
+        print(f"已写入 {args.config}，查找表 {lut_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+小地图黄点跨帧跟踪
+功能: 把每帧检测到的点与上一帧的轨迹关联，给每个点稳定的编号，并估计速度、朝向和存在时间
+特性: 按距离从近到远的贪心最近邻关联（带距离门限）；轨迹状态保存在预分配的NumPy数组中，
+      容量固定（max_tracks），结束的轨迹空出槽位复用，内存不随运行时间增长；
+      关联、速度更新、结束和新建轨迹都是整体的数组运算，不逐个轨迹循环
+
+使用方法:
+  tracker = DotTracker()
+  tracks = tracker.update(detector.detect(minimap), timestamp)
+  for track in tracks:
+      print(track.track_id, track.x, track.y, track.speed, track.heading, track.age)
+"""
+
+import itertools
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from blob_stats import Blobs
+
+DEFAULT_MAX_DISTANCE = 12.0   # 相邻两帧同一个点的最大移动距离（像素）
+DEFAULT_MAX_MISSES = 3        # 连续多少帧未匹配后结束轨迹
+DEFAULT_MAX_TRACKS = 128      # 同时存在的最大轨迹数
+DEFAULT_SMOOTHING = 0.5       # 速度指数平滑系数（新观测的权重）
+
+_FAR = 1e18  # 门限外的距离平方
+
+# 轨迹状态数组的列
+X, Y, AREA, VX, VY, FIRST_SEEN, LAST_SEEN = range(7)  # 前三列与检测结果 (x, y, area) 对应
+HITS, MISSES = range(2)
+
+
+class Track:
+    """
+    单个轨迹（跟踪器中一个槽位的只读视图，只有当前状态，不保存历史位置）
+
+    轨迹结束、槽位被新轨迹复用后视图随之指向新轨迹；需要保存时用 to_dict()
+    """
+
+    __slots__ = ('_tracker', 'slot')
+
+    def __init__(self, tracker: 'DotTracker', slot: int):
+        self._tracker = tracker
+        self.slot = slot
+
+    @property
+    def track_id(self) -> int:
+        return int(self._tracker._ids[self.slot])
+
+    @property
+    def x(self) -> float:
+        return float(self._tracker._state[self.slot, X])
+
+    @property
+    def y(self) -> float:
+        return float(self._tracker._state[self.slot, Y])
+
+    @property
+    def vx(self) -> float:
+        """水平速度（像素/秒）"""
+        return float(self._tracker._state[self.slot, VX])
+
+    @property
+    def vy(self) -> float:
+        """竖直速度（像素/秒）"""
+        return float(self._tracker._state[self.slot, VY])
+
+    @property
+    def area(self) -> int:
+        return int(self._tracker._state[self.slot, AREA])
+
+    @property
+    def first_seen(self) -> float:
+        return float(self._tracker._state[self.slot, FIRST_SEEN])
+
+    @property
+    def last_seen(self) -> float:
+        return float(self._tracker._state[self.slot, LAST_SEEN])
+
+    @property
+    def hits(self) -> int:
+        return int(self._tracker._counts[self.slot, HITS])
+
+    @property
+    def misses(self) -> int:
+        return int(self._tracker._counts[self.slot, MISSES])
+
+    @property
+    def age(self) -> float:
+        """存在时间（秒，首次到最近一次检测到）"""
+        return self.last_seen - self.first_seen
+
+    @property
+    def speed(self) -> float:
+        """速度（像素/秒）"""
+        return math.hypot(self.vx, self.vy)
+
+    @property
+    def heading(self) -> float:
+        """朝向（度，0为向右，90为向下，与图像坐标一致）"""
+        return math.degrees(math.atan2(self.vy, self.vx)) % 360.0
+
+    def predict(self, timestamp: float) -> Tuple[float, float]:
+        """按当前速度预测某一时刻的位置"""
+        dt = timestamp - self.last_seen
+        return self.x + self.vx * dt, self.y + self.vy * dt
+
+    def to_dict(self) -> dict:
+        return {'id': self.track_id, 'x': round(self.x, 1), 'y': round(self.y, 1),
+                'vx': round(self.vx, 1), 'vy': round(self.vy, 1), 'age': round(self.age, 3),
+                'hits': self.hits, 'misses': self.misses}
+
+    def __repr__(self) -> str:
+        return (f"Track(id={self.track_id}, pos=({self.x:.1f}, {self.y:.1f}), "
+                f"v=({self.vx:.1f}, {self.vy:.1f}), age={self.age:.2f}s)")
+
+
+class DotTracker:
+    """
+    黄点跟踪器（单线程使用，每个窗口一个）
+
+    每帧调用 update()，未匹配的轨迹按预测位置参与下一帧关联，连续 max_misses 帧未匹配后结束；
+    轨迹数达到 max_tracks 时新出现的点不建立轨迹
+    """
+
+    def __init__(self, max_distance: float = DEFAULT_MAX_DISTANCE, max_misses: int = DEFAULT_MAX_MISSES,
+                 max_tracks: int = DEFAULT_MAX_TRACKS, smoothing: float = DEFAULT_SMOOTHING):
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.max_tracks = max_tracks
+        self.smoothing = smoothing
+        self.last_update: Optional[float] = None
+        self._next_id = 1
+
+        # 按槽位保存的轨迹状态
+        self._alive = np.zeros(max_tracks, dtype=bool)
+        self._ids = np.zeros(max_tracks, dtype=np.int64)
+        self._state = np.zeros((max_tracks, 7), dtype=np.float64)   # X, Y, AREA, VX, VY, FIRST_SEEN, LAST_SEEN
+        self._counts = np.zeros((max_tracks, 2), dtype=np.int64)    # HITS, MISSES
+        self._views = [Track(self, slot) for slot in range(max_tracks)]
+
+    @classmethod
+    def from_config(cls, config) -> Optional['DotTracker']:
+        """
+        根据 [Tracking] 配置创建跟踪器，enabled = false 时返回None
+
+        [Tracking]
+        enabled = true
+        max_distance = 12
+        max_misses = 3
+        """
+        if not config.getboolean('Tracking', 'enabled', fallback=True):
+            return None
+        return cls(max_distance=config.getfloat('Tracking', 'max_distance', fallback=DEFAULT_MAX_DISTANCE),
+                   max_misses=config.getint('Tracking', 'max_misses', fallback=DEFAULT_MAX_MISSES),
+                   max_tracks=config.getint('Tracking', 'max_tracks', fallback=DEFAULT_MAX_TRACKS),
+                   smoothing=config.getfloat('Tracking', 'smoothing', fallback=DEFAULT_SMOOTHING))
+
+    @property
+    def tracks(self) -> List[Track]:
+        """未结束的轨迹（包括本帧未检测到、还在等待的轨迹）"""
+        return [self._views[slot] for slot in np.flatnonzero(self._alive).tolist()]
+
+    def active(self) -> List[Track]:
+        """本帧检测到的轨迹"""
+        return [self._views[slot] for slot in np.flatnonzero(self._alive & (self._counts[:, MISSES] == 0)).tolist()]
+
+    def motion(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        本帧检测到的轨迹的运动状态（供威胁判断整体计算）
+
+        Returns:
+            (位置 (N, 2), 速度 (N, 2) 像素/秒, 命中帧数 (N,))
+        """
+        slots = np.flatnonzero(self._alive & (self._counts[:, MISSES] == 0))
+        state = self._state[slots]
+        return state[:, X:Y + 1], state[:, VX:VY + 1], self._counts[slots, HITS]
+
+    def _assign(self, slots: np.ndarray, points: np.ndarray, timestamp: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        关联轨迹和点
+
+        Returns:
+            (匹配的轨迹在 slots 中的下标, 对应的点下标)
+        """
+        state = self._state[slots]
+        predicted = state[:, X:Y + 1] + state[:, VX:VY + 1] * (timestamp - state[:, LAST_SEEN, None])
+        dx = predicted[:, 0, None] - points[:, 0]
+        dy = predicted[:, 1, None] - points[:, 1]
+        distances = dx * dx
+        distances += dy * dy
+        np.putmask(distances, distances > self.max_distance * self.max_distance, _FAR)
+
+        # 互为最近邻的对一定会被按距离贪心选中，先整体匹配
+        track_count, dot_count = distances.shape
+        track_range = np.arange(track_count)
+        nearest_dot = distances.argmin(axis=1)
+        nearest_track = distances.argmin(axis=0)
+        rows = np.flatnonzero((nearest_track[nearest_dot] == track_range) &
+                              (distances[track_range, nearest_dot] < _FAR))
+        cols = nearest_dot[rows]
+
+        # 其余的候选对按距离从近到远贪心匹配（点密集、轨迹争抢同一个点时才会有）
+        distances[rows, :] = _FAR
+        distances[:, cols] = _FAR
+        extra_rows, extra_cols = np.nonzero(distances < _FAR)
+        if len(extra_rows) == 0:
+            return rows, cols
+        order = np.argsort(distances[extra_rows, extra_cols], kind='stable')
+        track_used = [False] * track_count
+        dot_used = [False] * dot_count
+        pairs = []
+        for row, col in zip(extra_rows[order].tolist(), extra_cols[order].tolist()):
+            if not (track_used[row] or dot_used[col]):
+                track_used[row] = dot_used[col] = True
+                pairs.append((row, col))
+        extra = np.array(pairs, dtype=np.intp)
+        return np.concatenate([rows, extra[:, 0]]), np.concatenate([cols, extra[:, 1]])
+
+    def update(self, dots: Sequence[Tuple[int, int, int]], timestamp: float) -> List[Track]:
+        """
+        用一帧的检测结果更新轨迹
+
+        Args:
+            dots: 检测到的点 [(x, y, area), ...]，或 MinimapDetector.detect_blobs() 的结果（不再逐点转换）
+            timestamp: 帧的截图时间（秒，单调时钟）
+
+        Returns:
+            本帧检测到的点对应的轨迹（包括新轨迹），按点的顺序；轨迹数已满时新出现的点没有轨迹
+        """
+        self.last_update = timestamp
+        count = len(dots)
+        if isinstance(dots, Blobs):
+            detections = dots.detections()
+        else:
+            detections = np.fromiter(itertools.chain.from_iterable(dots), dtype=np.float64,
+                                     count=3 * count).reshape(count, 3)
+        dot_slots = np.full(count, -1, dtype=np.intp)
+        slots = np.flatnonzero(self._alive)
+
+        if len(slots):
+            if count:
+                rows, cols = self._assign(slots, detections[:, :2], timestamp)
+                matched = slots[rows]
+                state = self._state[matched]
+                # 速度：新观测与原速度指数平滑（同一时刻的重复更新不改变速度）
+                dt = timestamp - state[:, LAST_SEEN, None]
+                observed = (detections[cols, :2] - state[:, X:Y + 1]) / np.maximum(dt, 1e-9)
+                state[:, VX:VY + 1] += np.where(dt > 0, self.smoothing, 0.0) * (observed - state[:, VX:VY + 1])
+                state[:, X:AREA + 1] = detections[cols]
+                state[:, LAST_SEEN] = timestamp
+                self._state[matched] = state
+                self._counts[matched, HITS] += 1
+                dot_slots[cols] = matched
+            else:
+                rows = slots[:0]
+
+            # 未匹配的轨迹计数，超过次数后结束，槽位空出
+            misses = self._counts[slots, MISSES] + 1
+            misses[rows] = 0
+            self._counts[slots, MISSES] = misses
+            self._alive[slots[misses > self.max_misses]] = False
+
+        # 未匹配的点：在空槽位新建轨迹
+        new_dots = np.flatnonzero(dot_slots < 0)
+        if len(new_dots):
+            free = np.flatnonzero(~self._alive)[:len(new_dots)]
+            new_dots = new_dots[:len(free)]
+            state = np.zeros((len(free), 7))
+            state[:, X:AREA + 1] = detections[new_dots]
+            state[:, FIRST_SEEN:] = timestamp
+            self._state[free] = state
+            self._counts[free] = (1, 0)
+            self._alive[free] = True
+            self._ids[free] = np.arange(self._next_id, self._next_id + len(free))
+            self._next_id += len(free)
+            dot_slots[new_dots] = free
+
+        views = self._views
+        return [views[slot] for slot in dot_slots.tolist() if slot >= 0]
+
+    def reset(self):
+        """结束所有轨迹（如切换地图后）"""
+        self._alive[:] = False
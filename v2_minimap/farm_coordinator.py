@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+多主机挂机农场协调器
+功能: 连接各台电脑上的 bot_daemon.py 节点，汇总窗口、健康状态和耗时直方图，统一下发配置和启停命令
+特性: 节点断开后按间隔自动重连；按各节点容量（[Daemon] capacity）分配监控的窗口，
+      超出容量的窗口给出迁移建议（游戏客户端在哪台电脑上就只能由哪台电脑截图和按键）
+
+使用方法:
+  python farm_coordinator.py --agents 192.168.1.10:9109 192.168.1.11:9109 --token secret --watch 5
+  python farm_coordinator.py --agents pc-1:9109 pc-2:9109 --push Teleport.cooldown=3.0 --save
+  python farm_coordinator.py --agents pc-1:9109 pc-2:9109 --balance --apply
+  python farm_coordinator.py --simulate 3 --sim-windows 5 --sim-capacity 4 --balance --apply
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from bot_daemon import DaemonClient, DaemonError, DaemonServer, parse_address
+from bot_metrics import LatencyHistogram, STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION
+
+logger = logging.getLogger(__name__)
+
+# 节点健康状态
+HEALTH_OK = 'ok'
+HEALTH_DEGRADED = 'degraded'  # 反应延迟p95超出预算
+HEALTH_STALE = 'stale'        # 已连接但长时间没有收到推送
+HEALTH_DOWN = 'down'          # 未连接
+
+
+class AgentNode:
+    """协调器一侧的单个节点连接"""
+
+    def __init__(self, address: str, token: str = None, timeout: float = 5.0):
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.token = token
+        self.timeout = timeout
+        self.client: Optional[DaemonClient] = None
+        self.info: Dict = {}
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.error: Optional[str] = None
+        self.next_retry = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.info.get('node') or self.address
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self.client.connected
+
+    @property
+    def capacity(self) -> int:
+        return int(self.info.get('capacity') or 0)
+
+    @property
+    def state(self) -> Optional[Dict]:
+        return self.client.latest_state if self.client is not None else None
+
+    def connect(self) -> bool:
+        """连接节点（失败时记录错误）"""
+        self.close()
+        client = DaemonClient(self.host, self.port, timeout=self.timeout, token=self.token)
+        try:
+            self.info = client.connect()
+        except (OSError, DaemonError) as e:
+            self.error = str(e)
+            return False
+        self.client = client
+        self.error = None
+        logger.info(f"已连接节点 {self.name} ({self.address})")
+        return True
+
+    def request(self, cmd: str, **args):
+        if not self.connected:
+            raise DaemonError(f"节点未连接: {self.address}")
+        return self.client.request(cmd, **args)
+
+    def refresh_metrics(self):
+        """拉取节点合并后的耗时直方图"""
+        result = self.request('metrics')
+        self.histograms = {stage: LatencyHistogram.from_dict(data) for stage, data in result['stages'].items()}
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+class BalancePlan:
+    """窗口分配方案"""
+
+    def __init__(self):
+        self.targets: Dict[str, int] = {}            # 节点 -> 应监控的窗口数
+        self.start: Dict[str, List[int]] = {}        # 节点 -> 需要开始监控的窗口
+        self.stop: Dict[str, List[int]] = {}         # 节点 -> 超出容量需要停止监控的窗口
+        self.moves: List[Tuple[str, str, int]] = []  # (源节点, 目标节点, 窗口数) 建议迁移的游戏客户端
+        self.unplaced = 0                            # 全农场容量不足、无处迁移的窗口数
+
+    @property
+    def changes(self) -> int:
+        return sum(len(v) for v in self.start.values()) + sum(len(v) for v in self.stop.values())
+
+    def format_lines(self) -> List[str]:
+        lines = [f"{node}: 监控 {target} 个窗口, 启动 {len(self.start.get(node, []))}, "
+                 f"停止 {len(self.stop.get(node, []))}" for node, target in self.targets.items()]
+        lines += [f"建议迁移: {source} -> {target} {count} 个客户端" for source, target, count in self.moves]
+        if self.unplaced:
+            lines.append(f"农场容量不足: {self.unplaced} 个窗口无法监控")
+        return lines
+
+
+def plan_balance(nodes: Dict[str, Dict]) -> BalancePlan:
+    """
+    按容量分配窗口
+
+    Args:
+        nodes: 节点名 -> {'capacity': 容量（0为不限）, 'windows': [{'hwnd', 'running'}, ...]}
+
+    Returns:
+        分配方案：每个节点在容量内监控尽量多的窗口（已在监控的优先保留），
+        超出的窗口停止监控，并按其他节点的剩余容量给出迁移建议
+    """
+    plan = BalancePlan()
+    overflow: Dict[str, int] = {}
+    headroom: Dict[str, int] = {}
+    for name, node in nodes.items():
+        windows = sorted(node.get('windows', []), key=lambda w: (not w.get('running'), w['hwnd']))
+        capacity = int(node.get('capacity') or 0)
+        target = len(windows) if capacity <= 0 else min(capacity, len(windows))
+        plan.targets[name] = target
+        plan.start[name] = [w['hwnd'] for w in windows[:target] if not w.get('running')]
+        plan.stop[name] = [w['hwnd'] for w in windows[target:] if w.get('running')]
+        if len(windows) > target:
+            overflow[name] = len(windows) - target
+        if capacity > 0 and capacity > len(windows):
+            headroom[name] = capacity - len(windows)
+        elif capacity <= 0:
+            headroom[name] = sys.maxsize
+
+    # 超出容量的窗口优先迁往剩余容量最多的节点
+    for source, count in sorted(overflow.items(), key=lambda item: -item[1]):
+        while count > 0:
+            candidates = [(room, name) for name, room in headroom.items() if room > 0 and name != source]
+            if not candidates:
+                break
+            room, target = max(candidates)
+            moved = min(count, room)
+            plan.moves.append((source, target, moved))
+            headroom[target] = room - moved
+            count -= moved
+        plan.unplaced += count
+    return plan
+
+
+class FarmCoordinator:
+    """农场协调器"""
+
+    def __init__(self, agents: List[str], token: str = None, retry_interval: float = 5.0,
+                 stale_after: float = 5.0, reaction_budget_ms: float = 100.0):
+        """
+        Args:
+            agents: 节点地址列表（host:port）
+            token: 节点连接口令
+            retry_interval: 断开节点的重连间隔（秒）
+            stale_after: 超过该时间没有收到推送视为异常（秒）
+            reaction_budget_ms: 反应延迟p95预算（毫秒），超出时节点标记为degraded
+        """
+        self.nodes: Dict[str, AgentNode] = {address: AgentNode(address, token) for address in agents}
+        self.retry_interval = retry_interval
+        self.stale_after = stale_after
+        self.reaction_budget_ms = reaction_budget_ms
+        self._stop_event = threading.Event()
+
+    def connect(self) -> int:
+        """连接所有节点，返回已连接数"""
+        self.poll(refresh_metrics=False)
+        return sum(1 for node in self.nodes.values() if node.connected)
+
+    def poll(self, refresh_metrics: bool = True):
+        """重连到期的断开节点，并拉取已连接节点的直方图"""
+        now = time.monotonic()
+        for node in self.nodes.values():
+            if not node.connected:
+                if now < node.next_retry:
+                    continue
+                if not node.connect():
+                    node.next_retry = now + self.retry_interval
+                    continue
+            if refresh_metrics:
+                try:
+                    node.refresh_metrics()
+                except DaemonError as e:
+                    node.error = str(e)
+
+    def health(self, node: AgentNode) -> str:
+        if not node.connected:
+            return HEALTH_DOWN
+        if node.client.state_time and time.monotonic() - node.client.state_time > self.stale_after:
+            return HEALTH_STALE
+        reaction = node.histograms.get(STAGE_REACTION)
+        if reaction is not None and reaction.count and reaction.percentile(95) * 1000.0 > self.reaction_budget_ms:
+            return HEALTH_DEGRADED
+        return HEALTH_OK
+
+    def summary(self) -> Dict:
+        """汇总所有节点的窗口、计数、健康状态和耗时分位数"""
+        merged = {stage: LatencyHistogram() for stage in (STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION)}
+        totals: Dict[str, int] = {}
+        rows = []
+        for node in self.nodes.values():
+            state = node.state or {}
+            windows = state.get('windows', [])
+            for name, value in state.get('totals', {}).items():
+                totals[name] = totals.get(name, 0) + value
+            for stage, histogram in merged.items():
+                if stage in node.histograms:
+                    histogram.merge(node.histograms[stage])
+            reaction = node.histograms.get(STAGE_REACTION)
+            rows.append({
+                'node': node.name,
+                'address': node.address,
+                'health': self.health(node),
+                'capacity': node.capacity,
+                'windows': len(windows),
+                'running': sum(1 for w in windows if w.get('running')),
+                'totals': state.get('totals', {}),
+                'reaction_p95_ms': reaction.percentile(95) * 1000.0 if reaction is not None and reaction.count else None,
+                'error': node.error,
+            })
+        return {
+            'nodes': rows,
+            'windows': sum(row['windows'] for row in rows),
+            'running': sum(row['running'] for row in rows),
+            'totals': totals,
+            'latency_p95_ms': {stage: h.percentile(95) * 1000.0 for stage, h in merged.items() if h.count},
+        }
+
+    def _broadcast(self, cmd: str, nodes: List[str] = None, **args) -> Dict[str, object]:
+        """向节点发送命令，返回 节点 -> 结果（失败时为DaemonError）"""
+        results = {}
+        for node in self.nodes.values():
+            if nodes and node.address not in nodes and node.name not in nodes:
+                continue
+            try:
+                results[node.name] = node.request(cmd, **args)
+            except DaemonError as e:
+                results[node.name] = e
+        return results
+
+    def push_config(self, sections: Dict[str, Dict[str, str]], save: bool = False,
+                    nodes: List[str] = None) -> Dict[str, object]:
+        """下发配置（节点立即应用，save=True时写入节点的配置文件）"""
+        return self._broadcast('configure', nodes, sections=sections, save=save)
+
+    def start(self, nodes: List[str] = None) -> Dict[str, object]:
+        return self._broadcast('start', nodes)
+
+    def stop(self, nodes: List[str] = None) -> Dict[str, object]:
+        return self._broadcast('stop', nodes)
+
+    def plan_balance(self) -> BalancePlan:
+        """按已连接节点的最新状态生成分配方案"""
+        nodes = {}
+        for node in self.nodes.values():
+            if node.connected:
+                state = node.request('status')
+                nodes[node.name] = {'capacity': node.capacity, 'windows': state['windows']}
+        return plan_balance(nodes)
+
+    def balance(self, apply: bool = True) -> BalancePlan:
+        """生成分配方案，apply=True时在各节点启停对应窗口"""
+        plan = self.plan_balance()
+        if apply:
+            for node in self.nodes.values():
+                if plan.stop.get(node.name):
+                    node.request('stop', hwnds=plan.stop[node.name])
+                if plan.start.get(node.name):
+                    node.request('start', hwnds=plan.start[node.name])
+        return plan
+
+    def run(self, interval: float = 5.0, report=None):
+        """定时轮询并输出汇总，直到 stop_running()"""
+        self._stop_event.clear()
+        while not self._stop_event.is_set():
+            self.poll()
+            if report is not None:
+                report(self.summary())
+            self._stop_event.wait(interval)
+
+    def stop_running(self):
+        self._stop_event.set()
+
+    def close(self):
+        self.stop_running()
+        for node in self.nodes.values():
+            node.close()
+
+
+def format_summary(summary: Dict) -> str:
+    """格式化为表格"""
+    lines = [f"{'node':<16}{'health':<10}{'windows':>9}{'running':>9}{'cap':>5}{'teleports':>11}{'react p95':>11}"]
+    for row in summary['nodes']:
+        p95 = '-' if row['reaction_p95_ms'] is None else f"{row['reaction_p95_ms']:.1f}ms"
+        lines.append(f"{row['node'][:15]:<16}{row['health']:<10}{row['windows']:>9}{row['running']:>9}"
+                     f"{row['capacity'] or '-':>5}{row['totals'].get('teleports_used', 0):>11}{p95:>11}")
+    latency = ' '.join(f"{stage} p95={value:.1f}ms" for stage, value in summary['latency_p95_ms'].items())
+    lines.append(f"总计: {summary['windows']} 个窗口, {summary['running']} 个监控中, "
+                 f"传送 {summary['totals'].get('teleports_used', 0)} | {latency or 'no samples'}")
+    return '\n'.join(lines)
+
+
+def parse_overrides(items: List[str]) -> Dict[str, Dict[str, str]]:
+    """解析 节.键=值 列表"""
+    sections: Dict[str, Dict[str, str]] = {}
+    for item in items:
+        name, sep, value = item.partition('=')
+        section, dot, key = name.partition('.')
+        if not sep or not dot or not section or not key:
+            raise ValueError(f"配置项格式应为 节.键=值: {item}")
+        sections.setdefault(section, {})[key] = value
+    return sections
+
+
+class LocalAgent:
+    """
+    本机模拟节点（无需win32）：模拟游戏窗口 + MultiWindowBot + 守护进程控制端口
+
+    用于在一台Linux机器上通过localhost演示和测试多节点农场
+    """
+
+    def __init__(self, windows: int = 4, capacity: int = 0, name: str = None, token: str = None,
+                 detection_interval: float = 0.05, arrival_rate: float = 0.2, seed: int = 0):
+        from farm_simulator import DEFAULT_TITLE, FarmWindowProvider, SimulatedGame, SimulatedGameSource
+        from mir2_multi_window_bot import MultiWindowBot
+
+        self.provider = FarmWindowProvider()
+        teleport_vk = self.provider.vk_code('2')
+        for i in range(windows):
+            game = SimulatedGame(arrival_rate=arrival_rate, teleport_vk=teleport_vk, seed=seed + i)
+            self.provider.add_game(game, f'{DEFAULT_TITLE} - {i + 1}')
+
+        self._directory = tempfile.TemporaryDirectory()
+        config_file = os.path.join(self._directory.name, 'agent.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Game]\nwindow_title = {DEFAULT_TITLE}\n\n"
+                    f"[Detection]\ndetection_interval = {detection_interval}\n\n"
+                    f"[Teleport]\nteleport_key = 2\ncooldown = 1.0\n\n"
+                    f"[Watcher]\nenabled = false\n\n[Stats]\nreport_interval = 3600\n")
+        self.bot = MultiWindowBot(config_file, window_provider=self.provider,
+                                  source_factory=lambda hwnd: SimulatedGameSource(self.provider.games[hwnd]))
+        self.bot.scan_windows()
+        self.server = DaemonServer(self.bot, port=0, update_interval=0.1, node_name=name,
+                                   capacity=capacity, token=token)
+        self.server.start()
+        self.thread = threading.Thread(target=self.bot.run, name=f'agent-{self.server.port}', daemon=True)
+        self.thread.start()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.server.port}"
+
+    def stop(self):
+        self.bot.running = False
+        self.thread.join(timeout=5.0)
+        self.server.stop()
+        self._directory.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='传奇2挂机农场协调器（连接各电脑上的 bot_daemon.py）')
+    parser.add_argument('--agents', nargs='*', default=[], help='节点地址 host:port')
+    parser.add_argument('--token', default=None, help='节点连接口令')
+    parser.add_argument('--push', nargs='*', default=[], metavar='SECTION.KEY=VALUE', help='下发配置项')
+    parser.add_argument('--save', action='store_true', help='下发的配置写入节点的配置文件')
+    parser.add_argument('--start', action='store_true', help='所有节点开始监控')
+    parser.add_argument('--stop', action='store_true', help='所有节点停止监控')
+    parser.add_argument('--balance', action='store_true', help='按节点容量生成窗口分配方案')
+    parser.add_argument('--apply', action='store_true', help='与 --balance 一起使用：在节点上执行分配方案')
+    parser.add_argument('--watch', type=float, default=0, metavar='SECONDS', help='按间隔持续输出汇总')
+    parser.add_argument('--budget-ms', type=float, default=100.0, help='反应延迟p95预算（毫秒）')
+    parser.add_argument('--simulate', type=int, default=0, help='在本机启动N个模拟节点（演示/测试）')
+    parser.add_argument('--sim-windows', type=int, default=4, help='每个模拟节点的窗口数')
+    parser.add_argument('--sim-capacity', type=int, default=0, help='模拟节点的容量')
+    args = parser.parse_args()
+
+    local_agents = [LocalAgent(args.sim_windows, args.sim_capacity, name=f'sim-{i + 1}', token=args.token,
+                               seed=i * 100) for i in range(args.simulate)]
+    agents = args.agents + [agent.address for agent in local_agents]
+    if not agents:
+        parser.error("请指定 --agents 或 --simulate")
+
+    coordinator = FarmCoordinator(agents, token=args.token, reaction_budget_ms=args.budget_ms)
+    try:
+        connected = coordinator.connect()
+        print(f"已连接 {connected}/{len(agents)} 个节点")
+        for node in coordinator.nodes.values():
+            if node.error:
+                print(f"  {node.address}: {node.error}")
+
+        def show(results: Dict[str, object]):
+            for name, result in results.items():
+                print(f"  {name}: {'失败 ' + str(result) if isinstance(result, Exception) else result}")
+
+        if args.push:
+            print("下发配置:")
+            show(coordinator.push_config(parse_overrides(args.push), save=args.save))
+        if args.stop:
+            print("停止监控:")
+            show(coordinator.stop())
+        if args.start:
+            print("开始监控:")
+            show(coordinator.start())
+        if args.balance:
+            plan = coordinator.balance(apply=args.apply)
+            print("分配方案" + ("（已执行）:" if args.apply else ":"))
+            for line in plan.format_lines():
+                print(f"  {line}")
+
+        time.sleep(0.5)  # 等待节点推送最新状态
+        coordinator.poll()
+        print(format_summary(coordinator.summary()))
+        if args.watch > 0:
+            coordinator.run(args.watch, lambda summary: print(format_summary(summary) + '\n'))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coordinator.close()
+        for agent in local_agents:
+            agent.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+多窗口挂机模拟农场
+功能: 模拟N个游戏窗口（小地图上按到达率出现并移动的其他玩家），接入 MultiWindowBot 做规模压测
+特性: 无需win32，收到传送按键后重新布置小地图；统计端到端反应延迟、每窗口CPU占用和丢帧
+
+使用方法:
+  python farm_simulator.py --windows 10 50 200 --duration 20
+  python farm_simulator.py --windows 50 --arrival-rate 0.5 --speed 30 --output farm.json
+  python farm_simulator.py --windows 4 --interval 0 --capture-ms 8 --pipeline both --duration 5
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from bot_metrics import LatencyHistogram, WindowMetrics, STAGE_CAPTURE, STAGE_DETECT
+from frame_source import FrameSource, Region, VirtualWindowProvider
+
+DEFAULT_TITLE = '九五沉默'
+MINIMAP_SIZE = 150
+
+
+class SimulatedPlayer:
+    """小地图上的一个其他玩家（匀速直线移动，离开小地图即消失）"""
+
+    __slots__ = ('x', 'y', 'vx', 'vy', 'arrived_at')
+
+    def __init__(self, x: float, y: float, vx: float, vy: float, arrived_at: float):
+        self.x, self.y = x, y
+        self.vx, self.vy = vx, vy
+        self.arrived_at = arrived_at
+
+    def position(self, now: float):
+        dt = now - self.arrived_at
+        return self.x + self.vx * dt, self.y + self.vy * dt
+
+
+class SimulatedGame:
+    """
+    单个模拟游戏窗口的状态
+
+    其他玩家按泊松过程到达，从小地图边缘进入并匀速穿过；收到传送按键后
+    清除所有玩家并重新布置怪物点（相当于传送到新位置）
+    """
+
+    def __init__(self, width: int = 800, height: int = 600, arrival_rate: float = 0.2,
+                 speed: float = 20.0, teleport_vk: int = 0x32, seed: int = 0):
+        """
+        Args:
+            arrival_rate: 每秒到达的玩家数（泊松过程）
+            speed: 玩家平均移动速度（像素/秒，相对小地图）
+            teleport_vk: 传送键的虚拟键码
+        """
+        self.width, self.height = width, height
+        self.minimap_region: Region = (width - MINIMAP_SIZE - 10, 10, MINIMAP_SIZE, MINIMAP_SIZE)
+        self.arrival_rate = arrival_rate
+        self.speed = speed
+        self.teleport_vk = teleport_vk
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+
+        self.players: List[SimulatedPlayer] = []
+        self.background: Optional[np.ndarray] = None
+        self.next_arrival = self._schedule(time.perf_counter())
+
+        # 统计
+        self.reaction = LatencyHistogram()  # 玩家出现到传送按键的延迟
+        self.arrivals = 0
+        self.missed_players = 0     # 离开小地图前没有触发传送的玩家
+        self.teleports = 0
+        self.false_teleports = 0    # 小地图上没有玩家时的传送
+        self.frames = 0
+
+        self._reshuffle()
+
+    def restart(self, now: float):
+        """从指定时间开始重新安排到达（开始压测时调用）"""
+        with self.lock:
+            self.players = []
+            self.next_arrival = self._schedule(now)
+
+    def _schedule(self, now: float) -> float:
+        if self.arrival_rate <= 0:
+            return float('inf')
+        return now + self.rng.expovariate(self.arrival_rate)
+
+    def _reshuffle(self):
+        """重新布置小地图背景和怪物点"""
+        size = MINIMAP_SIZE
+        background = np.empty((size, size, 3), dtype=np.uint8)
+        background[:] = (30, 30, 40)
+        for _ in range(10):
+            x, y = self.np_rng.integers(5, size - 5, 2)
+            cv2.circle(background, (int(x), int(y)), 2, (0, 150, 0), -1)
+        self.background = background
+
+    def _spawn(self, now: float) -> SimulatedPlayer:
+        """从小地图随机边缘进入，方向大致指向内部"""
+        size = MINIMAP_SIZE
+        edge = self.rng.randrange(4)
+        offset = self.rng.uniform(10, size - 10)
+        x, y, angle = [(offset, 3, 90), (size - 4, offset, 180), (offset, size - 4, 270), (3, offset, 0)][edge]
+        angle = np.radians(angle + self.rng.uniform(-60, 60))
+        speed = self.speed * self.rng.uniform(0.5, 1.5)
+        return SimulatedPlayer(x, y, speed * np.cos(angle), speed * np.sin(angle), now)
+
+    @staticmethod
+    def _visible(x: float, y: float) -> bool:
+        return 2 <= x < MINIMAP_SIZE - 2 and 2 <= y < MINIMAP_SIZE - 2
+
+    def advance(self, now: float):
+        """推进到指定时间：处理到达和离开"""
+        while self.next_arrival <= now:
+            self.players.append(self._spawn(self.next_arrival))
+            self.arrivals += 1
+            self.next_arrival = self._schedule(self.next_arrival)
+        remaining = []
+        for player in self.players:
+            if self._visible(*player.position(now)):
+                remaining.append(player)
+            else:
+                self.missed_players += 1
+        self.players = remaining
+
+    def render(self, now: float, out: np.ndarray = None) -> np.ndarray:
+        """渲染小地图"""
+        with self.lock:
+            self.advance(now)
+            self.frames += 1
+            minimap = out if out is not None and out.shape == self.background.shape else np.empty_like(self.background)
+            np.copyto(minimap, self.background)
+            for player in self.players:
+                x, y = player.position(now)
+                cv2.circle(minimap, (int(round(x)), int(round(y))), 2, (0, 255, 255), -1)
+            return minimap
+
+    def on_key_down(self, vk_code: int, now: float):
+        """收到按键：传送键则记录反应延迟并重新布置"""
+        if vk_code != self.teleport_vk:
+            return
+        with self.lock:
+            self.advance(now)
+            self.teleports += 1
+            if self.players:
+                self.reaction.record(now - min(player.arrived_at for player in self.players))
+            else:
+                self.false_teleports += 1
+            self.players = []
+            self._reshuffle()
+
+
+class SimulatedGameSource(FrameSource):
+    """模拟游戏窗口的截图源（只渲染小地图，其余区域为黑色）"""
+
+    name = 'farm'
+
+    def __init__(self, game: SimulatedGame, capture_delay: float = 0.0):
+        """
+        Args:
+            capture_delay: 每次截图的阻塞时间（秒），模拟BitBlt等待窗口合成（不占用CPU、释放GIL）
+        """
+        super().__init__()
+        self.game = game
+        self.capture_delay = capture_delay
+        self.width, self.height = game.width, game.height
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        frame = out if out is not None and out.shape == (self.height, self.width, 3) \
+            else np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        x, y, w, h = self.game.minimap_region
+        self.game.render(time.perf_counter(), frame[y:y + h, x:x + w])
+        return frame
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        if self.capture_delay > 0:
+            time.sleep(self.capture_delay)
+        if tuple(region) == self.game.minimap_region:
+            return self.game.render(time.perf_counter(), out)
+        return super().grab_region(region, out)
+
+
+class FarmWindowProvider(VirtualWindowProvider):
+    """模拟农场的窗口提供者：按键转发给对应的模拟游戏"""
+
+    def __init__(self):
+        super().__init__()
+        self.games: Dict[int, SimulatedGame] = {}
+
+    def add_game(self, game: SimulatedGame, title: str = DEFAULT_TITLE) -> int:
+        hwnd = self.add_window(title, game.width, game.height)
+        self.games[hwnd] = game
+        return hwnd
+
+    def key_down(self, hwnd: int, vk_code: int):
+        super().key_down(hwnd, vk_code)
+        game = self.games.get(hwnd)
+        if game is not None:
+            game.on_key_down(vk_code, time.perf_counter())
+
+
+class FarmSimulator:
+    """模拟农场：创建N个模拟窗口并用 MultiWindowBot 监控"""
+
+    def __init__(self, windows: int = 10, arrival_rate: float = 0.2, speed: float = 20.0,
+                 detection_interval: float = 0.3, cooldown: float = 4.0, teleport_key: str = '2',
+                 seed: int = 0, capture_delay: float = 0.0, pipeline: bool = False):
+        self.window_count = windows
+        self.detection_interval = detection_interval
+        self.capture_delay = capture_delay
+        self.pipeline = pipeline
+        self.cooldown = cooldown
+        self.teleport_key = teleport_key
+        self.provider = FarmWindowProvider()
+        teleport_vk = self.provider.vk_code(teleport_key)
+        for i in range(windows):
+            game = SimulatedGame(arrival_rate=arrival_rate, speed=speed, teleport_vk=teleport_vk, seed=seed + i)
+            self.provider.add_game(game, f'{DEFAULT_TITLE} - {i + 1}')
+
+    def source_factory(self, hwnd: int) -> FrameSource:
+        return SimulatedGameSource(self.provider.games[hwnd], self.capture_delay)
+
+    def _write_config(self, directory: str) -> str:
+        path = os.path.join(directory, 'farm_config.ini')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"[Game]\nwindow_title = {DEFAULT_TITLE}\n\n"
+                    f"[Detection]\ndetection_interval = {self.detection_interval}\n"
+                    f"pipeline = {str(self.pipeline).lower()}\n\n"
+                    f"[Teleport]\nteleport_key = {self.teleport_key}\ncooldown = {self.cooldown}\n\n"
+                    f"[Stats]\nreport_interval = 3600\n")
+        return path
+
+    def run(self, duration: float) -> Dict:
+        """
+        运行指定时长并返回统计
+
+        Returns:
+            可序列化为JSON的结果
+        """
+        from mir2_multi_window_bot import MultiWindowBot
+
+        with tempfile.TemporaryDirectory() as directory:
+            bot = MultiWindowBot(self._write_config(directory), window_provider=self.provider,
+                                 source_factory=self.source_factory)
+            bot.scan_windows()
+            windows = list(bot.windows.values())
+
+            cpu_started = time.process_time()
+            wall_started = time.perf_counter()
+            for game in self.provider.games.values():
+                game.restart(wall_started)
+            thread = threading.Thread(target=bot.run, name='farm-bot', daemon=True)
+            thread.start()
+            time.sleep(duration)
+            wall = time.perf_counter() - wall_started
+            cpu = time.process_time() - cpu_started
+            frames = sum(game.frames for game in self.provider.games.values())
+
+            stop_started = time.perf_counter()
+            bot.stop()
+            thread.join(timeout=5.0)
+            stop_time = time.perf_counter() - stop_started
+
+        report = self._report(windows, wall, cpu, frames)
+        report['stop_seconds'] = stop_time
+        return report
+
+    def _report(self, windows, wall: float, cpu: float, frames: int) -> Dict:
+        games = list(self.provider.games.values())
+        reaction = LatencyHistogram()
+        metrics = WindowMetrics()
+        for game in games:
+            reaction.merge(game.reaction)
+        for gw in windows:
+            metrics.merge(gw.metrics)
+
+        expected_frames = int(wall / self.detection_interval) * len(games) if self.detection_interval > 0 else frames
+        detections = sum(gw.stats['detection_runs'] for gw in windows)
+        cpu_percent = cpu / wall * 100.0 if wall > 0 else 0.0
+
+        def ms(histogram: LatencyHistogram) -> Dict[str, float]:
+            summary = histogram.summary()
+            return {key: (value * 1000.0 if key != 'count' else value) for key, value in summary.items()}
+
+        snapshot = metrics.snapshot()
+        return {
+            'windows': len(games),
+            'duration': wall,
+            'frames': frames,
+            'expected_frames': expected_frames,
+            'missed_frames': max(0, expected_frames - frames),
+            'missed_frame_ratio': max(0, expected_frames - frames) / expected_frames if expected_frames else 0.0,
+            'fps_per_window': frames / wall / len(games) if wall > 0 and games else 0.0,
+            'pipeline': self.pipeline,
+            'capture_delay_ms': self.capture_delay * 1000.0,
+            'detections_per_window': detections / wall / len(games) if wall > 0 and games else 0.0,
+            'frames_stale': sum(gw.frames_stale for gw in windows),
+            'frames_torn': sum(gw.frames_torn for gw in windows),
+            'cpu_percent': cpu_percent,
+            'cpu_percent_per_window': cpu_percent / len(games) if games else 0.0,
+            'arrivals': sum(game.arrivals for game in games),
+            'teleports': sum(game.teleports for game in games),
+            'false_teleports': sum(game.false_teleports for game in games),
+            'missed_players': sum(game.missed_players for game in games),
+            'reaction_ms': ms(reaction),
+            'capture_ms': ms(snapshot[STAGE_CAPTURE]),
+            'detect_ms': ms(snapshot[STAGE_DETECT]),
+        }
+
+
+def format_report(report: Dict) -> str:
+    """格式化为一行"""
+    reaction = report['reaction_ms']
+    return (f"N={report['windows']:<4} {'pipeline ' if report['pipeline'] else ''}"
+            f"fps/win={report['fps_per_window']:.2f} det/win={report['detections_per_window']:.2f} "
+            f"missed={report['missed_frame_ratio'] * 100:.1f}% "
+            f"cpu={report['cpu_percent']:.0f}% ({report['cpu_percent_per_window']:.2f}%/win) "
+            f"reaction p50={reaction['p50']:.0f}ms p95={reaction['p95']:.0f}ms max={reaction['max']:.0f}ms "
+            f"teleports={report['teleports']} missed_players={report['missed_players']} "
+            f"stop={report['stop_seconds']:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多窗口挂机模拟农场（规模压测，无需win32）')
+    parser.add_argument('--windows', type=int, nargs='+', default=[10, 50, 200], help='窗口数量（可多个）')
+    parser.add_argument('--duration', type=float, default=20.0, help='每轮运行秒数')
+    parser.add_argument('--arrival-rate', type=float, default=0.2, help='每窗口每秒到达的玩家数')
+    parser.add_argument('--speed', type=float, default=20.0, help='玩家移动速度（像素/秒）')
+    parser.add_argument('--interval', type=float, default=0.3, help='检测间隔（秒）')
+    parser.add_argument('--cooldown', type=float, default=4.0, help='传送冷却（秒）')
+    parser.add_argument('--capture-ms', type=float, default=0.0, help='模拟截图阻塞时间（毫秒）')
+    parser.add_argument('--pipeline', choices=['off', 'on', 'both'], default='off',
+                        help='截图/检测流水线模式（both: 两种模式各运行一轮并对比）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='结果JSON输出路径')
+    parser.add_argument('--verbose', action='store_true', help='输出机器人日志')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('mir2_multi_window_bot').setLevel(logging.WARNING)
+
+    modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.pipeline]
+    reports = []
+    for count in args.windows:
+        by_mode = {}
+        for pipeline in modes:
+            simulator = FarmSimulator(count, args.arrival_rate, args.speed, args.interval, args.cooldown,
+                                      seed=args.seed, capture_delay=args.capture_ms / 1000.0, pipeline=pipeline)
+            report = simulator.run(args.duration)
+            reports.append(report)
+            by_mode[pipeline] = report
+            print(format_report(report))
+        if len(by_mode) == 2 and by_mode[False]['detections_per_window'] > 0:
+            speedup = by_mode[True]['detections_per_window'] / by_mode[False]['detections_per_window']
+            print(f"N={count:<4} pipeline speedup: {speedup:.2f}x detections/s "
+                  f"(cpu {by_mode[False]['cpu_percent']:.0f}% -> {by_mode[True]['cpu_percent']:.0f}%)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, ensure_ascii=False)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+帧环形缓冲区
+功能: 截图阶段和检测阶段之间传递固定大小的小地图帧，可跨线程或跨进程（multiprocessing.shared_memory）
+特性: 单生产者/单消费者无锁协议：每个槽位带序号（写入中为奇数、写完为偶数），读取方在使用前后
+      比对序号判断帧是否被覆盖；生产者直接截图到槽位、消费者直接读取槽位视图，阶段之间不复制也不pickle；
+      消费者可选择只取最新帧或逐帧读取（被覆盖的帧计入丢帧数）
+
+协议依赖对齐的8字节整数写入不会被拆分、且按程序顺序对其他核可见（x86/x64满足）
+"""
+
+import secrets
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# 读取模式
+READ_LATEST = 'latest'   # 只取最新帧，跳过中间帧
+READ_EVERY = 'every'     # 逐帧读取，被覆盖的帧计为丢帧
+
+_HEADER_ALIGN = 64  # 头部按缓存行对齐
+
+
+class FrameRing:
+    """
+    固定槽位的帧环形缓冲区
+
+    内存布局: [head (int64)] [槽位序号 int64 x slots] [截图时间 float64 x slots] [对齐填充]
+              [槽位数据 slots x H x W x C]
+    head 为已发布的最新帧序号（从1开始，0表示还没有帧）；槽位 i 保存序号 seq 满足 (seq - 1) % slots == i；
+    截图时间为 time.monotonic()（系统范围的单调时钟，跨进程可比较）
+    """
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = 4, name: str = None,
+                 create: bool = True, shared: bool = True):
+        """
+        Args:
+            shape: 单帧形状，如 (150, 150, 3)
+            slots: 槽位数（至少2）
+            name: 共享内存名称，attach时必须提供；创建时默认随机生成
+            create: True创建，False连接到已存在的共享内存
+            shared: False时使用进程内内存（线程之间传递，不占用系统共享内存）
+        """
+        if slots < 2:
+            raise ValueError("slots 至少为 2")
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape))
+        header_bytes = 8 * (1 + 2 * slots)
+        self._data_offset = (header_bytes + _HEADER_ALIGN - 1) // _HEADER_ALIGN * _HEADER_ALIGN
+        size = self._data_offset + self.frame_bytes * slots
+
+        self.shm = None
+        self.owner = create
+        if shared:
+            from multiprocessing import shared_memory
+            if create:
+                name = name or f"mir2_ring_{secrets.token_hex(6)}"
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            else:
+                try:
+                    # 连接方不登记到resource_tracker，避免退出时误删创建方的共享内存（Python 3.13+）
+                    self.shm = shared_memory.SharedMemory(name=name, track=False)
+                except TypeError:
+                    self.shm = shared_memory.SharedMemory(name=name)
+            buffer = self.shm.buf
+        else:
+            buffer = bytearray(size)
+        self.name = self.shm.name if self.shm is not None else None
+
+        self._header = np.ndarray((1 + slots,), dtype=np.int64, buffer=buffer)
+        self._head = self._header[:1]
+        self._slot_seq = self._header[1:]
+        self._slot_time = np.ndarray((slots,), dtype=np.float64, buffer=buffer, offset=8 * (1 + slots))
+        self._data = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buffer, offset=self._data_offset)
+        if create:
+            self._header[:] = 0
+            self._slot_time[:] = 0.0
+
+        # 生产者状态（仅生产者使用）
+        self._writing = 0
+        # 消费者状态（仅消费者使用）
+        self.last_read = 0
+        self.dropped = 0
+
+    @classmethod
+    def attach(cls, name: str, shape: Tuple[int, ...], slots: int = 4) -> 'FrameRing':
+        """连接到其他进程创建的环形缓冲区"""
+        return cls(shape, slots, name=name, create=False)
+
+    @property
+    def head(self) -> int:
+        """最新已发布帧的序号"""
+        return int(self._head[0])
+
+    @property
+    def backlog(self) -> int:
+        """已发布但消费者尚未读取的帧数（监控线程读取，已关闭时为0）"""
+        head = self._head
+        return max(0, int(head[0]) - self.last_read) if head is not None else 0
+
+    # ==================== 生产者 ====================
+
+    def write_slot(self) -> np.ndarray:
+        """
+        取得下一帧的槽位视图（生产者直接截图到该视图，然后调用 commit）
+
+        槽位在返回前已标记为写入中，消费者不会读到写了一半的帧
+        """
+        seq = self.head + 1
+        index = (seq - 1) % self.slots
+        self._slot_seq[index] = 2 * seq - 1  # 奇数：写入中
+        self._writing = seq
+        return self._data[index]
+
+    def commit(self, timestamp: float = None) -> int:
+        """
+        发布 write_slot 返回的帧，返回帧序号
+
+        Args:
+            timestamp: 截图时间（time.monotonic()），默认为当前时间
+        """
+        seq = self._writing
+        if not seq:
+            raise RuntimeError("commit() 之前需要调用 write_slot()")
+        index = (seq - 1) % self.slots
+        self._slot_time[index] = time.monotonic() if timestamp is None else timestamp
+        self._slot_seq[index] = 2 * seq  # 偶数：写入完成
+        self._head[0] = seq
+        self._writing = 0
+        return seq
+
+    def publish(self, frame: np.ndarray) -> int:
+        """复制一帧并发布（截图源无法直接写入槽位时使用）"""
+        np.copyto(self.write_slot(), frame)
+        return self.commit()
+
+    # ==================== 消费者 ====================
+
+    def is_valid(self, seq: int) -> bool:
+        """帧 seq 是否仍完整保存在槽位中（读取视图使用完后再检查一次，判断是否被覆盖）"""
+        return seq > 0 and int(self._slot_seq[(seq - 1) % self.slots]) == 2 * seq
+
+    def frame_time(self, seq: int) -> Optional[float]:
+        """帧 seq 的截图时间，已被覆盖时返回None"""
+        timestamp = float(self._slot_time[(seq - 1) % self.slots])
+        return timestamp if self.is_valid(seq) else None
+
+    def frame_age(self, seq: int, now: float = None) -> float:
+        """帧 seq 距截图的秒数，已被覆盖时返回无穷大"""
+        timestamp = self.frame_time(seq)
+        if timestamp is None:
+            return float('inf')
+        return (time.monotonic() if now is None else now) - timestamp
+
+    def read(self, mode: str = READ_LATEST) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        读取下一帧（不复制，返回槽位视图）
+
+        Args:
+            mode: READ_LATEST 只取最新帧；READ_EVERY 按顺序读取下一帧
+
+        Returns:
+            (帧序号, 槽位视图)；没有新帧时返回None。
+            视图在生产者绕回该槽位前有效，使用完后可用 is_valid(seq) 确认
+        """
+        head = self.head
+        if head <= self.last_read:
+            return None
+
+        if mode == READ_LATEST:
+            seq = head
+        else:
+            seq = self.last_read + 1
+            oldest = max(1, head - self.slots + 2)  # 生产者可能正在写 head+1 所在的槽位
+            if seq < oldest:
+                self.dropped += oldest - seq
+                seq = oldest
+
+        if not self.is_valid(seq):
+            # 读取期间被覆盖，改读最新帧
+            seq = self.head
+            if not self.is_valid(seq):
+                return None
+        if mode == READ_LATEST and seq > self.last_read + 1:
+            self.dropped += seq - self.last_read - 1
+        self.last_read = seq
+        return seq, self._data[(seq - 1) % self.slots]
+
+    def copy_frame(self, seq: int, out: np.ndarray = None) -> Optional[np.ndarray]:
+        """复制帧 seq 而不改变读取进度（其他线程查看画面时使用），已被覆盖时返回None"""
+        if not self.is_valid(seq):
+            return None
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        np.copyto(out, self._data[(seq - 1) % self.slots])
+        return out if self.is_valid(seq) else None
+
+    def read_copy(self, mode: str = READ_LATEST, out: np.ndarray = None) -> Optional[Tuple[int, np.ndarray]]:
+        """读取并复制一帧（需要长期保存帧时使用），复制后校验未被覆盖"""
+        while True:
+            result = self.read(mode)
+            if result is None:
+                return None
+            seq, view = result
+            if out is None:
+                out = np.empty(self.shape, dtype=np.uint8)
+            np.copyto(out, view)
+            if self.is_valid(seq):
+                return seq, out
+
+    # ==================== 资源 ====================
+
+    def close(self):
+        """释放本进程的映射"""
+        self._header = self._head = self._slot_seq = self._slot_time = self._data = None
+        if self.shm is not None:
+            try:
+                self.shm.close()
+            except BufferError:
+                pass  # 调用方仍持有槽位视图，映射随视图释放
+
+    def unlink(self):
+        """删除共享内存（仅创建方调用）"""
+        if self.shm is not None and self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        self.unlink()
+
+
+def ring_for_region(ring: Optional[FrameRing], region: Tuple[int, int, int, int], slots: int = 3,
+                    shared: bool = False) -> FrameRing:
+    """返回与区域 (x, y, width, height) 大小一致的环形缓冲区，大小变化时重新创建"""
+    width, height = region[2], region[3]
+    if ring is not None and ring.shape == (height, width, 3):
+        return ring
+    if ring is not None:
+        # 不关闭旧缓冲区：检测线程可能仍在读取旧帧，关闭会清空它的槽位数组。
+        # 删除共享内存名称不影响已有映射，最后一个引用释放后由垃圾回收释放内存
+        ring.unlink()
+    return FrameRing((height, width, 3), slots, shared=shared)
+
+
+def ring_queue_stats(rings) -> Dict[str, int]:
+    """多个环形缓冲区合计的积压帧数和消费者丢帧数（监控指标）"""
+    rings = [ring for ring in rings if ring is not None]
+    return {'depth': sum(ring.backlog for ring in rings), 'dropped': sum(ring.dropped for ring in rings)}
+
+
+def grab_into_ring(source, region: Tuple[int, int, int, int], ring: FrameRing) -> Optional[Tuple[int, np.ndarray]]:
+    """
+    截图源直接截图到环形缓冲区的下一个槽位并发布
+
+    Returns:
+        (帧序号, 槽位视图)；截图失败或区域超出窗口时返回None
+    """
+    slot = ring.write_slot()
+    started = time.monotonic()
+    frame = source.grab_region(region, slot)
+    if frame is None:
+        return None
+    if frame is not slot:
+        if frame.shape != slot.shape:
+            return None
+        np.copyto(slot, frame)
+    return ring.commit(started), slot
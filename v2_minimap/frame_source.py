@@ -0,0 +1,702 @@
+# -*- coding: utf-8 -*-
+"""
+截图源与窗口提供者模块
+功能: 将截图和窗口操作从机器人类中抽离为可替换的后端
+特性: win32后端按需导入，录制回放和模拟小地图后端可在Linux上运行大规模压测
+
+截图源（FrameSource）:
+  bitblt       - win32 BitBlt（需要窗口可见，速度快）
+  printwindow  - win32 PrintWindow（窗口被遮挡也能截图，失败时回退到BitBlt）
+  pyautogui    - 屏幕截图（需要窗口在前台）
+  replay       - 回放录制的画面（目录或zip）
+  synthetic    - 模拟小地图，带移动的黄点
+
+窗口提供者（WindowProvider）:
+  Win32WindowProvider   - 真实窗口
+  VirtualWindowProvider - 虚拟窗口，记录发送的按键
+"""
+
+import configparser
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# 区域: (x, y, width, height)，相对于截图原点
+Region = Tuple[int, int, int, int]
+
+_win32_modules = None
+
+
+def _import_win32():
+    """按需导入pywin32（非Windows环境下只有真正使用win32后端时才报错）"""
+    global _win32_modules
+    if _win32_modules is None:
+        import win32api
+        import win32con
+        import win32gui
+        import win32ui
+        _win32_modules = (win32gui, win32ui, win32con, win32api)
+    return _win32_modules
+
+
+def key_lparam(scan_code: int, key_up: bool = False) -> int:
+    """
+    WM_KEYDOWN/WM_KEYUP 的lParam
+
+    位0-15为重复次数(1)，位16-23为扫描码；抬起时置位30（之前为按下）和位31（转换状态）
+    """
+    lparam = 1 | ((scan_code & 0xFF) << 16)
+    if key_up:
+        lparam |= (1 << 30) | (1 << 31)
+    return lparam
+
+
+def _fits(out: Optional[np.ndarray], height: int, width: int) -> bool:
+    """输出缓冲区是否可以直接复用"""
+    return out is not None and out.shape == (height, width, 3) and out.dtype == np.uint8
+
+
+def _crop(image: np.ndarray, region: Region, out: np.ndarray = None) -> np.ndarray:
+    """裁剪区域，提供缓冲区时复制到缓冲区"""
+    x, y, width, height = region
+    cropped = image[y:y + height, x:x + width]
+    if _fits(out, *cropped.shape[:2]):
+        np.copyto(out, cropped)
+        return out
+    return cropped
+
+
+def compile_title_pattern(titles: Sequence[str]) -> 're.Pattern':
+    """把标题关键字编译为一个不区分大小写的正则（只编译一次，匹配时不再逐个比较）"""
+    keywords = sorted({title for title in titles if title}, key=len, reverse=True)
+    if not keywords:
+        return re.compile(r'(?!)')  # 不匹配任何标题
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+
+# ==================== 窗口提供者 ====================
+
+class WindowProvider:
+    """窗口提供者接口：枚举、校验窗口并向窗口发送按键"""
+
+    def enum_windows(self) -> List[Tuple[int, str]]:
+        """返回所有可见顶层窗口 [(hwnd, 标题), ...]"""
+        raise NotImplementedError
+
+    def is_window(self, hwnd: int) -> bool:
+        raise NotImplementedError
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        raise NotImplementedError
+
+    def get_client_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        raise NotImplementedError
+
+    def client_to_screen(self, hwnd: int, point: Tuple[int, int]) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def vk_code(self, key: str) -> int:
+        """按键字符转换为虚拟键码"""
+        raise NotImplementedError
+
+    def key_down(self, hwnd: int, vk_code: int):
+        raise NotImplementedError
+
+    def key_up(self, hwnd: int, vk_code: int):
+        raise NotImplementedError
+
+    def find_windows(self, titles: Sequence[str]) -> List[Tuple[int, str]]:
+        """
+        查找标题包含任一关键字且客户区有效的窗口
+
+        Args:
+            titles: 标题关键字（不区分大小写）
+
+        Returns:
+            [(hwnd, 标题), ...]，按枚举顺序
+        """
+        pattern = compile_title_pattern(titles)
+        found = []
+        for hwnd, title in self.enum_windows():
+            if not pattern.search(title):
+                continue
+            try:
+                left, top, right, bottom = self.get_client_rect(hwnd)
+            except Exception:
+                continue
+            if right - left > 0 and bottom - top > 0:
+                found.append((hwnd, title))
+        return found
+
+
+class Win32WindowProvider(WindowProvider):
+    """真实窗口（pywin32）"""
+
+    def __init__(self):
+        self._scan_codes: Dict[int, int] = {}  # 虚拟键码 -> 扫描码
+
+    def scan_code(self, vk_code: int) -> int:
+        """虚拟键码转换为扫描码（MAPVK_VK_TO_VSC，结果缓存）"""
+        code = self._scan_codes.get(vk_code)
+        if code is None:
+            code = self._scan_codes[vk_code] = _import_win32()[3].MapVirtualKey(vk_code, 0)
+        return code
+
+    def enum_windows(self) -> List[Tuple[int, str]]:
+        win32gui = _import_win32()[0]
+        windows = []
+
+        def callback(hwnd, result):
+            if win32gui.IsWindowVisible(hwnd):
+                result.append((hwnd, win32gui.GetWindowText(hwnd)))
+            return True
+
+        win32gui.EnumWindows(callback, windows)
+        return windows
+
+    def is_window(self, hwnd: int) -> bool:
+        try:
+            return bool(_import_win32()[0].IsWindow(hwnd))
+        except Exception:
+            return False
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        return _import_win32()[0].GetWindowRect(hwnd)
+
+    def get_client_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        return _import_win32()[0].GetClientRect(hwnd)
+
+    def client_to_screen(self, hwnd: int, point: Tuple[int, int]) -> Tuple[int, int]:
+        return _import_win32()[0].ClientToScreen(hwnd, point)
+
+    def vk_code(self, key: str) -> int:
+        return _import_win32()[3].VkKeyScan(key) & 0xFF  # 只取低字节
+
+    def key_down(self, hwnd: int, vk_code: int):
+        win32gui, _, win32con, _ = _import_win32()
+        win32gui.PostMessage(hwnd, win32con.WM_KEYDOWN, vk_code, key_lparam(self.scan_code(vk_code)))
+
+    def key_up(self, hwnd: int, vk_code: int):
+        win32gui, _, win32con, _ = _import_win32()
+        win32gui.PostMessage(hwnd, win32con.WM_KEYUP, vk_code, key_lparam(self.scan_code(vk_code), key_up=True))
+
+
+class VirtualWindowProvider(WindowProvider):
+    """虚拟窗口：用于无界面压测，记录所有发送的按键"""
+
+    def __init__(self, first_hwnd: int = 0x10000):
+        self.lock = threading.Lock()
+        self.windows: Dict[int, dict] = {}
+        self.key_events: List[Tuple[float, int, str, int]] = []  # (时间, hwnd, 'down'/'up', 键码)
+        self._next_hwnd = itertools.count(first_hwnd, 2)
+
+    def add_window(self, title: str = '九五沉默', width: int = 800, height: int = 600,
+                   position: Tuple[int, int] = (0, 0), border: Tuple[int, int] = (3, 26),
+                   hwnd: int = None) -> int:
+        """
+        添加虚拟窗口
+
+        Args:
+            border: 客户区相对窗口左上角的偏移（边框、标题栏）
+            hwnd: 指定hwnd（如在子进程中重建父进程的窗口），默认自动分配
+
+        Returns:
+            虚拟hwnd
+        """
+        if hwnd is None:
+            hwnd = next(self._next_hwnd)
+        with self.lock:
+            self.windows[hwnd] = {
+                'title': title,
+                'size': (width, height),
+                'position': position,
+                'border': border,
+            }
+        return hwnd
+
+    def close_window(self, hwnd: int):
+        with self.lock:
+            self.windows.pop(hwnd, None)
+
+    def set_title(self, hwnd: int, title: str):
+        with self.lock:
+            if hwnd in self.windows:
+                self.windows[hwnd]['title'] = title
+
+    def enum_windows(self) -> List[Tuple[int, str]]:
+        with self.lock:
+            return [(hwnd, info['title']) for hwnd, info in self.windows.items()]
+
+    def is_window(self, hwnd: int) -> bool:
+        with self.lock:
+            return hwnd in self.windows
+
+    def _info(self, hwnd: int) -> dict:
+        with self.lock:
+            info = self.windows.get(hwnd)
+        if info is None:
+            raise OSError(f"invalid window handle: {hwnd}")
+        return info
+
+    def get_window_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        info = self._info(hwnd)
+        (x, y), (width, height), (bx, by) = info['position'], info['size'], info['border']
+        return (x, y, x + width + 2 * bx, y + height + by + bx)
+
+    def get_client_rect(self, hwnd: int) -> Tuple[int, int, int, int]:
+        width, height = self._info(hwnd)['size']
+        return (0, 0, width, height)
+
+    def client_to_screen(self, hwnd: int, point: Tuple[int, int]) -> Tuple[int, int]:
+        info = self._info(hwnd)
+        return (info['position'][0] + info['border'][0] + point[0],
+                info['position'][1] + info['border'][1] + point[1])
+
+    def vk_code(self, key: str) -> int:
+        return ord(key.upper()) & 0xFF
+
+    def _post(self, hwnd: int, action: str, vk_code: int):
+        with self.lock:
+            if hwnd in self.windows:
+                self.key_events.append((time.perf_counter(), hwnd, action, vk_code))
+
+    def key_down(self, hwnd: int, vk_code: int):
+        self._post(hwnd, 'down', vk_code)
+
+    def key_up(self, hwnd: int, vk_code: int):
+        self._post(hwnd, 'up', vk_code)
+
+    def key_presses(self, hwnd: int = None) -> int:
+        """按下次数（可按窗口过滤）"""
+        with self.lock:
+            return sum(1 for _, h, action, _ in self.key_events
+                       if action == 'down' and (hwnd is None or h == hwnd))
+
+
+# ==================== 截图源 ====================
+
+class FrameSource:
+    """
+    截图源接口
+
+    open() 绑定窗口并分配资源，grab()/grab_region() 返回BGR图像，
+    提供 out 缓冲区且尺寸匹配时直接写入缓冲区，close() 释放资源
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        self.hwnd: Optional[int] = None
+        self.width = 0
+        self.height = 0
+
+    def open(self, hwnd: int = None) -> bool:
+        """绑定窗口，返回是否成功"""
+        self.hwnd = hwnd
+        return True
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        """截取整个画面"""
+        raise NotImplementedError
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        """截取指定区域（默认整帧截取后裁剪）"""
+        frame = self.grab()
+        if frame is None:
+            return None
+        return _crop(frame, region, out)
+
+    def close(self):
+        """释放资源"""
+        self.hwnd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Win32BitBltSource(FrameSource):
+    """
+    win32 BitBlt截图
+
+    窗口DC、内存DC和位图在 open() 时创建并复用，区域截图只复制该区域；
+    整帧截图前重新读取客户区尺寸，窗口大小改变后不需要重新打开
+    注意：截图原点为窗口左上角（与原有实现一致），需要窗口可见
+    """
+
+    name = 'bitblt'
+
+    def __init__(self):
+        super().__init__()
+        self._hwnd_dc = None
+        self._window_dc = None
+        self._memory_dc = None
+        self._bitmaps: Dict[Tuple[int, int], object] = {}
+
+    def open(self, hwnd: int = None) -> bool:
+        self.close()
+        win32gui, win32ui, _, _ = _import_win32()
+        try:
+            left, top, right, bottom = win32gui.GetClientRect(hwnd)
+            self.width, self.height = right - left, bottom - top
+            self._hwnd_dc = win32gui.GetWindowDC(hwnd)
+            self._window_dc = win32ui.CreateDCFromHandle(self._hwnd_dc)
+            self._memory_dc = self._window_dc.CreateCompatibleDC()
+        except Exception as e:
+            logger.error(f"打开截图源失败 ({self.name}, hwnd: {hwnd}): {e}")
+            self.hwnd = hwnd
+            self.close()
+            return False
+        self.hwnd = hwnd
+        return True
+
+    def _client_size(self) -> Tuple[int, int]:
+        """重新读取客户区尺寸（窗口已关闭时沿用上次的尺寸，由截图本身报告失败）"""
+        try:
+            left, top, right, bottom = _import_win32()[0].GetClientRect(self.hwnd)
+            self.width, self.height = right - left, bottom - top
+        except Exception:
+            pass
+        return self.width, self.height
+
+    def _select_bitmap(self, width: int, height: int):
+        """选入指定尺寸的位图（按尺寸缓存）"""
+        bitmap = self._bitmaps.get((width, height))
+        if bitmap is None:
+            win32ui = _import_win32()[1]
+            bitmap = win32ui.CreateBitmap()
+            bitmap.CreateCompatibleBitmap(self._window_dc, width, height)
+            self._bitmaps[(width, height)] = bitmap
+        self._memory_dc.SelectObject(bitmap)
+        return bitmap
+
+    def _blit(self, x: int, y: int, width: int, height: int):
+        win32con = _import_win32()[2]
+        self._memory_dc.BitBlt((0, 0), (width, height), self._window_dc, (x, y), win32con.SRCCOPY)
+
+    @staticmethod
+    def _to_bgr(bitmap, width: int, height: int, out: np.ndarray = None) -> np.ndarray:
+        raw = np.frombuffer(bitmap.GetBitmapBits(True), dtype=np.uint8).reshape(height, width, 4)
+        if _fits(out, height, width):
+            return cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR, dst=out)
+        return cv2.cvtColor(raw, cv2.COLOR_BGRA2BGR)
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        if self._memory_dc is None:
+            return None
+        width, height = self._client_size()
+        return self.grab_region((0, 0, width, height), out)
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        if self._memory_dc is None:
+            return None
+        x, y, width, height = region
+        bitmap = self._select_bitmap(width, height)
+        self._blit(x, y, width, height)
+        return self._to_bgr(bitmap, width, height, out)
+
+    def close(self):
+        win32gui = _import_win32()[0] if self._hwnd_dc is not None or self._bitmaps else None
+        for bitmap in self._bitmaps.values():
+            try:
+                win32gui.DeleteObject(bitmap.GetHandle())
+            except Exception:
+                pass
+        self._bitmaps.clear()
+        for dc in (self._memory_dc, self._window_dc):
+            if dc is not None:
+                try:
+                    dc.DeleteDC()
+                except Exception:
+                    pass
+        if self._hwnd_dc is not None:
+            try:
+                win32gui.ReleaseDC(self.hwnd, self._hwnd_dc)
+            except Exception:
+                pass
+        self._hwnd_dc = self._window_dc = self._memory_dc = None
+        super().close()
+
+
+class Win32PrintWindowSource(Win32BitBltSource):
+    """
+    win32 PrintWindow截图（窗口被遮挡也能截图）
+
+    PrintWindow只能渲染整个客户区，区域截图为整帧截取后裁剪；失败时回退到BitBlt
+    """
+
+    name = 'printwindow'
+    PW_CLIENTONLY = 2
+
+    def __init__(self):
+        super().__init__()
+        self._frame: Optional[np.ndarray] = None
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        if self._memory_dc is None:
+            return None
+        import ctypes
+        width, height = self._client_size()
+        bitmap = self._select_bitmap(width, height)
+        result = ctypes.windll.user32.PrintWindow(self.hwnd, self._memory_dc.GetSafeHdc(), self.PW_CLIENTONLY)
+        if not result:
+            self._blit(0, 0, width, height)
+        return self._to_bgr(bitmap, width, height, out)
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        self._frame = self.grab(self._frame)
+        if self._frame is None:
+            return None
+        return _crop(self._frame, region, out)
+
+
+class PyAutoGuiSource(FrameSource):
+    """屏幕截图（pyautogui），截图原点为客户区左上角，需要窗口在前台"""
+
+    name = 'pyautogui'
+
+    def __init__(self, provider: WindowProvider = None):
+        super().__init__()
+        self.provider = provider or Win32WindowProvider()
+
+    def open(self, hwnd: int = None) -> bool:
+        try:
+            left, top, right, bottom = self.provider.get_client_rect(hwnd)
+        except Exception as e:
+            logger.error(f"打开截图源失败 ({self.name}, hwnd: {hwnd}): {e}")
+            return False
+        self.width, self.height = right - left, bottom - top
+        self.hwnd = hwnd
+        return True
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        if self.hwnd is None:
+            return None
+        try:
+            left, top, right, bottom = self.provider.get_client_rect(self.hwnd)
+            self.width, self.height = right - left, bottom - top  # 窗口大小可能在打开后改变
+        except Exception:
+            pass
+        return self.grab_region((0, 0, self.width, self.height), out)
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        if self.hwnd is None:
+            return None
+        import pyautogui
+        x, y, width, height = region
+        screen_x, screen_y = self.provider.client_to_screen(self.hwnd, (x, y))
+        rgb = np.asarray(pyautogui.screenshot(region=(screen_x, screen_y, width, height)))
+        if _fits(out, height, width):
+            return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=out)
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+def load_frames(path: str) -> List[Tuple[str, np.ndarray]]:
+    """
+    从目录或zip压缩包加载录制的画面
+
+    Args:
+        path: 图片目录或zip文件
+
+    Returns:
+        [(名称, BGR图像), ...]，按名称排序
+    """
+    frames = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(path, name))
+                if image is not None:
+                    frames.append((name, image))
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    data = np.frombuffer(archive.read(name), dtype=np.uint8)
+                    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+                    if image is not None:
+                        frames.append((name, image))
+    else:
+        raise ValueError(f"不支持的回放路径: {path}")
+    return frames
+
+
+class ReplaySource(FrameSource):
+    """
+    回放录制的画面
+
+    录制的是整个客户区时按区域裁剪；录制的只是小地图（尺寸与请求区域一致）时直接返回整帧
+    """
+
+    name = 'replay'
+
+    def __init__(self, frames=None, path: str = None, loop: bool = True):
+        """
+        Args:
+            frames: [(名称, 图像), ...] 或图像列表
+            path: 图片目录或zip文件（未提供frames时加载）
+            loop: 播放完后是否从头循环，否则返回None
+        """
+        super().__init__()
+        if frames is None:
+            frames = load_frames(path) if path else []
+        self.frames = [item[1] if isinstance(item, tuple) else item for item in frames]
+        if not self.frames:
+            raise ValueError("回放画面为空")
+        self.loop = loop
+        self.index = 0
+        self.height, self.width = self.frames[0].shape[:2]
+
+    def _next(self) -> Optional[np.ndarray]:
+        if self.index >= len(self.frames):
+            if not self.loop:
+                return None
+            self.index = 0
+        frame = self.frames[self.index]
+        self.index += 1
+        return frame
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        frame = self._next()
+        if frame is None:
+            return None
+        if _fits(out, *frame.shape[:2]):
+            np.copyto(out, frame)
+            return out
+        return frame
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        frame = self._next()
+        if frame is None:
+            return None
+        x, y, width, height = region
+        if frame.shape[:2] == (height, width):
+            region = (0, 0, width, height)
+        return _crop(frame, region, out)
+
+
+class SyntheticMinimapSource(FrameSource):
+    """
+    模拟游戏画面：右上角带边框的小地图，绿色怪物点静止，黄点（其他玩家）在小地图周围移动
+
+    黄点在比小地图大一倍的平面上环绕移动，会自然地进出小地图；每次截图前进一帧
+    """
+
+    name = 'synthetic'
+    YELLOW_BGR = (0, 255, 255)
+    FRAME_BGR = (150, 170, 190)
+
+    def __init__(self, width: int = 800, height: int = 600, minimap_region: Region = None,
+                 dots: int = 2, speed: float = 2.0, seed: int = 0, border: int = 2):
+        """
+        Args:
+            minimap_region: 小地图区域，默认右上角150x150（与默认配置一致）
+            border: 小地图外框宽度（画在区域外侧，0为不画）
+            dots: 黄点数量
+            speed: 黄点每帧移动的最大像素数
+            seed: 随机种子
+        """
+        super().__init__()
+        self.width, self.height = width, height
+        self.minimap_region = minimap_region or (width - 160, 10, 150, 150)
+        self.frame_index = 0
+
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 90, (height, width, 3), dtype=np.uint8)
+        x, y, w, h = self.minimap_region
+        if border > 0:
+            self.background[max(0, y - border):y + h + border, max(0, x - border):x + w + border] = self.FRAME_BGR
+        minimap = self.background[y:y + h, x:x + w]
+        minimap[:] = (30, 30, 40)
+        for _ in range(10):
+            mx, my = rng.integers(5, max(6, w - 5)), rng.integers(5, max(6, h - 5))
+            cv2.circle(minimap, (int(mx), int(my)), 2, (0, 150, 0), -1)
+
+        # 黄点位置和速度，坐标相对于小地图中心，平面范围为 [-w, w) x [-h, h)
+        self.positions = rng.uniform((-w, -h), (w, h), (dots, 2))
+        self.velocities = rng.uniform(-speed, speed, (dots, 2))
+
+    def _advance(self):
+        x, y, w, h = self.minimap_region
+        self.frame_index += 1
+        self.positions += self.velocities
+        span = np.array([2 * w, 2 * h])
+        self.positions = (self.positions + span / 2) % span - span / 2
+
+    def dot_positions(self) -> List[Tuple[int, int]]:
+        """当前在小地图内的黄点坐标（相对于小地图，用于校验检测结果）"""
+        x, y, w, h = self.minimap_region
+        visible = []
+        for dx, dy in self.positions:
+            px, py = int(round(w / 2 + dx)), int(round(h / 2 + dy))
+            if 2 <= px < w - 2 and 2 <= py < h - 2:
+                visible.append((px, py))
+        return visible
+
+    def _render(self, target: np.ndarray, origin: Tuple[int, int]):
+        """在目标图像上绘制黄点，origin为目标左上角的客户区坐标"""
+        x, y, _, _ = self.minimap_region
+        for px, py in self.dot_positions():
+            cv2.circle(target, (x + px - origin[0], y + py - origin[1]), 2, self.YELLOW_BGR, -1)
+
+    def grab(self, out: np.ndarray = None) -> Optional[np.ndarray]:
+        self._advance()
+        frame = out if _fits(out, self.height, self.width) else np.empty_like(self.background)
+        np.copyto(frame, self.background)
+        self._render(frame, (0, 0))
+        return frame
+
+    def grab_region(self, region: Region, out: np.ndarray = None) -> Optional[np.ndarray]:
+        self._advance()
+        x, y, width, height = region
+        background = self.background[y:y + height, x:x + width]
+        frame = out if _fits(out, *background.shape[:2]) else np.empty_like(background)
+        np.copyto(frame, background)
+        self._render(frame, (x, y))
+        return frame
+
+
+FRAME_SOURCES = {
+    source.name: source
+    for source in (Win32BitBltSource, Win32PrintWindowSource, PyAutoGuiSource, ReplaySource, SyntheticMinimapSource)
+}
+
+
+def frame_source_from_config(config: configparser.ConfigParser, provider: WindowProvider = None,
+                             default: str = 'bitblt', seed: int = 0) -> FrameSource:
+    """
+    根据 [Capture] 配置创建截图源
+
+    [Capture]
+    backend = bitblt | printwindow | pyautogui | replay | synthetic
+    replay_path = 录制画面目录或zip（replay）
+    synthetic_dots = 黄点数量（synthetic）
+
+    Args:
+        seed: synthetic的随机种子（多窗口时按窗口区分）
+    """
+    backend = config.get('Capture', 'backend', fallback=default).strip().lower()
+    if backend == 'pyautogui':
+        return PyAutoGuiSource(provider)
+    if backend == 'replay':
+        return ReplaySource(path=config.get('Capture', 'replay_path', fallback=''))
+    if backend == 'synthetic':
+        return SyntheticMinimapSource(dots=config.getint('Capture', 'synthetic_dots', fallback=2), seed=seed)
+    if backend not in FRAME_SOURCES:
+        logger.warning(f"未知的截图后端: {backend}，使用 {default}")
+        backend = default
+    return FRAME_SOURCES[backend]()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+按键输入调度模块
+功能: 检测线程只提交按键意图，由独立线程按定时队列发送按下/抬起消息
+特性: 按下与抬起之间不阻塞检测线程；冷却时间内对同一窗口同一按键的重复请求直接合并；
+      多个窗口共用一个调度线程，停止时补发所有未抬起的按键，不会留下卡住的按键
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bot_metrics import LatencyHistogram
+from frame_source import WindowProvider
+
+logger = logging.getLogger(__name__)
+
+# 默认按住时长（秒），与原先 key_down 和 key_up 之间的 sleep 一致
+DEFAULT_HOLD = 0.05
+
+ACTION_DOWN = 'down'
+ACTION_UP = 'up'
+
+
+class InputDispatcher:
+    """按键调度器（线程安全，首次提交时才启动调度线程）"""
+
+    def __init__(self, provider: WindowProvider, hold: float = DEFAULT_HOLD, name: str = 'input-dispatcher'):
+        """
+        Args:
+            provider: 窗口提供者（实际发送按键消息）
+            hold: 默认按住时长（秒）
+            name: 调度线程名称
+        """
+        self.provider = provider
+        self.hold = hold
+        self.name = name
+
+        self.cond = threading.Condition()
+        self._queue: List[Tuple[float, int, str, int, int, float]] = []  # (到期时间, 序号, 动作, hwnd, 键码, 按住时长)
+        self._seq = itertools.count()
+        self._held: Dict[Tuple[int, int], float] = {}        # 已提交但尚未抬起的按键 -> 提交时间
+        self._last_press: Dict[Tuple[int, int], float] = {}  # 最近一次接受的按键时间（冷却判断）
+        self._running = False
+        self.thread: Optional[threading.Thread] = None
+
+        # 统计（提交/合并由提交线程更新，丢弃由 stop() 更新，其余只由调度线程写入）
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0  # 停止时尚未按下就被丢弃的请求
+        self.sent = 0
+        self.errors = 0
+        self.queue_delay = LatencyHistogram()  # 提交到按下消息发出的延迟
+
+    def press(self, hwnd: int, vk_code: int, hold: float = None, cooldown: float = 0.0) -> bool:
+        """
+        提交一次按键（立即返回）
+
+        Args:
+            hwnd: 目标窗口
+            vk_code: 虚拟键码
+            hold: 按住时长（秒），默认使用构造时的值
+            cooldown: 冷却时间（秒），冷却内或上一次尚未抬起时合并为同一次按键
+
+        Returns:
+            是否接受（False表示被合并）
+        """
+        key = (hwnd, vk_code)
+        now = time.monotonic()
+        with self.cond:
+            last = self._last_press.get(key)
+            if key in self._held or (last is not None and now - last < cooldown):
+                self.coalesced += 1
+                return False
+            self._last_press[key] = now
+            self._held[key] = now
+            self.submitted += 1
+            heapq.heappush(self._queue, (now, next(self._seq), ACTION_DOWN, hwnd, vk_code,
+                                         self.hold if hold is None else hold))
+            self._ensure_thread()
+            self.cond.notify()
+        return True
+
+    def pending(self) -> int:
+        """尚未发送完成（按下或抬起）的事件数"""
+        with self.cond:
+            return len(self._queue)
+
+    def queue_stats(self) -> Dict[str, int]:
+        """队列深度和累计合并/丢弃数（监控指标）"""
+        with self.cond:
+            return {'depth': len(self._queue), 'coalesced': self.coalesced, 'dropped': self.dropped}
+
+    def forget(self, hwnd: int):
+        """窗口关闭后清除其冷却记录"""
+        with self.cond:
+            for key in [key for key in self._last_press if key[0] == hwnd]:
+                del self._last_press[key]
+
+    def _ensure_thread(self):
+        # 调用方持有 self.cond
+        if self._running and self.thread is not None and self.thread.is_alive():
+            return
+        self._running = True
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def _send(self, action: str, hwnd: int, vk_code: int) -> bool:
+        try:
+            if action == ACTION_DOWN:
+                self.provider.key_down(hwnd, vk_code)
+            else:
+                self.provider.key_up(hwnd, vk_code)
+            return True
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"发送按键失败 (hwnd: {hwnd}, vk: {vk_code}, {action}): {e}")
+            return False
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self._running:
+                    if not self._queue:
+                        self.cond.wait()
+                        continue
+                    delay = self._queue[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self.cond.wait(delay)
+                if not self._running:
+                    return
+                due, _, action, hwnd, vk_code, hold = heapq.heappop(self._queue)
+
+            # 发送时不持有锁，避免阻塞提交线程
+            started = time.monotonic()
+            ok = self._send(action, hwnd, vk_code)
+            with self.cond:
+                if action == ACTION_DOWN and ok:
+                    self.queue_delay.record(started - due)
+                    self.sent += 1
+                    heapq.heappush(self._queue, (time.monotonic() + hold, next(self._seq), ACTION_UP,
+                                                 hwnd, vk_code, 0.0))
+                else:
+                    self._held.pop((hwnd, vk_code), None)
+
+    def stop(self, timeout: float = 1.0):
+        """停止调度线程，补发所有未抬起的按键，丢弃尚未按下的请求"""
+        with self.cond:
+            self._running = False
+            self.cond.notify_all()
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.join(timeout)
+
+        with self.cond:
+            pending, self._queue = self._queue, []
+            self._held.clear()
+            self.dropped += sum(1 for item in pending if item[2] == ACTION_DOWN)
+        for _, _, action, hwnd, vk_code, _ in sorted(pending):
+            if action == ACTION_UP:
+                self._send(ACTION_UP, hwnd, vk_code)
+
+    def format_stats(self) -> str:
+        """格式化统计"""
+        p95 = self.queue_delay.percentile(95) * 1000 if self.queue_delay.count else 0.0
+        return (f"按键: 提交 {self.submitted}, 合并 {self.coalesced}, 发送 {self.sent}, "
+                f"失败 {self.errors}, 丢弃 {self.dropped}, 排队p95 {p95:.2f}ms")
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+小地图地图识别（地图指纹）
+功能: 用降采样小地图的颜色直方图识别当前所在的地图，检测地图切换（传送、过图），
+      最近去过的地图保存在一个小缓存中，每个地图的状态（静态掩码等）切换时直接换入，不重新学习；
+      同时按地图统计玩家密度
+特性: 指纹为32x32最近邻降采样后的4x4x4颜色直方图（64维，约20微秒），与小地图的滚动位置无关；
+      与缓存中所有地图的距离一次向量化算出（缓存很小，切换为常数时间）；
+      新指纹需连续 confirm_frames 帧一致才确认切换，过图的过渡画面不会误判
+
+配置:
+  [MapTracking]
+  enabled = true
+  capacity = 16           # 缓存的地图数（最近最少使用的先淘汰）
+  threshold = 0.3         # 直方图L1距离小于该值视为同一地图（0~2）
+  confirm_frames = 2      # 连续多少帧一致后确认切换
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+FINGERPRINT_SIZE = 32     # 降采样边长
+HISTOGRAM_BINS = 4        # 每个通道的直方图格数
+UNIFORM_SHARE = 0.98      # 单一颜色占比超过该值的帧（黑屏、加载画面）不参与识别
+
+DEFAULT_CAPACITY = 16
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_CONFIRM_FRAMES = 2
+
+
+def map_fingerprint(minimap: np.ndarray) -> np.ndarray:
+    """小地图的地图指纹（归一化的颜色直方图，float32，长度64）"""
+    small = cv2.resize(minimap, (FINGERPRINT_SIZE, FINGERPRINT_SIZE), interpolation=cv2.INTER_NEAREST)
+    histogram = cv2.calcHist([small], [0, 1, 2], None, [HISTOGRAM_BINS] * 3, [0, 256] * 3).ravel()
+    return histogram / (FINGERPRINT_SIZE * FINGERPRINT_SIZE)
+
+
+def fingerprint_key(fingerprint: np.ndarray) -> str:
+    """指纹的短标识（用于文件名和日志，同一地图在不同运行中通常相同）"""
+    return hashlib.sha1(np.round(fingerprint * 32).astype(np.uint8).tobytes()).hexdigest()[:8]
+
+
+class MapState:
+    """单个地图的状态和统计"""
+
+    __slots__ = ('key', 'fingerprint', 'data', 'visits', 'frames', 'dot_frames', 'dots',
+                 'first_seen', 'last_seen')
+
+    def __init__(self, fingerprint: np.ndarray):
+        self.key = fingerprint_key(fingerprint)
+        self.fingerprint = fingerprint
+        self.data: Dict = {}  # 按地图保存的其他模块状态（如 'static_mask'）
+        self.visits = 0
+        self.frames = 0
+        self.dot_frames = 0   # 检测到玩家的帧数
+        self.dots = 0         # 检测到的玩家总数（按帧累加）
+        self.first_seen = self.last_seen = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            'key': self.key,
+            'visits': self.visits,
+            'frames': self.frames,
+            'players_per_frame': round(self.dots / self.frames, 3) if self.frames else 0.0,
+            'occupied_share': round(self.dot_frames / self.frames, 3) if self.frames else 0.0,
+            'last_seen': self.last_seen,
+        }
+
+
+class MapRegistry:
+    """
+    地图识别和最近地图缓存（每个窗口一个，检测线程调用 observe）
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, threshold: float = DEFAULT_THRESHOLD,
+                 confirm_frames: int = DEFAULT_CONFIRM_FRAMES):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.confirm_frames = confirm_frames
+        self.maps: 'OrderedDict[str, MapState]' = OrderedDict()
+        self.current: Optional[MapState] = None
+        self.changes = 0
+        self._fingerprints = np.zeros((0, HISTOGRAM_BINS ** 3), dtype=np.float32)  # 与 maps 顺序一致
+        self._candidate: Optional[np.ndarray] = None
+        self._candidate_frames = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> Optional['MapRegistry']:
+        """根据 [MapTracking] 配置创建，未启用时返回None"""
+        if not config.getboolean('MapTracking', 'enabled', fallback=True):
+            return None
+        return cls(capacity=config.getint('MapTracking', 'capacity', fallback=DEFAULT_CAPACITY),
+                   threshold=config.getfloat('MapTracking', 'threshold', fallback=DEFAULT_THRESHOLD),
+                   confirm_frames=config.getint('MapTracking', 'confirm_frames', fallback=DEFAULT_CONFIRM_FRAMES))
+
+    def _nearest(self, fingerprint: np.ndarray) -> Optional[MapState]:
+        """缓存中与指纹最接近且在阈值内的地图"""
+        if not self.maps:
+            return None
+        distances = np.abs(self._fingerprints - fingerprint).sum(axis=1)
+        index = int(distances.argmin())
+        if distances[index] > self.threshold:
+            return None
+        return list(self.maps.values())[index]
+
+    def _switch(self, fingerprint: np.ndarray) -> MapState:
+        with self.lock:
+            state = self._nearest(fingerprint)
+            if state is None:
+                state = MapState(fingerprint)
+                self.maps.pop(state.key, None)  # 标识相同但距离超出阈值时替换
+                if len(self.maps) >= self.capacity:
+                    self.maps.popitem(last=False)
+                self.maps[state.key] = state
+            else:
+                self.maps.move_to_end(state.key)
+            self._fingerprints = np.array([s.fingerprint for s in self.maps.values()], dtype=np.float32)
+            state.visits += 1
+            self.current = state
+            self.changes += 1
+        return state
+
+    def observe(self, minimap: np.ndarray, dot_count: int = 0) -> Optional[MapState]:
+        """
+        识别一帧小地图并累计当前地图的玩家统计
+
+        Returns:
+            确认切换到的地图（包括第一次识别），未切换时返回None
+        """
+        fingerprint = map_fingerprint(minimap)
+        if fingerprint.max() > UNIFORM_SHARE:
+            return None
+
+        changed = None
+        current = self.current
+        if current is None or np.abs(current.fingerprint - fingerprint).sum() > self.threshold:
+            candidate = self._candidate
+            if candidate is not None and np.abs(candidate - fingerprint).sum() <= self.threshold:
+                self._candidate_frames += 1
+            else:
+                self._candidate = fingerprint
+                self._candidate_frames = 1
+            if self._candidate_frames < self.confirm_frames:
+                return None
+            current = changed = self._switch(self._candidate)
+        self._candidate = None
+
+        current.frames += 1
+        current.dots += dot_count
+        current.dot_frames += dot_count > 0
+        current.last_seen = time.time()
+        return changed
+
+    def summary(self) -> List[Dict]:
+        """各地图的统计，最近去过的在前"""
+        with self.lock:
+            return [state.to_dict() for state in reversed(self.maps.values())]
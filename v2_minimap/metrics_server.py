@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+本地监控指标服务
+功能: 以Prometheus文本格式输出各窗口的计数、状态和耗时直方图
+特性: 只监听本机地址，在独立线程中响应请求，不影响检测线程
+"""
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from bot_metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'mir2_bot'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 输出给Prometheus的直方图分界（秒）
+PROMETHEUS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# 计数器名称 -> 说明
+COUNTER_HELP = {
+    'detection_runs': 'Minimap detection runs',
+    'yellow_dots_detected': 'Yellow dots detected',
+    'teleports_used': 'Teleport keypresses sent',
+}
+
+# 队列累计计数名称 -> 说明
+QUEUE_COUNTER_HELP = {
+    'coalesced': 'Requests merged into an already queued item',
+    'dropped': 'Items discarded before being processed',
+}
+
+
+def window_snapshot(label: str, stats: Dict, metrics, lock: threading.Lock = None,
+                    gauges: Dict[str, float] = None) -> Dict:
+    """
+    生成单个窗口的指标快照
+
+    只在复制计数字典时短暂持有锁，直方图在锁外复制
+
+    Args:
+        label: 窗口标签（Prometheus的window标签）
+        stats: 窗口统计字典
+        metrics: WindowMetrics实例
+        lock: 保护stats的锁
+        gauges: 窗口级别的状态值
+
+    Returns:
+        快照字典
+    """
+    if lock is not None:
+        with lock:
+            counters = dict(stats)
+    else:
+        counters = dict(stats)
+    return {
+        'window': label,
+        'counters': {k: v for k, v in counters.items() if isinstance(v, (int, float)) and not isinstance(v, bool)},
+        'gauges': dict(gauges or {}),
+        'histograms': metrics.snapshot() if metrics is not None else {},
+    }
+
+
+def _escape_label(value) -> str:
+    """转义标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _histogram_buckets(histogram: LatencyHistogram, bounds=PROMETHEUS_BUCKETS) -> List[int]:
+    """把对数分桶折算成Prometheus的累计分桶"""
+    cumulative = []
+    total = 0
+    index = 0
+    counts = histogram.counts
+    for bound in bounds:
+        while index < len(counts) and LatencyHistogram.bucket_upper_bound(index) <= bound:
+            total += counts[index]
+            index += 1
+        cumulative.append(total)
+    return cumulative
+
+
+def render_prometheus(snapshot: Dict) -> str:
+    """
+    渲染Prometheus文本格式
+
+    Args:
+        snapshot: {'gauges': {...}, 'queues': {...}, 'windows': [window_snapshot, ...]}；
+                  queues 的值为队列深度，或 {'depth': 深度, 计数名: 累计值, ...}（如合并、丢弃数）
+
+    Returns:
+        文本内容
+    """
+    lines = []
+    windows = snapshot.get('windows', [])
+
+    # 全局状态
+    for name, value in sorted(snapshot.get('gauges', {}).items()):
+        metric = f'{METRIC_PREFIX}_{name}'
+        lines.append(f'# TYPE {metric} gauge')
+        lines.append(f'{metric} {_format_value(value)}')
+
+    queues = {name: value if isinstance(value, dict) else {'depth': value}
+              for name, value in snapshot.get('queues', {}).items()}
+    if queues:
+        metric = f'{METRIC_PREFIX}_queue_depth'
+        lines.append(f'# HELP {metric} Pending items per internal queue')
+        lines.append(f'# TYPE {metric} gauge')
+        for name, values in sorted(queues.items()):
+            lines.append(f'{metric}{_format_labels({"queue": name})} {_format_value(values.get("depth", 0))}')
+    for counter in sorted({key for values in queues.values() for key in values if key != 'depth'}):
+        metric = f'{METRIC_PREFIX}_queue_{counter}_total'
+        lines.append(f'# HELP {metric} {QUEUE_COUNTER_HELP.get(counter, counter)}')
+        lines.append(f'# TYPE {metric} counter')
+        for name, values in sorted(queues.items()):
+            if counter in values:
+                lines.append(f'{metric}{_format_labels({"queue": name})} {_format_value(values[counter])}')
+
+    # 窗口计数
+    counter_names = sorted({name for w in windows for name in w['counters']})
+    for name in counter_names:
+        metric = f'{METRIC_PREFIX}_{name}_total'
+        lines.append(f'# HELP {metric} {COUNTER_HELP.get(name, name)}')
+        lines.append(f'# TYPE {metric} counter')
+        for w in windows:
+            if name in w['counters']:
+                lines.append(f'{metric}{_format_labels({"window": w["window"]})} {_format_value(w["counters"][name])}')
+
+    # 窗口状态
+    gauge_names = sorted({name for w in windows for name in w['gauges']})
+    for name in gauge_names:
+        metric = f'{METRIC_PREFIX}_window_{name}'
+        lines.append(f'# TYPE {metric} gauge')
+        for w in windows:
+            if name in w['gauges']:
+                lines.append(f'{metric}{_format_labels({"window": w["window"]})} {_format_value(w["gauges"][name])}')
+
+    # 分阶段耗时直方图
+    metric = f'{METRIC_PREFIX}_stage_latency_seconds'
+    if any(w['histograms'] for w in windows):
+        lines.append(f'# HELP {metric} Per-stage latency of the detection loop')
+        lines.append(f'# TYPE {metric} histogram')
+    for w in windows:
+        for stage, histogram in w['histograms'].items():
+            labels = {'window': w['window'], 'stage': stage}
+            for bound, count in zip(PROMETHEUS_BUCKETS, _histogram_buckets(histogram)):
+                lines.append(f'{metric}_bucket{_format_labels({**labels, "le": bound})} {count}')
+            lines.append(f'{metric}_bucket{_format_labels({**labels, "le": "+Inf"})} {histogram.count}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {_format_value(histogram.total)}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {histogram.count}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理"""
+
+    server_version = 'Mir2BotMetrics/1.0'
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        try:
+            body = render_prometheus(self.server.collect()).encode('utf-8')
+        except Exception as e:
+            logger.error(f"生成监控指标失败: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求很频繁，不写入日志
+        pass
+
+
+class MetricsServer:
+    """本地监控指标HTTP服务"""
+
+    def __init__(self, collect: Callable[[], Dict], port: int = 9108, host: str = '127.0.0.1'):
+        """
+        Args:
+            collect: 返回快照字典的函数（在请求线程中调用）
+            port: 监听端口，0表示自动分配
+            host: 监听地址，默认只监听本机
+        """
+        self.collect = collect
+        self.host = host
+        self.port = port
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """启动服务"""
+        if self.httpd is not None:
+            return True
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"监控指标服务启动失败 ({self.host}:{self.port}): {e}")
+            self.httpd = None
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.collect = self.collect
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='metrics-server', daemon=True)
+        self.thread.start()
+        logger.info(f"监控指标服务已启动: http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        """停止服务"""
+        if self.httpd is None:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.httpd = None
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        logger.info("监控指标服务已停止")
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+小地图自动定位与校准缓存
+功能: 在整张客户区截图中按边框的长直边定位小地图的精确矩形（边框内侧），按客户区分辨率缓存到JSON文件
+特性: 定位只在首次接入或校验失败时进行（整帧截图一次）；之后定时截取比小地图大1像素的一圈做廉价校验，
+      只检查四条边上的像素，边框不再对齐时才重新定位；每帧只截取边框内侧的精确区域，无需手动调整偏移
+
+原理: 相邻像素灰度差超过阈值的位置视为边缘，用长度为 min_size 的线形开运算只保留长直边
+（随机纹理和文字不会形成几十像素的连续直边），再在水平/竖直直边中组合出四边都被覆盖的矩形；
+只考虑配置区域附近和客户区左上/右上角的矩形（其他界面面板也有边框），四条边的覆盖用前缀和整体计算，
+取离锚点最近的矩形中嵌套的最小矩形（小地图外框通常有多层线条，最内层即小地图本身）
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Region = Tuple[int, int, int, int]  # (x, y, width, height)
+
+# 默认搜索范围：客户区上方 45% 高度（小地图在左上角或右上角）
+DEFAULT_SEARCH_HEIGHT = 0.45
+DEFAULT_EDGE_THRESHOLD = 40    # 相邻像素灰度差阈值
+DEFAULT_MIN_SIZE = 60          # 小地图最小边长（像素）
+DEFAULT_MAX_ASPECT = 2.0       # 最大长宽比
+DEFAULT_COVERAGE = 0.9         # 每条边被直边覆盖的最小比例
+DEFAULT_ANCHOR_MARGIN = 60     # 候选矩形与配置区域、客户区角的最大距离
+
+MANUAL_REGION_KEYS = ('offset_x', 'offset_y', 'width', 'height')  # [Minimap] 手动配置的区域
+
+
+def _edge_positions(edges: np.ndarray, horizontal: bool, min_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    提取长直边
+
+    Returns:
+        (直边像素沿边方向的前缀和（水平边为 (行, 列+1)，竖直边为 (列, 行+1)）, 含直边的行/列位置)
+    """
+    kernel = np.ones((1, min_length) if horizontal else (min_length, 1), dtype=np.uint8)
+    opened = cv2.morphologyEx(edges, cv2.MORPH_OPEN, kernel) != 0
+    if not horizontal:
+        opened = opened.T
+    cumulative = np.zeros((opened.shape[0], opened.shape[1] + 1), dtype=np.int32)
+    np.cumsum(opened, axis=1, out=cumulative[:, 1:])
+    return cumulative, np.flatnonzero(cumulative[:, -1])
+
+
+def _covered(cumulative: np.ndarray, positions: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+             coverage: float) -> np.ndarray:
+    """
+    每个位置上每个 [start, end) 是否被直边覆盖
+
+    Returns:
+        (len(positions), len(starts), len(ends)) 的bool数组
+    """
+    lines = cumulative[positions]
+    covered = lines[:, None, ends] - lines[:, starts, None]
+    return covered >= coverage * (ends[None, None, :] - starts[None, :, None])
+
+
+def _window(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    return values[(values >= low) & (values <= high)]
+
+
+def locate_minimap(frame: np.ndarray, search_height: float = DEFAULT_SEARCH_HEIGHT,
+                   edge_threshold: int = DEFAULT_EDGE_THRESHOLD, min_size: int = DEFAULT_MIN_SIZE,
+                   max_aspect: float = DEFAULT_MAX_ASPECT, coverage: float = DEFAULT_COVERAGE,
+                   prefer_right: bool = True, hint: Region = None,
+                   anchor_margin: int = DEFAULT_ANCHOR_MARGIN) -> Optional[Region]:
+    """
+    在客户区截图中定位小地图
+
+    只考虑左上角在配置区域（hint）附近、或外角靠近客户区左上/右上角的矩形，界面上其他带边框的面板不参与；
+    按 配置区域、prefer_right 一侧的角、另一侧的角 的顺序选离锚点最近的矩形，再取嵌套在其中的最小矩形（多层外框的最内层）
+
+    Args:
+        frame: 整个客户区截图（BGR）
+        search_height: 搜索范围占客户区高度的比例（从顶部开始，不足以包含 hint 时扩大）
+        edge_threshold: 边缘阈值（相邻像素灰度差）
+        min_size: 小地图最小边长
+        max_aspect: 最大长宽比
+        coverage: 四条边被直边覆盖的最小比例
+        prefer_right: 优先右上角（否则优先左上角）
+        hint: 配置的小地图区域 (x, y, width, height)
+        anchor_margin: 矩形左上角与配置区域、外角与客户区角的最大距离（每个方向，像素）
+
+    Returns:
+        小地图区域 (x, y, width, height)（边框内侧），未找到时返回None
+    """
+    if frame is None or frame.ndim != 3:
+        return None
+    limit = max(min_size + 2, int(frame.shape[0] * search_height))
+    if hint is not None:
+        # 配置的区域在搜索范围以下时扩大范围（包含底边外侧一行）
+        limit = min(frame.shape[0], max(limit, hint[1] + hint[3] + anchor_margin + 1))
+    gray = cv2.cvtColor(frame[:limit], cv2.COLOR_BGR2GRAY).astype(np.int16)
+    width = gray.shape[1]
+
+    # 行 y 的水平边表示第 y-1 行与第 y 行之间的跳变，竖直边同理，矩形 [x0, x1) x [y0, y1) 的四边分别位于 y0/y1/x0/x1
+    horizontal = np.zeros(gray.shape, dtype=np.uint8)
+    vertical = np.zeros(gray.shape, dtype=np.uint8)
+    horizontal[1:][np.abs(gray[1:] - gray[:-1]) > edge_threshold] = 255
+    vertical[:, 1:][np.abs(gray[:, 1:] - gray[:, :-1]) > edge_threshold] = 255
+    row_sums, rows = _edge_positions(horizontal, True, min_size)
+    col_sums, cols = _edge_positions(vertical, False, min_size)
+    if len(rows) < 2 or len(cols) < 2:
+        return None
+
+    # 锚点：(优先级, 左上角x范围, 左上角y范围, 右边x范围, 到锚点的距离)；配置区域优先，其次 prefer_right 一侧的角
+    anchors = [(2 if prefer_right else 1, (0, anchor_margin), (0, anchor_margin), (0, width),
+                lambda x0, y0, x1: x0 + y0),
+               (1 if prefer_right else 2, (0, width), (0, anchor_margin), (width - anchor_margin, width),
+                lambda x0, y0, x1: (width - x1) + y0)]
+    if hint is not None:
+        hx, hy = hint[0], hint[1]
+        anchors.append((0, (hx - anchor_margin, hx + anchor_margin), (hy - anchor_margin, hy + anchor_margin),
+                        (0, width), lambda x0, y0, x1: np.abs(x0 - hx) + np.abs(y0 - hy)))
+
+    found = []
+    for priority, x0_range, y0_range, x1_range, distance in anchors:
+        ys0, xs0, xs1 = _window(rows, *y0_range), _window(cols, *x0_range), _window(cols, *x1_range)
+        if not (len(ys0) and len(xs0) and len(xs1)):
+            continue
+        # 四条边分别计算覆盖，再按 (y0, y1, x0, x1) 组合
+        top = _covered(row_sums, ys0, xs0, xs1, coverage)             # (y0, x0, x1)
+        bottom = _covered(row_sums, rows, xs0, xs1, coverage)         # (y1, x0, x1)
+        left = _covered(col_sums, xs0, ys0, rows, coverage)           # (x0, y0, y1)
+        right = _covered(col_sums, xs1, ys0, rows, coverage)          # (x1, y0, y1)
+        heights = rows[None, :] - ys0[:, None]                        # (y0, y1)
+        widths = xs1[None, :] - xs0[:, None]                          # (x0, x1)
+        sized = ((heights[:, :, None, None] >= min_size) & (widths[None, None] >= min_size) &
+                 (np.maximum(heights[:, :, None, None], widths[None, None]) <=
+                  max_aspect * np.minimum(heights[:, :, None, None], widths[None, None])))
+        valid = (sized & top[:, None] & bottom[None] &
+                 left.transpose(1, 2, 0)[:, :, :, None] & right.transpose(1, 2, 0)[:, :, None, :])
+        i, j, k, m = np.nonzero(valid)
+        if len(i):
+            x0, y0, x1, y1 = xs0[k], ys0[i], xs1[m], rows[j]
+            found.append(np.column_stack([x0, y0, x1, y1, distance(x0, y0, x1), np.full(len(i), priority)]))
+    if not found:
+        return None
+
+    candidates = np.concatenate(found)
+    x0, y0, x1, y1, _, _ = candidates[np.lexsort((candidates[:, 4], candidates[:, 5]))[0]]
+    nested = candidates[(candidates[:, 0] >= x0) & (candidates[:, 1] >= y0) &
+                        (candidates[:, 2] <= x1) & (candidates[:, 3] <= y1)]
+    areas = (nested[:, 2] - nested[:, 0]) * (nested[:, 3] - nested[:, 1])
+    x0, y0, x1, y1, _, _ = nested[np.argmin(areas)].tolist()
+    return int(x0), int(y0), int(x1 - x0), int(y1 - y0)
+
+
+def validate_region(source, region: Region, edge_threshold: int = DEFAULT_EDGE_THRESHOLD,
+                    coverage: float = DEFAULT_COVERAGE) -> bool:
+    """
+    廉价校验：截取比区域大1像素的一圈，检查四条边界上的跳变是否仍然存在
+
+    Args:
+        source: 截图源（已打开）
+        region: 小地图区域
+    """
+    x, y, w, h = region
+    if x < 1 or y < 1:
+        return False
+    frame = source.grab_region((x - 1, y - 1, w + 2, h + 2))
+    if frame is None or frame.shape[:2] != (h + 2, w + 2):
+        return False
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY).astype(np.int16)
+    sides = (
+        np.abs(gray[1, 1:-1] - gray[0, 1:-1]),      # 上边
+        np.abs(gray[-1, 1:-1] - gray[-2, 1:-1]),    # 下边
+        np.abs(gray[1:-1, 1] - gray[1:-1, 0]),      # 左边
+        np.abs(gray[1:-1, -1] - gray[1:-1, -2]),    # 右边
+    )
+    return all(np.count_nonzero(side > edge_threshold) >= coverage * side.size for side in sides)
+
+
+class MinimapCalibrator:
+    """
+    小地图校准缓存（按客户区分辨率，多个窗口共用，线程安全）
+
+    缓存文件格式: {"1024x768": {"region": [x, y, w, h], "calibrated_at": "..."}}
+    """
+
+    def __init__(self, cache_path: str = None, revalidate_interval: float = 30.0, **locate_options):
+        """
+        Args:
+            cache_path: 缓存JSON文件路径，None时只缓存在内存中
+            revalidate_interval: 运行中校验间隔（秒）
+            locate_options: 传给 locate_minimap 的参数
+        """
+        self.cache_path = cache_path
+        self.revalidate_interval = revalidate_interval
+        self.locate_options = locate_options
+        self.lock = threading.Lock()
+        self.cache: Dict[str, Dict] = {}
+        self.calibrations = 0
+        self.validations = 0
+        self.failures = 0
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取小地图校准缓存失败: {e}")
+
+    @staticmethod
+    def size_key(client_size: Tuple[int, int]) -> str:
+        return f"{client_size[0]}x{client_size[1]}"
+
+    def cached(self, client_size: Tuple[int, int]) -> Optional[Region]:
+        """该分辨率的缓存区域"""
+        with self.lock:
+            entry = self.cache.get(self.size_key(client_size))
+        return tuple(entry['region']) if entry else None
+
+    def store(self, client_size: Tuple[int, int], region: Region):
+        with self.lock:
+            self.cache[self.size_key(client_size)] = {
+                'region': [int(v) for v in region],
+                'calibrated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            snapshot = dict(self.cache)
+        if self.cache_path:
+            try:
+                temp_path = f"{self.cache_path}.{os.getpid()}.tmp"  # 多进程模式下各进程共用缓存文件
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, indent=2)
+                os.replace(temp_path, self.cache_path)
+            except OSError as e:
+                logger.warning(f"保存小地图校准缓存失败: {e}")
+
+    def forget(self, client_size: Tuple[int, int]):
+        with self.lock:
+            self.cache.pop(self.size_key(client_size), None)
+
+    def calibrate(self, source, client_size: Tuple[int, int], hint: Region = None) -> Optional[Region]:
+        """整帧截图定位小地图并缓存（hint 为配置的区域）"""
+        frame = source.grab()
+        region = locate_minimap(frame, hint=hint, **self.locate_options) if frame is not None else None
+        self.calibrations += 1
+        if region is None:
+            self.failures += 1
+            return None
+        self.store(client_size, region)
+        logger.info(f"小地图自动定位 ({self.size_key(client_size)}): {region}")
+        return region
+
+    def validate(self, source, region: Region) -> bool:
+        self.validations += 1
+        threshold = self.locate_options.get('edge_threshold', DEFAULT_EDGE_THRESHOLD)
+        return validate_region(source, region, threshold)
+
+    def region_for(self, source, client_size: Tuple[int, int], hint: Region = None) -> Optional[Region]:
+        """
+        返回该分辨率的小地图区域：缓存有效时直接使用，否则在配置的区域（hint）和客户区上方两角附近重新定位
+
+        Returns:
+            区域，定位失败时返回None（调用方使用配置的区域）
+        """
+        region = self.cached(client_size)
+        if region is not None and self.validate(source, region):
+            return region
+        return self.calibrate(source, client_size, hint)
+
+
+def calibrator_from_config(config, base_dir: str) -> Optional[MinimapCalibrator]:
+    """
+    根据 [Minimap] 配置创建校准器，auto_calibrate 关闭时返回None（使用手动配置的区域）
+
+    没有 auto_calibrate 时，配置了手动区域（offset_x/offset_y/width/height）的旧配置文件默认关闭，
+    不会被静默切换为自动定位；没有手动区域时默认开启
+
+    [Minimap]
+    auto_calibrate = true
+    calibration_file = minimap_calibration.json（相对配置文件所在目录）
+    revalidate_interval = 30
+    """
+    manual = any(config.has_option('Minimap', key) for key in MANUAL_REGION_KEYS)
+    if not config.getboolean('Minimap', 'auto_calibrate', fallback=not manual):
+        return None
+    path = config.get('Minimap', 'calibration_file', fallback='minimap_calibration.json')
+    if path and not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return MinimapCalibrator(path or None,
+                             revalidate_interval=config.getfloat('Minimap', 'revalidate_interval', fallback=30.0))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='在截图中定位小地图（检查自动校准结果）')
+    parser.add_argument('images', nargs='+', help='客户区截图')
+    parser.add_argument('--threshold', type=int, default=DEFAULT_EDGE_THRESHOLD, help='边缘阈值')
+    parser.add_argument('--min-size', type=int, default=DEFAULT_MIN_SIZE, help='小地图最小边长')
+    parser.add_argument('--save', action='store_true', help='保存标出区域的图片（*_minimap.png）')
+    args = parser.parse_args()
+
+    for path in args.images:
+        frame = cv2.imread(path)
+        started = time.perf_counter()
+        region = locate_minimap(frame, edge_threshold=args.threshold, min_size=args.min_size)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{path}: {region} ({elapsed:.1f}ms)")
+        if region is not None and args.save:
+            x, y, w, h = region
+            cv2.rectangle(frame, (x, y), (x + w - 1, y + h - 1), (0, 0, 255), 1)
+            cv2.imwrite(os.path.splitext(path)[0] + '_minimap.png', frame)
+
+
+if __name__ == '__main__':
+    main()
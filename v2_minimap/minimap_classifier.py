@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+小地图多类别像素分类
+功能: 按配置的颜色类别（玩家、行会成员、怪物、NPC等）给小地图每个像素打标签，返回每个类别的像素数和点
+特性: 颜色 -> 类别的查找表只在加载配置时构建一次；分类是一次向量化查表，
+      点的提取和按类别计数各只需一遍，与类别数量无关（增加类别不增加遍历次数）
+
+配置:
+  [MinimapClasses]
+  player = 250,250,0-255,255,5
+  guild = 0,200,200-40,255,255; 0,160,255-30,200,255
+  monster = 0,120,0-40,180,40
+  每个类别为一个或多个RGB颜色框（分号分隔），颜色框重叠时先配置的类别优先
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from blob_stats import Blobs, label_blobs
+from minimap_detector import ColorBox, color_index
+
+MAX_CLASSES = 255  # 标签0为背景
+
+_lut_cache: Dict[Tuple, np.ndarray] = {}  # (类别, 位数) -> 查找表，多个窗口的分类器共用
+_lut_cache_lock = threading.Lock()
+
+
+def parse_boxes(text: str) -> List[ColorBox]:
+    """
+    解析颜色框 "r,g,b-r,g,b; r,g,b-r,g,b"
+
+    Raises:
+        ValueError: 格式错误
+    """
+    boxes = []
+    for part in text.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            lower_text, upper_text = part.split('-')
+            lower = tuple(int(v) for v in lower_text.split(','))
+            upper = tuple(int(v) for v in upper_text.split(','))
+        except ValueError:
+            raise ValueError(f"颜色框格式应为 r,g,b-r,g,b: {part}")
+        if len(lower) != 3 or len(upper) != 3 or not all(0 <= a <= b <= 255 for a, b in zip(lower, upper)):
+            raise ValueError(f"颜色框超出范围: {part}")
+        boxes.append((lower, upper))
+    if not boxes:
+        raise ValueError("颜色类别没有颜色框")
+    return boxes
+
+
+def format_boxes(boxes: Sequence[ColorBox]) -> str:
+    return '; '.join(f"{','.join(map(str, lower))}-{','.join(map(str, upper))}" for lower, upper in boxes)
+
+
+def classes_from_config(config) -> List[Tuple[str, List[ColorBox]]]:
+    """读取 [MinimapClasses]，按配置顺序返回 [(类别名, 颜色框)]"""
+    if not config.has_section('MinimapClasses'):
+        return []
+    return [(name, parse_boxes(value)) for name, value in config.items('MinimapClasses')]
+
+
+def build_class_lut(classes: Sequence[Tuple[str, Sequence[ColorBox]]], bits: int = 8) -> np.ndarray:
+    """
+    构建颜色 -> 类别标签的查找表
+
+    Args:
+        classes: [(类别名, 颜色框)]，标签依次为1, 2, ...
+        bits: 每个通道的位数，8为精确的24位表（16MB），5为32x32x32的量化表（32KB，每格取中心颜色判断）
+
+    Returns:
+        长度 2^(3*bits) 的uint8数组
+    """
+    if len(classes) > MAX_CLASSES:
+        raise ValueError(f"颜色类别最多 {MAX_CLASSES} 个")
+    side = 1 << bits
+    shift = 8 - bits
+    lut = np.zeros(side ** 3, dtype=np.uint8)
+    cube = lut.reshape(side, side, side)  # [r, g, b]
+    half = (1 << shift) >> 1
+    # 倒序写入，重叠部分保留先配置的类别
+    for label in range(len(classes), 0, -1):
+        for lower, upper in classes[label - 1][1]:
+            # 量化格 i 覆盖 [i << shift, (i + 1) << shift)，中心颜色在框内时属于该类别
+            start = [max(0, (v - half + (1 << shift) - 1) >> shift) for v in lower]
+            stop = [((v - half) >> shift) + 1 for v in upper]
+            cube[start[0]:stop[0], start[1]:stop[1], start[2]:stop[2]] = label
+    return lut
+
+
+class MinimapClassifier:
+    """小地图多类别分类器（查找表构建一次，多窗口可共用同一个实例）"""
+
+    def __init__(self, classes: Sequence[Tuple[str, Sequence[ColorBox]]], bits: int = 8):
+        self.names = [name for name, _ in classes]
+        self.bits = bits
+        key = (tuple((name, tuple(boxes)) for name, boxes in classes), bits)
+        with _lut_cache_lock:
+            self.lut = _lut_cache.get(key)
+            if self.lut is None:
+                self.lut = _lut_cache[key] = build_class_lut(classes, bits)
+        self.min_area = 1
+
+    @classmethod
+    def from_config(cls, config) -> Optional['MinimapClassifier']:
+        """根据 [MinimapClasses] 创建分类器，未配置类别时返回None；[Detection] class_lut_bits 选择查找表精度"""
+        classes = classes_from_config(config)
+        if not classes:
+            return None
+        classifier = cls(classes, config.getint('Detection', 'class_lut_bits', fallback=8))
+        classifier.min_area = config.getint('Detection', 'min_contour_area', fallback=1)
+        return classifier
+
+    def label(self, image: np.ndarray) -> np.ndarray:
+        """每个像素的类别标签（0为背景），一次查表"""
+        index = color_index(image)
+        if self.bits < 8:
+            shift = 8 - self.bits
+            mask = (1 << self.bits) - 1
+            index = (((index >> (16 + shift)) & mask) << (2 * self.bits)) | \
+                    (((index >> (8 + shift)) & mask) << self.bits) | ((index >> shift) & mask)
+        return np.take(self.lut, index)
+
+    def classify_blobs(self, image: np.ndarray, static_mask=None) -> Tuple[Blobs, np.ndarray]:
+        """
+        分类并提取所有连通块（static_mask 为 StaticMask 时先排除静态像素）
+
+        所有类别的前景一起做一次连通域分析，每个连通块按中心像素的标签归类（点是实心的，中心落在点内）；
+        不同类别的点相接时合并为一个点
+
+        Returns:
+            (所有连通块（不按面积过滤）, 每个连通块的类别标签（从1开始）)
+        """
+        labels = self.label(image)
+        if static_mask is not None:
+            static_mask.apply(labels)
+        count, components, blobs = label_blobs((labels > 0).view(np.uint8))
+        if count <= 1:
+            return blobs, np.zeros(0, dtype=labels.dtype)
+
+        centers = blobs.pixel_centers()
+        owners = labels[centers[:, 1], centers[:, 0]]
+        outside = components[centers[:, 1], centers[:, 0]] != np.arange(1, count)
+        for component in np.flatnonzero(outside) + 1:
+            # 中心不在连通块内（环形等非实心形状）时取连通块中最多的标签
+            owners[component - 1] = np.bincount(labels[components == component]).argmax()
+        return blobs, owners
+
+    def summarize(self, blobs: Blobs, owners: np.ndarray) -> Dict[str, Dict]:
+        """
+        按类别汇总 classify_blobs 的结果，各类别的像素数为该类别连通块面积之和
+
+        Returns:
+            {类别名: {'pixels': 像素数, 'blobs': [(x, y, 面积), ...]}}
+        """
+        results = {name: {'pixels': 0, 'blobs': []} for name in self.names}
+        for (cx, cy, area), owner in zip(blobs, owners.tolist()):
+            result = results[self.names[owner - 1]]
+            result['pixels'] += area
+            if area >= self.min_area:
+                result['blobs'].append((cx, cy, area))
+        return results
+
+    def classify(self, image: np.ndarray, static_mask=None) -> Dict[str, Dict]:
+        """
+        分类并提取各类别的点（见 classify_blobs）
+
+        Returns:
+            {类别名: {'pixels': 像素数, 'blobs': [(x, y, 面积), ...]}}
+        """
+        return self.summarize(*self.classify_blobs(image, static_mask))
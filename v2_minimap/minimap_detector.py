@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+小地图黄点检测模块
+功能: 检测小地图中的黄点（代表其他玩家）
+特性: 只依赖OpenCV和NumPy，命令行版、多窗口版和GUI版共用，可在无Windows环境下测试
+      配置了颜色查找表（color_calibration.py 生成）时，每个像素只做一次查表，不做范围比较
+      很大的小地图区域可使用粗到细扫描（[Detection] coarse_min_side），黄色掩码最大值池化后找出候选块，
+      只在候选块内做连通域分析，这部分耗时随点数而不是区域面积增长
+"""
+
+import logging
+import os
+import threading
+import numpy as np
+import cv2
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from blob_stats import Blobs, extract_blobs, extract_blobs_coarse
+from static_mask import StaticMask
+
+logger = logging.getLogger(__name__)
+
+# 颜色框: ((r_lower, g_lower, b_lower), (r_upper, g_upper, b_upper))
+ColorBox = Tuple[Tuple[int, int, int], Tuple[int, int, int]]
+
+LUT_SIZE = 1 << 24  # 24位颜色，每种颜色一个字节
+
+_lut_cache: Dict[str, np.ndarray] = {}  # 路径 -> 查找表（多个窗口共用同一份16MB内存）
+_lut_cache_lock = threading.Lock()
+
+
+def color_index(image: np.ndarray) -> np.ndarray:
+    """
+    BGR图像每个像素的24位颜色索引 (r << 16) | (g << 8) | b
+
+    BGRA的4个字节按小端读作一个uint32即为 (a << 24) | 索引，去掉alpha即可，比逐通道移位快一倍
+    """
+    bgra = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    return bgra.view(np.dtype('<u4'))[..., 0] & 0xFFFFFF
+
+
+def build_color_lut(boxes: Sequence[ColorBox]) -> np.ndarray:
+    """
+    根据RGB颜色框构建查找表
+
+    Returns:
+        长度 2^24 的uint8数组，按 color_index 索引，框内颜色为255，其余为0
+    """
+    lut = np.zeros(LUT_SIZE, dtype=np.uint8)
+    cube = lut.reshape(256, 256, 256)  # [r, g, b]
+    for (r_lower, g_lower, b_lower), (r_upper, g_upper, b_upper) in boxes:
+        cube[r_lower:r_upper + 1, g_lower:g_upper + 1, b_lower:b_upper + 1] = 255
+    return lut
+
+
+def save_color_lut(path: str, lut: np.ndarray, boxes: Sequence[ColorBox] = ()):
+    """按位压缩保存查找表（约2MB，压缩后通常只有几KB），同时保存生成它的颜色框便于查看"""
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, bits=np.packbits(lut != 0), boxes=np.array(boxes, dtype=np.int16).reshape(-1, 2, 3))
+    with _lut_cache_lock:
+        _lut_cache.pop(os.path.abspath(path), None)
+
+
+def load_color_lut(path: str) -> np.ndarray:
+    """加载查找表（按路径缓存，多个检测器共用）"""
+    key = os.path.abspath(path)
+    with _lut_cache_lock:
+        lut = _lut_cache.get(key)
+        if lut is None:
+            with np.load(key) as data:
+                lut = np.unpackbits(data['bits'], count=LUT_SIZE) * np.uint8(255)
+            _lut_cache[key] = lut
+    return lut
+
+
+class MinimapDetector:
+    """小地图黄点检测器"""
+
+    def __init__(self):
+        # 精确黄色检测：RGB(255, 255, 0)
+        self.yellow_lower_rgb = np.array([250, 250, 0])
+        self.yellow_upper_rgb = np.array([255, 255, 5])
+        self.min_contour_area = 1  # 最小像素面积（配置项名沿用轮廓检测时的名称）
+        self.color_lut: Optional[np.ndarray] = None  # 设置后代替范围比较
+        # 多类别分类（[MinimapClasses]），设置后 detect 返回 trigger_classes 中各类别的点
+        self.classifier = None
+        self.trigger_classes: List[str] = []
+        self.last_classes: Dict[str, Dict] = {}  # 最近一次分类的各类别像素数和点
+        self.static_mask: Optional[StaticMask] = None  # 静态特征排除掩码（[StaticMask]），提取点之前应用
+        # 粗到细扫描：小地图短边不小于 coarse_min_side 时启用（0为关闭；约300以下整幅扫描更快，建议400以上）
+        self.coarse_factor = 4
+        self.coarse_min_side = 0
+
+    def configure(self, config, base_dir: str = None):
+        """
+        从配置加载检测参数
+
+        [YellowColor] r_lower ... b_upper 为颜色范围；lut_file（相对 base_dir）为颜色查找表，加载失败时使用颜色范围；
+        [StaticMask] 的掩码文件也保存在 base_dir；
+        [Detection] coarse_min_side、coarse_factor 为粗到细扫描设置
+        """
+        self.yellow_lower_rgb = np.array([config.getint('YellowColor', 'r_lower', fallback=250),
+                                          config.getint('YellowColor', 'g_lower', fallback=250),
+                                          config.getint('YellowColor', 'b_lower', fallback=0)])
+        self.yellow_upper_rgb = np.array([config.getint('YellowColor', 'r_upper', fallback=255),
+                                          config.getint('YellowColor', 'g_upper', fallback=255),
+                                          config.getint('YellowColor', 'b_upper', fallback=5)])
+        self.min_contour_area = config.getint('Detection', 'min_contour_area', fallback=1)
+        self.coarse_factor = max(2, config.getint('Detection', 'coarse_factor', fallback=4))
+        self.coarse_min_side = config.getint('Detection', 'coarse_min_side', fallback=0)
+
+        self.color_lut = None
+        path = config.get('YellowColor', 'lut_file', fallback='')
+        if path:
+            if base_dir and not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            try:
+                self.color_lut = load_color_lut(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"加载颜色查找表失败，使用颜色范围: {e}")
+
+        from minimap_classifier import MinimapClassifier
+        self.classifier = MinimapClassifier.from_config(config)
+        if self.classifier is not None:
+            triggers = config.get('Detection', 'trigger_classes', fallback=self.classifier.names[0])
+            self.trigger_classes = [name.strip() for name in triggers.split(',') if name.strip()]
+
+        self.static_mask = StaticMask.from_config(config, base_dir)
+
+    def mask(self, image: np.ndarray) -> np.ndarray:
+        """黄色像素掩码（255为黄色）"""
+        if self.color_lut is not None:
+            return np.take(self.color_lut, color_index(image))
+        # 转换BGR到RGB
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return cv2.inRange(rgb, self.yellow_lower_rgb, self.yellow_upper_rgb)
+
+    def detect_blobs(self, image: np.ndarray) -> Blobs:
+        """
+        检测黄点，结果为数组形式的连通块（亚像素中心、像素面积、外接框），可直接交给跟踪器
+
+        配置了多类别分类时为触发类别的点，各类别的统计保存在 last_classes
+        """
+        if self.classifier is not None:
+            blobs, owners = self.classifier.classify_blobs(image, self.static_mask)
+            self.last_classes = self.classifier.summarize(blobs, owners)
+            triggers = [self.classifier.names.index(name) + 1 for name in self.trigger_classes
+                        if name in self.classifier.names]
+            return blobs.select(np.isin(owners, triggers) & (blobs.areas >= self.classifier.min_area))
+
+        # 创建精确黄色掩码
+        yellow_mask = self.mask(image)
+        if self.static_mask is not None:
+            self.static_mask.apply(yellow_mask)
+        if self.coarse_min_side and min(yellow_mask.shape) >= max(self.coarse_min_side, self.coarse_factor):
+            blobs = extract_blobs_coarse(yellow_mask, self.coarse_factor, self.min_contour_area)
+            if blobs is not None:
+                return blobs
+        return extract_blobs(yellow_mask, self.min_contour_area)
+
+    def detect(self, image: np.ndarray) -> List[Tuple[float, float, int]]:
+        """
+        精确检测RGB(255,255,0)的黄点
+
+        Args:
+            image: BGR格式的图像
+
+        Returns:
+            检测到的黄点列表 [(x, y, area), ...]，x、y 为亚像素中心，area 为像素数；
+            配置了多类别分类时为触发类别的点
+        """
+        return self.detect_blobs(image).to_dots()
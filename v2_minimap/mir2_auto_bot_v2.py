@@ -6,11 +6,6 @@
 """
 
 import time
-import keyboard
-import win32gui
-import win32con
-import win32api
-import win32ui
 import logging
 import configparser
 import os
@@ -18,7 +13,16 @@ import numpy as np
 import cv2
 from datetime import datetime
 from typing import Optional, Tuple, List
-import ctypes
+from minimap_detector import MinimapDetector
+from bot_metrics import WindowMetrics, STAGE_CAPTURE, STAGE_DETECT, STAGE_TELEPORT, STAGE_SLEEP
+from metrics_server import MetricsServer, window_snapshot
+from stats_reporter import StatsReporter
+from bot_profiler import BotProfiler
+from frame_source import FrameSource, WindowProvider, Win32WindowProvider, frame_source_from_config
+from minimap_calibration import calibrator_from_config
+from window_registry import WindowRegistry, game_title_keywords
+from frame_ring import FrameRing, READ_LATEST, grab_into_ring, ring_for_region, ring_queue_stats
+from input_dispatcher import InputDispatcher, DEFAULT_HOLD
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -36,51 +40,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class MinimapDetector:
-    """小地图黄点检测器"""
-
-    def __init__(self):
-        # 精确黄色检测：RGB(255, 255, 0)
-        self.yellow_lower_rgb = np.array([250, 250, 0])
-        self.yellow_upper_rgb = np.array([255, 255, 5])
-        self.min_contour_area = 1
+class Mir2AutoBotV2:
+    """传奇2自动挂机机器人 V2 - 小地图黄点检测版（后台截图）"""
 
-    def detect(self, image: np.ndarray) -> List[Tuple[int, int, int]]:
+    def __init__(self, config_file: str = None, window_index: int = 0,
+                 frame_source: FrameSource = None, window_provider: WindowProvider = None):
         """
-        精确检测RGB(255,255,0)的黄点
-
         Args:
-            image: BGR格式的图像
-
-        Returns:
-            检测到的黄点列表 [(x, y, area), ...]
+            config_file: 配置文件路径
+            window_index: 窗口索引（用于多实例）
+            frame_source: 截图源，默认按 [Capture] 配置创建（BitBlt）
+            window_provider: 窗口提供者，默认win32
         """
-        # 转换BGR到RGB
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # 创建精确黄色掩码
-        yellow_mask = cv2.inRange(rgb, self.yellow_lower_rgb, self.yellow_upper_rgb)
-
-        # 查找轮廓
-        contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        # 过滤小轮廓，获取黄点位置
-        yellow_dots = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area >= self.min_contour_area:
-                M = cv2.moments(contour)
-                if M["m00"] > 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    yellow_dots.append((cx, cy, int(area)))
-
-        return yellow_dots
-
-class Mir2AutoBotV2:
-    """传奇2自动挂机机器人 V2 - 小地图黄点检测版（后台截图）"""
-
-    def __init__(self, config_file: str = None, window_index: int = 0):
         self.running = False
         if config_file is None:
             config_file = CONFIG_FILE
@@ -94,6 +65,19 @@ class Mir2AutoBotV2:
         # 加载配置
         self.config = self._load_config(config_file)
 
+        # 截图源和窗口提供者
+        self.window_provider = window_provider or Win32WindowProvider()
+        self.frame_source = frame_source or frame_source_from_config(
+            self.config, self.window_provider, default='bitblt', seed=window_index)
+        self.frame_ring: Optional[FrameRing] = None  # 截图 -> 检测的小地图环形缓冲区
+        self.ring_slots = self.config.getint('Capture', 'ring_slots', fallback=3)
+        # 小地图自动定位（按分辨率缓存），运行中定时廉价校验
+        self.calibrator = calibrator_from_config(self.config, os.path.dirname(os.path.abspath(config_file)))
+        self._next_region_check = 0.0
+        self.window_registry = WindowRegistry(self.window_provider, game_title_keywords(self.config))
+        self.input_dispatcher = InputDispatcher(
+            self.window_provider, hold=self.config.getfloat('Teleport', 'key_hold', fallback=DEFAULT_HOLD))
+
         # 窗口信息
         self.hwnd = None
         self.window_rect = None
@@ -116,6 +100,12 @@ class Mir2AutoBotV2:
             'start_time': None
         }
 
+        # 分阶段耗时统计
+        self.metrics = WindowMetrics()
+        self.metrics_server: Optional[MetricsServer] = None
+        self.stats_reporter: Optional[StatsReporter] = None
+        self.profile_request = None  # 由BotProfiler设置
+
         logger.info(f"传奇2自动挂机机器人V2（后台截图版）初始化完成 - 窗口索引: {window_index}")
 
     def _load_config(self, config_file: str) -> configparser.ConfigParser:
@@ -134,6 +124,8 @@ class Mir2AutoBotV2:
                 'width': '150',
                 'height': '150',
                 'from_right': 'true',
+                'auto_calibrate': 'true',
+                'revalidate_interval': '30',
             },
             'Detection': {
                 'enabled': 'true',
@@ -153,6 +145,17 @@ class Mir2AutoBotV2:
                 'g_upper': '255',
                 'b_lower': '0',
                 'b_upper': '5',
+            },
+            'Metrics': {
+                'enabled': 'false',
+                'port': '9108',
+            },
+            'Stats': {
+                'report_interval': '60',
+                'cleanup_interval': '900',
+            },
+            'Capture': {
+                'backend': 'bitblt',
             }
         }
 
@@ -169,46 +172,18 @@ class Mir2AutoBotV2:
             logger.info(f"已创建默认配置文件: {config_file}")
 
         # 更新检测器参数
-        self._update_detector_params(config)
+        self._update_detector_params(config, os.path.dirname(os.path.abspath(config_file)))
 
         return config
 
-    def _update_detector_params(self, config: configparser.ConfigParser):
-        """更新检测器参数"""
-        r_lower = config.getint('YellowColor', 'r_lower', fallback=250)
-        r_upper = config.getint('YellowColor', 'r_upper', fallback=255)
-        g_lower = config.getint('YellowColor', 'g_lower', fallback=250)
-        g_upper = config.getint('YellowColor', 'g_upper', fallback=255)
-        b_lower = config.getint('YellowColor', 'b_lower', fallback=0)
-        b_upper = config.getint('YellowColor', 'b_upper', fallback=5)
-
-        self.minimap_detector.yellow_lower_rgb = np.array([r_lower, g_lower, b_lower])
-        self.minimap_detector.yellow_upper_rgb = np.array([r_upper, g_upper, b_upper])
-        self.minimap_detector.min_contour_area = config.getint('Detection', 'min_contour_area', fallback=1)
+    def _update_detector_params(self, config: configparser.ConfigParser, base_dir: str = None):
+        """更新检测器参数（颜色范围、最小面积和颜色查找表）"""
+        self.minimap_detector.configure(config, base_dir)
 
     def find_game_window(self) -> bool:
         """查找游戏窗口"""
-        window_title = self.config.get('Game', 'window_title', fallback='九五沉默')
-        possible_titles = [window_title, 'Legend of Mir2', '传奇']
-
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                for possible_title in possible_titles:
-                    if possible_title.lower() in title.lower():
-                        # 检查客户区是否有效
-                        try:
-                            client_rect = win32gui.GetClientRect(hwnd)
-                            client_width = client_rect[2] - client_rect[0]
-                            client_height = client_rect[3] - client_rect[1]
-                            if client_width > 0 and client_height > 0:
-                                windows.append((hwnd, title))
-                        except:
-                            pass
-            return True
-
-        windows = []
-        win32gui.EnumWindows(callback, windows)
+        self.window_registry.rescan()
+        windows = self.window_registry.list()
 
         if windows:
             # 根据窗口索引选择窗口
@@ -227,10 +202,10 @@ class Mir2AutoBotV2:
 
     def _init_window_info(self):
         """初始化窗口信息"""
-        self.window_rect = win32gui.GetWindowRect(self.hwnd)
-        self.client_rect = win32gui.GetClientRect(self.hwnd)
+        self.window_rect = self.window_provider.get_window_rect(self.hwnd)
+        self.client_rect = self.window_provider.get_client_rect(self.hwnd)
 
-        client_left, client_top = win32gui.ClientToScreen(self.hwnd, (0, 0))
+        client_left, client_top = self.window_provider.client_to_screen(self.hwnd, (0, 0))
         window_left, window_top = self.window_rect[0], self.window_rect[1]
         self.client_offset = (client_left - window_left, client_top - window_top)
 
@@ -261,59 +236,55 @@ class Mir2AutoBotV2:
         y = offset_y
 
         self.minimap_region = (x, y, width, height)
+
+        # 自动定位：同分辨率的缓存区域校验通过时直接使用，否则整帧截图定位，失败时保留配置的区域
+        if self.calibrator is not None and self._open_frame_source():
+            client_size = (client_width, self.client_rect[3] - self.client_rect[1])
+            region = self.calibrator.region_for(self.frame_source, client_size, self.minimap_region)
+            if region is not None:
+                self.minimap_region = region
+            self._next_region_check = time.monotonic() + self.calibrator.revalidate_interval
         logger.info(f"小地图区域（相对客户区）: {self.minimap_region}")
 
+    def _check_minimap_region(self):
+        """定时校验小地图边框是否仍在原位（只截取外围一圈），不在时重新初始化窗口并定位"""
+        if self.calibrator is None or time.monotonic() < self._next_region_check:
+            return
+        self._next_region_check = time.monotonic() + self.calibrator.revalidate_interval
+        if self.minimap_region and self.calibrator.validate(self.frame_source, self.minimap_region):
+            return
+        self._init_window_info()
+
+    def _open_frame_source(self) -> bool:
+        """截图源绑定到当前窗口（窗口变化时重新打开）"""
+        if self.frame_source.hwnd != self.hwnd:
+            self.frame_source.close()
+            if not self.frame_source.open(self.hwnd):
+                return False
+        return True
+
     def capture_minimap(self) -> Optional[np.ndarray]:
         """
-        后台捕获小地图 - 使用Win32 API
-        即使窗口被遮挡也能正确截图
+        后台捕获小地图 - 默认使用Win32 BitBlt
+        截图源在首次截图时打开并复用，结果直接写入环形缓冲区的槽位
         """
         if not self.client_rect or not self.minimap_region:
             return None
 
         try:
-            client_width = self.client_rect[2] - self.client_rect[0]
-            client_height = self.client_rect[3] - self.client_rect[1]
-
-            # 获取窗口DC
-            hwndDC = win32gui.GetWindowDC(self.hwnd)
-            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-            saveDC = mfcDC.CreateCompatibleDC()
-
-            # 创建位图
-            saveBitMap = win32ui.CreateBitmap()
-            saveBitMap.CreateCompatibleBitmap(mfcDC, client_width, client_height)
-            saveDC.SelectObject(saveBitMap)
-
-            # 使用BitBlt进行截图（比PrintWindow更可靠）
-            # 注意：BitBlt需要窗口可见，但不需要窗口在最前面
-            saveDC.BitBlt((0, 0), (client_width, client_height), mfcDC, (0, 0), win32con.SRCCOPY)
-
-            # 转换为numpy数组
-            bmpinfo = saveBitMap.GetInfo()
-            bmpstr = saveBitMap.GetBitmapBits(True)
-            img = np.frombuffer(bmpstr, dtype='uint8')
-            img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-            # 裁剪小地图区域
-            minimap_x, minimap_y, minimap_w, minimap_h = self.minimap_region
-            minimap = img[minimap_y:minimap_y+minimap_h, minimap_x:minimap_x+minimap_w]
-
-            # 清理资源
-            win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
-            mfcDC.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, hwndDC)
-
-            return minimap
+            if not self._open_frame_source():
+                return None
+            # 直接截图到环形缓冲区槽位，检测阶段读取同一块内存
+            self.frame_ring = ring_for_region(self.frame_ring, self.minimap_region, self.ring_slots)
+            captured = grab_into_ring(self.frame_source, self.minimap_region, self.frame_ring)
+            return None if captured is None else captured[1]
 
         except Exception as e:
             logger.error(f"后台截图失败: {e}")
             return None
 
 
-    def detect_yellow_dots(self, minimap_image: np.ndarray) -> Tuple[bool, List[Tuple[int, int, int]]]:
+    def detect_yellow_dots(self, minimap_image: np.ndarray) -> Tuple[bool, List[Tuple[float, float, int]]]:
         """检测小地图中的黄点"""
         if not self.config.getboolean('Detection', 'enabled', fallback=True):
             return False, []
@@ -331,7 +302,7 @@ class Mir2AutoBotV2:
 
         return False, []
 
-    def _save_debug_image(self, minimap_image: np.ndarray, yellow_dots: List[Tuple[int, int, int]]):
+    def _save_debug_image(self, minimap_image: np.ndarray, yellow_dots: List[Tuple[float, float, int]]):
         """保存调试图像"""
         debug_dir = os.path.join(SCRIPT_DIR, 'debug')
         os.makedirs(debug_dir, exist_ok=True)
@@ -344,6 +315,7 @@ class Mir2AutoBotV2:
         # 绘制检测结果
         debug_img = minimap_image.copy()
         for x, y, area in yellow_dots:
+            x, y = int(round(x)), int(round(y))  # 亚像素中心
             cv2.circle(debug_img, (x, y), 5, (0, 0, 255), -1)
             cv2.putText(debug_img, f"{area}", (x + 5, y - 5),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
@@ -365,13 +337,14 @@ class Mir2AutoBotV2:
 
         try:
             # 将按键字符转换为虚拟键码
-            vk_code = win32api.VkKeyScan(teleport_key)
-            vk_code = vk_code & 0xFF
+            vk_code = self.window_provider.vk_code(teleport_key)
 
-            # 使用PostMessage向窗口发送按键消息
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYDOWN, vk_code, 0)
-            time.sleep(0.05)
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYUP, vk_code, 0)
+            # 提交给按键调度线程（PostMessage按下，按住时长后再抬起，不阻塞检测线程）
+            key_started = time.perf_counter()
+            if not self.input_dispatcher.press(self.hwnd, vk_code, cooldown=self.teleport_cooldown):
+                return
+            self.metrics.record_reaction(key_started)
+            self.metrics.record(STAGE_TELEPORT, time.perf_counter() - key_started)
 
             self.last_teleport_time = current_time
             self.stats['teleports_used'] += 1
@@ -380,24 +353,24 @@ class Mir2AutoBotV2:
         except Exception as e:
             logger.error(f"使用传送石失败: {e}")
 
-    def update_stats(self):
-        """更新统计信息"""
+    def _collect_counters(self) -> dict:
+        """返回累计计数（在统计报告线程中调用）"""
+        return {k: v for k, v in self.stats.items() if k != 'start_time'}
+
+    def _start_stats_reporter(self):
+        """启动定时统计报告（独立线程，不占用检测循环）"""
         if not self.stats['start_time']:
             self.stats['start_time'] = datetime.now()
 
-        if self.stats['start_time']:
-            elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
-            if elapsed > 0 and int(elapsed) % 60 == 0:
-                logger.info(
-                    f"运行时间: {int(elapsed // 60)}分钟 | "
-                    f"检测次数: {self.stats['detection_runs']} | "
-                    f"黄点检测: {self.stats['yellow_dots_detected']} | "
-                    f"使用传送: {self.stats['teleports_used']}"
-                )
-                
-                # 每15分钟清理一次debug目录
-                if int(elapsed) % 900 == 0:  # 900秒 = 15分钟
-                    self._cleanup_debug_dir()
+        self.stats_reporter = StatsReporter(
+            self._collect_counters,
+            interval=self.config.getfloat('Stats', 'report_interval', fallback=60.0),
+            log=logger.info,
+        )
+        # 每15分钟清理一次debug目录
+        self.stats_reporter.add_task(self.config.getfloat('Stats', 'cleanup_interval', fallback=900.0),
+                                     self._cleanup_debug_dir)
+        self.stats_reporter.start()
 
     def _cleanup_debug_dir(self):
         """清理debug目录"""
@@ -416,6 +389,34 @@ class Mir2AutoBotV2:
         except Exception as e:
             logger.warning(f"清理debug目录失败: {e}")
 
+    def collect_metrics(self) -> dict:
+        """生成监控指标快照（在指标服务线程中调用）"""
+        return {
+            'gauges': {
+                'windows_total': 1 if self.hwnd else 0,
+                'windows_alive': int(self.running),
+                'detection_interval_seconds': self.config.getfloat('Detection', 'detection_interval', fallback=0.3),
+                'teleport_cooldown_seconds': self.teleport_cooldown,
+            },
+            'queues': {
+                'input': self.input_dispatcher.queue_stats(),
+                'frame_ring': ring_queue_stats([self.frame_ring]),
+            },
+            'windows': [window_snapshot(f"{self.window_index}", self.stats, self.metrics)],
+        }
+
+    def start_metrics_server(self, port: int = None) -> bool:
+        """启动本地监控指标服务（多实例时端口按窗口索引递增）"""
+        if self.metrics_server is not None:
+            return True
+        if port is None:
+            port = self.config.getint('Metrics', 'port', fallback=9108) + self.window_index
+        server = MetricsServer(self.collect_metrics, port=port)
+        if not server.start():
+            return False
+        self.metrics_server = server
+        return True
+
     def run(self):
         """运行挂机脚本"""
         logger.info("开始运行挂机脚本V2...")
@@ -428,6 +429,9 @@ class Mir2AutoBotV2:
         logger.info("提示: 脚本支持后台运行，窗口被遮挡也能正常工作")
 
         self.running = True
+        if self.config.getboolean('Metrics', 'enabled', fallback=False):
+            self.start_metrics_server()
+        self._start_stats_reporter()
         logger.info("挂机脚本V2已启动，按 F10 停止")
         logger.info(f"功能: 检测小地图黄点（其他玩家），自动使用随机传送石")
         logger.info(f"小地图区域: {self.minimap_region}")
@@ -435,32 +439,49 @@ class Mir2AutoBotV2:
         try:
             while self.running:
                 # 检查窗口是否还存在
-                if not win32gui.IsWindow(self.hwnd):
+                if not self.window_provider.is_window(self.hwnd):
                     logger.warning("游戏窗口已关闭")
                     break
 
+                # 性能分析（仅在请求时生效）
+                if self.profile_request is not None and self.profile_request.poll():
+                    self.profile_request = None
+
+                self._check_minimap_region()
+
                 # 后台捕获小地图
+                capture_started = self.metrics.mark_capture_start()
                 minimap = self.capture_minimap()
+                captured = time.perf_counter()
+                self.metrics.record(STAGE_CAPTURE, captured - capture_started)
 
-                if minimap is not None:
+                frame = self.frame_ring.read(READ_LATEST) if minimap is not None else None
+                if frame is not None:
+                    _, minimap = frame
                     self.stats['detection_runs'] += 1
 
                     # 检测黄点
                     has_players, yellow_dots = self.detect_yellow_dots(minimap)
+                    self.metrics.record(STAGE_DETECT, time.perf_counter() - captured)
 
                     if has_players:
                         self.use_teleport()
 
-                self.update_stats()
-
                 detection_interval = self.config.getfloat('Detection', 'detection_interval', fallback=0.3)
+                sleep_started = time.perf_counter()
                 time.sleep(detection_interval)
+                self.metrics.record(STAGE_SLEEP, time.perf_counter() - sleep_started)
 
         except KeyboardInterrupt:
             logger.info("收到中断信号")
         except Exception as e:
             logger.error(f"运行出错: {e}", exc_info=True)
         finally:
+            if self.profile_request is not None:
+                self.profile_request.finish()
+                self.profile_request = None
+            self.frame_source.close()
+            self.input_dispatcher.stop()  # 补发未抬起的按键
             self.stop()
 
     def stop(self):
@@ -468,6 +489,14 @@ class Mir2AutoBotV2:
         self.running = False
         logger.info("挂机脚本V2已停止")
 
+        if self.stats_reporter is not None:
+            self.stats_reporter.stop()
+            self.stats_reporter = None
+
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
         if self.stats['start_time']:
             elapsed = (datetime.now() - self.stats['start_time']).total_seconds()
             logger.info("=" * 50)
@@ -476,12 +505,25 @@ class Mir2AutoBotV2:
             logger.info(f"检测次数: {self.stats['detection_runs']}")
             logger.info(f"黄点检测: {self.stats['yellow_dots_detected']}")
             logger.info(f"使用传送: {self.stats['teleports_used']}")
+            logger.info("耗时统计:")
+            for line in self.metrics.format_lines():
+                logger.info(f"  {line}")
             logger.info("=" * 50)
 
 def main():
     """主函数"""
-    import sys
-    
+    import argparse
+    import keyboard
+
+    parser = argparse.ArgumentParser(description='传奇2自动挂机脚本 V2 - 小地图黄点检测版')
+    parser.add_argument('window_index', nargs='?', default='0', help='窗口索引: 0=第1个窗口, 1=第2个窗口...')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='启动本地监控指标服务（Prometheus格式）的端口')
+    parser.add_argument('--profile', type=float, default=None, metavar='SECONDS',
+                        help='启动后立即进行指定秒数的性能分析（运行中也可按F11）')
+    parser.add_argument('--profile-dir', default=None, help='性能分析结果目录（默认 profiles/）')
+    args = parser.parse_args()
+
     print("=" * 50)
     print("传奇2自动挂机脚本 V2 - 小地图黄点检测版")
     print("=" * 50)
@@ -499,10 +541,11 @@ def main():
     print()
     print("控制:")
     print("  - F10: 停止挂机")
+    print("  - F11: 性能分析（堆栈采样5秒 + 检测循环cProfile 10秒）")
     print("  - Ctrl+C: 强制退出")
     print()
     print("使用方法:")
-    print("  python mir2_auto_bot_v2.py [窗口索引]")
+    print("  python mir2_auto_bot_v2.py [窗口索引] [--metrics-port 端口]")
     print("  窗口索引: 0=第1个窗口, 1=第2个窗口, 2=第3个窗口...")
     print("  示例: python mir2_auto_bot_v2.py 0  # 监控第1个窗口")
     print("        python mir2_auto_bot_v2.py 1  # 监控第2个窗口")
@@ -512,15 +555,24 @@ def main():
 
     # 解析窗口索引参数
     window_index = 0
-    if len(sys.argv) > 1:
-        try:
-            window_index = int(sys.argv[1])
-            print(f"窗口索引: {window_index} (监控第 {window_index + 1} 个窗口)")
-        except ValueError:
-            print(f"警告: 无效的窗口索引参数 '{sys.argv[1]}'，使用默认值 0")
+    try:
+        window_index = int(args.window_index)
+        print(f"窗口索引: {window_index} (监控第 {window_index + 1} 个窗口)")
+    except ValueError:
+        print(f"警告: 无效的窗口索引参数 '{args.window_index}'，使用默认值 0")
     
     bot = Mir2AutoBotV2(window_index=window_index)
     keyboard.add_hotkey('F10', bot.stop)
+
+    # 性能分析（关闭时无开销）
+    profiler = BotProfiler(args.profile_dir)
+    keyboard.add_hotkey('F11', lambda: (profiler.sample_stacks(5.0),
+                                        profiler.profile_loop(bot, 10.0, f'window{window_index}')))
+    if args.profile:
+        profiler.sample_stacks(args.profile)
+        profiler.profile_loop(bot, args.profile, f'window{window_index}')
+    if args.metrics_port is not None:
+        bot.start_metrics_server(args.metrics_port)
     bot.run()
     keyboard.unhook_all()
 
@@ -10,10 +10,6 @@ from tkinter import ttk, scrolledtext, messagebox
 import threading
 import time
 import keyboard
-import win32gui
-import win32con
-import win32api
-import win32ui
 import logging
 import configparser
 import os
@@ -22,42 +18,27 @@ import cv2
 from datetime import datetime
 from typing import Optional, Tuple, List
 from PIL import Image, ImageTk
-import ctypes
+from minimap_detector import MinimapDetector
+from bot_metrics import WindowMetrics, STAGE_CAPTURE, STAGE_DETECT, STAGE_TELEPORT, STAGE_SLEEP
+from bot_profiler import BotProfiler
+from frame_source import FrameSource, WindowProvider, Win32WindowProvider, frame_source_from_config
+from minimap_calibration import calibrator_from_config
+from window_registry import WindowRegistry, game_title_keywords
+from frame_ring import FrameRing, READ_LATEST, grab_into_ring, ring_for_region
+from input_dispatcher import InputDispatcher, DEFAULT_HOLD
+from bot_daemon import DaemonClient, DaemonError, parse_address
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(SCRIPT_DIR, 'mir2_bot_v2.log')
 CONFIG_FILE = os.path.join(SCRIPT_DIR, 'bot_config_v2.ini')
-
-class MinimapDetector:
-    """小地图黄点检测器"""
-
-    def __init__(self):
-        self.yellow_lower_rgb = np.array([250, 250, 0])
-        self.yellow_upper_rgb = np.array([255, 255, 5])
-        self.min_contour_area = 1
-
-    def detect(self, image: np.ndarray) -> List[Tuple[int, int, int]]:
-        """精确检测RGB(255,255,0)的黄点"""
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        yellow_mask = cv2.inRange(rgb, self.yellow_lower_rgb, self.yellow_upper_rgb)
-        contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        yellow_dots = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area >= self.min_contour_area:
-                M = cv2.moments(contour)
-                if M["m00"] > 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    yellow_dots.append((cx, cy, int(area)))
-        return yellow_dots
+DEBUG_CLEANUP_INTERVAL = 900  # 900秒 = 15分钟
 
 class Mir2AutoBotV2:
     """传奇2自动挂机机器人 V2 - 后台截图版"""
 
-    def __init__(self, config_file: str = None, log_callback=None):
+    def __init__(self, config_file: str = None, log_callback=None,
+                 frame_source: FrameSource = None, window_provider: WindowProvider = None):
         self.running = False
         self.paused = False
         self.log_callback = log_callback
@@ -68,6 +49,18 @@ class Mir2AutoBotV2:
         self.minimap_detector = MinimapDetector()
         self.config = self._load_config(config_file)
 
+        # 截图源和窗口提供者（默认win32 BitBlt）
+        self.window_provider = window_provider or Win32WindowProvider()
+        self.frame_source = frame_source or frame_source_from_config(self.config, self.window_provider)
+        self.frame_ring: Optional[FrameRing] = None  # 截图 -> 检测的小地图环形缓冲区
+        self.ring_slots = self.config.getint('Capture', 'ring_slots', fallback=3)
+        # 小地图自动定位（按分辨率缓存），运行中定时廉价校验
+        self.calibrator = calibrator_from_config(self.config, os.path.dirname(os.path.abspath(config_file)))
+        self._next_region_check = 0.0
+        self.window_registry = WindowRegistry(self.window_provider, game_title_keywords(self.config))
+        self.input_dispatcher = InputDispatcher(
+            self.window_provider, hold=self.config.getfloat('Teleport', 'key_hold', fallback=DEFAULT_HOLD))
+
         self.hwnd = None
         self.window_rect = None
         self.client_rect = None
@@ -84,6 +77,10 @@ class Mir2AutoBotV2:
             'start_time': None
         }
 
+        # 分阶段耗时统计
+        self.metrics = WindowMetrics()
+        self.profile_request = None  # 由BotProfiler设置
+
         self._log("Bot V2 (Background Capture) initialized")
 
     def _log(self, message: str, level: str = "INFO"):
@@ -106,6 +103,8 @@ class Mir2AutoBotV2:
                 'width': '150',
                 'height': '150',
                 'from_right': 'true',
+                'auto_calibrate': 'true',
+                'revalidate_interval': '30',
             },
             'Detection': {
                 'enabled': 'true',
@@ -140,44 +139,17 @@ class Mir2AutoBotV2:
                 config.write(f)
             self._log(f"Config created: {config_file}")
 
-        self._update_detector_params(config)
+        self._update_detector_params(config, os.path.dirname(os.path.abspath(config_file)))
         return config
 
-    def _update_detector_params(self, config: configparser.ConfigParser):
-        """更新检测器参数"""
-        r_lower = config.getint('YellowColor', 'r_lower', fallback=250)
-        r_upper = config.getint('YellowColor', 'r_upper', fallback=255)
-        g_lower = config.getint('YellowColor', 'g_lower', fallback=250)
-        g_upper = config.getint('YellowColor', 'g_upper', fallback=255)
-        b_lower = config.getint('YellowColor', 'b_lower', fallback=0)
-        b_upper = config.getint('YellowColor', 'b_upper', fallback=5)
-
-        self.minimap_detector.yellow_lower_rgb = np.array([r_lower, g_lower, b_lower])
-        self.minimap_detector.yellow_upper_rgb = np.array([r_upper, g_upper, b_upper])
-        self.minimap_detector.min_contour_area = config.getint('Detection', 'min_contour_area', fallback=1)
+    def _update_detector_params(self, config: configparser.ConfigParser, base_dir: str = None):
+        """更新检测器参数（颜色范围、最小面积和颜色查找表）"""
+        self.minimap_detector.configure(config, base_dir)
 
     def find_game_window(self) -> bool:
         """查找游戏窗口"""
-        window_title = self.config.get('Game', 'window_title', fallback='九五沉默')
-        possible_titles = [window_title, 'Legend of Mir2', '传奇']
-
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                for possible_title in possible_titles:
-                    if possible_title.lower() in title.lower():
-                        try:
-                            client_rect = win32gui.GetClientRect(hwnd)
-                            client_width = client_rect[2] - client_rect[0]
-                            client_height = client_rect[3] - client_rect[1]
-                            if client_width > 0 and client_height > 0:
-                                windows.append((hwnd, title))
-                        except:
-                            pass
-            return True
-
-        windows = []
-        win32gui.EnumWindows(callback, windows)
+        self.window_registry.rescan()
+        windows = self.window_registry.list()
 
         if windows:
             self.hwnd, self.window_title = windows[0]
@@ -189,9 +161,9 @@ class Mir2AutoBotV2:
 
     def _init_window_info(self):
         """初始化窗口信息"""
-        self.window_rect = win32gui.GetWindowRect(self.hwnd)
-        self.client_rect = win32gui.GetClientRect(self.hwnd)
-        client_left, client_top = win32gui.ClientToScreen(self.hwnd, (0, 0))
+        self.window_rect = self.window_provider.get_window_rect(self.hwnd)
+        self.client_rect = self.window_provider.get_client_rect(self.hwnd)
+        client_left, client_top = self.window_provider.client_to_screen(self.hwnd, (0, 0))
         window_left, window_top = self.window_rect[0], self.window_rect[1]
         self.client_offset = (client_left - window_left, client_top - window_top)
         self._log(f"Game window found: {self.window_title}")
@@ -214,53 +186,45 @@ class Mir2AutoBotV2:
             x = offset_x
         y = offset_y
         self.minimap_region = (x, y, width, height)
+
+        # 自动定位：同分辨率的缓存区域校验通过时直接使用，否则整帧截图定位，失败时保留配置的区域
+        if self.calibrator is not None and self._open_frame_source():
+            client_size = (client_width, self.client_rect[3] - self.client_rect[1])
+            region = self.calibrator.region_for(self.frame_source, client_size, self.minimap_region)
+            if region is not None:
+                self.minimap_region = region
+            self._next_region_check = time.monotonic() + self.calibrator.revalidate_interval
         self._log(f"Minimap region: {self.minimap_region}")
 
+    def _check_minimap_region(self):
+        """定时校验小地图边框是否仍在原位（只截取外围一圈），不在时重新初始化窗口并定位"""
+        if self.calibrator is None or time.monotonic() < self._next_region_check:
+            return
+        self._next_region_check = time.monotonic() + self.calibrator.revalidate_interval
+        if self.minimap_region and self.calibrator.validate(self.frame_source, self.minimap_region):
+            return
+        self._init_window_info()
+
+    def _open_frame_source(self) -> bool:
+        """截图源绑定到当前窗口（窗口变化时重新打开）"""
+        if self.frame_source.hwnd != self.hwnd:
+            self.frame_source.close()
+            if not self.frame_source.open(self.hwnd):
+                return False
+        return True
+
     def capture_minimap(self) -> Optional[np.ndarray]:
-        """后台捕获小地图 - 使用Win32 API"""
+        """后台捕获小地图（截图源默认使用BitBlt）"""
         if not self.client_rect or not self.minimap_region:
             return None
 
         try:
-            client_width = self.client_rect[2] - self.client_rect[0]
-            client_height = self.client_rect[3] - self.client_rect[1]
-
-            # 获取窗口DC
-            hwndDC = win32gui.GetWindowDC(self.hwnd)
-            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-            saveDC = mfcDC.CreateCompatibleDC()
-
-            # 创建位图
-            saveBitMap = win32ui.CreateBitmap()
-            saveBitMap.CreateCompatibleBitmap(mfcDC, client_width, client_height)
-            saveDC.SelectObject(saveBitMap)
-
-            img = None
-            
-            # 方法1: 尝试PrintWindow
-            # 使用BitBlt进行截图（比PrintWindow更可靠）
-
-            saveDC.BitBlt((0, 0), (client_width, client_height), mfcDC, (0, 0), win32con.SRCCOPY)
-
-            bmpinfo = saveBitMap.GetInfo()
-
-            bmpstr = saveBitMap.GetBitmapBits(True)
-
-            img = np.frombuffer(bmpstr, dtype='uint8')
-
-            img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-            minimap_x, minimap_y, minimap_w, minimap_h = self.minimap_region
-            minimap = img[minimap_y:minimap_y+minimap_h, minimap_x:minimap_x+minimap_w]
-
-            # 清理资源
-            win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
-            mfcDC.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, hwndDC)
-
-            return minimap
+            if not self._open_frame_source():
+                return None
+            # 直接截图到环形缓冲区槽位，检测阶段读取同一块内存
+            self.frame_ring = ring_for_region(self.frame_ring, self.minimap_region, self.ring_slots)
+            captured = grab_into_ring(self.frame_source, self.minimap_region, self.frame_ring)
+            return None if captured is None else captured[1]
 
         except Exception as e:
             self._log(f"Background capture failed: {e}", "ERROR")
@@ -272,39 +236,16 @@ class Mir2AutoBotV2:
             return None
 
         try:
-            client_width = self.client_rect[2] - self.client_rect[0]
-            client_height = self.client_rect[3] - self.client_rect[1]
-
-            hwndDC = win32gui.GetWindowDC(self.hwnd)
-            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-            saveDC = mfcDC.CreateCompatibleDC()
-
-            saveBitMap = win32ui.CreateBitmap()
-            saveBitMap.CreateCompatibleBitmap(mfcDC, client_width, client_height)
-            saveDC.SelectObject(saveBitMap)
-
-            # 使用BitBlt进行截图（比PrintWindow更可靠）
-            saveDC.BitBlt((0, 0), (client_width, client_height), mfcDC, (0, 0), win32con.SRCCOPY)
-
-            bmpinfo = saveBitMap.GetInfo()
-            bmpstr = saveBitMap.GetBitmapBits(True)
-            img = np.frombuffer(bmpstr, dtype='uint8')
-            img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-            win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
-            mfcDC.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, hwndDC)
-
-            return img
+            if not self._open_frame_source():
+                return None
+            return self.frame_source.grab()
 
         except Exception as e:
             self._log(f"Full screen capture failed: {e}", "ERROR")
             return None
 
 
-    def detect_yellow_dots(self, minimap_image: np.ndarray) -> Tuple[bool, List[Tuple[int, int, int]]]:
+    def detect_yellow_dots(self, minimap_image: np.ndarray) -> Tuple[bool, List[Tuple[float, float, int]]]:
         """检测小地图中的黄点"""
         if not self.config.getboolean('Detection', 'enabled', fallback=True):
             return False, []
@@ -332,12 +273,13 @@ class Mir2AutoBotV2:
         teleport_key = self.config.get('Teleport', 'teleport_key', fallback='2')
 
         try:
-            vk_code = win32api.VkKeyScan(teleport_key)
-            vk_code = vk_code & 0xFF
+            vk_code = self.window_provider.vk_code(teleport_key)
 
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYDOWN, vk_code, 0)
-            time.sleep(0.05)
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYUP, vk_code, 0)
+            key_started = time.perf_counter()
+            if not self.input_dispatcher.press(self.hwnd, vk_code, cooldown=self.teleport_cooldown):
+                return
+            self.metrics.record_reaction(key_started)
+            self.metrics.record(STAGE_TELEPORT, time.perf_counter() - key_started)
 
             self.last_teleport_time = current_time
             self.stats['teleports_used'] += 1
@@ -375,29 +317,52 @@ class Mir2AutoBotV2:
                     continue
 
                 # 检查窗口是否还存在
-                if not win32gui.IsWindow(self.hwnd):
+                if not self.window_provider.is_window(self.hwnd):
                     self._log("Game window closed", "WARNING")
                     break
 
+                # 性能分析（仅在请求时生效）
+                if self.profile_request is not None and self.profile_request.poll():
+                    self.profile_request = None
+
+                self._check_minimap_region()
+
+                capture_started = self.metrics.mark_capture_start()
                 minimap = self.capture_minimap()
-                if minimap is not None:
+                captured = time.perf_counter()
+                self.metrics.record(STAGE_CAPTURE, captured - capture_started)
+                frame = self.frame_ring.read(READ_LATEST) if minimap is not None else None
+                if frame is not None:
+                    _, minimap = frame
                     self.stats['detection_runs'] += 1
                     has_players, yellow_dots = self.detect_yellow_dots(minimap)
+                    self.metrics.record(STAGE_DETECT, time.perf_counter() - captured)
                     if has_players:
                         self.use_teleport()
 
                 detection_interval = self.config.getfloat('Detection', 'detection_interval', fallback=0.3)
+                sleep_started = time.perf_counter()
                 time.sleep(detection_interval)
+                self.metrics.record(STAGE_SLEEP, time.perf_counter() - sleep_started)
 
         except Exception as e:
             self._log(f"Error: {e}", "ERROR")
         finally:
+            if self.profile_request is not None:
+                self.profile_request.finish()
+                self.profile_request = None
+            self.frame_source.close()
+            self.input_dispatcher.stop()  # 补发未抬起的按键
             self.stop()
 
     def stop(self):
         """停止挂机脚本"""
+        if not self.running:
+            return
         self.running = False
         self._log("Bot V2 stopped")
+        for line in self.metrics.format_lines():
+            self._log(f"Latency {line}")
 
     def pause(self):
         """暂停/继续"""
@@ -477,6 +442,7 @@ class MinimapAdjustWindow:
         temp_bot = Mir2AutoBotV2()
         if temp_bot.find_game_window():
             self.full_screen_image = temp_bot.capture_full_screen()
+            temp_bot.frame_source.close()
             self.client_rect = temp_bot.client_rect
             if self.full_screen_image is not None:
                 self._preview()
@@ -558,6 +524,7 @@ class MinimapAdjustWindow:
             config.set('Minimap', 'width', self.width_var.get())
             config.set('Minimap', 'height', self.height_var.get())
             config.set('Minimap', 'from_right', str(self.from_right_var.get()).lower())
+            config.set('Minimap', 'auto_calibrate', 'false')  # 手动调整的区域优先于自动定位
 
             # 保存到实例专用的配置文件
             with open(self.config_file, 'w', encoding='utf-8') as f:
@@ -598,6 +565,7 @@ class BotGUI:
         # 为每个实例创建独立的配置文件
         self.config_file = self._get_instance_config_file()
         self.config = self._load_config()
+        self._init_backend()
 
         # 窗口显示/隐藏状态
         self.window_visible = True
@@ -609,6 +577,11 @@ class BotGUI:
         keyboard.add_hotkey('F10', self.stop_bot)
         keyboard.add_hotkey(self.toggle_hotkey, self.toggle_window)
     
+    def _init_backend(self):
+        """本进程内截图和查找窗口所需的窗口提供者和注册表"""
+        self.window_provider = Win32WindowProvider()
+        self.window_registry = WindowRegistry(self.window_provider, game_title_keywords(self.config))
+
     def _get_instance_config_file(self):
         """获取实例专用的配置文件路径"""
         if self.instance_id == 1:
@@ -686,6 +659,9 @@ class BotGUI:
         self.adjust_btn = ttk.Button(control_frame, text="Adjust Minimap", command=self.adjust_minimap, width=12)
         self.adjust_btn.pack(side=tk.LEFT, padx=5)
 
+        self.profile_btn = ttk.Button(control_frame, text="Profile", command=self.profile_bot, width=8)
+        self.profile_btn.pack(side=tk.LEFT, padx=5)
+
         status_frame = ttk.LabelFrame(main_frame, text="Status", padding="5")
         status_frame.pack(fill=tk.X, pady=5)
 
@@ -695,6 +671,9 @@ class BotGUI:
         self.stats_label = ttk.Label(status_frame, text="Detections: 0 | Teleports: 0", font=('Arial', 10))
         self.stats_label.pack(anchor=tk.W)
 
+        self.latency_label = ttk.Label(status_frame, text="Latency: no samples", font=('Arial', 10))
+        self.latency_label.pack(anchor=tk.W)
+
         self.minimap_label = ttk.Label(status_frame, text="Minimap: Not set", font=('Arial', 10))
         self.minimap_label.pack(anchor=tk.W)
 
@@ -735,27 +714,9 @@ class BotGUI:
     def refresh_windows(self):
         """刷新游戏窗口列表"""
         self.log("Scanning for game windows...")
-        self.found_windows = []
-        
-        window_title = self.config.get('Game', 'window_title', fallback='九五沉默')
-        possible_titles = [window_title, 'Legend of Mir2', '传奇']
-
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                for possible_title in possible_titles:
-                    if possible_title.lower() in title.lower():
-                        try:
-                            client_rect = win32gui.GetClientRect(hwnd)
-                            client_width = client_rect[2] - client_rect[0]
-                            client_height = client_rect[3] - client_rect[1]
-                            if client_width > 0 and client_height > 0:
-                                windows.append((hwnd, title))
-                        except:
-                            pass
-            return True
-
-        win32gui.EnumWindows(callback, self.found_windows)
+        self.window_registry.set_titles(game_title_keywords(self.config))
+        self.window_registry.rescan()
+        self.found_windows = self.window_registry.list()
 
         # 更新下拉框
         window_names = [f"[{hwnd}] {title}" for hwnd, title in self.found_windows]
@@ -776,7 +737,7 @@ class BotGUI:
         if 0 <= selection < len(self.found_windows):
             hwnd, title = self.found_windows[selection]
             try:
-                client_rect = win32gui.GetClientRect(hwnd)
+                client_rect = self.window_provider.get_client_rect(hwnd)
                 client_size = f"{client_rect[2]-client_rect[0]}x{client_rect[3]-client_rect[1]}"
                 self.window_info_label.config(text=f"HWND: {hwnd} | Size: {client_size}")
             except:
@@ -809,6 +770,7 @@ class BotGUI:
             self.stats_label.config(
                 text=f"Detections: {stats['detection_runs']} | Yellow Dots: {stats['yellow_dots_detected']} | Teleports: {stats['teleports_used']}"
             )
+            self.latency_label.config(text=f"Latency: {self.bot.metrics.format_compact()}")
 
     def start_bot(self):
         """启动机器人"""
@@ -835,6 +797,7 @@ class BotGUI:
 
         self.bot.running = True
         self.bot.stats['start_time'] = datetime.now()
+        self._next_cleanup = time.monotonic() + DEBUG_CLEANUP_INTERVAL
         
         self.bot_thread = threading.Thread(target=self.bot.run_with_window, daemon=True)
         self.bot_thread.start()
@@ -868,6 +831,18 @@ class BotGUI:
             self.update_status(status)
             self.pause_btn.config(text="Resume" if self.bot.paused else "Pause")
 
+    def profile_bot(self):
+        """性能分析：堆栈采样5秒 + 检测循环cProfile 10秒"""
+        if not (self.bot and self.bot.running):
+            messagebox.showinfo("Info", "Start the bot before profiling")
+            return
+        profiler = BotProfiler()
+        stacks_path = profiler.sample_stacks(5.0)
+        loop_path = profiler.profile_loop(self.bot, 10.0, f'instance{self.instance_id}')
+        self.log(f"Profiling started, stacks -> {os.path.basename(stacks_path)}")
+        if loop_path:
+            self.log(f"Loop profile (10s) -> {os.path.basename(loop_path)}")
+
     def toggle_window(self):
         """切换窗口显示/隐藏"""
         if self.window_visible:
@@ -896,6 +871,7 @@ class BotGUI:
         test_bot._init_window_info()
 
         minimap = test_bot.capture_minimap()
+        test_bot.frame_source.close()
         if minimap is not None:
             has_players, yellow_dots = test_bot.detect_yellow_dots(minimap)
             self.log(f"Test result: {len(yellow_dots)} yellow dots, players: {has_players}")
@@ -935,11 +911,11 @@ class BotGUI:
         if self.bot and self.bot.running:
             self.update_stats()
             
-            # 每15分钟清理一次debug目录
-            if self.bot.stats['start_time']:
-                elapsed = (datetime.now() - self.bot.stats['start_time']).total_seconds()
-                if int(elapsed) > 0 and int(elapsed) % 900 == 0:  # 900秒 = 15分钟
-                    self._cleanup_debug_dir()
+            # 每15分钟清理一次debug目录（单调时钟，不会跳过或重复）
+            now = time.monotonic()
+            if now >= self._next_cleanup:
+                self._next_cleanup = now + DEBUG_CLEANUP_INTERVAL
+                self._cleanup_debug_dir()
             
             self.root.after(1000, self._update_stats_loop)
     
@@ -977,9 +953,178 @@ class BotGUI:
         keyboard.unhook_all()
         self.root.destroy()
 
+
+class RemoteBotGUI(BotGUI):
+    """
+    守护进程客户端GUI（单窗口）
+
+    监控在 bot_daemon.py 进程中运行，本界面只控制选中的一个窗口并显示推送的状态；
+    关闭界面不影响守护进程
+    """
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self._shown_seq = 0
+        self.remote_hwnd: Optional[int] = None  # 本界面启动的窗口
+        super().__init__()
+        self.root.title(f"Legend of Mir 2 Auto Bot V2 - Daemon Client (Instance {self.instance_id})")
+        self.update_status(f"Connected to daemon {client.host}:{client.port}")
+        self._poll_daemon()
+
+    def _init_backend(self):
+        # 窗口、截图和按键都在守护进程中
+        pass
+
+    def _call(self, cmd: str, **args):
+        """发送命令，失败时写日志并返回None"""
+        try:
+            return self.client.request(cmd, **args)
+        except DaemonError as e:
+            self.log(f"Daemon command '{cmd}' failed: {e}", "ERROR")
+            return None
+
+    def _selected_hwnd(self) -> Optional[int]:
+        selection = self.window_combo.current()
+        if 0 <= selection < len(self.found_windows):
+            return self.found_windows[selection][0]
+        return None
+
+    def _settings(self):
+        return {'teleport_key': self.teleport_key_var.get(), 'cooldown': self.cooldown_var.get(),
+                'detection_interval': self.interval_var.get()}
+
+    def refresh_windows(self):
+        """让守护进程重新扫描，窗口列表随下一次推送更新"""
+        count = self._call('scan')
+        if count is not None:
+            self.log(f"Daemon found {count} game window(s)")
+
+    def _on_window_selected(self, event=None):
+        hwnd = self._selected_hwnd()
+        if hwnd is not None:
+            self.window_info_label.config(text=f"HWND: {hwnd} (daemon)")
+
+    def _poll_daemon(self):
+        """显示读取线程收到的最新推送（界面只在Tk线程中更新）"""
+        lines = self.client.drain_logs()
+        if lines:
+            self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+            self.log_text.see(tk.END)
+        if self.client.state_seq != self._shown_seq and self.client.latest_state is not None:
+            self._shown_seq = self.client.state_seq
+            self._apply_state(self.client.latest_state)
+        if not self.client.connected:
+            self.update_status("Disconnected from daemon")
+            self.log("Daemon connection closed", "WARNING")
+            return
+        self.root.after(250, self._poll_daemon)
+
+    def _apply_state(self, state):
+        """用推送的状态刷新窗口下拉框和选中窗口的统计"""
+        windows = [(row['hwnd'], row['title']) for row in state['windows']]
+        if windows != self.found_windows:
+            selected = self._selected_hwnd()
+            self.found_windows = windows
+            self.window_combo['values'] = [f"[{hwnd}] {title}" for hwnd, title in windows]
+            hwnds = [hwnd for hwnd, _ in windows]
+            if selected in hwnds:
+                self.window_combo.current(hwnds.index(selected))
+            elif windows:
+                self.window_combo.current(0)
+            else:
+                self.window_combo.set('')
+            self._on_window_selected()
+
+        row = next((row for row in state['windows'] if row['hwnd'] == self._selected_hwnd()), None)
+        if row is None:
+            return
+        stats = row['stats']
+        self.stats_label.config(text=f"Detections: {stats.get('detection_runs', 0)} | "
+                                     f"Yellow Dots: {stats.get('yellow_dots_detected', 0)} | "
+                                     f"Teleports: {stats.get('teleports_used', 0)}")
+        if row['capture_p95_ms'] is not None:
+            self.latency_label.config(text=f"Latency: capture p95={row['capture_p95_ms']:.1f}ms | "
+                                           f"detect p95={row['detect_p95_ms']:.1f}ms")
+        running = row['running']
+        self.update_status(f"Daemon {row.get('state') or 'Running'}" if running else "Daemon Stopped")
+        self.start_btn.config(state=tk.DISABLED if running else tk.NORMAL)
+        self.stop_btn.config(state=tk.NORMAL if running else tk.DISABLED)
+
+    def start_bot(self):
+        hwnd = self._selected_hwnd()
+        if hwnd is None:
+            messagebox.showwarning("Warning", "Please select a game window first")
+            return
+        if self._call('configure', **self._settings()) is None:
+            return
+        if self._call('start', hwnds=[hwnd]) is not None:
+            self.remote_hwnd = hwnd
+            self.log(f"Started window {hwnd} in daemon")
+
+    def stop_bot(self):
+        hwnd = self.remote_hwnd if self.remote_hwnd is not None else self._selected_hwnd()
+        if hwnd is None:
+            return
+        if self._call('stop', hwnds=[hwnd]) is not None:
+            self.remote_hwnd = None
+            self.log(f"Stopped window {hwnd} in daemon")
+
+    def pause_bot(self):
+        # 守护进程只支持启停，暂停按钮保持禁用
+        pass
+
+    def profile_bot(self):
+        if self._call('profile', duration=10.0, hwnd=self._selected_hwnd()):
+            self.log("Profiling started in daemon (results in daemon's profiles/ directory)")
+
+    def test_detection(self):
+        hwnd = self._selected_hwnd()
+        if hwnd is None:
+            messagebox.showwarning("Warning", "Please select a game window first")
+            return
+        result = self._call('test', hwnd=hwnd, save=True)
+        if result is None:
+            return
+        if result['captured']:
+            self.log(f"Test result: {result['dots']} yellow dots, image: {result.get('image')}")
+        else:
+            self.log("Failed to capture minimap", "ERROR")
+
+    def _on_minimap_adjusted(self):
+        super()._on_minimap_adjusted()
+        if self._call('reload') is not None:
+            self.log("Minimap settings reloaded by daemon")
+
+    def save_settings(self):
+        if self._call('configure', save=True, **self._settings()) is not None:
+            self.log("Settings saved by daemon")
+
+    def on_closing(self):
+        # 守护进程继续运行
+        self.client.close()
+        keyboard.unhook_all()
+        self.root.destroy()
+
+
 def main():
     """主函数"""
-    gui = BotGUI()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='传奇2自动挂机脚本 V2 - 图形界面')
+    parser.add_argument('--connect', nargs='?', const='', default=None, metavar='HOST:PORT',
+                        help='连接 bot_daemon.py 守护进程（界面只作为单窗口客户端），默认 127.0.0.1:9109')
+    args = parser.parse_args()
+
+    if args.connect is not None:
+        client = DaemonClient(*parse_address(args.connect))
+        try:
+            client.connect()
+        except (OSError, DaemonError) as e:
+            print(f"无法连接守护进程 {client.host}:{client.port}: {e}")
+            return
+        gui = RemoteBotGUI(client)
+    else:
+        gui = BotGUI()
     gui.root.protocol("WM_DELETE_WINDOW", gui.on_closing)
     gui.run()
 
@@ -6,27 +6,37 @@
 """
 
 import time
-import keyboard
-import win32gui
-import win32con
-import win32api
-import win32ui
 import logging
 import configparser
 import os
 import numpy as np
-import cv2
 from datetime import datetime
-from typing import Optional, Tuple, List, Dict
-from PIL import Image
+from typing import Optional, Tuple, List, Dict, Callable
 import threading
-import ctypes
+from minimap_detector import MinimapDetector
+from dot_tracker import DotTracker
+from threat_policy import ThreatPolicy
+from map_fingerprint import MapRegistry, MapState
+from window_state import WindowStateMachine, SETTLING
+from bot_metrics import LatencyHistogram, WindowMetrics, STAGE_CAPTURE, STAGE_DETECT, STAGE_TELEPORT, STAGE_SLEEP, STAGE_REACTION
+from metrics_server import MetricsServer, window_snapshot
+from stats_reporter import StatsReporter
+from bot_profiler import BotProfiler
+from frame_source import FrameSource, WindowProvider, Win32WindowProvider, frame_source_from_config
+from minimap_calibration import MinimapCalibrator, calibrator_from_config
+from frame_ring import FrameRing, READ_LATEST, grab_into_ring, ring_for_region, ring_queue_stats
+from window_registry import WindowRegistry, WindowInfo, game_title_keywords
+from input_dispatcher import InputDispatcher, DEFAULT_HOLD
+from window_watcher import WindowWatcher, WindowHistory, REASON_CLOSED, REASON_REMOVED
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(SCRIPT_DIR, 'mir2_bot_v2.log')
 CONFIG_FILE = os.path.join(SCRIPT_DIR, 'bot_config_v2.ini')
 
+# 窗口级状态值（监控指标和工作进程上报共用）
+WINDOW_GAUGES = ('running', 'alive', 'frames_stale', 'frames_torn', 'frame_backlog')
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -39,71 +49,94 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class MinimapDetector:
-    """小地图黄点检测器"""
-
-    def __init__(self):
-        self.yellow_lower_rgb = np.array([250, 250, 0])
-        self.yellow_upper_rgb = np.array([255, 255, 5])
-        self.min_contour_area = 1
-
-    def detect(self, image: np.ndarray) -> List[Tuple[int, int, int]]:
-        """精确检测RGB(255,255,0)的黄点"""
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        yellow_mask = cv2.inRange(rgb, self.yellow_lower_rgb, self.yellow_upper_rgb)
-        contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        yellow_dots = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area >= self.min_contour_area:
-                M = cv2.moments(contour)
-                if M["m00"] > 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    yellow_dots.append((cx, cy, int(area)))
-        return yellow_dots
-
-
 class GameWindow:
     """单个游戏窗口 - 独立运行"""
 
-    def __init__(self, hwnd: int, title: str, config: configparser.ConfigParser):
+    def __init__(self, hwnd: int, title: str, config: configparser.ConfigParser,
+                 frame_source: FrameSource = None, window_provider: WindowProvider = None,
+                 input_dispatcher: InputDispatcher = None, calibrator: MinimapCalibrator = None,
+                 source_factory: Callable[[], FrameSource] = None):
         self.hwnd = hwnd
         self.title = title
         self.config = config
+        self.enabled = True  # 是否监控此窗口（界面可以临时禁用，线程继续运行但不截图）
+
+        # 截图源和窗口提供者（默认win32）
+        self.window_provider = window_provider or Win32WindowProvider()
+        # 新建截图源（测试截图在监控线程之外使用单独的截图源）
+        self.source_factory = source_factory or (lambda: frame_source_from_config(
+            config, self.window_provider, default='printwindow', seed=hwnd))
+        self.frame_source = frame_source or self.source_factory()
+        self.frame_ring: Optional[FrameRing] = None  # 截图 -> 检测的小地图环形缓冲区
+        self.ring_slots = config.getint('Capture', 'ring_slots', fallback=3)
 
         self.window_rect = None
         self.client_rect = None
         self.client_offset = (0, 0)
         self.minimap_region = None
 
+        # 小地图自动定位（多窗口共用按分辨率的缓存），运行中定时廉价校验
+        self.calibrator = calibrator
+        self._next_region_check = time.monotonic() + (calibrator.revalidate_interval if calibrator else 0)
+
         # 每个窗口独立的检测器实例
         self.detector = MinimapDetector()
+        self.tracker = DotTracker.from_config(config)  # 黄点跨帧跟踪（编号、速度、朝向），未启用时为None
+        self.last_tracks = []
+        # 传送策略：按预测接近传送（需要跟踪器），或出现黄点即传送；两种判断都计入统计用于对比
+        self.threat_policy = ThreatPolicy.from_config(config)
+        # 地图识别：切换地图时换入该地图的静态掩码、清空轨迹，并按地图统计玩家密度
+        self.map_registry = MapRegistry.from_config(config)
+        # 传送后的过渡处理：传送中不截图，小地图稳定前不检测，冷却期间降低轮询频率（未启用时为None）
+        self.window_state = WindowStateMachine.from_config(config)
+        if self.threat_policy.predictive and self.tracker is None:
+            logger.warning(f"[{self.title}] 预测传送策略需要启用 [Tracking]，改为出现黄点即传送")
         self.last_teleport_time = 0
         self.teleport_cooldown = config.getfloat('Teleport', 'cooldown', fallback=4.0)
 
+        # 按键调度（多窗口共用一个调度线程，未提供时单独创建）
+        self._owns_dispatcher = input_dispatcher is None
+        self.input_dispatcher = input_dispatcher or InputDispatcher(self.window_provider, name=f"input-{hwnd}")
+        self.key_hold = config.getfloat('Teleport', 'key_hold', fallback=DEFAULT_HOLD)
+
         # 独立的统计数据（每个窗口自己的字典）
         self.stats = {
             'yellow_dots_detected': 0,
             'teleports_used': 0,
             'detection_runs': 0,
+            'threat_frames_any_dot': 0,     # 出现黄点策略会传送的帧数
+            'threat_frames_predicted': 0,   # 预测策略会传送的帧数
+            'map_changes': 0,
         }
 
+        # 分阶段耗时统计
+        self.metrics = WindowMetrics()
+
+        # 流水线模式：截图线程截取第N+1帧的同时检测线程分析第N帧，超过最大帧龄的帧不参与决策
+        self.pipeline = config.getboolean('Detection', 'pipeline', fallback=False)
+        self.max_frame_age = config.getfloat('Detection', 'max_frame_age', fallback=0.5)
+        self.frame_ready = threading.Event()
+        self.frames_stale = 0   # 超过最大帧龄被丢弃的帧
+        self.frames_torn = 0    # 检测期间被截图线程覆盖的帧
+        self._decision_frame_time: Optional[float] = None
+
         # 线程控制
         self.running = False
         self.thread = None
+        self._stop_event = threading.Event()  # 停止时唤醒休眠中的循环（传送后的休眠可能较长）
         self.lock = threading.Lock()
+        self.profile_request = None  # 由BotProfiler设置
+        self.attached_at = time.monotonic()
 
         self._init_window()
 
     def _init_window(self):
         """初始化窗口信息"""
         try:
-            self.window_rect = win32gui.GetWindowRect(self.hwnd)
-            self.client_rect = win32gui.GetClientRect(self.hwnd)
+            self.window_rect = self.window_provider.get_window_rect(self.hwnd)
+            self.client_rect = self.window_provider.get_client_rect(self.hwnd)
 
-            client_left, client_top = win32gui.ClientToScreen(self.hwnd, (0, 0))
+            client_left, client_top = self.window_provider.client_to_screen(self.hwnd, (0, 0))
             window_left, window_top = self.window_rect[0], self.window_rect[1]
             self.client_offset = (client_left - window_left, client_top - window_top)
 
@@ -131,83 +164,172 @@ class GameWindow:
 
         self.minimap_region = (x, y, width, height)
 
+        # 自动定位：同分辨率的缓存区域校验通过时直接使用，否则整帧截图定位，失败时保留配置的区域
+        if self.calibrator is not None and self._open_frame_source():
+            client_size = (client_width, self.client_rect[3] - self.client_rect[1])
+            region = self.calibrator.region_for(self.frame_source, client_size, self.minimap_region)
+            if region is not None:
+                self.minimap_region = region
+
+    def _check_minimap_region(self):
+        """定时校验小地图边框是否仍在原位（只截取外围一圈），不在时重新初始化窗口并定位"""
+        if self.calibrator is None or time.monotonic() < self._next_region_check:
+            return
+        self._next_region_check = time.monotonic() + self.calibrator.revalidate_interval
+        if self.minimap_region and self.calibrator.validate(self.frame_source, self.minimap_region):
+            return
+        previous = self.minimap_region
+        self._init_window()
+        if self.minimap_region != previous:
+            logger.info(f"[{self.title}] 小地图区域已更新: {previous} -> {self.minimap_region}")
+
+    def _open_frame_source(self) -> bool:
+        """截图源绑定到当前窗口（窗口变化时重新打开）"""
+        if self.frame_source.hwnd != self.hwnd:
+            self.frame_source.close()
+            if not self.frame_source.open(self.hwnd):
+                return False
+        return True
+
     def capture_minimap(self) -> Optional[np.ndarray]:
-        """后台捕获小地图 - 使用Win32 API"""
+        """后台捕获小地图（截图源默认使用PrintWindow，失败时回退到BitBlt）"""
         if not self.client_rect or not self.minimap_region:
             return None
 
         try:
-            client_width = self.client_rect[2] - self.client_rect[0]
-            client_height = self.client_rect[3] - self.client_rect[1]
-
-            # 获取窗口DC
-            hwndDC = win32gui.GetWindowDC(self.hwnd)
-            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-            saveDC = mfcDC.CreateCompatibleDC()
-
-            # 创建位图
-            saveBitMap = win32ui.CreateBitmap()
-            saveBitMap.CreateCompatibleBitmap(mfcDC, client_width, client_height)
-            saveDC.SelectObject(saveBitMap)
-
-            # 使用PrintWindow进行后台截图
-            # PW_CLIENTONLY = 2 - 只截取客户区
-            result = ctypes.windll.user32.PrintWindow(self.hwnd, saveDC.GetSafeHdc(), 2)
-
-            if result:
-                # 转换为numpy数组
-                bmpinfo = saveBitMap.GetInfo()
-                bmpstr = saveBitMap.GetBitmapBits(True)
-                img = np.frombuffer(bmpstr, dtype='uint8')
-                img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-                # 裁剪小地图区域
-                minimap_x, minimap_y, minimap_w, minimap_h = self.minimap_region
-                minimap = img[minimap_y:minimap_y+minimap_h, minimap_x:minimap_x+minimap_w]
-            else:
-                # PrintWindow失败，尝试BitBlt
-                saveDC.BitBlt((0, 0), (client_width, client_height), mfcDC, (0, 0), win32con.SRCCOPY)
-                bmpinfo = saveBitMap.GetInfo()
-                bmpstr = saveBitMap.GetBitmapBits(True)
-                img = np.frombuffer(bmpstr, dtype='uint8')
-                img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            if not self._open_frame_source():
+                return None
+            # 直接截图到环形缓冲区槽位，检测阶段读取同一块内存
+            self.frame_ring = ring_for_region(self.frame_ring, self.minimap_region, self.ring_slots)
+            captured = grab_into_ring(self.frame_source, self.minimap_region, self.frame_ring)
+            return None if captured is None else captured[1]
 
-                minimap_x, minimap_y, minimap_w, minimap_h = self.minimap_region
-                minimap = img[minimap_y:minimap_y+minimap_h, minimap_x:minimap_x+minimap_w]
+        except Exception as e:
+            logger.error(f"[{self.title}] 后台截图失败: {e}")
+            return None
 
-            # 清理资源
-            win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
-            mfcDC.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, hwndDC)
+    def test_capture(self, timeout: float = 2.0) -> Optional[np.ndarray]:
+        """
+        测试截图（界面或守护进程线程调用），返回小地图副本
 
-            return minimap
+        环形缓冲区只允许一个生产者：监控线程截图中时不另外截图，等待它提交下一帧后复制；
+        未运行时用单独的截图源截图，不经过环形缓冲区
+        """
+        if self.running and self.enabled and self.thread is not None and self.thread.is_alive():
+            return self._next_ring_frame(timeout)
+        if not self.client_rect or not self.minimap_region:
+            return None
 
+        source = self.source_factory()
+        try:
+            if not source.open(self.hwnd):
+                return None
+            minimap = source.grab_region(self.minimap_region)
+            return None if minimap is None else minimap.copy()  # 截图源会复用缓冲区
         except Exception as e:
-            logger.error(f"[{self.title}] 后台截图失败: {e}")
+            logger.error(f"[{self.title}] 测试截图失败: {e}")
             return None
+        finally:
+            source.close()
+
+    def _next_ring_frame(self, timeout: float) -> Optional[np.ndarray]:
+        """等待监控线程提交新的一帧并复制（不影响检测线程的读取进度），超时（如传送中）时返回最近一帧"""
+        start_ring = self.frame_ring
+        start_head = start_ring.head if start_ring is not None else 0
+        deadline = time.monotonic() + timeout
+        while True:
+            ring = self.frame_ring
+            if ring is not None and ring.head > 0 and (ring is not start_ring or ring.head > start_head):
+                minimap = ring.copy_frame(ring.head)
+                if minimap is not None:
+                    return minimap
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(0.01)
+        ring = self.frame_ring
+        return ring.copy_frame(ring.head) if ring is not None and ring.head > 0 else None
 
     def detect_players(self) -> bool:
-        """检测是否有其他玩家"""
+        """截图并检测是否有其他玩家"""
+        capture_started = self.metrics.mark_capture_start()
         minimap = self.capture_minimap()
+        self.metrics.record(STAGE_CAPTURE, time.perf_counter() - capture_started)
         if minimap is None:
             return False
+        return self.analyze_frame()
+
+    def analyze_frame(self) -> bool:
+        """
+        检测环形缓冲区中最新的一帧
+
+        帧龄超过 max_frame_age、或检测期间被截图线程覆盖的帧不参与决策
+        """
+        ring = self.frame_ring
+        frame = ring.read(READ_LATEST) if ring is not None else None
+        if frame is None:
+            return False
+        seq, minimap = frame
+        if ring.frame_age(seq) > self.max_frame_age:
+            self.frames_stale += 1
+            return False
 
+        detect_started = time.perf_counter()
         with self.lock:
             self.stats['detection_runs'] += 1
 
-        yellow_dots = self.detector.detect(minimap)
+        blobs = self.detector.detect_blobs(minimap)  # 数组形式，跟踪器直接使用
+        dot_count = len(blobs)
+        self.metrics.record(STAGE_DETECT, time.perf_counter() - detect_started)
 
-        if yellow_dots:
+        frame_time = ring.frame_time(seq)
+        if frame_time is None:
+            self.frames_torn += 1
+            return False
+        self._decision_frame_time = frame_time
+        if self.map_registry is not None:
+            map_state = self.map_registry.observe(minimap, dot_count)
+            if map_state is not None:
+                self._on_map_change(map_state)
+        if self.tracker is not None:
+            self.last_tracks = self.tracker.update(blobs, frame_time)
+        if self.window_state is not None:
+            self.window_state.on_detection(dot_count > 0)
+
+        if dot_count:
+            if time.monotonic() - frame_time > self.max_frame_age:
+                self.frames_stale += 1
+                return False
+            predicted = True
+            if self.tracker is not None:
+                predicted = self.threat_policy.threatened(self.tracker, minimap.shape)
             with self.lock:
-                self.stats['yellow_dots_detected'] += len(yellow_dots)
-            logger.info(f"[{self.title}] 检测到 {len(yellow_dots)} 个黄点")
+                self.stats['yellow_dots_detected'] += dot_count
+                self.stats['threat_frames_any_dot'] += 1
+                self.stats['threat_frames_predicted'] += predicted
+            if self.threat_policy.predictive and not predicted:
+                return False
+            logger.info(f"[{self.title}] 检测到 {dot_count} 个黄点")
             return True
 
         return False
 
+    def _on_map_change(self, map_state: MapState):
+        """切换到另一个地图：换入该地图的状态，上一个地图的轨迹不再有意义"""
+        with self.lock:
+            self.stats['map_changes'] += 1
+        if self.tracker is not None:
+            self.tracker.reset()
+        static_mask = self.detector.static_mask
+        if static_mask is not None:
+            if 'static_mask' not in map_state.data:
+                map_state.data['static_mask'] = static_mask.for_map(map_state.key)
+            self.detector.static_mask = map_state.data['static_mask']
+        logger.info(f"[{self.title}] 地图 {map_state.key}（第 {map_state.visits} 次进入）")
+
+    def map_stats(self) -> List[Dict]:
+        """最近去过的各地图的玩家密度统计"""
+        return self.map_registry.summary() if self.map_registry is not None else []
+
     def teleport(self):
         """传送 - 使用PostMessage向特定窗口发送按键"""
         if not self.config.getboolean('Teleport', 'enabled', fallback=True):
@@ -216,47 +338,155 @@ class GameWindow:
         current_time = time.time()
         if current_time - self.last_teleport_time < self.teleport_cooldown:
             return
+        if self.window_state is not None and not self.window_state.can_teleport:
+            return
 
         teleport_key = self.config.get('Teleport', 'teleport_key', fallback='2')
 
         try:
             # 将按键字符转换为虚拟键码
-            vk_code = win32api.VkKeyScan(teleport_key)
-            vk_code = vk_code & 0xFF  # 只取低字节
+            vk_code = self.window_provider.vk_code(teleport_key)
 
-            # 使用PostMessage向特定窗口发送按键消息
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYDOWN, vk_code, 0)
-            time.sleep(0.05)
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYUP, vk_code, 0)
+            # 提交给按键调度线程（PostMessage按下，按住时长后再抬起，不阻塞检测线程）
+            key_started = time.perf_counter()
+            if not self.input_dispatcher.press(self.hwnd, vk_code, self.key_hold, self.teleport_cooldown):
+                return
+            if self._decision_frame_time is not None:
+                # 从决策所用帧的截图开始到提交按键的延迟
+                self.metrics.record(STAGE_REACTION, time.monotonic() - self._decision_frame_time)
+            self.metrics.record(STAGE_TELEPORT, time.perf_counter() - key_started)
 
             self.last_teleport_time = current_time
+            if self.window_state is not None:
+                self.window_state.on_teleport()
             with self.lock:
                 self.stats['teleports_used'] += 1
             logger.info(f"[{self.title}] 已传送 (快捷键: {teleport_key}, hwnd: {self.hwnd})")
         except Exception as e:
             logger.error(f"[{self.title}] 传送失败: {e}")
 
+    def _loop_interval(self, detection_interval: float) -> float:
+        """下一次循环的间隔（由窗口状态决定）"""
+        if self.window_state is None:
+            return detection_interval
+        return self.window_state.interval(detection_interval)
+
+    def _probe_settling(self):
+        """传送后稳定中：只截图比较小地图指纹，不检测"""
+        minimap = self.capture_minimap()
+        if minimap is not None and self.window_state.on_settle_frame(minimap):
+            logger.debug(f"[{self.title}] 传送后小地图已稳定")
+
+    def _capture_loop(self, detection_interval: float):
+        """
+        流水线模式的截图线程：按固定节奏截图到环形缓冲区并通知检测线程
+
+        截图开始时刻按 detection_interval 排期（扣除截图耗时），截图比间隔慢时不再休眠
+        """
+        next_due = time.perf_counter()
+        while self.running:
+            if not self.window_provider.is_window(self.hwnd):
+                logger.info(f"[{self.title}] 窗口已关闭")
+                self.running = False
+                break
+            if not self.enabled:
+                self._stop_event.wait(0.1)
+                continue
+
+            self._check_minimap_region()
+            state = self.window_state.tick() if self.window_state is not None else None
+            if state == SETTLING:
+                self._probe_settling()
+            elif self.window_state is None or self.window_state.capturing:
+                capture_started = self.metrics.mark_capture_start()
+                if self.capture_minimap() is not None:
+                    self.frame_ready.set()
+                self.metrics.record(STAGE_CAPTURE, time.perf_counter() - capture_started)
+            captured = time.perf_counter()
+
+            next_due = max(next_due + self._loop_interval(detection_interval), captured)
+            if next_due > captured:
+                self._stop_event.wait(next_due - captured)
+                self.metrics.record(STAGE_SLEEP, time.perf_counter() - captured)
+
+        self.frame_source.close()
+        self.frame_ready.set()  # 唤醒检测线程退出
+
+    def _detect_loop(self):
+        """流水线模式的检测线程：每有新帧就检测最新一帧"""
+        while self.running:
+            if not self.frame_ready.wait(0.5):
+                continue
+            self.frame_ready.clear()
+            try:
+                # 性能分析（仅在请求时生效）
+                if self.profile_request is not None and self.profile_request.poll():
+                    self.profile_request = None
+
+                if self.window_state is not None and not self.window_state.detecting:
+                    continue
+                if self.analyze_frame():
+                    self.teleport()
+            except Exception as e:
+                logger.error(f"[{self.title}] 检测错误: {e}")
+
+    def _run_pipeline(self, detection_interval: float):
+        """截图线程与检测线程重叠运行，检测线程总是分析最新一帧"""
+        capture_thread = threading.Thread(target=self._capture_loop, args=(detection_interval,),
+                                          name=f"capture-{self.hwnd}", daemon=True)
+        capture_thread.start()
+        self._detect_loop()
+        capture_thread.join(detection_interval + 1.0)
+
     def _run_loop(self, detection_interval: float):
         """独立线程运行循环"""
-        logger.info(f"[{self.title}] 开始独立监控")
-        
+        logger.info(f"[{self.title}] 开始独立监控{'（流水线模式）' if self.pipeline else ''}")
+        if self.pipeline:
+            self._run_pipeline(detection_interval)
+        else:
+            self._run_sequential(detection_interval)
+
+        if self.profile_request is not None:
+            self.profile_request.finish()
+            self.profile_request = None
+        if self._owns_dispatcher:
+            self.input_dispatcher.stop()
+        logger.info(f"[{self.title}] 监控已停止")
+
+    def _run_sequential(self, detection_interval: float):
+        """截图、检测、休眠依次进行"""
         while self.running:
+            if not self.enabled:
+                self._stop_event.wait(0.1)
+                continue
             try:
                 # 检查窗口是否还存在
-                if not win32gui.IsWindow(self.hwnd):
+                if not self.window_provider.is_window(self.hwnd):
                     logger.info(f"[{self.title}] 窗口已关闭")
                     break
 
-                # 检测玩家
-                if self.detect_players():
-                    self.teleport()
+                # 性能分析（仅在请求时生效）
+                if self.profile_request is not None and self.profile_request.poll():
+                    self.profile_request = None
+
+                self._check_minimap_region()
+
+                state = self.window_state.tick() if self.window_state is not None else None
+                if state == SETTLING:
+                    self._probe_settling()
+                elif self.window_state is None or self.window_state.detecting:
+                    # 检测玩家
+                    if self.detect_players():
+                        self.teleport()
 
             except Exception as e:
                 logger.error(f"[{self.title}] 检测错误: {e}")
 
-            time.sleep(detection_interval)
+            sleep_started = time.perf_counter()
+            self._stop_event.wait(self._loop_interval(detection_interval))
+            self.metrics.record(STAGE_SLEEP, time.perf_counter() - sleep_started)
 
-        logger.info(f"[{self.title}] 监控已停止")
+        self.frame_source.close()
 
     def start(self, detection_interval: float = 0.3):
         """启动独立监控线程"""
@@ -264,35 +494,61 @@ class GameWindow:
             return
         
         self.running = True
-        self.thread = threading.Thread(target=self._run_loop, args=(detection_interval,), daemon=True)
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run_loop, args=(detection_interval,),
+                                       name=f"window-{self.hwnd}", daemon=True)
         self.thread.start()
         logger.info(f"[{self.title}] 启动独立监控线程")
 
     def stop(self):
         """停止监控"""
         self.running = False
+        self._stop_event.set()
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=1.0)
         logger.info(f"[{self.title}] 已停止")
 
+    def release(self):
+        """释放截图资源（线程仍在运行时由线程退出时自行释放）"""
+        if self.thread is None or not self.thread.is_alive():
+            self.frame_source.close()
+            self.frame_ring = None
+
     def is_valid(self) -> bool:
         """检查窗口是否仍然有效"""
-        try:
-            return win32gui.IsWindow(self.hwnd)
-        except:
-            return False
+        return self.window_provider.is_window(self.hwnd)
 
 
 class MultiWindowBot:
     """多窗口挂机机器人"""
 
-    def __init__(self, config_file: str = None):
+    def __init__(self, config_file: str = None, window_provider: WindowProvider = None,
+                 source_factory: Callable[[int], FrameSource] = None):
+        """
+        Args:
+            config_file: 配置文件路径
+            window_provider: 窗口提供者，默认win32
+            source_factory: hwnd -> 截图源，默认按 [Capture] 配置创建
+        """
         self.running = False
         self.windows: Dict[int, GameWindow] = {}  # hwnd -> GameWindow
+        self.window_provider = window_provider or Win32WindowProvider()
+        self.source_factory = source_factory
+        self.metrics_server: Optional[MetricsServer] = None
+        self.stats_reporter: Optional[StatsReporter] = None
+        self.window_watcher: Optional[WindowWatcher] = None
+        self.supervisor = None  # 多进程模式的 ProcessPoolSupervisor
+        self.windows_lock = threading.RLock()  # 监视线程和主线程都会增删窗口
+        self.history = WindowHistory()  # 已移除窗口的统计
 
         if config_file is None:
             config_file = CONFIG_FILE
+        self.config_file = config_file
         self.config = self._load_config(config_file)
+        self.calibrator = calibrator_from_config(self.config, os.path.dirname(os.path.abspath(config_file)))
+        self.window_registry = WindowRegistry(self.window_provider, game_title_keywords(self.config))
+        self.input_dispatcher = InputDispatcher(
+            self.window_provider, hold=self.config.getfloat('Teleport', 'key_hold', fallback=DEFAULT_HOLD))
 
         self.stats = {
             'start_time': None,
@@ -316,6 +572,8 @@ class MultiWindowBot:
                 'width': '150',
                 'height': '150',
                 'from_right': 'true',
+                'auto_calibrate': 'true',
+                'revalidate_interval': '30',
             },
             'Detection': {
                 'enabled': 'true',
@@ -333,6 +591,33 @@ class MultiWindowBot:
                 'g_upper': '255',
                 'b_lower': '0',
                 'b_upper': '5',
+            },
+            'Threat': {
+                'policy': 'any_dot',
+                'danger_radius': '30',
+                'horizon': '1.0',
+            },
+            'Metrics': {
+                'enabled': 'false',
+                'port': '9108',
+            },
+            'Stats': {
+                'report_interval': '60',
+            },
+            'Capture': {
+                'backend': 'printwindow',
+            },
+            'ProcessPool': {
+                'workers': '0',
+            },
+            'Watcher': {
+                'enabled': 'true',
+                'scan_interval': '2.0',
+                'prune_interval': '0.5',
+            },
+            'Daemon': {
+                'port': '9109',
+                'update_interval': '0.5',
             }
         }
 
@@ -352,86 +637,272 @@ class MultiWindowBot:
 
     def find_all_windows(self) -> List[Tuple[int, str]]:
         """查找所有游戏窗口"""
-        window_title = self.config.get('Game', 'window_title', fallback='九五沉默')
-        possible_titles = [window_title, 'Legend of Mir2', '传奇']
-
-        found_windows = []
-
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                for possible_title in possible_titles:
-                    if possible_title.lower() in title.lower():
-                        try:
-                            client_rect = win32gui.GetClientRect(hwnd)
-                            client_width = client_rect[2] - client_rect[0]
-                            client_height = client_rect[3] - client_rect[1]
-                            if client_width > 0 and client_height > 0:
-                                windows.append((hwnd, title))
-                        except:
-                            pass
-            return True
-
-        win32gui.EnumWindows(callback, found_windows)
-        return found_windows
+        self.window_registry.rescan()
+        return self.window_registry.list()
 
     def scan_windows(self) -> int:
-        """扫描并添加所有游戏窗口"""
-        found = self.find_all_windows()
-        
-        # 停止所有现有窗口
-        for gw in self.windows.values():
-            gw.stop()
-        
-        self.windows.clear()
+        """
+        扫描游戏窗口并同步监控列表
 
-        for hwnd, title in found:
-            self.windows[hwnd] = GameWindow(hwnd, title, self.config)
-            logger.info(f"添加窗口: {title} (hwnd: {hwnd})")
+        只移除已关闭的窗口、添加新窗口，未变化的窗口保持运行；
+        监控运行中时新窗口立即开始监控
+        """
+        diff = self.window_registry.rescan()
+
+        with self.windows_lock:
+            for info in diff.removed:
+                self.remove_window(info.hwnd, REASON_CLOSED)
+            for info in diff.renamed:
+                self._rename_window(info)
+
+            # 注册表中有但未监控的窗口（新窗口，或之前被移除的窗口）
+            for hwnd, title in self.window_registry.list():
+                if hwnd not in self.windows:
+                    self.attach_window(hwnd, title)
 
         logger.info(f"共找到 {len(self.windows)} 个游戏窗口")
         return len(self.windows)
 
+    def _create_window(self, hwnd: int, title: str) -> GameWindow:
+        """创建窗口对象（截图源由 source_factory 或配置决定）"""
+        frame_source, window_source_factory = None, None
+        if self.source_factory:
+            frame_source = self.source_factory(hwnd)
+            window_source_factory = lambda: self.source_factory(hwnd)
+        gw = GameWindow(hwnd, title, self.config, frame_source, self.window_provider, self.input_dispatcher,
+                        self.calibrator, window_source_factory)
+        gw.detector.configure(self.config, os.path.dirname(os.path.abspath(self.config_file)))
+        return gw
+
     def add_window(self, hwnd: int, title: str):
         """添加单个窗口"""
-        if hwnd not in self.windows:
-            self.windows[hwnd] = GameWindow(hwnd, title, self.config)
-            logger.info(f"添加窗口: {title}")
-
-    def remove_window(self, hwnd: int):
-        """移除窗口"""
-        if hwnd in self.windows:
-            self.windows[hwnd].stop()
-            del self.windows[hwnd]
-            logger.info(f"移除窗口: {hwnd}")
-
-    def run(self):
-        """运行多窗口监控 - 每个窗口独立线程"""
-        if not self.windows:
+        with self.windows_lock:
+            if hwnd not in self.windows:
+                self.windows[hwnd] = self._create_window(hwnd, title)
+                logger.info(f"添加窗口: {title} (hwnd: {hwnd})")
+
+    def attach_window(self, hwnd: int, title: str):
+        """添加窗口，监控运行中时立即开始监控（多进程模式下分配给工作进程）"""
+        with self.windows_lock:
+            self.add_window(hwnd, title)
+            if self.supervisor is not None:
+                self.supervisor.assign(hwnd, title)
+            elif self.running:
+                self.windows[hwnd].start(self.config.getfloat('Detection', 'detection_interval', fallback=0.3))
+
+    def remove_window(self, hwnd: int, reason: str = REASON_REMOVED):
+        """移除窗口：停止监控、释放截图资源，统计并入历史记录"""
+        with self.windows_lock:
+            gw = self.windows.pop(hwnd, None)
+        if gw is None:
+            return
+        if self.supervisor is not None:
+            self.supervisor.remove(hwnd)
+        gw.stop()
+        gw.release()
+        self.input_dispatcher.forget(hwnd)
+        with gw.lock:
+            stats = dict(gw.stats)
+        self.history.record(hwnd, gw.title, gw.attached_at, stats, reason)
+        logger.info(f"移除窗口: {gw.title} (hwnd: {hwnd}, {reason})")
+
+    def _rename_window(self, info: WindowInfo):
+        gw = self.windows.get(info.hwnd)
+        if gw is not None:
+            gw.title = info.title
+
+    def start_watcher(self) -> WindowWatcher:
+        """启动窗口热插拔监视（新窗口自动接入，关闭的窗口自动移除）"""
+        if self.window_watcher is None:
+            self.window_watcher = WindowWatcher(
+                self.window_registry,
+                on_attach=lambda info: self.attach_window(info.hwnd, info.title),
+                on_detach=lambda info, reason: self.remove_window(info.hwnd, reason),
+                on_rename=self._rename_window,
+                scan_interval=self.config.getfloat('Watcher', 'scan_interval', fallback=2.0),
+                prune_interval=self.config.getfloat('Watcher', 'prune_interval', fallback=0.5),
+            )
+        self.window_watcher.start()
+        return self.window_watcher
+
+    def window_rows(self) -> List[Tuple[GameWindow, Dict, Dict, WindowMetrics, Optional[str]]]:
+        """
+        各窗口的 (窗口, 计数, 状态值, 分阶段耗时, 窗口状态) 快照（在指标服务和守护进程推送线程中调用）
+
+        多进程模式下检测在工作进程中运行，本进程窗口对象的计数和直方图在停止前一直为空，
+        改用工作进程最近一次上报的值
+        """
+        with self.windows_lock:
+            windows = list(self.windows.values())
+        reported = self.supervisor.window_stats() if self.supervisor is not None else None
+        rows = []
+        for gw in windows:
+            if reported is None:
+                with gw.lock:
+                    stats = dict(gw.stats)
+                gauges = {'running': int(gw.running),
+                          'alive': int(gw.thread is not None and gw.thread.is_alive()),
+                          'frames_stale': gw.frames_stale, 'frames_torn': gw.frames_torn,
+                          'frame_backlog': ring_queue_stats([gw.frame_ring])['depth']}
+                metrics = gw.metrics
+                state = gw.window_state.state if gw.window_state is not None else None
+            else:
+                remote = reported.get(gw.hwnd, {})
+                stats = {name: remote.get(name, 0) for name in gw.stats}
+                gauges = {name: remote.get(name, 0) for name in WINDOW_GAUGES}
+                metrics = WindowMetrics()
+                for stage, data in remote.get('metrics', {}).items():
+                    metrics.histograms[stage] = LatencyHistogram.from_dict(data)
+                state = remote.get('state')
+            rows.append((gw, stats, gauges, metrics, state))
+        return rows
+
+    def collect_queues(self) -> Dict[str, Dict[str, int]]:
+        """各内部队列的深度和累计合并/丢弃数（多进程模式下为各工作进程之和）"""
+        if self.supervisor is not None:
+            return self.supervisor.collect_queues()
+        with self.windows_lock:
+            rings = [gw.frame_ring for gw in self.windows.values()]
+        return {'input': self.input_dispatcher.queue_stats(), 'frame_ring': ring_queue_stats(rings)}
+
+    def collect_metrics(self) -> Dict:
+        """生成监控指标快照（在指标服务线程中调用）"""
+        rows = self.window_rows()
+        return {
+            'gauges': {
+                'windows_total': len(rows),
+                'windows_alive': sum(gauges['alive'] for _, _, gauges, _, _ in rows),
+                'detection_interval_seconds': self.config.getfloat('Detection', 'detection_interval', fallback=0.3),
+                'teleport_cooldown_seconds': self.config.getfloat('Teleport', 'cooldown', fallback=4.0),
+                'pool_workers': self.supervisor.worker_count if self.supervisor is not None else 0,
+                'pool_restarts': self.supervisor.restarts if self.supervisor is not None else 0,
+            },
+            'queues': self.collect_queues(),
+            'windows': [window_snapshot(f"{gw.hwnd}", stats, metrics, None, gauges)
+                        for gw, stats, gauges, metrics, _ in rows],
+        }
+
+    def _collect_counters(self) -> Dict[str, int]:
+        """汇总所有窗口的累计计数（在统计报告线程中调用）"""
+        if self.supervisor is not None:
+            return self.supervisor.collect_counters()
+        totals = {'yellow_dots_detected': 0, 'teleports_used': 0, 'detection_runs': 0}
+        for gw in list(self.windows.values()):
+            with gw.lock:
+                for name in totals:
+                    totals[name] += gw.stats[name]
+        # 已移除窗口的计数保留在历史中，总计不会因窗口关闭而回退
+        return self.history.add_totals(totals)
+
+    def start_metrics_server(self, port: int = None) -> bool:
+        """启动本地监控指标服务"""
+        if self.metrics_server is not None:
+            return True
+        if port is None:
+            port = self.config.getint('Metrics', 'port', fallback=9108)
+        server = MetricsServer(self.collect_metrics, port=port)
+        if not server.start():
+            return False
+        self.metrics_server = server
+        return True
+
+    def start_profiling(self, duration: float = 10.0, hwnd: int = None, profile_dir: str = None) -> bool:
+        """
+        性能分析：采样所有线程的调用栈，并对一个窗口的检测循环做cProfile
+
+        Args:
+            duration: 分析时长（秒）
+            hwnd: 要cProfile的窗口，默认第一个窗口
+            profile_dir: 结果目录
+
+        Returns:
+            多进程模式下检测循环不在本进程中，不支持分析，返回False
+        """
+        if self.supervisor is not None:
+            logger.warning("多进程模式下检测在工作进程中运行，不支持性能分析（去掉 --workers 后再分析）")
+            return False
+        profiler = BotProfiler(profile_dir)
+        profiler.sample_stacks(min(duration, 5.0))
+        target = self.windows.get(hwnd) if hwnd is not None else next(iter(self.windows.values()), None)
+        if target is not None:
+            profiler.profile_loop(target, duration, f"{target.hwnd}")
+        return True
+
+    def start_process_pool(self, workers: int, provider_factory: Callable = None, window_setup: Callable = None):
+        """
+        多进程模式：窗口分配到多个工作进程，本进程只负责窗口发现、分配和统计汇总
+
+        Args:
+            workers: 工作进程数
+            provider_factory: 子进程中创建窗口提供者，默认win32
+            window_setup: 子进程接收窗口时的准备函数（压测用）
+        """
+        from process_pool import ProcessPoolSupervisor
+
+        self.supervisor = ProcessPoolSupervisor(
+            self.config_file, workers, provider_factory=provider_factory,
+            source_factory=self.source_factory, window_setup=window_setup)
+        self.supervisor.start()
+        with self.windows_lock:
+            for hwnd, gw in self.windows.items():
+                self.supervisor.assign(hwnd, gw.title)
+        logger.info(f"多进程模式: {self.supervisor.worker_count} 个工作进程")
+        return self.supervisor
+
+    def run(self, workers: int = None):
+        """
+        运行多窗口监控 - 每个窗口独立线程
+
+        Args:
+            workers: 工作进程数，默认读取 [ProcessPool] workers，0为单进程多线程
+        """
+        if workers is None:
+            workers = self.config.getint('ProcessPool', 'workers', fallback=0)
+        watch = self.config.getboolean('Watcher', 'enabled', fallback=True)
+        if not self.windows and not watch:
             logger.error("没有游戏窗口，请先扫描窗口")
             return
 
         self.running = True
         self.stats['start_time'] = datetime.now()
+
+        if self.config.getboolean('Metrics', 'enabled', fallback=False):
+            self.start_metrics_server()
+
+        self.stats_reporter = StatsReporter(
+            self._collect_counters,
+            interval=self.config.getfloat('Stats', 'report_interval', fallback=60.0),
+            log=logger.info,
+        )
+        self.stats_reporter.start()
         
         detection_interval = self.config.getfloat('Detection', 'detection_interval', fallback=0.3)
         
-        logger.info(f"开始监控 {len(self.windows)} 个窗口（独立线程模式），按 F10 停止")
+        if workers > 0:
+            logger.info(f"开始监控 {len(self.windows)} 个窗口（多进程模式），按 F10 停止")
+            self.start_process_pool(workers)
+        else:
+            logger.info(f"开始监控 {len(self.windows)} 个窗口（独立线程模式），按 F10 停止")
 
-        # 启动所有窗口的独立线程
-        for hwnd, game_window in self.windows.items():
-            game_window.start(detection_interval)
+            # 启动所有窗口的独立线程
+            with self.windows_lock:
+                for hwnd, game_window in self.windows.items():
+                    game_window.start(detection_interval)
+
+        # 热插拔监视：游戏客户端重启后自动重新接入
+        if watch:
+            self.start_watcher()
 
         # 主线程等待
         try:
             while self.running:
-                # 检查各窗口状态
-                for hwnd, game_window in list(self.windows.items()):
-                    if not game_window.is_valid():
-                        logger.info(f"[{game_window.title}] 窗口已关闭")
-                        game_window.stop()
-                        del self.windows[hwnd]
-                
+                if not watch:
+                    # 检查各窗口状态
+                    for hwnd, game_window in list(self.windows.items()):
+                        if not game_window.is_valid():
+                            logger.info(f"[{game_window.title}] 窗口已关闭")
+                            self.remove_window(hwnd, REASON_CLOSED)
+
                 time.sleep(1.0)
 
         except KeyboardInterrupt:
@@ -442,10 +913,39 @@ class MultiWindowBot:
     def stop(self):
         """停止所有监控"""
         self.running = False
-        
-        # 停止所有窗口线程
-        for gw in self.windows.values():
+
+        # 先停止热插拔监视，避免停止过程中接入新窗口
+        if self.window_watcher is not None:
+            self.window_watcher.stop()
+
+        # 停止所有窗口线程（先全部通知退出再逐个等待，避免窗口多时逐个等待检测间隔）
+        with self.windows_lock:
+            windows = list(self.windows.values())
+        for gw in windows:
+            gw.running = False
+        for gw in windows:
             gw.stop()
+        self.input_dispatcher.stop()  # 补发未抬起的按键
+
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            # 工作进程的最终统计写回本进程的窗口对象，便于下面统一输出
+            for hwnd, stats in self.supervisor.window_stats().items():
+                gw = self.windows.get(hwnd)
+                if gw is not None:
+                    with gw.lock:
+                        for name in gw.stats:
+                            gw.stats[name] = stats.get(name, 0)
+                    for stage, data in stats.get('metrics', {}).items():
+                        gw.metrics.histograms[stage] = LatencyHistogram.from_dict(data)
+
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+        if self.stats_reporter is not None:
+            self.stats_reporter.stop()
+            self.stats_reporter = None
 
         logger.info("多窗口监控已停止")
 
@@ -457,14 +957,32 @@ class MultiWindowBot:
             logger.info("=" * 50)
             logger.info("统计信息:")
             logger.info(f"运行时间: {int(elapsed // 60)} 分钟 {int(elapsed % 60)} 秒")
-            logger.info(f"总传送次数: {total_teleports}")
+            logger.info(f"总传送次数: {total_teleports + self.history.totals.get('teleports_used', 0)}")
+            if self.history.records:
+                logger.info(f"已移除窗口: {len(self.history.records)} 个, 传送: {self.history.totals.get('teleports_used', 0)}")
+            logger.info(self.input_dispatcher.format_stats())
             for hwnd, gw in self.windows.items():
                 logger.info(f"  [{gw.title}] 检测: {gw.stats['detection_runs']}, 黄点: {gw.stats['yellow_dots_detected']}, 传送: {gw.stats['teleports_used']}")
+                for line in gw.metrics.format_lines():
+                    logger.info(f"    {line}")
             logger.info("=" * 50)
 
 
 def main():
     """主函数"""
+    import argparse
+    import keyboard
+
+    parser = argparse.ArgumentParser(description='传奇2自动挂机脚本 V2 - 多窗口版本')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='启动本地监控指标服务（Prometheus格式）的端口')
+    parser.add_argument('--profile', type=float, default=None, metavar='SECONDS',
+                        help='启动后立即进行指定秒数的性能分析（运行中也可按F11）')
+    parser.add_argument('--profile-dir', default=None, help='性能分析结果目录（默认 profiles/）')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='多进程模式的工作进程数（默认读取 [ProcessPool] workers，0为单进程）')
+    args = parser.parse_args()
+
     print("=" * 50)
     print("传奇2自动挂机脚本 V2 - 多窗口版本")
     print("=" * 50)
@@ -477,6 +995,7 @@ def main():
     print()
     print("控制:")
     print("  - F10: 停止监控")
+    print("  - F11: 性能分析（堆栈采样 + 第一个窗口的检测循环cProfile 10秒）")
     print("  - Ctrl+C: 强制退出")
     print()
     print("=" * 50)
@@ -487,14 +1006,25 @@ def main():
     # 扫描窗口
     count = bot.scan_windows()
     if count == 0:
-        print("未找到游戏窗口，请确保游戏已启动")
-        return
+        if not bot.config.getboolean('Watcher', 'enabled', fallback=True):
+            print("未找到游戏窗口，请确保游戏已启动")
+            return
+        print("未找到游戏窗口，游戏启动后将自动接入")
 
     # 设置快捷键
     keyboard.add_hotkey('F10', bot.stop)
+    keyboard.add_hotkey('F11', lambda: bot.start_profiling(10.0, profile_dir=args.profile_dir))
+
+    # 监控指标服务
+    if args.metrics_port is not None:
+        bot.start_metrics_server(args.metrics_port)
+
+    # 性能分析（关闭时无开销）
+    if args.profile:
+        bot.start_profiling(args.profile, profile_dir=args.profile_dir)
 
     # 运行
-    bot.run()
+    bot.run(args.workers)
 
     # 清理
     keyboard.unhook_all()
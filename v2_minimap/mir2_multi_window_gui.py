@@ -7,284 +7,30 @@
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import threading
 import time
 import keyboard
-import win32gui
-import win32con
-import win32api
-import win32ui
 import logging
 import configparser
 import os
-import numpy as np
 import cv2
 from datetime import datetime
-from typing import Optional, Tuple, List, Dict
-from PIL import Image, ImageTk
-import ctypes
+from typing import Optional, List, Dict
+from bot_metrics import WindowMetrics, STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION
+from bot_profiler import BotProfiler
+from frame_source import Win32WindowProvider
+from minimap_calibration import calibrator_from_config
+from window_registry import WindowRegistry, WindowInfo, game_title_keywords
+from input_dispatcher import InputDispatcher
+from window_watcher import WindowWatcher, WindowHistory, REASON_REMOVED
+from bot_daemon import DaemonClient, DaemonError, LogBuffer, parse_address
+# 窗口监控与命令行版完全相同（传送策略、窗口状态、流水线等配置都生效）
+from mir2_multi_window_bot import GameWindow
 
 # 获取脚本所在目录
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(SCRIPT_DIR, 'mir2_bot_v2.log')
 CONFIG_FILE = os.path.join(SCRIPT_DIR, 'bot_config_v2.ini')
-
-
-class MinimapDetector:
-    """小地图黄点检测器"""
-
-    def __init__(self):
-        self.yellow_lower_rgb = np.array([250, 250, 0])
-        self.yellow_upper_rgb = np.array([255, 255, 5])
-        self.min_contour_area = 1
-
-    def detect(self, image: np.ndarray) -> List[Tuple[int, int, int]]:
-        """精确检测RGB(255,255,0)的黄点"""
-        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        yellow_mask = cv2.inRange(rgb, self.yellow_lower_rgb, self.yellow_upper_rgb)
-        contours, _ = cv2.findContours(yellow_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        yellow_dots = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area >= self.min_contour_area:
-                M = cv2.moments(contour)
-                if M["m00"] > 0:
-                    cx = int(M["m10"] / M["m00"])
-                    cy = int(M["m01"] / M["m00"])
-                    yellow_dots.append((cx, cy, int(area)))
-        return yellow_dots
-
-
-class GameWindow:
-    """单个游戏窗口 - 独立运行"""
-
-    def __init__(self, hwnd: int, title: str, config: configparser.ConfigParser):
-        self.hwnd = hwnd
-        self.title = title
-        self.config = config
-        self.enabled = True  # 是否监控此窗口
-
-        self.window_rect = None
-        self.client_rect = None
-        self.client_offset = (0, 0)
-        self.minimap_region = None
-
-        # 每个窗口独立的检测器实例
-        self.detector = MinimapDetector()
-        self.last_teleport_time = 0
-        self.teleport_cooldown = config.getfloat('Teleport', 'cooldown', fallback=4.0)
-
-        # 独立的统计数据（每个窗口自己的字典）
-        self.stats = {
-            'yellow_dots_detected': 0,
-            'teleports_used': 0,
-            'detection_runs': 0,
-        }
-
-        # 线程控制
-        self.running = False
-        self.thread = None
-        self.lock = threading.Lock()
-        self.log_callback = None
-
-        self._init_window()
-
-    def _init_window(self):
-        """初始化窗口信息"""
-        try:
-            self.window_rect = win32gui.GetWindowRect(self.hwnd)
-            self.client_rect = win32gui.GetClientRect(self.hwnd)
-
-            client_left, client_top = win32gui.ClientToScreen(self.hwnd, (0, 0))
-            window_left, window_top = self.window_rect[0], self.window_rect[1]
-            self.client_offset = (client_left - window_left, client_top - window_top)
-
-            self._calculate_minimap_region()
-        except Exception as e:
-            pass
-
-    def _calculate_minimap_region(self):
-        """计算小地图区域"""
-        if not self.client_rect:
-            return
-
-        client_width = self.client_rect[2] - self.client_rect[0]
-        offset_x = self.config.getint('Minimap', 'offset_x', fallback=10)
-        offset_y = self.config.getint('Minimap', 'offset_y', fallback=10)
-        width = self.config.getint('Minimap', 'width', fallback=150)
-        height = self.config.getint('Minimap', 'height', fallback=150)
-        from_right = self.config.getboolean('Minimap', 'from_right', fallback=True)
-
-        if from_right:
-            x = client_width - width - offset_x
-        else:
-            x = offset_x
-        y = offset_y
-
-        self.minimap_region = (x, y, width, height)
-
-    def capture_minimap(self) -> Optional[np.ndarray]:
-        """后台捕获小地图 - 使用Win32 API"""
-        if not self.client_rect or not self.minimap_region:
-            return None
-
-        try:
-            client_width = self.client_rect[2] - self.client_rect[0]
-            client_height = self.client_rect[3] - self.client_rect[1]
-
-            # 获取窗口DC
-            hwndDC = win32gui.GetWindowDC(self.hwnd)
-            mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-            saveDC = mfcDC.CreateCompatibleDC()
-
-            # 创建位图
-            saveBitMap = win32ui.CreateBitmap()
-            saveBitMap.CreateCompatibleBitmap(mfcDC, client_width, client_height)
-            saveDC.SelectObject(saveBitMap)
-
-            # 使用PrintWindow进行后台截图
-            result = ctypes.windll.user32.PrintWindow(self.hwnd, saveDC.GetSafeHdc(), 2)
-
-            if result:
-                # 转换为numpy数组
-                bmpinfo = saveBitMap.GetInfo()
-                bmpstr = saveBitMap.GetBitmapBits(True)
-                img = np.frombuffer(bmpstr, dtype='uint8')
-                img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-                # 裁剪小地图区域
-                minimap_x, minimap_y, minimap_w, minimap_h = self.minimap_region
-                minimap = img[minimap_y:minimap_y+minimap_h, minimap_x:minimap_x+minimap_w]
-            else:
-                # PrintWindow失败，尝试BitBlt
-                saveDC.BitBlt((0, 0), (client_width, client_height), mfcDC, (0, 0), win32con.SRCCOPY)
-                bmpinfo = saveBitMap.GetInfo()
-                bmpstr = saveBitMap.GetBitmapBits(True)
-                img = np.frombuffer(bmpstr, dtype='uint8')
-                img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-                img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-
-                minimap_x, minimap_y, minimap_w, minimap_h = self.minimap_region
-                minimap = img[minimap_y:minimap_y+minimap_h, minimap_x:minimap_x+minimap_w]
-
-            # 清理资源
-            win32gui.DeleteObject(saveBitMap.GetHandle())
-            saveDC.DeleteDC()
-            mfcDC.DeleteDC()
-            win32gui.ReleaseDC(self.hwnd, hwndDC)
-
-            return minimap
-
-        except Exception as e:
-            return None
-
-    def detect_players(self) -> bool:
-        """检测是否有其他玩家"""
-        if not self.enabled:
-            return False
-
-        minimap = self.capture_minimap()
-        if minimap is None:
-            return False
-
-        with self.lock:
-            self.stats['detection_runs'] += 1
-
-        yellow_dots = self.detector.detect(minimap)
-
-        if yellow_dots:
-            with self.lock:
-                self.stats['yellow_dots_detected'] += len(yellow_dots)
-            if self.log_callback:
-                self.log_callback(f"[{self.title}] Detected {len(yellow_dots)} yellow dot(s)")
-            return True
-
-        return False
-
-    def teleport(self):
-        """传送 - 使用PostMessage向特定窗口发送按键"""
-        if not self.config.getboolean('Teleport', 'enabled', fallback=True):
-            return
-
-        current_time = time.time()
-        if current_time - self.last_teleport_time < self.teleport_cooldown:
-            return
-
-        teleport_key = self.config.get('Teleport', 'teleport_key', fallback='2')
-
-        try:
-            # 将按键字符转换为虚拟键码
-            vk_code = win32api.VkKeyScan(teleport_key)
-            vk_code = vk_code & 0xFF  # 只取低字节
-
-            # 使用PostMessage向特定窗口发送按键消息
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYDOWN, vk_code, 0)
-            time.sleep(0.05)
-            win32gui.PostMessage(self.hwnd, win32con.WM_KEYUP, vk_code, 0)
-
-            self.last_teleport_time = current_time
-            with self.lock:
-                self.stats['teleports_used'] += 1
-            if self.log_callback:
-                self.log_callback(f"[{self.title}] Teleport used (key: {teleport_key}, hwnd: {self.hwnd})")
-        except Exception as e:
-            if self.log_callback:
-                self.log_callback(f"[{self.title}] Teleport failed: {e}", "ERROR")
-
-    def _run_loop(self, detection_interval: float):
-        """独立线程运行循环"""
-        if self.log_callback:
-            self.log_callback(f"[{self.title}] Started independent monitoring")
-        
-        while self.running:
-            try:
-                if not self.enabled:
-                    time.sleep(0.1)
-                    continue
-
-                # 检查窗口是否还存在
-                if not win32gui.IsWindow(self.hwnd):
-                    if self.log_callback:
-                        self.log_callback(f"[{self.title}] Window closed")
-                    break
-
-                # 检测玩家
-                if self.detect_players():
-                    self.teleport()
-
-            except Exception as e:
-                if self.log_callback:
-                    self.log_callback(f"[{self.title}] Error: {e}", "ERROR")
-
-            time.sleep(detection_interval)
-
-        if self.log_callback:
-            self.log_callback(f"[{self.title}] Monitoring stopped")
-
-    def start(self, detection_interval: float = 0.3, log_callback=None):
-        """启动独立监控线程"""
-        if self.running:
-            return
-        
-        self.log_callback = log_callback
-        self.running = True
-        self.thread = threading.Thread(target=self._run_loop, args=(detection_interval,), daemon=True)
-        self.thread.start()
-
-    def stop(self):
-        """停止监控"""
-        self.running = False
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=1.0)
-
-    def is_valid(self) -> bool:
-        """检查窗口是否仍然有效"""
-        try:
-            return win32gui.IsWindow(self.hwnd)
-        except:
-            return False
+DEBUG_CLEANUP_INTERVAL = 900  # 900秒 = 15分钟
 
 
 class MultiWindowBotGUI:
@@ -298,11 +44,32 @@ class MultiWindowBotGUI:
 
         self.windows: Dict[int, GameWindow] = {}
         self.config = self._load_config()
+        self._init_backend()
         self.running = False
 
         self._create_widgets()
         keyboard.add_hotkey('F10', self.stop_bot)
 
+    def _init_backend(self):
+        """本进程内运行监控所需的窗口提供者、注册表、按键调度和热插拔监视"""
+        self.window_provider = Win32WindowProvider()
+        self.window_registry = WindowRegistry(self.window_provider, game_title_keywords(self.config))
+        self.calibrator = calibrator_from_config(self.config, SCRIPT_DIR)  # 所有窗口共用的小地图定位缓存
+        self.input_dispatcher = InputDispatcher(self.window_provider)  # 所有窗口共用的按键调度线程
+        self.history = WindowHistory()  # 已移除窗口的统计
+        # 窗口线程的日志先缓存，由界面线程定时取出显示（Tk控件只能在界面线程中更新）
+        self.log_buffer = LogBuffer()
+        logging.getLogger(GameWindow.__module__).addHandler(self.log_buffer)
+        self.root.after(250, self._drain_logs)
+        # 热插拔监视：运行中由统计刷新循环定时调用，新客户端自动接入、关闭的客户端自动移除
+        self.window_watcher = WindowWatcher(
+            self.window_registry,
+            on_attach=lambda info: self._attach_window(info.hwnd, info.title),
+            on_detach=lambda info, reason: self._detach_window(info.hwnd, reason),
+            on_rename=self._rename_window,
+            scan_interval=self.config.getfloat('Watcher', 'scan_interval', fallback=2.0),
+        )
+
     def _load_config(self):
         """加载配置"""
         config = configparser.ConfigParser()
@@ -330,7 +97,7 @@ class MultiWindowBotGUI:
         window_frame.pack(fill=tk.X, pady=5)
 
         # 窗口列表
-        columns = ('hwnd', 'title', 'status', 'detections', 'yellow_dots', 'teleports')
+        columns = ('hwnd', 'title', 'status', 'detections', 'yellow_dots', 'teleports', 'latency')
         self.window_tree = ttk.Treeview(window_frame, columns=columns, show='headings', height=6)
         self.window_tree.heading('hwnd', text='HWND')
         self.window_tree.heading('title', text='Window Title')
@@ -338,6 +105,7 @@ class MultiWindowBotGUI:
         self.window_tree.heading('detections', text='Detections')
         self.window_tree.heading('yellow_dots', text='Yellow Dots')
         self.window_tree.heading('teleports', text='Teleports')
+        self.window_tree.heading('latency', text='Cap/Det p95 (ms)')
 
         self.window_tree.column('hwnd', width=70)
         self.window_tree.column('title', width=220)
@@ -345,6 +113,7 @@ class MultiWindowBotGUI:
         self.window_tree.column('detections', width=80)
         self.window_tree.column('yellow_dots', width=90)
         self.window_tree.column('teleports', width=70)
+        self.window_tree.column('latency', width=110)
 
         self.window_tree.pack(fill=tk.X, pady=5)
 
@@ -373,6 +142,9 @@ class MultiWindowBotGUI:
         self.adjust_btn = ttk.Button(control_frame, text="Adjust Minimap", command=self.adjust_minimap, width=12)
         self.adjust_btn.pack(side=tk.LEFT, padx=5)
 
+        self.profile_btn = ttk.Button(control_frame, text="Profile", command=self.profile_selected, width=8)
+        self.profile_btn.pack(side=tk.LEFT, padx=5)
+
         # 状态
         status_frame = ttk.LabelFrame(main_frame, text="Status", padding="5")
         status_frame.pack(fill=tk.X, pady=5)
@@ -383,6 +155,9 @@ class MultiWindowBotGUI:
         self.stats_label = ttk.Label(status_frame, text="Windows: 0 | Total Teleports: 0", font=('Arial', 10))
         self.stats_label.pack(anchor=tk.W)
 
+        self.latency_label = ttk.Label(status_frame, text="Latency: no samples", font=('Arial', 10))
+        self.latency_label.pack(anchor=tk.W)
+
         # 日志
         log_frame = ttk.LabelFrame(main_frame, text="Log", padding="5")
         log_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -421,55 +196,64 @@ class MultiWindowBotGUI:
         self.log_text.insert(tk.END, log_entry)
         self.log_text.see(tk.END)
 
+    def _drain_logs(self):
+        """显示窗口线程的日志"""
+        lines = self.log_buffer.drain()
+        if lines:
+            self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+            self.log_text.see(tk.END)
+        self.root.after(250, self._drain_logs)
+
     def scan_windows(self):
         """扫描游戏窗口"""
         self.log("Scanning for game windows...")
-        self.window_tree.delete(*self.window_tree.get_children())
-
-        window_title = self.config.get('Game', 'window_title', fallback='九五沉默')
-        possible_titles = [window_title, 'Legend of Mir2', '传奇']
-
-        found_windows = []
-
-        def callback(hwnd, windows):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                for possible_title in possible_titles:
-                    if possible_title.lower() in title.lower():
-                        try:
-                            client_rect = win32gui.GetClientRect(hwnd)
-                            client_width = client_rect[2] - client_rect[0]
-                            client_height = client_rect[3] - client_rect[1]
-                            if client_width > 0 and client_height > 0:
-                                windows.append((hwnd, title))
-                        except:
-                            pass
-            return True
-
-        win32gui.EnumWindows(callback, found_windows)
-
-        # 停止所有现有窗口
-        for gw in self.windows.values():
-            gw.stop()
+        self.window_registry.set_titles(game_title_keywords(self.config))
+        # 已关闭的窗口移除，未变化的窗口保持运行
+        self.window_watcher.poll()
+
+        # 注册表中有但未监控的窗口（新窗口，或之前被移除的窗口）
+        for hwnd, title in self.window_registry.list():
+            if hwnd not in self.windows:
+                self._attach_window(hwnd, title)
 
-        # 更新窗口列表
-        new_windows = {}
-        for hwnd, title in found_windows:
-            new_windows[hwnd] = GameWindow(hwnd, title, self.config)
-
-            # 添加到树形列表
-            gw = new_windows[hwnd]
-            status = "Enabled" if gw.enabled else "Disabled"
-            self.window_tree.insert('', 'end', iid=str(hwnd),
-                                    values=(hwnd, gw.title[:30], status,
-                                            gw.stats['detection_runs'],
-                                            gw.stats['yellow_dots_detected'],
-                                            gw.stats['teleports_used']))
-
-        self.windows = new_windows
         self.log(f"Found {len(self.windows)} game window(s)")
         self.update_stats()
 
+    def _attach_window(self, hwnd: int, title: str):
+        """添加窗口，监控运行中时立即开始监控"""
+        if hwnd in self.windows:
+            return
+        gw = GameWindow(hwnd, title, self.config, window_provider=self.window_provider,
+                        input_dispatcher=self.input_dispatcher, calibrator=self.calibrator)
+        gw.detector.configure(self.config, SCRIPT_DIR)
+        self.windows[hwnd] = gw
+        self.window_tree.insert('', 'end', iid=str(hwnd),
+                                values=(hwnd, gw.title[:30], "Enabled", 0, 0, 0, '-'))
+        if self.running:
+            gw.teleport_cooldown = float(self.cooldown_var.get())
+            gw.start(float(self.interval_var.get()))
+            self.log(f"[{title}] Attached (hwnd: {hwnd})")
+
+    def _detach_window(self, hwnd: int, reason: str = REASON_REMOVED):
+        """移除窗口：停止监控、释放截图资源，统计并入历史记录"""
+        gw = self.windows.pop(hwnd, None)
+        if gw is None:
+            return
+        gw.stop()
+        gw.release()
+        self.input_dispatcher.forget(hwnd)
+        with gw.lock:
+            stats = dict(gw.stats)
+        self.history.record(hwnd, gw.title, gw.attached_at, stats, reason)
+        if self.window_tree.exists(str(hwnd)):
+            self.window_tree.delete(str(hwnd))
+        self.log(f"[{gw.title}] Detached ({reason})")
+
+    def _rename_window(self, info: WindowInfo):
+        gw = self.windows.get(info.hwnd)
+        if gw is not None:
+            gw.title = info.title
+
     def enable_selected(self):
         """启用选中的窗口"""
         selected = self.window_tree.selection()
@@ -490,12 +274,8 @@ class MultiWindowBotGUI:
 
     def remove_selected(self):
         """移除选中的窗口"""
-        selected = self.window_tree.selection()
-        for item in selected:
-            hwnd = int(item)
-            if hwnd in self.windows:
-                self.windows[hwnd].stop()
-                del self.windows[hwnd]
+        for item in self.window_tree.selection():
+            self._detach_window(int(item), REASON_REMOVED)
         self.refresh_window_list()
 
     def refresh_window_list(self):
@@ -504,14 +284,34 @@ class MultiWindowBotGUI:
             hwnd = int(item)
             if hwnd in self.windows:
                 gw = self.windows[hwnd]
-                status = "Enabled" if gw.enabled else "Disabled"
+                state = gw.window_state.state if gw.window_state is not None else None
                 self.window_tree.item(item, values=(
-                    hwnd, gw.title[:30], status,
+                    hwnd, gw.title[:30], self._window_status(gw.enabled, gw.running, state),
                     gw.stats['detection_runs'],
                     gw.stats['yellow_dots_detected'],
-                    gw.stats['teleports_used']
+                    gw.stats['teleports_used'],
+                    self._format_window_latency(gw)
                 ))
 
+    @staticmethod
+    def _window_status(enabled: bool, running: bool, state: Optional[str]) -> str:
+        """窗口状态列：运行中显示窗口状态机的当前状态（idle/alert/settling...）"""
+        if not enabled:
+            return "Disabled"
+        if not running:
+            return "Stopped"
+        return state or "Running"
+
+    @staticmethod
+    def _format_window_latency(gw: GameWindow) -> str:
+        """格式化单个窗口的截图/检测p95耗时"""
+        snapshot = gw.metrics.snapshot()
+        capture = snapshot[STAGE_CAPTURE]
+        detect = snapshot[STAGE_DETECT]
+        if not capture.count:
+            return '-'
+        return f"{capture.percentile(95) * 1000:.1f}/{detect.percentile(95) * 1000:.1f}"
+
     def start_bot(self):
         """开始监控"""
         if not self.windows:
@@ -526,6 +326,7 @@ class MultiWindowBotGUI:
         self.log(f"Starting monitoring {enabled_count} window(s) (independent threads)...")
         self.running = True
         self.start_time = datetime.now()  # 记录启动时间
+        self._next_cleanup = time.monotonic() + DEBUG_CLEANUP_INTERVAL
 
         # 更新配置
         self.config.set('Teleport', 'teleport_key', self.teleport_key_var.get())
@@ -538,7 +339,7 @@ class MultiWindowBotGUI:
         for gw in self.windows.values():
             gw.config = self.config
             gw.teleport_cooldown = float(self.cooldown_var.get())
-            gw.start(detection_interval, self.log)
+            gw.start(detection_interval)
 
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
@@ -553,23 +354,28 @@ class MultiWindowBotGUI:
         # 停止所有窗口线程
         for gw in self.windows.values():
             gw.stop()
+        self.input_dispatcher.stop()  # 补发未抬起的按键
 
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_label.config(text="Status: Stopped")
         self.log("Monitoring stopped")
+        for gw in self.windows.values():
+            for line in gw.metrics.format_lines():
+                self.log(f"[{gw.title}] {line}")
 
     def _update_stats_loop(self):
         """更新统计"""
         if self.running:
+            self.window_watcher.tick()
             self.update_stats()
             self.refresh_window_list()
             
-            # 每15分钟清理一次debug目录
-            if hasattr(self, 'start_time') and self.start_time:
-                elapsed = (datetime.now() - self.start_time).total_seconds()
-                if int(elapsed) > 0 and int(elapsed) % 900 == 0:  # 900秒 = 15分钟
-                    self._cleanup_debug_dir()
+            # 每15分钟清理一次debug目录（单调时钟，不会跳过或重复）
+            now = time.monotonic()
+            if now >= self._next_cleanup:
+                self._next_cleanup = now + DEBUG_CLEANUP_INTERVAL
+                self._cleanup_debug_dir()
             
             self.root.after(1000, self._update_stats_loop)
     
@@ -596,10 +402,20 @@ class MultiWindowBotGUI:
     def update_stats(self):
         """更新统计显示"""
         enabled = sum(1 for gw in self.windows.values() if gw.enabled)
-        total_teleports = sum(gw.stats['teleports_used'] for gw in self.windows.values())
-        total_detections = sum(gw.stats['yellow_dots_detected'] for gw in self.windows.values())
+        totals = self.history.add_totals({
+            'teleports_used': sum(gw.stats['teleports_used'] for gw in self.windows.values()),
+            'yellow_dots_detected': sum(gw.stats['yellow_dots_detected'] for gw in self.windows.values()),
+        })
+        total_teleports = totals['teleports_used']
+        total_detections = totals['yellow_dots_detected']
         self.stats_label.config(text=f"Windows: {len(self.windows)} ({enabled} enabled) | Yellow Dots: {total_detections} | Teleports: {total_teleports}")
 
+        # 合并所有窗口的耗时直方图
+        merged = WindowMetrics()
+        for gw in self.windows.values():
+            merged.merge(gw.metrics)
+        self.latency_label.config(text=f"Latency: {merged.format_compact((STAGE_CAPTURE, STAGE_DETECT, STAGE_REACTION))}")
+
     def test_selected(self):
         """测试选中的窗口"""
         selected = self.window_tree.selection()
@@ -613,7 +429,7 @@ class MultiWindowBotGUI:
                 gw = self.windows[hwnd]
                 self.log(f"Testing window: {gw.title}")
 
-                minimap = gw.capture_minimap()
+                minimap = gw.test_capture()  # 不与监控线程争用截图源和环形缓冲区
                 if minimap is not None:
                     yellow_dots = gw.detector.detect(minimap)
                     self.log(f"  Result: {len(yellow_dots)} yellow dot(s) detected")
@@ -627,6 +443,23 @@ class MultiWindowBotGUI:
                 else:
                     self.log(f"  Failed to capture minimap", "ERROR")
 
+    def profile_selected(self):
+        """性能分析：采样所有线程调用栈，并对选中（或第一个运行中）窗口的检测循环做cProfile"""
+        running = [gw for gw in self.windows.values() if gw.running]
+        if not running:
+            messagebox.showinfo("Info", "Start monitoring before profiling")
+            return
+        selected = [self.windows[int(item)] for item in self.window_tree.selection()
+                    if int(item) in self.windows and self.windows[int(item)].running]
+        target = selected[0] if selected else running[0]
+
+        profiler = BotProfiler()
+        stacks_path = profiler.sample_stacks(5.0)
+        loop_path = profiler.profile_loop(target, 10.0, f"{target.hwnd}")
+        self.log(f"Profiling started, stacks -> {os.path.basename(stacks_path)}")
+        if loop_path:
+            self.log(f"[{target.title}] Loop profile (10s) -> {os.path.basename(loop_path)}")
+
     def adjust_minimap(self):
         """调整小地图范围"""
         from mir2_bot_gui_v2 import MinimapAdjustWindow
@@ -635,9 +468,11 @@ class MultiWindowBotGUI:
     def _on_minimap_adjusted(self):
         """小地图调整完成"""
         self.config = self._load_config()
+        self.calibrator = calibrator_from_config(self.config, SCRIPT_DIR)  # 手动调整后关闭自动定位
         # 重新初始化所有窗口
         for hwnd, gw in self.windows.items():
             gw.config = self.config
+            gw.calibrator = self.calibrator
             gw._init_window()
         self.log("Minimap settings updated for all windows")
 
@@ -664,8 +499,169 @@ class MultiWindowBotGUI:
         self.root.destroy()
 
 
+class RemoteBotGUI(MultiWindowBotGUI):
+    """
+    守护进程客户端GUI
+
+    监控在 bot_daemon.py 进程中运行，本界面只发送命令并显示推送的状态；
+    界面重绘和日志控件不再与检测线程争用同一进程，关闭界面不影响守护进程
+    """
+
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self._shown_seq = 0
+        super().__init__()
+        self.root.title("Legend of Mir 2 Auto Bot V2 - Multi-Window (Daemon Client)")
+        self.stop_btn.config(state=tk.NORMAL)
+        self.status_label.config(text=f"Status: Connected to daemon {client.host}:{client.port}")
+        self._poll_daemon()
+
+    def _init_backend(self):
+        # 窗口、截图和按键都在守护进程中
+        pass
+
+    def _call(self, cmd: str, **args):
+        """发送命令，失败时写日志并返回None"""
+        try:
+            return self.client.request(cmd, **args)
+        except DaemonError as e:
+            self.log(f"Daemon command '{cmd}' failed: {e}", "ERROR")
+            return None
+
+    def _selected_hwnds(self) -> List[int]:
+        return [int(item) for item in self.window_tree.selection()]
+
+    def _settings(self) -> Dict[str, str]:
+        return {'teleport_key': self.teleport_key_var.get(), 'cooldown': self.cooldown_var.get(),
+                'detection_interval': self.interval_var.get()}
+
+    def scan_windows(self):
+        count = self._call('scan')
+        if count is not None:
+            self.log(f"Found {count} game window(s)")
+
+    def enable_selected(self):
+        self._call('start', hwnds=self._selected_hwnds())
+
+    def disable_selected(self):
+        self._call('stop', hwnds=self._selected_hwnds())
+
+    def remove_selected(self):
+        self._call('remove', hwnds=self._selected_hwnds())
+
+    def start_bot(self):
+        if self._call('configure', **self._settings()) is None:
+            return
+        started = self._call('start')
+        if started is not None:
+            self.log(f"Started {len(started)} window(s) in daemon")
+
+    def stop_bot(self):
+        stopped = self._call('stop')
+        if stopped is not None:
+            self.log(f"Stopped {len(stopped)} window(s) in daemon")
+
+    def _poll_daemon(self):
+        """显示读取线程收到的最新推送（界面只在Tk线程中更新）"""
+        lines = self.client.drain_logs()
+        if lines:
+            self.log_text.insert(tk.END, '\n'.join(lines) + '\n')
+            self.log_text.see(tk.END)
+        if self.client.state_seq != self._shown_seq and self.client.latest_state is not None:
+            self._shown_seq = self.client.state_seq
+            self._apply_state(self.client.latest_state)
+        if not self.client.connected:
+            self.status_label.config(text="Status: Disconnected from daemon")
+            self.log("Daemon connection closed", "WARNING")
+            return
+        self.root.after(250, self._poll_daemon)
+
+    def _apply_state(self, state: Dict):
+        """用推送的状态刷新窗口列表和统计"""
+        rows = {row['hwnd']: row for row in state['windows']}
+        for item in self.window_tree.get_children():
+            if int(item) not in rows:
+                self.window_tree.delete(item)
+        for hwnd, row in rows.items():
+            stats = row['stats']
+            latency = '-' if row['capture_p95_ms'] is None else f"{row['capture_p95_ms']:.1f}/{row['detect_p95_ms']:.1f}"
+            values = (hwnd, row['title'][:30], self._window_status(True, row['running'], row.get('state')),
+                      stats.get('detection_runs', 0), stats.get('yellow_dots_detected', 0),
+                      stats.get('teleports_used', 0), latency)
+            if self.window_tree.exists(str(hwnd)):
+                self.window_tree.item(str(hwnd), values=values)
+            else:
+                self.window_tree.insert('', 'end', iid=str(hwnd), values=values)
+
+        running = sum(1 for row in rows.values() if row['running'])
+        totals = state['totals']
+        self.status_label.config(text=f"Status: Daemon {'Running' if state['running'] else 'Idle'} "
+                                      f"({running} window(s) active)")
+        self.stats_label.config(text=f"Windows: {len(rows)} ({running} running) | "
+                                     f"Yellow Dots: {totals.get('yellow_dots_detected', 0)} | "
+                                     f"Teleports: {totals.get('teleports_used', 0)}")
+        self.latency_label.config(text=f"Latency: {state['latency']}")
+
+    def refresh_window_list(self):
+        if self.client.latest_state is not None:
+            self._apply_state(self.client.latest_state)
+
+    def update_stats(self):
+        self.refresh_window_list()
+
+    def test_selected(self):
+        hwnds = self._selected_hwnds()
+        if not hwnds:
+            messagebox.showinfo("Info", "Please select a window to test")
+            return
+        for hwnd in hwnds:
+            result = self._call('test', hwnd=hwnd, save=True)
+            if result is None:
+                continue
+            if result['captured']:
+                self.log(f"[{hwnd}] Result: {result['dots']} yellow dot(s) detected, image: {result.get('image')}")
+            else:
+                self.log(f"[{hwnd}] Failed to capture minimap", "ERROR")
+
+    def profile_selected(self):
+        hwnds = self._selected_hwnds()
+        if self._call('profile', duration=10.0, hwnd=hwnds[0] if hwnds else None):
+            self.log("Profiling started in daemon (results in daemon's profiles/ directory)")
+
+    def _on_minimap_adjusted(self):
+        self.config = self._load_config()
+        if self._call('reload') is not None:
+            self.log("Minimap settings reloaded by daemon")
+
+    def save_settings(self):
+        if self._call('configure', save=True, **self._settings()) is not None:
+            self.log("Settings saved by daemon")
+
+    def on_closing(self):
+        # 守护进程继续运行
+        self.client.close()
+        keyboard.unhook_all()
+        self.root.destroy()
+
+
 def main():
-    gui = MultiWindowBotGUI()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='传奇2自动挂机脚本 V2 - 多窗口GUI')
+    parser.add_argument('--connect', nargs='?', const='', default=None, metavar='HOST:PORT',
+                        help='连接 bot_daemon.py 守护进程（界面只作为客户端），默认 127.0.0.1:9109')
+    args = parser.parse_args()
+
+    if args.connect is not None:
+        client = DaemonClient(*parse_address(args.connect))
+        try:
+            client.connect()
+        except (OSError, DaemonError) as e:
+            print(f"无法连接守护进程 {client.host}:{client.port}: {e}")
+            return
+        gui = RemoteBotGUI(client)
+    else:
+        gui = MultiWindowBotGUI()
     gui.root.protocol("WM_DELETE_WINDOW", gui.on_closing)
     gui.run()
 
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+多进程扩展模块
+功能: 把游戏窗口分配到多个工作进程，每个进程运行自己的截图/检测循环，突破单进程GIL限制
+特性: 监督线程负责窗口分配（每次分给窗口最少的进程）、崩溃重启（原窗口自动重新分配）
+      和统计汇总（工作进程通过管道定时上报），已退出进程的计数保留，累计值不会回退
+
+使用方法:
+  python process_pool.py --windows 32 --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+
+from frame_source import FrameSource, SyntheticMinimapSource, VirtualWindowProvider, WindowProvider
+
+logger = logging.getLogger(__name__)
+
+# 管道消息
+MSG_ASSIGN = 'assign'    # (MSG_ASSIGN, hwnd, 标题)
+MSG_REMOVE = 'remove'    # (MSG_REMOVE, hwnd)
+MSG_STOP = 'stop'        # (MSG_STOP,)
+MSG_STATS = 'stats'      # (MSG_STATS, 快照) 工作进程 -> 监督线程
+
+COUNTER_NAMES = ('yellow_dots_detected', 'teleports_used', 'detection_runs')
+
+
+def register_virtual_window(provider: WindowProvider, hwnd: int, title: str):
+    """在子进程的虚拟窗口提供者中重建父进程分配的窗口（压测用）"""
+    if not provider.is_window(hwnd):
+        provider.add_window(title, hwnd=hwnd)
+
+
+def synthetic_source(hwnd: int) -> FrameSource:
+    """模拟截图源（压测用，可被pickle传给子进程）"""
+    return SyntheticMinimapSource(dots=2, seed=hwnd)
+
+
+def _worker_snapshot(bot) -> Dict:
+    windows = {}
+    for gw, stats, gauges, metrics, state in bot.window_rows():
+        # 直方图只发送非空桶，父进程的指标服务和守护进程按窗口恢复
+        histograms = {stage: h.to_dict() for stage, h in metrics.snapshot().items() if h.count}
+        windows[gw.hwnd] = dict(stats, **gauges, state=state, metrics=histograms)
+    return {'pid': os.getpid(), 'counters': bot._collect_counters(), 'windows': windows,
+            'queues': bot.collect_queues()}
+
+
+def worker_main(worker_id: int, conn, config_file: str,
+                provider_factory: Optional[Callable[[], WindowProvider]],
+                source_factory: Optional[Callable[[int], FrameSource]],
+                window_setup: Optional[Callable[[WindowProvider, int, str], None]],
+                stats_interval: float):
+    """工作进程入口：按管道命令增删窗口，定时上报统计"""
+    from mir2_multi_window_bot import MultiWindowBot
+    from window_watcher import REASON_REMOVED
+
+    provider = provider_factory() if provider_factory is not None else None
+    bot = MultiWindowBot(config_file, window_provider=provider, source_factory=source_factory)
+    bot.running = True
+    next_report = 0.0
+    try:
+        while True:
+            if conn.poll(min(stats_interval, 0.5)):
+                message = conn.recv()
+                command = message[0]
+                if command == MSG_ASSIGN:
+                    _, hwnd, title = message
+                    if window_setup is not None:
+                        window_setup(bot.window_provider, hwnd, title)
+                    bot.attach_window(hwnd, title)
+                elif command == MSG_REMOVE:
+                    bot.remove_window(message[1], REASON_REMOVED)
+                elif command == MSG_STOP:
+                    break
+            now = time.monotonic()
+            if now >= next_report:
+                next_report = now + stats_interval
+                conn.send((MSG_STATS, _worker_snapshot(bot)))
+    except (EOFError, OSError, KeyboardInterrupt):
+        pass  # 父进程已退出
+    finally:
+        bot.stop()
+        try:
+            conn.send((MSG_STATS, _worker_snapshot(bot)))
+            conn.close()
+        except (OSError, ValueError):
+            pass
+
+
+class WorkerHandle:
+    """监督线程持有的工作进程信息"""
+
+    __slots__ = ('worker_id', 'process', 'conn', 'windows', 'snapshot', 'restarts', 'started_at')
+
+    def __init__(self, worker_id: int, process, conn, windows: Dict[int, str], restarts: int = 0):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self.windows = windows    # hwnd -> 标题
+        self.snapshot: Optional[Dict] = None
+        self.restarts = restarts
+        self.started_at = time.monotonic()
+
+    def counters(self) -> Dict[str, int]:
+        if self.snapshot is None:
+            return {}
+        return self.snapshot['counters']
+
+
+class ProcessPoolSupervisor:
+    """多进程监督器（线程安全）"""
+
+    def __init__(self, config_file: str, workers: int = None,
+                 provider_factory: Callable[[], WindowProvider] = None,
+                 source_factory: Callable[[int], FrameSource] = None,
+                 window_setup: Callable[[WindowProvider, int, str], None] = None,
+                 stats_interval: float = 1.0, context=None):
+        """
+        Args:
+            config_file: 配置文件路径（工作进程各自加载）
+            workers: 工作进程数，默认CPU核数
+            provider_factory: 子进程中创建窗口提供者，默认win32（需可pickle）
+            source_factory: 子进程中 hwnd -> 截图源，默认按配置创建（需可pickle）
+            window_setup: 子进程接收窗口时的准备函数（压测时重建虚拟窗口）
+            stats_interval: 统计上报和健康检查间隔（秒）
+            context: multiprocessing上下文，默认平台默认值（Windows为spawn）
+        """
+        self.config_file = config_file
+        self.worker_count = max(1, workers or os.cpu_count() or 1)
+        self.provider_factory = provider_factory
+        self.source_factory = source_factory
+        self.window_setup = window_setup
+        self.stats_interval = stats_interval
+        self.context = context or multiprocessing.get_context()
+
+        self.lock = threading.RLock()
+        self.workers: List[WorkerHandle] = []
+        self.assignments: Dict[int, int] = {}  # hwnd -> 工作进程序号
+        self.retired: Dict[str, int] = {name: 0 for name in COUNTER_NAMES}  # 已退出进程的最后计数
+        self.restarts = 0
+        self._stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def _spawn(self, worker_id: int, windows: Dict[int, str] = None, restarts: int = 0) -> WorkerHandle:
+        parent_conn, child_conn = self.context.Pipe()
+        process = self.context.Process(
+            target=worker_main,
+            args=(worker_id, child_conn, self.config_file, self.provider_factory,
+                  self.source_factory, self.window_setup, self.stats_interval),
+            name=f'bot-worker-{worker_id}', daemon=True)
+        process.start()
+        child_conn.close()
+        handle = WorkerHandle(worker_id, process, parent_conn, dict(windows or {}), restarts)
+        for hwnd, title in handle.windows.items():
+            self._send(handle, (MSG_ASSIGN, hwnd, title))
+        logger.info(f"工作进程 {worker_id} 已启动 (pid: {process.pid}, 窗口: {len(handle.windows)})")
+        return handle
+
+    def _send(self, handle: WorkerHandle, message):
+        try:
+            handle.conn.send(message)
+        except (OSError, ValueError):
+            pass  # 进程已退出，由健康检查重启并重新分配
+
+    def start(self):
+        """启动所有工作进程和监督线程（每个监督器只能启动一次）"""
+        with self.lock:
+            if self.workers:
+                return
+            self.workers = [self._spawn(i) for i in range(self.worker_count)]
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='pool-supervisor', daemon=True)
+        self.thread.start()
+
+    def assign(self, hwnd: int, title: str) -> Optional[int]:
+        """把窗口分配给当前窗口最少的工作进程，返回进程序号"""
+        with self.lock:
+            if hwnd in self.assignments:
+                return self.assignments[hwnd]
+            if not self.workers or self._stop_event.is_set():
+                return None
+            handle = min(self.workers, key=lambda w: len(w.windows))
+            handle.windows[hwnd] = title
+            self.assignments[hwnd] = handle.worker_id
+            self._send(handle, (MSG_ASSIGN, hwnd, title))
+            return handle.worker_id
+
+    def remove(self, hwnd: int):
+        """移除窗口"""
+        with self.lock:
+            worker_id = self.assignments.pop(hwnd, None)
+            if worker_id is None:
+                return
+            handle = self.workers[worker_id]
+            handle.windows.pop(hwnd, None)
+            self._send(handle, (MSG_REMOVE, hwnd))
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self.lock:
+                handles = {w.conn: w for w in self.workers}
+            try:
+                ready = multiprocessing.connection.wait(list(handles), timeout=self.stats_interval)
+            except OSError:
+                ready = []
+            for conn in ready:
+                handle = handles[conn]
+                try:
+                    while conn.poll():
+                        kind, payload = conn.recv()
+                        if kind == MSG_STATS:
+                            handle.snapshot = payload
+                except (EOFError, OSError):
+                    handle.process.join(0.5)  # 进程已退出，下面的健康检查处理
+            if not self._stop_event.is_set():
+                self._check_workers()
+
+    def _check_workers(self):
+        """重启已退出的工作进程并重新分配其窗口"""
+        with self.lock:
+            for index, handle in enumerate(self.workers):
+                if handle.process.is_alive():
+                    continue
+                logger.warning(f"工作进程 {handle.worker_id} 已退出 (exitcode: {handle.process.exitcode})，正在重启")
+                for name, value in handle.counters().items():
+                    self.retired[name] = self.retired.get(name, 0) + value
+                try:
+                    handle.conn.close()
+                except OSError:
+                    pass
+                self.restarts += 1
+                self.workers[index] = self._spawn(handle.worker_id, handle.windows, handle.restarts + 1)
+
+    def collect_counters(self) -> Dict[str, int]:
+        """汇总所有工作进程的累计计数（含已退出进程）"""
+        with self.lock:
+            totals = dict(self.retired)
+            for handle in self.workers:
+                for name, value in handle.counters().items():
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def window_stats(self) -> Dict[int, Dict]:
+        """各窗口最近一次上报的统计"""
+        result = {}
+        with self.lock:
+            for handle in self.workers:
+                if handle.snapshot is not None:
+                    for hwnd, stats in handle.snapshot['windows'].items():
+                        result[hwnd] = dict(stats, worker=handle.worker_id)
+        return result
+
+    def collect_queues(self) -> Dict[str, Dict[str, int]]:
+        """各工作进程最近一次上报的队列深度和计数之和"""
+        totals: Dict[str, Dict[str, int]] = {}
+        with self.lock:
+            for handle in self.workers:
+                if handle.snapshot is None:
+                    continue
+                for name, values in handle.snapshot.get('queues', {}).items():
+                    queue = totals.setdefault(name, {})
+                    for key, value in values.items():
+                        queue[key] = queue.get(key, 0) + value
+        return totals
+
+    def stop(self, timeout: float = 5.0):
+        """通知所有工作进程退出，超时后强制结束"""
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join(self.stats_interval + 1.0)
+            self.thread = None
+
+        # 工作进程列表保留（含最后一次统计），停止后仍可读取汇总
+        with self.lock:
+            workers = list(self.workers)
+            self.assignments.clear()
+        for handle in workers:
+            self._send(handle, (MSG_STOP,))
+        deadline = time.monotonic() + timeout
+        for handle in workers:
+            handle.process.join(max(0.0, deadline - time.monotonic()))
+            # 读取退出前的最后一次统计
+            try:
+                while handle.conn.poll():
+                    kind, payload = handle.conn.recv()
+                    if kind == MSG_STATS:
+                        handle.snapshot = payload
+            except (EOFError, OSError):
+                pass
+            if handle.process.is_alive():
+                logger.warning(f"工作进程 {handle.worker_id} 未按时退出，强制结束")
+                handle.process.terminate()
+                handle.process.join(1.0)
+            handle.conn.close()
+
+
+def run_scaling_benchmark(windows: int, worker_counts: List[int], duration: float,
+                          detection_interval: float = 0.0) -> List[Dict]:
+    """
+    多进程扩展性压测：模拟窗口，统计每秒检测次数
+
+    Returns:
+        每个进程数的结果 [{'workers', 'detections_per_second', 'speedup'}, ...]
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        config_file = os.path.join(tmp, 'pool_bench.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(f"[Detection]\ndetection_interval = {detection_interval}\n"
+                    f"[Teleport]\nenabled = false\n[Watcher]\nenabled = false\n")
+
+        provider = VirtualWindowProvider()
+        hwnds = [provider.add_window(f'九五沉默 - {i}') for i in range(windows)]
+        base = None
+        for workers in worker_counts:
+            supervisor = ProcessPoolSupervisor(config_file, workers, provider_factory=VirtualWindowProvider,
+                                               source_factory=synthetic_source,
+                                               window_setup=register_virtual_window, stats_interval=0.5)
+            supervisor.start()
+            for hwnd in hwnds:
+                supervisor.assign(hwnd, f'九五沉默 - {hwnd}')
+            time.sleep(min(2.0, duration / 2))  # 预热（进程启动、导入）
+            start_count = supervisor.collect_counters()['detection_runs']
+            started = time.monotonic()
+            time.sleep(duration)
+            count = supervisor.collect_counters()['detection_runs'] - start_count
+            elapsed = time.monotonic() - started
+            supervisor.stop()
+
+            rate = count / elapsed if elapsed > 0 else 0.0
+            base = base or rate
+            results.append({'workers': workers, 'detections_per_second': rate,
+                            'speedup': rate / base if base else 0.0})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程模式扩展性压测（模拟窗口）')
+    parser.add_argument('--windows', type=int, default=32, help='模拟窗口数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='要测试的工作进程数')
+    parser.add_argument('--duration', type=float, default=10.0, help='每组测量时长（秒）')
+    parser.add_argument('--interval', type=float, default=0.0, help='检测间隔（秒），0为满负荷')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(f"{'workers':>8}{'det/s':>12}{'speedup':>10}   (CPU核数: {os.cpu_count()})")
+    for result in run_scaling_benchmark(args.windows, args.workers, args.duration, args.interval):
+        print(f"{result['workers']:>8}{result['detections_per_second']:>12.1f}{result['speedup']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+小地图静态特征排除掩码
+功能: 自动学习在连续很多帧中一直是黄色的像素（界面叠加层、地图上固定的黄色标记），在提取黄点前排除，减少误传送
+特性: 学习阶段每帧只做一次计数累加；学习完成后每帧只做一次按位与（与黄色掩码同尺寸的0/255掩码）；
+      按小地图尺寸（和地图标识）分别按位压缩保存，启动时自动加载，无需重新学习
+
+配置:
+  [StaticMask]
+  enabled = false           # 启用后自动学习并排除
+  learn_frames = 200        # 学习的帧数
+  threshold = 0.98          # 像素在学习帧中为黄色的比例达到该值时视为静态
+  dilate = 1                # 静态区域向外扩展的像素（覆盖抗锯齿边缘）
+  file_prefix = static_mask # 保存文件名前缀（与配置文件同目录），文件名为 前缀_宽x高[_地图].npz
+
+重新学习: 删除对应的 .npz 文件后重启
+"""
+
+import logging
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEARN_FRAMES = 200
+DEFAULT_THRESHOLD = 0.98
+DEFAULT_DILATE = 1
+DEFAULT_FILE_PREFIX = 'static_mask'
+
+
+def save_static_mask(path: str, static: np.ndarray):
+    """按位压缩保存静态像素（150x150约3KB）"""
+    temp_path = f"{path}.{os.getpid()}.tmp"  # 多个窗口可能同时保存同一尺寸的掩码
+    with open(temp_path, 'wb') as f:
+        np.savez_compressed(f, bits=np.packbits(static != 0), shape=np.array(static.shape, dtype=np.int32))
+    os.replace(temp_path, path)
+
+
+def load_static_mask(path: str) -> np.ndarray:
+    """加载静态像素（bool数组）"""
+    with np.load(path) as data:
+        shape = tuple(int(v) for v in data['shape'])
+        return np.unpackbits(data['bits'], count=shape[0] * shape[1]).reshape(shape).astype(bool)
+
+
+class StaticMask:
+    """
+    单个窗口的静态特征掩码（检测线程使用）
+
+    apply() 在检测器提取点之前对前景掩码原地处理：学习阶段累计，学习完成后排除静态像素；
+    小地图尺寸或地图变化时自动切换到对应的掩码（没有保存过的重新学习）
+    """
+
+    def __init__(self, directory: str = None, file_prefix: str = DEFAULT_FILE_PREFIX,
+                 learn_frames: int = DEFAULT_LEARN_FRAMES, threshold: float = DEFAULT_THRESHOLD,
+                 dilate: int = DEFAULT_DILATE):
+        self.directory = directory
+        self.file_prefix = file_prefix
+        self.learn_frames = learn_frames
+        self.threshold = threshold
+        self.dilate = dilate
+        self.map_key = ''
+        self.shape: Optional[Tuple[int, int]] = None
+        self.keep: Optional[np.ndarray] = None      # 0为排除的静态像素，255为保留
+        self._counts: Optional[np.ndarray] = None   # 学习阶段每个像素为前景的帧数
+        self._frames = 0
+
+    @classmethod
+    def from_config(cls, config, base_dir: str = None) -> Optional['StaticMask']:
+        """根据 [StaticMask] 配置创建，未启用时返回None"""
+        if not config.getboolean('StaticMask', 'enabled', fallback=False):
+            return None
+        return cls(directory=base_dir,
+                   file_prefix=config.get('StaticMask', 'file_prefix', fallback=DEFAULT_FILE_PREFIX),
+                   learn_frames=config.getint('StaticMask', 'learn_frames', fallback=DEFAULT_LEARN_FRAMES),
+                   threshold=config.getfloat('StaticMask', 'threshold', fallback=DEFAULT_THRESHOLD),
+                   dilate=config.getint('StaticMask', 'dilate', fallback=DEFAULT_DILATE))
+
+    def for_map(self, map_key: str) -> 'StaticMask':
+        """同样设置的另一个地图的掩码（见 map_fingerprint.MapRegistry）"""
+        mask = StaticMask(self.directory, self.file_prefix, self.learn_frames, self.threshold, self.dilate)
+        mask.map_key = map_key
+        return mask
+
+    @property
+    def learning(self) -> bool:
+        return self._counts is not None
+
+    def path_for(self, shape: Tuple[int, int]) -> Optional[str]:
+        if not self.directory:
+            return None
+        suffix = f"_{self.map_key}" if self.map_key else ''
+        return os.path.join(self.directory, f"{self.file_prefix}_{shape[1]}x{shape[0]}{suffix}.npz")
+
+    def select(self, shape: Tuple[int, int], map_key: str = None):
+        """切换到某个尺寸（和地图）的掩码：加载保存的掩码，没有时开始学习"""
+        self.shape = shape
+        if map_key is not None:
+            self.map_key = map_key
+        self.keep = None
+        self._counts = None
+        self._frames = 0
+        path = self.path_for(shape)
+        if path and os.path.exists(path):
+            try:
+                static = load_static_mask(path)
+                if static.shape == shape:
+                    self._set_static(static)
+                    logger.info(f"已加载静态掩码 {os.path.basename(path)}，排除 {int(static.sum())} 个像素")
+                    return
+                logger.warning(f"静态掩码尺寸不符，重新学习: {path}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"加载静态掩码失败，重新学习: {e}")
+        self._counts = np.zeros(shape, dtype=np.uint16)
+
+    def _set_static(self, static: np.ndarray):
+        self.keep = np.where(static, 0, 255).astype(np.uint8)
+
+    def _finish_learning(self):
+        static = self._counts >= self.threshold * self._frames
+        if self.dilate > 0 and static.any():
+            kernel = np.ones((2 * self.dilate + 1, 2 * self.dilate + 1), dtype=np.uint8)
+            static = cv2.dilate(static.view(np.uint8), kernel).view(bool)
+        self._counts = None
+        self._set_static(static)
+        path = self.path_for(self.shape)
+        if path:
+            try:
+                save_static_mask(path, static)
+            except OSError as e:
+                logger.warning(f"保存静态掩码失败: {e}")
+        logger.info(f"静态掩码学习完成（{self._frames} 帧），排除 {int(static.sum())} 个像素")
+
+    def apply(self, mask: np.ndarray) -> np.ndarray:
+        """
+        处理前景掩码（原地修改并返回）
+
+        Args:
+            mask: 前景掩码或类别标签（非0为前景），uint8
+        """
+        if mask.shape != self.shape:
+            self.select(mask.shape)
+        if self._counts is not None:
+            self._counts += mask != 0
+            self._frames += 1
+            if self._frames >= self.learn_frames:
+                self._finish_learning()
+            return mask
+        return cv2.bitwise_and(mask, self.keep, dst=mask)
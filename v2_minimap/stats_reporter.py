@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+定时统计报告模块
+功能: 在独立线程中按单调时钟定时输出统计，包含区间增量和速率
+特性: 不占用检测循环，错过的周期直接跳过，不会重复或漏报
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认显示名称
+DEFAULT_LABELS = {
+    'detection_runs': '检测次数',
+    'yellow_dots_detected': '黄点检测',
+    'teleports_used': '使用传送',
+}
+
+# 默认速率：计数名 -> (换算秒数, 单位)
+DEFAULT_RATES = {
+    'detection_runs': (1.0, '次/秒'),
+    'teleports_used': (3600.0, '次/小时'),
+}
+
+
+class StatsReport:
+    """单个统计周期的结果"""
+
+    __slots__ = ('elapsed', 'period', 'totals', 'deltas')
+
+    def __init__(self, elapsed: float, period: float, totals: Dict[str, int], deltas: Dict[str, int]):
+        self.elapsed = elapsed    # 从启动到现在的秒数
+        self.period = period      # 本周期实际长度（秒）
+        self.totals = totals
+        self.deltas = deltas
+
+    def rate(self, name: str, per: float = 1.0) -> float:
+        """本周期内的速率，per=3600表示每小时"""
+        if self.period <= 0:
+            return 0.0
+        return self.deltas.get(name, 0) * per / self.period
+
+    def format(self, labels: Dict[str, str] = None, rates: Dict[str, Tuple[float, str]] = None) -> str:
+        """格式化为一行日志"""
+        labels = DEFAULT_LABELS if labels is None else labels
+        rates = DEFAULT_RATES if rates is None else rates
+        parts = [f"运行时间: {int(self.elapsed // 60)}分钟"]
+        for name, label in labels.items():
+            if name not in self.totals:
+                continue
+            detail = f"+{self.deltas.get(name, 0)}"
+            if name in rates:
+                per, unit = rates[name]
+                detail += f", {self.rate(name, per):.2f}{unit}"
+            parts.append(f"{label}: {self.totals[name]} ({detail})")
+        return " | ".join(parts)
+
+
+class StatsReporter:
+    """定时统计报告器（独立线程，单调时钟）"""
+
+    def __init__(self, collect: Callable[[], Dict[str, int]], interval: float = 60.0,
+                 log: Callable[[str], None] = None, labels: Dict[str, str] = None,
+                 rates: Dict[str, Tuple[float, str]] = None):
+        """
+        Args:
+            collect: 返回当前累计计数的函数（在报告线程中调用）
+            interval: 报告周期（秒）
+            log: 输出函数，默认写入logger
+            labels: 计数名 -> 显示名称
+            rates: 计数名 -> (换算秒数, 单位)
+        """
+        self.collect = collect
+        self.interval = max(0.01, float(interval))
+        self.log = log if log is not None else logger.info
+        self.labels = labels
+        self.rates = rates
+        self.last_report: Optional[StatsReport] = None
+
+        # 附加定时任务: [下次时间, 周期, 函数]
+        self._tasks: List[list] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._last_time = 0.0
+        self._last_totals: Dict[str, int] = {}
+
+    def add_task(self, period: float, func: Callable[[], None]):
+        """添加附加定时任务（如清理debug目录），在报告线程中执行"""
+        self._tasks.append([time.monotonic() + period, period, func])
+
+    def start(self):
+        """启动报告线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._started_at = self._last_time = time.monotonic()
+        self._last_totals = dict(self.collect())
+        for task in self._tasks:
+            task[0] = self._started_at + task[1]
+        self._thread = threading.Thread(target=self._run, name='stats-reporter', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止报告线程"""
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _run(self):
+        next_report = self._started_at + self.interval
+        while True:
+            now = time.monotonic()
+            due = min([next_report] + [task[0] for task in self._tasks])
+            if self._stop_event.wait(max(0.0, due - now)):
+                break
+
+            now = time.monotonic()
+            if now >= next_report:
+                self._safe_call(self.report_now)
+                next_report = self._advance(next_report, self.interval, now)
+            for task in self._tasks:
+                if now >= task[0]:
+                    self._safe_call(task[2])
+                    task[0] = self._advance(task[0], task[1], now)
+
+    @staticmethod
+    def _advance(due: float, period: float, now: float) -> float:
+        """计算下一次时间，落后时跳过错过的周期"""
+        due += period
+        if due <= now:
+            due += ((now - due) // period + 1) * period
+        return due
+
+    def _safe_call(self, func: Callable[[], None]):
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"统计任务执行失败: {e}")
+
+    def report_now(self) -> StatsReport:
+        """立即生成并输出一次统计"""
+        now = time.monotonic()
+        totals = dict(self.collect())
+        deltas = {name: value - self._last_totals.get(name, 0) for name, value in totals.items()}
+        report = StatsReport(now - self._started_at, now - self._last_time, totals, deltas)
+        self._last_time = now
+        self._last_totals = totals
+        self.last_report = report
+        self.log(report.format(self.labels, self.rates))
+        return report
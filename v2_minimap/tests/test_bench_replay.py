@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+bench_replay 单元测试
+测试模拟画面和基准结果格式
+"""
+
+import pytest
+import sys
+import os
+import tracemalloc
+
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from bench_replay import synthetic_minimaps, synthetic_screens, run_benchmark, run_stage, compare
+from frame_source import ReplaySource
+
+
+class TestSynthetic:
+    """模拟画面测试类"""
+
+    def test_synthetic_frames(self):
+        """测试模拟画面尺寸和可复现性"""
+        minimaps = synthetic_minimaps(3, seed=1)
+        screens = synthetic_screens(2, width=640, height=480)
+        assert len(minimaps) == 3
+        assert minimaps[0][1].shape == (150, 150, 3)
+        assert screens[0][1].shape == (480, 640, 3)
+        assert (synthetic_minimaps(3, seed=1)[2][1] == minimaps[2][1]).all()
+
+
+class TestBenchmark:
+    """基准结果测试类"""
+
+    def test_run_benchmark(self):
+        """测试模拟画面基准结果"""
+        result = run_benchmark(synthetic_minimaps(5), synthetic_screens(5), iterations=10)
+        stages = result['stages']
+        for name in ('minimap_detect', 'preprocess_auto', 'template_match'):
+            assert stages[name]['frames'] == 10
+            assert stages[name]['fps'] > 0
+            assert stages[name]['p50_ms'] <= stages[name]['p99_ms'] <= stages[name]['max_ms']
+        assert 'ocr' in stages
+        assert result['meta']['iterations'] == 10
+
+    def test_timing_without_tracemalloc(self):
+        """测试计时的帧不开启 tracemalloc，内存峰值单独运行少量帧测量"""
+        tracing = []
+
+        def stage(frame):
+            tracing.append(tracemalloc.is_tracing())
+            return np.zeros(1024, dtype=np.uint8)
+
+        stats = run_stage(stage, ReplaySource(synthetic_minimaps(3)), iterations=30, warmup=2, memory_iterations=4)
+        assert tracing == [False] * 32 + [True] * 4
+        assert stats['frames'] == 30 and stats['peak_tracemalloc_kb'] > 0
+        assert not tracemalloc.is_tracing()
+
+    def test_region_sizes(self):
+        """测试各小地图尺寸的整幅扫描和粗到细扫描阶段"""
+        result = run_benchmark([], [], iterations=5, only=['detect_full_400', 'detect_coarse_400'],
+                               region_sizes=[400])
+        assert set(result['stages']) == {'detect_full_400', 'detect_coarse_400'}
+        assert result['meta']['region_sizes'] == [400]
+
+    def test_compare_detects_regression(self):
+        """测试对比时发现吞吐量下降"""
+        baseline = {'stages': {'minimap_detect': {'fps': 1000.0, 'p95_ms': 1.0}}}
+        current = {'stages': {'minimap_detect': {'fps': 500.0, 'p95_ms': 2.0}}}
+        assert compare(current, baseline, 0.2)
+        assert not compare(baseline, baseline, 0.2)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+blob_stats 单元测试
+测试亚像素中心、像素面积和外接框、按面积过滤、加权中心，检测器、跟踪器和窗口检测直接使用数组结果，
+以及粗到细扫描与整幅扫描结果一致、大区域更快
+"""
+
+import pytest
+import sys
+import os
+import timeit
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from blob_stats import Blobs, coarse_regions, extract_blobs, extract_blobs_coarse, label_blobs
+from dot_tracker import DotTracker
+from minimap_detector import MinimapDetector
+
+
+def _mask(*rects) -> np.ndarray:
+    mask = np.zeros((60, 80), dtype=np.uint8)
+    for x, y, w, h in rects:
+        mask[y:y + h, x:x + w] = 255
+    return mask
+
+
+class TestExtract:
+    """提取测试类"""
+
+    def test_subpixel_centroid_area_bbox(self):
+        blobs = extract_blobs(_mask((10, 20, 2, 2), (40, 5, 3, 1)))
+        assert len(blobs) == 2
+        # 2x2 的块中心在两个像素之间，取整会偏半个像素
+        assert blobs.centroids.tolist() == [[41.0, 5.0], [10.5, 20.5]]
+        assert blobs.areas.tolist() == [3, 4]
+        assert blobs.bboxes.tolist() == [[40, 5, 3, 1], [10, 20, 2, 2]]
+        assert list(blobs) == [(41.0, 5.0, 3), (10.5, 20.5, 4)]
+
+    def test_min_area_and_empty(self):
+        blobs = extract_blobs(_mask((10, 20, 2, 2), (40, 5, 1, 1)), min_area=2)
+        assert blobs.areas.tolist() == [4]
+        assert len(extract_blobs(_mask())) == 0 and extract_blobs(_mask()).to_dots() == []
+        assert len(extract_blobs(np.zeros((0, 0), dtype=np.uint8))) == 0
+
+    def test_weighted_centroid(self):
+        mask = _mask((10, 10, 3, 1))
+        weights = np.zeros(mask.shape)
+        weights[10, 10:13] = (1, 1, 2)
+        count, labels, blobs = label_blobs(mask, weights)
+        assert count == 2 and labels[10, 11] == 1
+        assert blobs.centroids[0].tolist() == pytest.approx([(10 + 11 + 24) / 4, 10.0])
+        # 权重和为0时使用几何中心
+        _, _, blobs = label_blobs(mask, np.zeros(mask.shape))
+        assert blobs.centroids[0].tolist() == [11.0, 10.0]
+
+
+class TestConsumers:
+    """检测器和跟踪器测试类"""
+
+    def test_detector_returns_subpixel(self):
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        image[30:32, 40:42] = (0, 255, 255)
+        detector = MinimapDetector()
+        assert detector.detect(image) == [(40.5, 30.5, 4)]
+        blobs = detector.detect_blobs(image)
+        assert isinstance(blobs, Blobs) and blobs.bboxes.tolist() == [[40, 30, 2, 2]]
+
+    def test_tracker_accepts_blobs(self):
+        tracker = DotTracker()
+        first = tracker.update(extract_blobs(_mask((10, 20, 2, 2))), 0.0)
+        second = tracker.update(extract_blobs(_mask((11, 20, 2, 2))), 0.5)
+        assert first[0].track_id == second[0].track_id
+        assert second[0].x == 11.5 and second[0].vx == pytest.approx(1.0)
+
+    def test_window_passes_blobs_to_tracker(self, tmp_path):
+        """测试窗口检测不转换成元组列表，跟踪器收到数组形式的连通块"""
+        from frame_source import ReplaySource, VirtualWindowProvider
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Minimap]\nauto_calibrate = false\n', encoding='utf-8')
+        minimap = np.full((150, 150, 3), (30, 30, 40), dtype=np.uint8)
+        minimap[20:23, 30:33] = minimap[100:102, 60:62] = (0, 255, 255)
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: ReplaySource([minimap]))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+        gw.detector.detect = None  # 不应再调用
+        received = []
+        update = gw.tracker.update
+        gw.tracker.update = lambda dots, now: received.append(dots) or update(dots, now)
+        gw.detect_players()
+        assert isinstance(received[0], Blobs)
+        assert received[0].centroids.tolist() == [[31.0, 21.0], [60.5, 100.5]]
+        assert gw.stats['yellow_dots_detected'] == 2
+        bot.stop()
+
+    def test_faster_than_contour_moments(self):
+        """测试100个点时比逐轮廓计算矩快"""
+        rng = np.random.default_rng(0)
+        mask = np.zeros((300, 300), dtype=np.uint8)
+        for x, y in rng.integers(5, 295, (100, 2)).tolist():
+            cv2.circle(mask, (x, y), 2, 255, -1)
+
+        def contour_moments():
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            dots = []
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area >= 1:
+                    m = cv2.moments(contour)
+                    if m['m00'] > 0:
+                        dots.append((int(m['m10'] / m['m00']), int(m['m01'] / m['m00']), int(area)))
+            return dots
+
+        vectorised = min(timeit.repeat(lambda: extract_blobs(mask), number=20, repeat=3))
+        looped = min(timeit.repeat(contour_moments, number=20, repeat=3))
+        assert vectorised < looped
+
+
+def _large_minimap(size: int, dots: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    image = np.full((size, size, 3), (30, 30, 40), dtype=np.uint8)
+    for x, y in rng.integers(5, size - 5, (20, 2)).tolist():
+        cv2.circle(image, (x, y), 2, (0, 150, 0), -1)
+    for x, y in rng.integers(5, size - 5, (dots, 2)).tolist():
+        cv2.circle(image, (x, y), int(rng.integers(2, 5)), (0, 255, 255), -1)
+    return image
+
+
+class TestCoarseToFine:
+    """粗到细扫描测试类"""
+
+    def test_regions_from_pooled_mask(self):
+        mask = np.zeros((38, 38), dtype=np.uint8)
+        mask[9, 13] = mask[37, 37] = 255
+        labels, rects = coarse_regions(mask, 4)
+        assert labels.shape == (10, 10)
+        assert rects.tolist() == [[3, 2, 4, 3], [9, 9, 10, 10]]
+        assert labels[2, 3] == 1 and labels[9, 9] == 2 and labels.sum() == 3
+
+    def test_overlapping_regions_not_duplicated(self):
+        """测试L形点的候选区域外接框包含另一个点时，各点只提取一次且不被截断"""
+        mask = np.zeros((64, 64), dtype=np.uint8)
+        mask[4:6, 4:40] = 255
+        mask[4:40, 38:40] = 255
+        mask[20:23, 20:23] = 255
+        blobs = extract_blobs_coarse(mask, 4)
+        expected = extract_blobs(mask)
+        assert sorted(blobs) == sorted(expected) and len(blobs) == 2
+
+    def test_same_blobs_as_full_scan(self):
+        full = MinimapDetector()
+        coarse = MinimapDetector()
+        coarse.coarse_min_side = 300
+        for seed in range(5):
+            image = _large_minimap(600, 12, seed)
+            image[597:600, 0:3] = (0, 255, 255)  # 贴着边缘的点
+            expected = full.detect_blobs(image)
+            blobs = coarse.detect_blobs(image)
+            order = np.lexsort(blobs.centroids.T)
+            expected_order = np.lexsort(expected.centroids.T)
+            assert len(blobs) == len(expected) == 13
+            assert blobs.centroids[order].tolist() == expected.centroids[expected_order].tolist()
+            assert blobs.areas[order].tolist() == expected.areas[expected_order].tolist()
+            assert blobs.bboxes[order].tolist() == expected.bboxes[expected_order].tolist()
+
+    def test_crowded_falls_back(self):
+        crowded = np.zeros((400, 400), dtype=np.uint8)
+        crowded[::4, ::4] = 255
+        assert extract_blobs_coarse(crowded, 4) is None
+        detector = MinimapDetector()
+        detector.coarse_min_side = 300
+        image = np.zeros((400, 400, 3), dtype=np.uint8)
+        image[::4, ::4] = (0, 255, 255)
+        assert len(detector.detect_blobs(image)) == 100 * 100
+        assert len(extract_blobs_coarse(np.zeros((400, 400), dtype=np.uint8))) == 0
+
+    def test_static_mask(self):
+        from static_mask import StaticMask
+
+        image = _large_minimap(400, 0)
+        image[100:104, 200:204] = (0, 255, 255)
+        image[300:304, 50:54] = (0, 255, 255)
+        detector = MinimapDetector()
+        detector.coarse_min_side = 300
+        detector.static_mask = StaticMask(learn_frames=2, dilate=0)
+        static = image.copy()
+        static[300:304, 50:54] = (30, 30, 40)
+        for _ in range(2):
+            detector.detect_blobs(static)
+        assert detector.detect_blobs(image).centroids.tolist() == [[51.5, 301.5]]
+
+    def test_large_region_faster(self):
+        """测试1000x1000区域、少量点时粗到细扫描明显快于整幅扫描"""
+        image = _large_minimap(1000, 5)
+        full = MinimapDetector()
+        coarse = MinimapDetector()
+        coarse.coarse_min_side = 300
+        full_time = min(timeit.repeat(lambda: full.detect_blobs(image), number=5, repeat=5))
+        coarse_time = min(timeit.repeat(lambda: coarse.detect_blobs(image), number=5, repeat=5))
+        assert coarse_time * 1.5 < full_time
+
+    def test_from_config(self):
+        import configparser
+
+        config = configparser.ConfigParser()
+        config.read_dict({'Detection': {'coarse_min_side': '300', 'coarse_factor': '3'}})
+        detector = MinimapDetector()
+        detector.configure(config)
+        assert detector.coarse_min_side == 300 and detector.coarse_factor == 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+bot_daemon 单元测试
+测试消息编解码、控制命令、状态推送和慢客户端丢弃旧更新
+"""
+
+import pytest
+import logging
+import socket
+import sys
+import os
+import threading
+import time
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from bot_daemon import (DaemonServer, DaemonClient, DaemonError, LogBuffer, _ClientConnection,
+                        encode_message, decode_message, is_loopback, parse_address, CLIENT_QUEUE_LIMIT)
+from frame_source import VirtualWindowProvider, SyntheticMinimapSource
+
+
+def _wait(condition, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    """运行中的守护进程（两个虚拟窗口）和已连接的客户端"""
+    from mir2_multi_window_bot import MultiWindowBot
+
+    provider = VirtualWindowProvider()
+    hwnds = [provider.add_window(), provider.add_window()]
+    config_file = tmp_path / 'bot.ini'
+    config_file.write_text('[Detection]\ndetection_interval = 0.01\n[Teleport]\ncooldown = 0\n'
+                           '[Watcher]\nenabled = false\n[Stats]\nreport_interval = 3600\n', encoding='utf-8')
+    bot = MultiWindowBot(str(config_file), window_provider=provider,
+                         source_factory=lambda h: SyntheticMinimapSource(seed=h))
+    bot.scan_windows()
+    server = DaemonServer(bot, port=0, update_interval=0.02)
+    assert server.start()
+    thread = threading.Thread(target=bot.run, daemon=True)
+    thread.start()
+
+    client = DaemonClient(port=server.port)
+    client.connect()
+    yield bot, server, client, hwnds
+
+    client.close()
+    bot.running = False
+    thread.join(5.0)
+    server.stop()
+
+
+class TestProtocol:
+    """协议测试类"""
+
+    def test_roundtrip(self):
+        """测试编码为单行紧凑JSON并可解码"""
+        data = encode_message({'id': 1, 'cmd': 'status', 'title': '九五沉默'})
+        assert data.endswith(b'\n') and data.count(b'\n') == 1
+        assert b' ' not in data
+        assert decode_message(data) == {'id': 1, 'cmd': 'status', 'title': '九五沉默'}
+        with pytest.raises(ValueError):
+            decode_message(b'[1, 2]\n')
+
+    def test_parse_address(self):
+        """测试地址解析"""
+        assert parse_address('') == ('127.0.0.1', 9109)
+        assert parse_address('9200') == ('127.0.0.1', 9200)
+        assert parse_address('localhost:9300') == ('localhost', 9300)
+        assert parse_address(':9400') == ('127.0.0.1', 9400)
+
+
+class TestDaemon:
+    """守护进程测试类"""
+
+    def test_status_and_updates(self, daemon):
+        """测试状态查询和订阅后的批量推送"""
+        bot, server, client, hwnds = daemon
+        state = client.request('status')
+        assert sorted(row['hwnd'] for row in state['windows']) == sorted(hwnds)
+
+        assert client.wait_state() is not None
+        assert _wait(lambda: client.latest_state['totals']['detection_runs'] > 0)
+        assert client.state_seq > 0
+        assert all(row['running'] for row in client.latest_state['windows'])
+
+    def test_start_stop_remove(self, daemon):
+        """测试按窗口启停和移除（stop() 立即返回，推送的状态要等移除之后的新推送）"""
+        bot, server, client, hwnds = daemon
+        assert _wait(lambda: all(gw.running for gw in bot.windows.values()))
+        assert client.wait_state() is not None
+        assert client.request('stop', hwnds=[hwnds[0]]) == [hwnds[0]]
+        assert not bot.windows[hwnds[0]].running and bot.windows[hwnds[1]].running
+        assert client.request('start', hwnds=[hwnds[0]]) == [hwnds[0]]
+        assert bot.windows[hwnds[0]].running
+
+        seq = client.state_seq
+        assert client.request('remove', hwnds=[hwnds[1]]) == [hwnds[1]]
+        assert hwnds[1] not in bot.windows
+        assert _wait(lambda: client.state_seq > seq and
+                     [row['hwnd'] for row in client.latest_state['windows']] == [hwnds[0]])
+        assert 'state' in client.latest_state['windows'][0]
+
+    def test_test_and_configure(self, daemon):
+        """测试单次检测和修改配置"""
+        bot, server, client, hwnds = daemon
+        assert _wait(lambda: all(gw.frame_ring is not None for gw in bot.windows.values()))
+        result = client.request('test', hwnd=hwnds[0])
+        assert result['captured'] and result['dots'] >= 0
+
+        # 未运行的窗口用单独的截图源，不写入监控线程的环形缓冲区
+        client.request('stop', hwnds=[hwnds[1]])
+        ring = bot.windows[hwnds[1]].frame_ring
+        head = ring.head
+        assert client.request('test', hwnd=hwnds[1])['captured']
+        assert bot.windows[hwnds[1]].frame_ring is ring and ring.head == head
+
+        settings = client.request('configure', cooldown='2.5', teleport_key='3')
+        assert settings['cooldown'] == '2.5' and settings['teleport_key'] == '3'
+        assert all(gw.teleport_cooldown == 2.5 for gw in bot.windows.values())
+
+        with pytest.raises(DaemonError):
+            client.request('configure', cooldown='abc')
+        with pytest.raises(DaemonError):
+            client.request('no_such_command')
+
+    def test_logs_forwarded(self, daemon):
+        """测试守护进程日志随推送批量发给客户端"""
+        bot, server, client, hwnds = daemon
+        logging.getLogger('mir2_multi_window_bot').warning('daemon log line')
+        assert _wait(lambda: any('daemon log line' in line for line in client.logs))
+
+    def test_shutdown(self, daemon):
+        """测试shutdown命令让守护进程主循环退出"""
+        bot, server, client, hwnds = daemon
+        assert client.request('shutdown') is True
+        assert _wait(lambda: not any(gw.running for gw in bot.windows.values()))
+
+
+class TestIsolation:
+    """推送与检测隔离测试类"""
+
+    def test_remote_bind_requires_token(self):
+        """测试监听非本机地址时没有口令拒绝启动"""
+        assert is_loopback('127.0.0.1') and is_loopback('localhost') and is_loopback('::1')
+        assert not is_loopback('0.0.0.0') and not is_loopback('192.168.1.5') and not is_loopback('pc-2')
+        server = DaemonServer(bot=None, host='0.0.0.0', port=0)
+        assert not server.start()
+        server = DaemonServer(bot=None, host='0.0.0.0', port=0, token='secret')
+        assert server.start()
+        server.stop()
+
+    def test_slow_client_drops_old_updates(self):
+        """测试客户端不读取时只保留最近的更新，推送不阻塞"""
+        server = DaemonServer(bot=None)
+        left, right = socket.socketpair()
+        client = _ClientConnection(server, left, ('test', 0))  # 不启动发送线程，模拟客户端卡住
+        started = time.perf_counter()
+        for i in range(CLIENT_QUEUE_LIMIT + 12):
+            client.send(encode_message({'event': 'update', 'seq': i}), droppable=True)
+        assert time.perf_counter() - started < 0.1
+        assert len(client._outbox) == CLIENT_QUEUE_LIMIT
+        assert client.dropped == 12
+        assert decode_message(client._outbox[-1])['seq'] == CLIENT_QUEUE_LIMIT + 11
+        client.close()
+        right.close()
+
+    def test_log_buffer_defers_formatting(self):
+        """测试日志处理器只缓存记录，格式化在drain时进行"""
+        buffer = LogBuffer(limit=3)
+        for i in range(5):
+            buffer.emit(logging.LogRecord('t', logging.INFO, __file__, 1, f'line {i}', None, None))
+        lines = buffer.drain()
+        assert len(lines) == 3 and lines[-1].endswith('line 4')
+        assert buffer.drain() == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+bot_metrics 单元测试
+测试对数分桶直方图和分阶段耗时统计
+"""
+
+import pytest
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from bot_metrics import LatencyHistogram, WindowMetrics, STAGE_CAPTURE, STAGE_REACTION
+
+
+class TestLatencyHistogram:
+    """LatencyHistogram测试类"""
+
+    def test_empty_histogram(self):
+        """测试空直方图"""
+        histogram = LatencyHistogram()
+        assert histogram.count == 0
+        assert histogram.percentile(50) == 0.0
+        assert histogram.mean == 0.0
+
+    def test_percentiles_within_bucket_error(self):
+        """测试百分位误差在分桶精度内"""
+        histogram = LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.record(i / 1000.0 * 0.1)  # 0.1ms 到 100ms
+
+        assert histogram.count == 1000
+        assert abs(histogram.percentile(50) - 0.05) / 0.05 < 0.07
+        assert abs(histogram.percentile(95) - 0.095) / 0.095 < 0.07
+        assert abs(histogram.percentile(99) - 0.099) / 0.099 < 0.07
+        assert histogram.percentile(100) == pytest.approx(0.1)
+        assert histogram.max_value == pytest.approx(0.1)
+
+    def test_fixed_memory(self):
+        """测试记录大量数据后内存不增长"""
+        histogram = LatencyHistogram()
+        size = len(histogram.counts)
+        for i in range(10000):
+            histogram.record(i * 1e-5)
+        histogram.record(1e9)
+        histogram.record(0.0)
+        assert len(histogram.counts) == size
+
+    def test_merge(self):
+        """测试合并直方图"""
+        a = LatencyHistogram()
+        b = LatencyHistogram()
+        for _ in range(10):
+            a.record(0.001)
+            b.record(0.010)
+        a.merge(b)
+        assert a.count == 20
+        assert a.min_value == pytest.approx(0.001)
+        assert a.max_value == pytest.approx(0.010)
+        assert a.percentile(99) == pytest.approx(0.010)
+
+    def test_dict_roundtrip(self):
+        """测试转换为字典（只含非空桶）后恢复"""
+        histogram = LatencyHistogram()
+        for i in range(1, 101):
+            histogram.record(i * 1e-4)
+        data = histogram.to_dict()
+        assert len(data['buckets']) < len(histogram.counts)
+        restored = LatencyHistogram.from_dict(data)
+        assert restored.counts == histogram.counts
+        assert restored.count == 100
+        assert restored.percentile(95) == histogram.percentile(95)
+        assert restored.min_value == histogram.min_value
+
+
+class TestWindowMetrics:
+    """WindowMetrics测试类"""
+
+    def test_reaction_latency(self):
+        """测试截图到按键的延迟"""
+        metrics = WindowMetrics()
+        started = metrics.mark_capture_start()
+        metrics.record_reaction(started + 0.02)
+        histogram = metrics.snapshot()[STAGE_REACTION]
+        assert histogram.count == 1
+        assert histogram.max_value == pytest.approx(0.02)
+
+    def test_format(self):
+        """测试格式化输出"""
+        metrics = WindowMetrics()
+        assert metrics.format_compact() == "no samples"
+        metrics.record(STAGE_CAPTURE, 0.004)
+        assert "capture p95=4.0ms" in metrics.format_compact()
+        lines = metrics.format_lines()
+        assert len(lines) == 1 and lines[0].startswith("capture:")
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
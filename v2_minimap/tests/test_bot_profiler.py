@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+bot_profiler 单元测试
+测试堆栈采样和检测循环cProfile分析
+"""
+
+import pytest
+import threading
+import time
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from bot_profiler import BotProfiler
+
+
+class FakeLoop:
+    """模拟带 profile_request 钩子的检测循环"""
+
+    def __init__(self):
+        self.running = True
+        self.profile_request = None
+        self.thread = threading.Thread(target=self._run_loop, name='window-test', daemon=True)
+
+    def _busy(self):
+        return sum(i * i for i in range(2000))
+
+    def _run_loop(self):
+        while self.running:
+            if self.profile_request is not None and self.profile_request.poll():
+                self.profile_request = None
+            self._busy()
+            time.sleep(0.005)
+        if self.profile_request is not None:
+            self.profile_request.finish()
+            self.profile_request = None
+
+
+class TestBotProfiler:
+    """BotProfiler测试类"""
+
+    def test_sample_stacks(self, tmp_path):
+        """测试堆栈采样输出折叠栈"""
+        loop = FakeLoop()
+        loop.thread.start()
+        done = threading.Event()
+        try:
+            path = BotProfiler(str(tmp_path)).sample_stacks(0.2, 0.005, on_done=lambda p: done.set())
+            assert done.wait(5.0)
+        finally:
+            loop.running = False
+            loop.thread.join(1.0)
+
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines
+        assert any(line.startswith('window-test;') and '_run_loop' in line for line in lines)
+
+    def test_profile_loop(self, tmp_path):
+        """测试限时cProfile分析并自动结束"""
+        loop = FakeLoop()
+        profiler = BotProfiler(str(tmp_path))
+        path = profiler.profile_loop(loop, 0.1, 'test')
+        # 正在分析时不允许重复请求
+        assert profiler.profile_loop(loop, 0.1, 'test') is None
+
+        loop.thread.start()
+        deadline = time.monotonic() + 5.0
+        while loop.profile_request is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        loop.running = False
+        loop.thread.join(1.0)
+
+        assert loop.profile_request is None
+        assert os.path.exists(path)
+        with open(os.path.splitext(path)[0] + '.txt', encoding='utf-8') as f:
+            assert '_busy' in f.read()
+
+    def test_finish_when_loop_stops_early(self, tmp_path):
+        """测试循环提前退出时仍写出结果"""
+        loop = FakeLoop()
+        path = BotProfiler(str(tmp_path)).profile_loop(loop, 60.0, 'early')
+        loop.thread.start()
+        time.sleep(0.05)
+        loop.running = False
+        loop.thread.join(1.0)
+        assert os.path.exists(path)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
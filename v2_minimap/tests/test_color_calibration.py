@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+color_calibration 单元测试
+测试颜色直方图统计、颜色聚类、写入配置和查找表，以及检测器使用查找表检测
+"""
+
+import pytest
+import configparser
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from color_calibration import collect_histogram, cluster_colors, cluster_boxes, write_calibration
+from minimap_detector import MinimapDetector, build_color_lut, color_index, load_color_lut
+
+
+def _minimaps(count: int, dot_bgr_colors, seed: int = 0):
+    """深色背景、绿色怪物点、指定颜色的黄点，底部有一条大面积的黄色界面元素"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        image = np.full((150, 150, 3), (30, 30, 40), dtype=np.uint8)
+        image[140:150, :] = (0, 220, 230)  # 大片黄色，不应计入黄点颜色
+        for _ in range(5):
+            x, y = rng.integers(5, 145, 2)
+            cv2.circle(image, (int(x), int(y)), 2, (0, 150, 0), -1)
+        for color in dot_bgr_colors:
+            x, y = rng.integers(5, 130, 2)
+            cv2.circle(image, (int(x), int(y)), 2, color, -1)
+        frames.append(image)
+    return frames
+
+
+class TestColorIndex:
+    """颜色索引和查找表测试类"""
+
+    def test_index_matches_rgb(self):
+        image = np.array([[[1, 2, 3], [0, 255, 255]]], dtype=np.uint8)  # BGR
+        assert color_index(image).tolist() == [[(3 << 16) | (2 << 8) | 1, 0xFFFF00]]
+
+    def test_lut_matches_in_range(self):
+        """测试单个颜色框的查找表与inRange结果一致"""
+        detector = MinimapDetector()
+        image = np.random.default_rng(0).integers(240, 256, (60, 60, 3), dtype=np.uint8)
+        image[..., 0] = np.random.default_rng(1).integers(0, 10, (60, 60))
+        expected = detector.mask(image)
+        detector.color_lut = build_color_lut([((250, 250, 0), (255, 255, 5))])
+        assert np.array_equal(detector.mask(image), expected)
+
+
+class TestCalibration:
+    """校准测试类"""
+
+    def test_clusters_client_yellow(self):
+        """测试找到客户端实际使用的黄色，忽略大片黄色界面"""
+        colors, counts = collect_histogram(_minimaps(20, [(10, 240, 245), (10, 240, 245)]))
+        clusters = cluster_colors(colors, counts)
+        assert len(clusters) == 1
+        assert clusters[0]['lower'] == (243, 238, 8) and clusters[0]['upper'] == (247, 242, 12)
+
+    def test_two_clusters(self):
+        """测试两种不相连的黄色各自成簇"""
+        colors, counts = collect_histogram(_minimaps(20, [(0, 255, 255), (40, 200, 220)]))
+        clusters = cluster_colors(colors, counts)
+        assert len(clusters) == 2
+        assert {cluster['upper'] for cluster in clusters} == {(255, 255, 2), (222, 202, 42)}
+
+    def test_write_and_detect(self, tmp_path):
+        """测试写入配置后检测器只用查找表检测两种黄色，范围之间的颜色不算"""
+        config_file = str(tmp_path / 'bot.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write('[Detection]\nmin_contour_area = 1\n')
+        colors, counts = collect_histogram(_minimaps(20, [(0, 255, 255), (40, 200, 220)]))
+        lut_path = write_calibration(config_file, cluster_boxes(cluster_colors(colors, counts)))
+        assert os.path.getsize(lut_path) < 100 * 1024
+
+        config = configparser.ConfigParser()
+        config.read(config_file, encoding='utf-8')
+        assert config.getint('YellowColor', 'r_lower') == 218
+        assert config.get('YellowColor', 'lut_file') == 'bot_yellow_lut.npz'
+
+        detector = MinimapDetector()
+        detector.configure(config, str(tmp_path))
+        assert detector.color_lut is load_color_lut(lut_path)
+        image = np.full((100, 100, 3), (30, 30, 40), dtype=np.uint8)
+        cv2.circle(image, (20, 20), 2, (0, 255, 255), -1)
+        cv2.circle(image, (50, 50), 2, (40, 200, 220), -1)
+        cv2.circle(image, (80, 80), 2, (20, 230, 240), -1)  # 在外包范围内但不属于任何簇
+        assert sorted((x, y) for x, y, _ in detector.detect(image)) == [(20, 20), (50, 50)]
+
+    def test_missing_lut_falls_back(self, tmp_path):
+        """测试查找表文件缺失时使用颜色范围"""
+        config = configparser.ConfigParser()
+        config.read_dict({'YellowColor': {'lut_file': 'missing.npz'}})
+        detector = MinimapDetector()
+        detector.configure(config, str(tmp_path))
+        assert detector.color_lut is None
+        image = np.zeros((50, 50, 3), dtype=np.uint8)
+        cv2.circle(image, (25, 25), 2, (0, 255, 255), -1)
+        assert len(detector.detect(image)) == 1
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+dot_tracker 单元测试
+测试轨迹编号保持、速度和朝向估计、未检测到时的等待与结束、容量上限，以及100个点的跟踪耗时
+"""
+
+import pytest
+import configparser
+import sys
+import os
+import time
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from dot_tracker import DotTracker
+from minimap_detector import MinimapDetector
+
+
+class TestAssociation:
+    """关联测试类"""
+
+    def test_identity_kept(self):
+        """测试两个点相向移动时编号保持不变"""
+        tracker = DotTracker()
+        first = tracker.update([(20, 50, 12), (80, 50, 12)], 0.0)
+        ids = [track.track_id for track in first]
+        for step in range(1, 6):
+            tracks = tracker.update([(80 - 5 * step, 50, 12), (20 + 5 * step, 50, 12)], step * 0.1)
+            assert [track.track_id for track in tracks] == ids[::-1]
+        assert len(tracker.tracks) == 2
+
+    def test_contested_dot_goes_to_nearest(self):
+        """测试两个轨迹争抢同一个点时距离近的得到，另一个轨迹匹配次近的点"""
+        tracker = DotTracker(max_distance=10)
+        a, b = tracker.update([(50, 50, 12), (56, 50, 12)], 0.0)
+        tracks = tracker.update([(54, 50, 12), (45, 50, 12)], 0.1)
+        assert tracks[0].track_id == b.track_id
+        assert tracks[1].track_id == a.track_id
+
+    def test_far_dot_is_new_track(self):
+        tracker = DotTracker(max_distance=10)
+        first = tracker.update([(20, 20, 12)], 0.0)[0].track_id
+        second = tracker.update([(60, 60, 12)], 0.1)[0].track_id
+        assert second != first
+        assert len(tracker.tracks) == 2 and len(tracker.active()) == 1
+
+
+class TestMotion:
+    """速度和朝向测试类"""
+
+    def test_velocity_and_heading(self):
+        tracker = DotTracker(smoothing=1.0)
+        for step in range(5):
+            track = tracker.update([(10 + 3 * step, 100 - 4 * step, 12)], step * 0.1)[0]
+        assert track.vx == pytest.approx(30.0) and track.vy == pytest.approx(-40.0)
+        assert track.speed == pytest.approx(50.0)
+        assert track.heading == pytest.approx(306.87, abs=0.01)  # 向右上
+        assert track.age == pytest.approx(0.4)
+        assert track.hits == 5
+        assert track.predict(0.5) == pytest.approx((25.0, 80.0))
+
+    def test_stationary_dot(self):
+        tracker = DotTracker()
+        for step in range(4):
+            track = tracker.update([(70, 70, 12)], step * 0.1)[0]
+        assert track.speed == 0.0
+        assert track.to_dict()['age'] == pytest.approx(0.3)
+
+    def test_prediction_bridges_missed_frames(self):
+        """测试点漏检两帧后按预测位置重新关联到原轨迹"""
+        tracker = DotTracker(max_distance=6, smoothing=1.0)
+        track_id = None
+        for step in range(3):
+            track_id = tracker.update([(10 + 5 * step, 40, 12)], step * 0.1)[0].track_id
+        tracker.update([], 0.3)
+        tracker.update([], 0.4)
+        assert tracker.update([(35, 40, 12)], 0.5)[0].track_id == track_id
+
+
+class TestLifecycle:
+    """轨迹结束和容量测试类"""
+
+    def test_track_expires(self):
+        tracker = DotTracker(max_misses=2)
+        tracker.update([(30, 30, 12)], 0.0)
+        for step in range(1, 3):
+            tracker.update([], step * 0.1)
+            assert len(tracker.tracks) == 1 and tracker.tracks[0].misses == step
+        tracker.update([], 0.3)
+        assert tracker.tracks == []
+
+    def test_bounded_slots(self):
+        """测试轨迹数不超过容量，结束的轨迹空出槽位后新点可以建立轨迹"""
+        tracker = DotTracker(max_tracks=4, max_misses=0)
+        tracks = tracker.update([(10 * i, 10, 12) for i in range(1, 7)], 0.0)
+        assert len(tracks) == 4 and len(tracker.tracks) == 4
+        tracks = tracker.update([(10 * i, 100, 12) for i in range(1, 4)], 0.1)
+        assert len(tracks) == 3
+        assert min(track.track_id for track in tracks) == 5
+
+    def test_reset(self):
+        tracker = DotTracker()
+        tracker.update([(10, 10, 12)], 0.0)
+        tracker.reset()
+        assert tracker.tracks == []
+        assert tracker.update([(10, 10, 12)], 0.1)[0].track_id == 2
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_dict({'Tracking': {'max_distance': '8', 'max_tracks': '16'}})
+        tracker = DotTracker.from_config(config)
+        assert tracker.max_distance == 8.0 and tracker.max_tracks == 16
+        config.set('Tracking', 'enabled', 'false')
+        assert DotTracker.from_config(config) is None
+
+
+class TestPerformance:
+    """耗时测试类"""
+
+    def test_hundred_dots_cheaper_than_detection(self):
+        """测试100个移动点的跟踪耗时在1毫秒以内（连通块提取后检测本身也只需零点几毫秒）"""
+        rng = np.random.default_rng(0)
+        positions = rng.uniform(10, 140, (100, 2))
+        velocities = rng.uniform(-2, 2, (100, 2))
+        detector = MinimapDetector()
+        tracker = DotTracker()
+        detect_times, track_times = [], []
+        for step in range(40):
+            positions = np.clip(positions + velocities, 3, 147)
+            image = np.zeros((150, 150, 3), dtype=np.uint8)
+            for x, y in positions.astype(int):
+                cv2.circle(image, (int(x), int(y)), 1, (0, 255, 255), -1)
+            started = time.perf_counter()
+            dots = detector.detect_blobs(image)
+            detect_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            tracker.update(dots, step * 0.05)
+            track_times.append(time.perf_counter() - started)
+        assert len(tracker.tracks) <= tracker.max_tracks
+        assert np.median(track_times) < 1e-3
+        assert np.median(detect_times) < 1e-3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+farm_coordinator 单元测试
+测试容量分配方案、配置项解析，以及本机多个模拟节点的汇总、配置下发和启停
+"""
+
+import pytest
+import logging
+import sys
+import os
+import time
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from farm_coordinator import (FarmCoordinator, LocalAgent, plan_balance, parse_overrides,
+                              HEALTH_OK, HEALTH_DOWN)
+
+
+def _wait(condition, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _windows(count: int, running: bool = True, start: int = 1):
+    return [{'hwnd': start + i, 'running': running} for i in range(count)]
+
+
+class TestPlanBalance:
+    """分配方案测试类"""
+
+    def test_within_capacity(self):
+        """测试容量足够时启动所有未监控的窗口"""
+        plan = plan_balance({'a': {'capacity': 4, 'windows': _windows(3, running=False)},
+                             'b': {'capacity': 0, 'windows': _windows(2)}})
+        assert plan.targets == {'a': 3, 'b': 2}
+        assert plan.start == {'a': [1, 2, 3], 'b': []}
+        assert plan.changes == 3
+        assert plan.moves == [] and plan.unplaced == 0
+
+    def test_overflow_migrates_to_headroom(self):
+        """测试超出容量的窗口停止监控，并建议迁往有剩余容量的节点"""
+        windows = _windows(3, running=True) + _windows(2, running=False, start=10)
+        plan = plan_balance({'a': {'capacity': 3, 'windows': windows},
+                             'b': {'capacity': 4, 'windows': _windows(3)},
+                             'c': {'capacity': 2, 'windows': []}})
+        assert plan.targets['a'] == 3
+        assert plan.stop['a'] == []          # 正在监控的窗口优先保留
+        assert plan.start['a'] == []
+        assert plan.moves == [('a', 'c', 2)]
+        assert plan.unplaced == 0
+
+    def test_unplaced(self):
+        """测试农场容量不足"""
+        plan = plan_balance({'a': {'capacity': 2, 'windows': _windows(5)},
+                             'b': {'capacity': 2, 'windows': _windows(1)}})
+        assert sorted(plan.stop['a']) == [3, 4, 5]
+        assert plan.moves == [('a', 'b', 1)]
+        assert plan.unplaced == 2
+        assert any('容量不足' in line for line in plan.format_lines())
+
+
+class TestOverrides:
+    """配置项解析测试类"""
+
+    def test_parse(self):
+        assert parse_overrides(['Teleport.cooldown=3.0', 'Game.window_title=九五沉默']) == {
+            'Teleport': {'cooldown': '3.0'}, 'Game': {'window_title': '九五沉默'}}
+        with pytest.raises(ValueError):
+            parse_overrides(['cooldown=3'])
+
+
+@pytest.fixture
+def farm():
+    """本机两个模拟节点（口令认证）和已连接的协调器"""
+    logging.getLogger('mir2_multi_window_bot').setLevel(logging.WARNING)
+    agents = [LocalAgent(windows=3, capacity=2, name='node-a', token='t'),
+              LocalAgent(windows=1, capacity=4, name='node-b', token='t', seed=10)]
+    coordinator = FarmCoordinator([agent.address for agent in agents], token='t', retry_interval=0.1)
+    assert coordinator.connect() == 2
+    yield agents, coordinator
+    coordinator.close()
+    for agent in agents:
+        agent.stop()
+
+
+class TestCoordinator:
+    """协调器测试类"""
+
+    def test_summary(self, farm):
+        """测试汇总各节点的窗口和直方图"""
+        agents, coordinator = farm
+        assert _wait(lambda: all(node.state for node in coordinator.nodes.values()))
+        assert _wait(lambda: coordinator.poll() or all(
+            node.histograms.get('detect') and node.histograms['detect'].count for node in coordinator.nodes.values()))
+        summary = coordinator.summary()
+        assert summary['windows'] == 4
+        assert {row['node'] for row in summary['nodes']} == {'node-a', 'node-b'}
+        assert all(row['health'] == HEALTH_OK for row in summary['nodes'])
+        assert 'detect' in summary['latency_p95_ms']
+
+    def test_push_config_and_start_stop(self, farm):
+        """测试下发配置和启停"""
+        agents, coordinator = farm
+        results = coordinator.push_config({'Teleport': {'cooldown': '2.5'}})
+        assert all(result['cooldown'] == '2.5' for result in results.values())
+        assert all(gw.teleport_cooldown == 2.5 for agent in agents for gw in agent.bot.windows.values())
+
+        coordinator.stop(['node-b'])
+        assert not any(gw.running for gw in agents[1].bot.windows.values())
+        assert all(gw.running for gw in agents[0].bot.windows.values())
+        coordinator.start()
+        assert all(gw.running for agent in agents for gw in agent.bot.windows.values())
+
+    def test_balance(self, farm):
+        """测试按容量启停窗口并给出迁移建议"""
+        agents, coordinator = farm
+        plan = coordinator.balance(apply=True)
+        assert plan.targets == {'node-a': 2, 'node-b': 1}
+        assert plan.moves == [('node-a', 'node-b', 1)]
+        assert sum(gw.running for gw in agents[0].bot.windows.values()) == 2
+
+    def test_node_down_and_wrong_token(self, farm):
+        """测试节点断开后标记为down，口令错误无法连接"""
+        agents, coordinator = farm
+        agents[1].server.stop()
+        node = coordinator.nodes[agents[1].address]
+        assert _wait(lambda: not node.connected)
+        assert coordinator.health(node) == HEALTH_DOWN
+
+        intruder = FarmCoordinator([agents[0].address], token='wrong')
+        assert intruder.connect() == 0
+        assert '口令' in intruder.nodes[agents[0].address].error
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+farm_simulator 单元测试
+测试模拟游戏的到达、传送反应统计、小规模农场运行和截图/检测流水线
+"""
+
+import pytest
+import logging
+import sys
+import os
+import time
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from farm_simulator import SimulatedGame, SimulatedGameSource, FarmWindowProvider, FarmSimulator
+from frame_source import SyntheticMinimapSource
+from minimap_detector import MinimapDetector
+
+
+class TestSimulatedGame:
+    """SimulatedGame测试类"""
+
+    def test_arrivals_rendered_and_detected(self):
+        """测试到达的玩家被渲染并能被检测"""
+        game = SimulatedGame(arrival_rate=50.0, speed=0.0, seed=1)
+        game.restart(0.0)
+        minimap = game.render(0.5)
+        assert game.arrivals > 0
+        assert game.players
+        assert MinimapDetector().detect(minimap)
+
+    def test_teleport_records_reaction_and_reshuffles(self):
+        """测试传送按键记录反应延迟并清除玩家"""
+        game = SimulatedGame(arrival_rate=50.0, speed=0.0, seed=2)
+        game.restart(0.0)
+        game.render(0.5)
+        first_arrival = min(p.arrived_at for p in game.players)
+        game.on_key_down(game.teleport_vk, 0.5)
+        assert game.teleports == 1
+        assert game.players == []
+        assert game.reaction.count == 1
+        assert game.reaction.max_value == pytest.approx(0.5 - first_arrival)
+
+    def test_other_keys_ignored_and_false_teleport(self):
+        """测试非传送键被忽略，无玩家时的传送记为误传送"""
+        game = SimulatedGame(arrival_rate=0.0)
+        game.on_key_down(0x41, 1.0)
+        assert game.teleports == 0
+        game.on_key_down(game.teleport_vk, 1.0)
+        assert game.false_teleports == 1
+
+    def test_players_leave(self):
+        """测试移出小地图的玩家计为漏检"""
+        game = SimulatedGame(arrival_rate=20.0, speed=100.0, seed=3)
+        game.restart(0.0)
+        game.advance(0.2)
+        game.arrival_rate = 0.0
+        game.next_arrival = float('inf')
+        game.advance(100.0)
+        assert game.players == []
+        assert game.missed_players == game.arrivals > 0
+
+
+class TestFarm:
+    """FarmSimulator测试类"""
+
+    def test_key_routed_to_game(self):
+        """测试按键转发到对应的模拟游戏"""
+        provider = FarmWindowProvider()
+        game = SimulatedGame(arrival_rate=0.0)
+        hwnd = provider.add_game(game)
+        provider.key_down(hwnd, game.teleport_vk)
+        assert game.teleports == 1
+        assert SimulatedGameSource(game).grab().shape == (600, 800, 3)
+
+    def test_small_farm(self):
+        """测试小规模农场运行并输出统计"""
+        logging.getLogger('mir2_multi_window_bot').setLevel(logging.WARNING)
+        report = FarmSimulator(windows=5, arrival_rate=5.0, speed=10.0, detection_interval=0.02,
+                               cooldown=0.1).run(1.0)
+        assert report['windows'] == 5
+        assert report['frames'] > 0
+        assert report['teleports'] > 0
+        assert report['reaction_ms']['count'] > 0
+        assert report['cpu_percent_per_window'] >= 0
+
+
+class TestPipeline:
+    """截图/检测流水线测试类"""
+
+    def _window(self, tmp_path, settings: str):
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = FarmWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text(settings, encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: SyntheticMinimapSource(dots=3, speed=0.0, seed=h))
+        bot.scan_windows()
+        return bot, bot.windows[hwnd]
+
+    def test_stale_frame_not_acted_on(self, tmp_path):
+        """测试超过最大帧龄的帧不参与决策"""
+        bot, gw = self._window(tmp_path, '[Detection]\nmax_frame_age = 0.05\n')
+        assert gw.capture_minimap() is not None
+        time.sleep(0.1)
+        assert gw.analyze_frame() is False
+        assert gw.frames_stale == 1
+        assert gw.stats['detection_runs'] == 0
+
+        assert gw.detect_players() is True
+        assert gw.stats['detection_runs'] == 1
+        bot.stop()
+
+    def test_overwritten_frame_discarded(self, tmp_path):
+        """测试检测期间被截图线程覆盖的帧被丢弃"""
+        bot, gw = self._window(tmp_path, '[Capture]\nring_slots = 2\n')
+        gw.capture_minimap()
+        detect = gw.detector.detect_blobs
+
+        def detect_while_capturing(minimap):
+            # 模拟检测期间截图线程绕回同一槽位
+            gw.capture_minimap()
+            gw.capture_minimap()
+            return detect(minimap)
+
+        gw.detector.detect_blobs = detect_while_capturing
+        assert gw.analyze_frame() is False
+        assert gw.frames_torn == 1
+        bot.stop()
+
+    def test_pipeline_window_teleports(self, tmp_path):
+        """测试流水线模式检测并传送，停止后线程退出"""
+        bot, gw = self._window(tmp_path, '[Detection]\npipeline = true\n[Teleport]\ncooldown = 0\n')
+        gw.start(0.01)
+        deadline = time.perf_counter() + 2.0
+        while gw.stats['teleports_used'] == 0 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        bot.stop()
+        assert gw.stats['teleports_used'] > 0
+        assert gw.metrics.snapshot()['reaction'].count > 0
+        assert not gw.thread.is_alive()
+
+    def test_pipeline_overlaps_slow_capture(self):
+        """测试截图阻塞时流水线的检测次数高于顺序模式"""
+        logging.getLogger('mir2_multi_window_bot').setLevel(logging.WARNING)
+        reports = [FarmSimulator(windows=2, arrival_rate=0.0, detection_interval=0.02, capture_delay=0.02,
+                                 pipeline=pipeline).run(1.0)
+                   for pipeline in (False, True)]
+        sequential, pipelined = reports
+        assert pipelined['pipeline'] and not sequential['pipeline']
+        assert pipelined['detections_per_window'] > sequential['detections_per_window'] * 1.3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+frame_ring 单元测试
+测试槽位序号协议、最新帧/逐帧读取、积压帧数、跨进程共享内存和零复制截图
+"""
+
+import pytest
+import multiprocessing
+import sys
+import os
+
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from frame_ring import FrameRing, READ_EVERY, READ_LATEST, grab_into_ring, ring_for_region, ring_queue_stats
+from frame_source import SyntheticMinimapSource
+
+SHAPE = (8, 8, 3)
+
+
+def _produce(name, count):
+    """子进程: 连接到共享内存并写入帧（每帧像素值等于序号）"""
+    ring = FrameRing.attach(name, SHAPE, slots=4)
+    for i in range(1, count + 1):
+        ring.write_slot()[:] = i
+        ring.commit()
+    ring.close()
+
+
+class TestFrameRing:
+    """FrameRing测试类"""
+
+    def test_latest(self):
+        """测试只取最新帧"""
+        ring = FrameRing(SHAPE, slots=4, shared=False)
+        assert ring.read() is None
+        for i in range(1, 4):
+            ring.publish(np.full(SHAPE, i, dtype=np.uint8))
+        seq, frame = ring.read(READ_LATEST)
+        assert seq == 3 and frame[0, 0, 0] == 3
+        assert ring.dropped == 2
+        assert ring.read() is None  # 没有新帧
+        assert ring.backlog == 0
+
+    def test_backlog(self):
+        """测试积压帧数和多个缓冲区合计的队列指标"""
+        ring = FrameRing(SHAPE, slots=4, shared=False)
+        other = FrameRing(SHAPE, slots=4, shared=False)
+        for i in range(1, 4):
+            ring.publish(np.full(SHAPE, i, dtype=np.uint8))
+        assert ring.backlog == 3
+        ring.read(READ_EVERY)
+        assert ring.backlog == 2
+        other.publish(np.zeros(SHAPE, dtype=np.uint8))
+        other.publish(np.zeros(SHAPE, dtype=np.uint8))
+        other.read(READ_LATEST)
+        assert ring_queue_stats([ring, other, None]) == {'depth': 2, 'dropped': 1}
+        other.close()
+        assert other.backlog == 0
+
+    def test_copy_frame(self):
+        """测试复制指定帧不改变读取进度，被覆盖的帧返回None"""
+        ring = FrameRing(SHAPE, slots=2, shared=False)
+        for i in range(1, 4):
+            ring.publish(np.full(SHAPE, i, dtype=np.uint8))
+        frame = ring.copy_frame(3)
+        assert frame[0, 0, 0] == 3 and not np.shares_memory(frame, ring.read(READ_LATEST)[1])
+        assert ring.copy_frame(1) is None
+        ring.publish(np.full(SHAPE, 4, dtype=np.uint8))
+        ring.copy_frame(4)
+        assert ring.backlog == 1
+
+    def test_every_frame_and_drops(self):
+        """测试逐帧读取，被覆盖的帧计为丢帧"""
+        ring = FrameRing(SHAPE, slots=4, shared=False)
+        for i in range(1, 3):
+            ring.publish(np.full(SHAPE, i, dtype=np.uint8))
+        assert [ring.read(READ_EVERY)[0] for _ in range(2)] == [1, 2]
+
+        for i in range(3, 11):
+            ring.publish(np.full(SHAPE, i, dtype=np.uint8))
+        seqs = []
+        while True:
+            result = ring.read(READ_EVERY)
+            if result is None:
+                break
+            seq, frame = result
+            assert frame[0, 0, 0] == seq
+            seqs.append(seq)
+        assert seqs == [8, 9, 10]
+        assert ring.dropped == 5
+
+    def test_write_in_progress_and_overwrite(self):
+        """测试写入中的槽位不可读、视图被覆盖后校验失败"""
+        ring = FrameRing(SHAPE, slots=2, shared=False)
+        ring.publish(np.full(SHAPE, 1, dtype=np.uint8))
+        seq, view = ring.read()
+        assert ring.is_valid(seq)
+
+        ring.write_slot()[:] = 2  # 写入中（未commit）
+        assert ring.head == 1 and ring.read() is None
+        ring.commit()
+        ring.publish(np.full(SHAPE, 3, dtype=np.uint8))  # 绕回覆盖帧1所在槽位
+        assert not ring.is_valid(seq)
+        assert view[0, 0, 0] == 3
+
+        seq, copy = ring.read_copy()
+        assert seq == 3 and copy[0, 0, 0] == 3
+        ring.publish(np.full(SHAPE, 4, dtype=np.uint8))
+        assert copy[0, 0, 0] == 3  # 复制的帧不受影响
+
+    def test_frame_age(self):
+        """测试帧截图时间和帧龄，被覆盖的帧帧龄为无穷大"""
+        ring = FrameRing(SHAPE, slots=2, shared=False)
+        ring.write_slot()
+        seq = ring.commit(timestamp=100.0)
+        assert ring.frame_time(seq) == 100.0
+        assert ring.frame_age(seq, now=100.25) == pytest.approx(0.25)
+
+        ring.publish(np.zeros(SHAPE, dtype=np.uint8))
+        ring.publish(np.zeros(SHAPE, dtype=np.uint8))
+        assert ring.frame_time(seq) is None
+        assert ring.frame_age(seq) == float('inf')
+
+    def test_cross_process(self):
+        """测试子进程写入、父进程通过共享内存读取"""
+        with FrameRing(SHAPE, slots=4) as ring:
+            process = multiprocessing.Process(target=_produce, args=(ring.name, 10))
+            process.start()
+            process.join(20)
+            assert process.exitcode == 0
+            seq, frame = ring.read(READ_LATEST)
+            assert seq == 10 and np.all(frame == 10)
+
+
+class TestGrabIntoRing:
+    """零复制截图测试类"""
+
+    def test_capture_into_slot(self):
+        """测试截图直接写入槽位，读取方拿到同一块内存"""
+        source = SyntheticMinimapSource(dots=2, seed=3)
+        region = source.minimap_region
+        ring = ring_for_region(None, region)
+        assert ring.shape == (region[3], region[2], 3)
+        assert ring_for_region(ring, region) is ring
+
+        seq, slot = grab_into_ring(source, region, ring)
+        read_seq, view = ring.read()
+        assert read_seq == seq and np.shares_memory(slot, view)
+        expected = SyntheticMinimapSource(dots=2, seed=3).grab_region(region)
+        assert np.array_equal(view, expected)
+
+        resized = ring_for_region(ring, (0, 0, 20, 10))
+        assert resized is not ring and resized.shape == (10, 20, 3)
+
+    def test_old_ring_readable_after_resize(self):
+        """测试区域大小变化后旧缓冲区仍可读取（检测线程可能还持有旧缓冲区）"""
+        source = SyntheticMinimapSource(dots=2, seed=3)
+        region = source.minimap_region
+        ring = ring_for_region(None, region)
+        seq, _ = grab_into_ring(source, region, ring)
+
+        ring_for_region(ring, (0, 0, 20, 10))
+        assert ring.backlog == 1
+        read_seq, frame = ring.read_copy()
+        assert read_seq == seq and ring.is_valid(seq)
+        assert ring.frame_time(seq) is not None
+        assert frame.shape == (region[3], region[2], 3)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+frame_source 单元测试
+测试回放、模拟截图源、win32截图源跟随窗口大小、虚拟窗口以及多窗口机器人的无界面压测
+"""
+
+import pytest
+import zipfile
+import time
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from frame_source import (ReplaySource, SyntheticMinimapSource, VirtualWindowProvider,
+                          load_frames, frame_source_from_config, FRAME_SOURCES)
+from minimap_detector import MinimapDetector
+
+
+def _frames(count=3, size=(40, 60)):
+    return [(f'frame_{i}.png', np.full(size + (3,), i * 10, dtype=np.uint8)) for i in range(count)]
+
+
+class TestReplaySource:
+    """ReplaySource测试类"""
+
+    def test_load_directory_and_zip(self, tmp_path):
+        """测试从目录和zip加载画面"""
+        frames = _frames()
+        archive = tmp_path / 'frames.zip'
+        with zipfile.ZipFile(archive, 'w') as zf:
+            for name, image in frames:
+                cv2.imwrite(str(tmp_path / name), image)
+                zf.writestr(name, cv2.imencode('.png', image)[1].tobytes())
+
+        from_dir = load_frames(str(tmp_path))
+        from_zip = load_frames(str(archive))
+        assert [name for name, _ in from_dir] == [name for name, _ in from_zip] == [n for n, _ in frames]
+        assert (from_zip[2][1] == frames[2][1]).all()
+
+    def test_cycle_and_buffer(self):
+        """测试循环回放和写入缓冲区"""
+        source = ReplaySource(_frames())
+        assert (source.width, source.height) == (60, 40)
+        out = np.empty((40, 60, 3), dtype=np.uint8)
+        values = [int(source.grab(out)[0, 0, 0]) for _ in range(4)]
+        assert values == [0, 10, 20, 0]
+        assert source.grab(out) is out
+
+    def test_no_loop(self):
+        """测试不循环时播放完返回None"""
+        source = ReplaySource(_frames(2), loop=False)
+        assert source.grab() is not None
+        assert source.grab() is not None
+        assert source.grab() is None
+
+    def test_region(self):
+        """测试整帧录制按区域裁剪，小地图录制直接返回"""
+        source = ReplaySource(_frames(1, (100, 200)))
+        assert source.grab_region((150, 10, 30, 20)).shape == (20, 30, 3)
+        minimap_only = ReplaySource(_frames(1, (150, 150)))
+        region = minimap_only.grab_region((640, 10, 150, 150))
+        assert region.shape == (150, 150, 3)
+
+    def test_empty(self):
+        """测试空回放报错"""
+        with pytest.raises(ValueError):
+            ReplaySource([])
+
+
+class TestSyntheticMinimapSource:
+    """SyntheticMinimapSource测试类"""
+
+    def test_dots_detected(self):
+        """测试检测器能检测到模拟黄点"""
+        source = SyntheticMinimapSource(dots=3, seed=4)
+        detector = MinimapDetector()
+        matched = 0
+        for _ in range(30):
+            minimap = source.grab_region(source.minimap_region)
+            expected = source.dot_positions()
+            found = detector.detect(minimap)
+            if expected:
+                matched += bool(found)
+            else:
+                assert not found
+        assert matched > 0
+
+    def test_dots_move(self):
+        """测试黄点随帧移动"""
+        source = SyntheticMinimapSource(dots=2, seed=1)
+        before = source.positions.copy()
+        source.grab_region(source.minimap_region)
+        assert not np.allclose(before, source.positions)
+
+    def test_full_frame_and_buffer(self):
+        """测试整帧截图写入缓冲区"""
+        source = SyntheticMinimapSource(width=320, height=240)
+        out = np.empty((240, 320, 3), dtype=np.uint8)
+        assert source.grab(out) is out
+
+
+class _FakeBitmap:
+    """替代 win32ui 位图，只记录尺寸"""
+
+    def CreateCompatibleBitmap(self, dc, width, height):
+        self.size = (width, height)
+
+    def GetBitmapBits(self, as_bytes):
+        return bytes(self.size[0] * self.size[1] * 4)
+
+    def GetHandle(self):
+        return 0
+
+
+class _FakeDC:
+    """替代 win32ui 设备上下文"""
+
+    def CreateCompatibleDC(self):
+        return _FakeDC()
+
+    def SelectObject(self, bitmap):
+        pass
+
+    def BitBlt(self, dest, size, source_dc, origin, rop):
+        pass
+
+    def DeleteDC(self):
+        pass
+
+
+class TestWin32Source:
+    """win32截图源测试类（用假的pywin32模块）"""
+
+    def test_full_grab_follows_resize(self, monkeypatch):
+        """测试打开后窗口大小改变，整帧截图使用新的客户区尺寸"""
+        import types
+        import frame_source
+        from frame_source import Win32BitBltSource
+
+        client = [0, 0, 800, 600]
+        win32gui = types.SimpleNamespace(GetClientRect=lambda hwnd: tuple(client), GetWindowDC=lambda hwnd: 1,
+                                         ReleaseDC=lambda hwnd, dc: None, DeleteObject=lambda handle: None)
+        win32ui = types.SimpleNamespace(CreateDCFromHandle=lambda handle: _FakeDC(), CreateBitmap=_FakeBitmap)
+        monkeypatch.setattr(frame_source, '_win32_modules',
+                            (win32gui, win32ui, types.SimpleNamespace(SRCCOPY=0), None))
+
+        source = Win32BitBltSource()
+        assert source.open(1)
+        assert source.grab().shape == (600, 800, 3)
+        client[2:] = [1024, 768]
+        assert source.grab().shape == (768, 1024, 3)
+        assert (source.width, source.height) == (1024, 768)
+        source.close()
+
+
+class TestVirtualWindowProvider:
+    """VirtualWindowProvider测试类"""
+
+    def test_find_and_close(self):
+        """测试查找和关闭虚拟窗口"""
+        provider = VirtualWindowProvider()
+        game = provider.add_window('九五沉默 - 1')
+        provider.add_window('记事本')
+        provider.add_window('传奇', width=0, height=0)
+        assert provider.find_windows(['九五沉默', '传奇']) == [(game, '九五沉默 - 1')]
+        provider.close_window(game)
+        assert not provider.is_window(game)
+        assert provider.find_windows(['九五沉默']) == []
+
+    def test_key_events(self):
+        """测试记录按键"""
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        vk = provider.vk_code('2')
+        assert vk == 0x32
+        provider.key_down(hwnd, vk)
+        provider.key_up(hwnd, vk)
+        assert provider.key_presses(hwnd) == 1
+
+
+class TestConfig:
+    """截图源配置测试类"""
+
+    def test_from_config(self):
+        """测试按配置创建截图源"""
+        import configparser
+        config = configparser.ConfigParser()
+        assert isinstance(frame_source_from_config(config), FRAME_SOURCES['bitblt'])
+        config.read_dict({'Capture': {'backend': 'synthetic', 'synthetic_dots': '5'}})
+        source = frame_source_from_config(config)
+        assert isinstance(source, SyntheticMinimapSource)
+        assert len(source.positions) == 5
+
+
+class TestScale:
+    """多窗口无界面压测"""
+
+    def test_hundred_windows(self, tmp_path):
+        """测试100个虚拟窗口同时运行检测和传送"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        for i in range(100):
+            provider.add_window(f'九五沉默 - {i}')
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Teleport]\ncooldown = 0.2\n', encoding='utf-8')
+
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda hwnd: SyntheticMinimapSource(dots=4, speed=4.0, seed=hwnd))
+        assert bot.scan_windows() == 100
+        for gw in bot.windows.values():
+            gw.start(0.01)
+        time.sleep(1.0)
+        for gw in bot.windows.values():
+            gw.stop()
+
+        runs = [gw.stats['detection_runs'] for gw in bot.windows.values()]
+        assert min(runs) > 0
+        assert sum(gw.stats['teleports_used'] for gw in bot.windows.values()) == provider.key_presses() > 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
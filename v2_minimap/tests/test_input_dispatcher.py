@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+input_dispatcher 单元测试
+测试按键异步发送、重复请求合并、停止时补发抬起和队列深度指标
+"""
+
+import pytest
+import time
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from frame_source import SyntheticMinimapSource, VirtualWindowProvider, key_lparam
+from input_dispatcher import InputDispatcher
+
+
+def _wait_events(provider, count: int, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while len(provider.key_events) < count and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return [(hwnd, action, vk) for _, hwnd, action, vk in provider.key_events]
+
+
+class TestKeyLparam:
+    """lParam测试类"""
+
+    def test_down_up(self):
+        """测试按下和抬起的lParam位"""
+        assert key_lparam(0x03) == 0x00030001
+        assert key_lparam(0x03, key_up=True) == 0xC0030001
+        assert key_lparam(0x1FF) == 0x00FF0001  # 扫描码只占8位
+
+
+class TestInputDispatcher:
+    """InputDispatcher测试类"""
+
+    def test_press_does_not_block(self):
+        """测试提交立即返回，抬起在按住时长后发送"""
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        dispatcher = InputDispatcher(provider)
+        try:
+            started = time.perf_counter()
+            assert dispatcher.press(hwnd, 50, hold=0.1)
+            assert time.perf_counter() - started < 0.02
+
+            assert _wait_events(provider, 2) == [(hwnd, 'down', 50), (hwnd, 'up', 50)]
+            (down_time, *_), (up_time, *_) = provider.key_events
+            assert up_time - down_time >= 0.09
+            assert dispatcher.sent == 1
+        finally:
+            dispatcher.stop()
+
+    def test_coalesce(self):
+        """测试按键未抬起或冷却中时合并重复请求"""
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        other = provider.add_window()
+        dispatcher = InputDispatcher(provider, hold=0.02)
+        try:
+            assert dispatcher.press(hwnd, 50, cooldown=10.0)
+            assert not dispatcher.press(hwnd, 50, cooldown=10.0)
+            assert dispatcher.press(other, 50, cooldown=10.0)  # 不同窗口互不影响
+            _wait_events(provider, 4)
+            assert not dispatcher.press(hwnd, 50, cooldown=10.0)
+            assert dispatcher.press(hwnd, 50, cooldown=0.0)  # 已抬起且无冷却
+            _wait_events(provider, 6)
+            assert provider.key_presses(hwnd) == 2
+            assert dispatcher.coalesced == 2
+
+            dispatcher.forget(hwnd)
+            assert dispatcher.press(hwnd, 50, cooldown=10.0)
+        finally:
+            dispatcher.stop()
+
+    def test_stop_drops_unsent_presses(self):
+        """测试停止时尚未按下的请求计入丢弃数"""
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        dispatcher = InputDispatcher(provider)
+        with dispatcher.cond:  # 持有锁，调度线程在停止前取不到请求
+            dispatcher.press(hwnd, 50)
+            dispatcher.press(hwnd, 51)
+            dispatcher._running = False
+        dispatcher.stop()
+        assert dispatcher.queue_stats() == {'depth': 0, 'coalesced': 0, 'dropped': 2}
+        assert provider.key_events == []
+
+    def test_stop_releases_held_keys(self):
+        """测试停止时补发未抬起的按键"""
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        dispatcher = InputDispatcher(provider)
+        dispatcher.press(hwnd, 50, hold=30.0)
+        _wait_events(provider, 1)
+        dispatcher.stop()
+        assert [action for _, _, action, _ in provider.key_events] == ['down', 'up']
+        assert dispatcher.pending() == 0
+        assert dispatcher.dropped == 0
+
+        # 停止后再次提交会重新启动调度线程
+        assert dispatcher.press(hwnd, 50, hold=0.0)
+        assert len(_wait_events(provider, 4)) == 4
+        dispatcher.stop()
+
+
+class TestGameWindowTeleport:
+    """检测线程只提交按键测试类"""
+
+    def test_teleport_returns_immediately(self, tmp_path):
+        """测试传送不在检测线程中等待按住时长"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Teleport]\ncooldown = 0\nkey_hold = 0.2\n', encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: SyntheticMinimapSource(seed=h))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+
+        started = time.perf_counter()
+        gw.teleport()
+        assert time.perf_counter() - started < 0.05
+        gw.teleport()  # 上一次尚未抬起，合并
+        assert gw.stats['teleports_used'] == 1
+
+        _wait_events(provider, 1)
+        bot.stop()  # 停止时补发抬起
+        assert [action for _, _, action, _ in provider.key_events] == ['down', 'up']
+
+    def test_metrics_report_queue_depth(self, tmp_path):
+        """测试监控指标报告按键队列中尚未发送的事件数"""
+        from metrics_server import render_prometheus
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Teleport]\ncooldown = 0\nkey_hold = 0.5\n', encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: SyntheticMinimapSource(seed=h))
+        bot.scan_windows()
+        bot.windows[hwnd].teleport()
+        _wait_events(provider, 1)
+        assert not bot.input_dispatcher.press(hwnd, provider.vk_code('2'))  # 尚未抬起，合并
+        snapshot = bot.collect_metrics()
+        assert snapshot['queues']['input'] == {'depth': 1, 'coalesced': 1, 'dropped': 0}  # 等待抬起
+        assert snapshot['queues']['frame_ring'] == {'depth': 0, 'dropped': 0}
+        text = render_prometheus(snapshot)
+        assert 'mir2_bot_queue_depth{queue="input"} 1' in text
+        assert 'mir2_bot_queue_coalesced_total{queue="input"} 1' in text
+        bot.stop()
+        assert bot.collect_metrics()['queues']['input']['depth'] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
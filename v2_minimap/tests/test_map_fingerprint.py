@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+map_fingerprint 单元测试
+测试地图指纹与滚动位置无关、切换确认、最近地图缓存的换入和淘汰、按地图的玩家统计，以及窗口切换地图时换入静态掩码
+"""
+
+import pytest
+import configparser
+import sys
+import os
+import timeit
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from map_fingerprint import MapRegistry, map_fingerprint
+from blob_stats import Blobs
+from farm_simulator import FarmWindowProvider
+from frame_source import ReplaySource
+
+PALETTES = {
+    'forest': [(30, 90, 40), (20, 60, 80), (40, 120, 60), (10, 40, 30)],
+    'desert': [(80, 170, 200), (60, 140, 180), (100, 200, 220), (40, 100, 150)],
+    'cave': [(70, 70, 70), (110, 100, 90), (40, 40, 50), (150, 140, 130)],
+}
+
+
+def _world(name: str, size: int = 400) -> np.ndarray:
+    """由地图调色板的色块组成的大地图"""
+    rng = np.random.default_rng(len(name))
+    palette = np.array(PALETTES[name], dtype=np.uint8)
+    blocks = palette[rng.integers(0, len(palette), (size // 10, size // 10))]
+    return cv2.resize(blocks, (size, size), interpolation=cv2.INTER_NEAREST)
+
+
+def _minimap(name: str, x: int = 0, y: int = 0) -> np.ndarray:
+    """以 (x, y) 为左上角截取的150x150小地图（小地图随人物位置滚动）"""
+    return np.ascontiguousarray(_world(name)[y:y + 150, x:x + 150])
+
+
+class TestFingerprint:
+    """指纹测试类"""
+
+    def test_scroll_invariant(self):
+        base = map_fingerprint(_minimap('forest'))
+        assert np.abs(base - map_fingerprint(_minimap('forest', 200, 180))).sum() < 0.3
+        assert np.abs(base - map_fingerprint(_minimap('desert'))).sum() > 1.0
+
+    def test_fast(self):
+        minimap = _minimap('cave')
+        assert timeit.timeit(lambda: map_fingerprint(minimap), number=200) / 200 < 1e-3
+
+
+class TestRegistry:
+    """地图缓存测试类"""
+
+    def test_change_needs_confirmation(self):
+        registry = MapRegistry(confirm_frames=2)
+        assert registry.observe(_minimap('forest')) is None
+        forest = registry.observe(_minimap('forest', 10, 10))
+        assert forest is not None and forest.visits == 1
+        assert registry.observe(_minimap('forest', 50, 0)) is None
+
+        assert registry.observe(_minimap('desert')) is None       # 单帧不确认
+        assert registry.observe(_minimap('forest')) is None
+        assert registry.current is forest
+        assert registry.observe(np.zeros((150, 150, 3), dtype=np.uint8)) is None  # 黑屏不参与
+
+    def test_revisit_swaps_in_cached_state(self):
+        registry = MapRegistry(confirm_frames=1)
+        forest = registry.observe(_minimap('forest'))
+        forest.data['marker'] = 'learned'
+        registry.observe(_minimap('desert'))
+        back = registry.observe(_minimap('forest', 120, 90))
+        assert back is forest and back.visits == 2
+        assert back.data['marker'] == 'learned'
+        assert registry.changes == 3
+
+    def test_lru_eviction(self):
+        registry = MapRegistry(capacity=2, confirm_frames=1)
+        forest = registry.observe(_minimap('forest'))
+        registry.observe(_minimap('desert'))
+        registry.observe(_minimap('cave'))
+        assert forest.key not in registry.maps and len(registry.maps) == 2
+        assert registry.observe(_minimap('forest')) is not forest
+
+    def test_player_density(self):
+        registry = MapRegistry(confirm_frames=1)
+        for count in (0, 2, 0, 4):
+            registry.observe(_minimap('forest'), count)
+        registry.observe(_minimap('cave'), 1)
+        cave, forest = registry.summary()
+        assert forest['frames'] == 4
+        assert forest['players_per_frame'] == 1.5 and forest['occupied_share'] == 0.5
+        assert cave['players_per_frame'] == 1.0
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_dict({'MapTracking': {'capacity': '4'}})
+        assert MapRegistry.from_config(config).capacity == 4
+        config.set('MapTracking', 'enabled', 'false')
+        assert MapRegistry.from_config(config) is None
+
+
+class TestWindowMapChange:
+    """窗口切换地图测试类"""
+
+    def test_swaps_static_mask_and_resets_tracks(self, tmp_path):
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = FarmWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Minimap]\nauto_calibrate = false\n[StaticMask]\nenabled = true\n'
+                               '[MapTracking]\nconfirm_frames = 1\n', encoding='utf-8')
+        minimaps = [_minimap('forest'), _minimap('forest', 30, 30), _minimap('desert'), _minimap('forest', 60, 0)]
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: ReplaySource(minimaps, loop=False))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+        gw.detector.detect_blobs = lambda minimap: Blobs(np.array([[20.0, 20.0]]), np.array([12]),
+                                                         np.array([[19, 19, 3, 3]], dtype=np.int32))
+
+        masks = []
+        for _ in minimaps:
+            gw.detect_players()
+            masks.append(gw.detector.static_mask)
+        assert gw.stats['map_changes'] == 3
+        assert masks[0] is masks[1] is masks[3] and masks[2] is not masks[0]
+        assert masks[0].map_key != masks[2].map_key
+        assert len(gw.tracker.tracks) == 1 and gw.tracker.tracks[0].hits == 1
+        assert [row['visits'] for row in gw.map_stats()] == [2, 1]
+        bot.stop()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
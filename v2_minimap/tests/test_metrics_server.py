@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+metrics_server 单元测试
+测试Prometheus文本格式输出和本地HTTP服务
+"""
+
+import pytest
+import threading
+import urllib.request
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from bot_metrics import WindowMetrics, STAGE_CAPTURE
+from metrics_server import MetricsServer, render_prometheus, window_snapshot
+
+
+def make_snapshot():
+    """创建测试用快照"""
+    metrics = WindowMetrics()
+    for value in (0.0004, 0.002, 0.03):
+        metrics.record(STAGE_CAPTURE, value)
+    stats = {'detection_runs': 3, 'teleports_used': 1, 'start_time': None}
+    return {
+        'gauges': {'windows_alive': 1, 'detection_interval_seconds': 0.3},
+        'queues': {'input': 2},
+        'windows': [window_snapshot('1234', stats, metrics, threading.Lock(), {'running': 1})],
+    }
+
+
+class TestRenderPrometheus:
+    """Prometheus文本格式测试类"""
+
+    def test_counters_and_gauges(self):
+        """测试计数和状态值"""
+        text = render_prometheus(make_snapshot())
+        assert 'mir2_bot_detection_runs_total{window="1234"} 3' in text
+        assert 'mir2_bot_teleports_used_total{window="1234"} 1' in text
+        assert 'mir2_bot_windows_alive 1' in text
+        assert 'mir2_bot_detection_interval_seconds 0.3' in text
+        assert 'mir2_bot_queue_depth{queue="input"} 2' in text
+        assert 'mir2_bot_window_running{window="1234"} 1' in text
+        # 非数值字段不输出
+        assert 'start_time' not in text
+
+    def test_queue_counters(self):
+        """测试队列的深度和累计合并/丢弃数"""
+        snapshot = {'queues': {'input': {'depth': 1, 'coalesced': 4, 'dropped': 2},
+                               'frame_ring': {'depth': 3, 'dropped': 7}}}
+        text = render_prometheus(snapshot)
+        assert 'mir2_bot_queue_depth{queue="frame_ring"} 3' in text
+        assert 'mir2_bot_queue_depth{queue="input"} 1' in text
+        assert '# TYPE mir2_bot_queue_dropped_total counter' in text
+        assert 'mir2_bot_queue_dropped_total{queue="frame_ring"} 7' in text
+        assert 'mir2_bot_queue_dropped_total{queue="input"} 2' in text
+        assert 'mir2_bot_queue_coalesced_total{queue="input"} 4' in text
+        assert 'queue_coalesced_total{queue="frame_ring"}' not in text
+
+    def test_histogram_buckets_cumulative(self):
+        """测试直方图累计分桶"""
+        text = render_prometheus(make_snapshot())
+        prefix = 'mir2_bot_stage_latency_seconds_bucket{window="1234",stage="capture",'
+        assert prefix + 'le="0.001"} 1' in text
+        assert prefix + 'le="0.05"} 3' in text
+        assert prefix + 'le="+Inf"} 3' in text
+        assert 'mir2_bot_stage_latency_seconds_count{window="1234",stage="capture"} 3' in text
+
+    def test_label_escaping(self):
+        """测试标签转义"""
+        snapshot = {'windows': [window_snapshot('a"b', {'detection_runs': 1}, None)]}
+        assert 'window="a\\"b"' in render_prometheus(snapshot)
+
+
+class TestMetricsServer:
+    """本地HTTP服务测试类"""
+
+    def test_serve_metrics(self):
+        """测试通过HTTP获取指标"""
+        server = MetricsServer(make_snapshot, port=0)
+        assert server.start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics', timeout=5) as response:
+                body = response.read().decode('utf-8')
+                assert response.headers['Content-Type'].startswith('text/plain')
+            assert 'mir2_bot_detection_runs_total' in body
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
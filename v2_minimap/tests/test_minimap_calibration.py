@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+minimap_calibration 单元测试
+测试按边框定位小地图（忽略其他带边框的面板）、外围一圈的廉价校验、按分辨率缓存，以及窗口使用定位结果代替配置的区域
+"""
+
+import pytest
+import json
+import sys
+import os
+import time
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from minimap_calibration import MinimapCalibrator, locate_minimap, validate_region, calibrator_from_config
+from frame_source import SyntheticMinimapSource, VirtualWindowProvider
+
+
+def _with_panels(region, count, seed=0):
+    """小地图画面上再画 count 个不与小地图重叠、带边框的界面面板"""
+    frame = SyntheticMinimapSource(minimap_region=region, seed=seed).grab().copy()
+    rng = np.random.default_rng(seed)
+    x, y, w, h = region
+    placed = 0
+    while placed < count:
+        pw, ph = rng.integers(60, 100, 2).tolist()
+        px, py = int(rng.integers(0, 800 - pw)), int(rng.integers(0, 270 - ph))
+        if px < x + w + 4 and px + pw > x - 4 and py < y + h + 4 and py + ph > y - 4:
+            continue
+        cv2.rectangle(frame, (px, py), (px + pw, py + ph), (200, 200, 200), 2)
+        frame[py + 3:py + ph - 2, px + 3:px + pw - 2] = rng.integers(20, 60, 3)
+        placed += 1
+    return frame
+
+
+class TestLocate:
+    """定位测试类"""
+
+    @pytest.mark.parametrize('region', [(640, 10, 150, 150), (20, 15, 120, 110), (610, 30, 180, 160)])
+    def test_finds_exact_region(self, region):
+        """测试定位结果与小地图区域（边框内侧）完全一致"""
+        source = SyntheticMinimapSource(minimap_region=region, seed=3)
+        assert locate_minimap(source.grab()) == region
+
+    @pytest.mark.parametrize('count', [10, 20, 40])
+    @pytest.mark.parametrize('region', [(640, 10, 150, 150), (20, 15, 120, 110)])
+    def test_ignores_panels(self, region, count):
+        """测试画面上有很多比小地图小的带边框面板时仍定位到小地图，且耗时很短"""
+        frame = _with_panels(region, count, seed=count)
+        start = time.perf_counter()
+        assert locate_minimap(frame) == region
+        assert time.perf_counter() - start < 0.1
+
+    def test_prefers_hint_and_right_corner(self):
+        """测试配置区域附近的矩形优先，其次右上角，左上角的面板不会抢先"""
+        frame = SyntheticMinimapSource(minimap_region=(640, 10, 150, 150), seed=1).grab().copy()
+        cv2.rectangle(frame, (4, 4), (90, 80), (200, 200, 200), 2)
+        assert locate_minimap(frame) == (640, 10, 150, 150)
+        assert locate_minimap(frame, prefer_right=False) == (6, 6, 83, 73)
+        # 不在两角的小地图只能靠配置区域找到
+        frame = SyntheticMinimapSource(minimap_region=(300, 200, 150, 150), seed=1).grab()
+        assert locate_minimap(frame) is None
+        assert locate_minimap(frame, hint=(320, 180, 150, 150)) == (300, 200, 150, 150)
+
+    def test_no_minimap(self):
+        """测试随机画面和没有边框的画面返回None"""
+        rng = np.random.default_rng(0)
+        assert locate_minimap(rng.integers(0, 256, (600, 800, 3), dtype=np.uint8)) is None
+        assert locate_minimap(np.zeros((600, 800, 3), dtype=np.uint8)) is None
+        assert locate_minimap(None) is None
+
+    def test_validate(self):
+        """测试校验只在边框对齐时通过"""
+        source = SyntheticMinimapSource(minimap_region=(640, 10, 150, 150))
+        assert validate_region(source, (640, 10, 150, 150))
+        assert not validate_region(source, (630, 10, 150, 150))
+        assert not validate_region(source, (640, 10, 140, 150))
+
+
+class TestCalibrator:
+    """校准缓存测试类"""
+
+    def test_cache_per_resolution(self, tmp_path):
+        """测试按分辨率缓存到文件，重新加载后直接使用缓存"""
+        path = str(tmp_path / 'calibration.json')
+        calibrator = MinimapCalibrator(path)
+        small = SyntheticMinimapSource(800, 600, minimap_region=(640, 10, 150, 150))
+        large = SyntheticMinimapSource(1024, 768, minimap_region=(850, 12, 160, 160))
+        assert calibrator.region_for(small, (800, 600)) == (640, 10, 150, 150)
+        assert calibrator.region_for(large, (1024, 768)) == (850, 12, 160, 160)
+        assert calibrator.calibrations == 2
+
+        with open(path, encoding='utf-8') as f:
+            assert set(json.load(f)) == {'800x600', '1024x768'}
+
+        reloaded = MinimapCalibrator(path)
+        assert reloaded.region_for(large, (1024, 768)) == (850, 12, 160, 160)
+        assert reloaded.calibrations == 0 and reloaded.validations == 1
+
+    def test_stale_cache_recalibrates(self):
+        """测试缓存区域校验失败时重新定位"""
+        calibrator = MinimapCalibrator()
+        calibrator.store((800, 600), (600, 20, 150, 150))
+        source = SyntheticMinimapSource(minimap_region=(640, 10, 150, 150))
+        assert calibrator.region_for(source, (800, 600)) == (640, 10, 150, 150)
+        assert calibrator.calibrations == 1
+
+    def test_from_config(self, tmp_path):
+        """测试配置关闭时不创建校准器，缓存文件相对配置文件目录"""
+        import configparser
+        config = configparser.ConfigParser()
+        config.read_dict({'Minimap': {'auto_calibrate': 'false'}})
+        assert calibrator_from_config(config, str(tmp_path)) is None
+        config.set('Minimap', 'auto_calibrate', 'true')
+        config.set('Minimap', 'revalidate_interval', '5')
+        calibrator = calibrator_from_config(config, str(tmp_path))
+        assert calibrator.cache_path == os.path.join(str(tmp_path), 'minimap_calibration.json')
+        assert calibrator.revalidate_interval == 5.0
+
+    def test_manual_region_defaults_off(self, tmp_path):
+        """测试没有 auto_calibrate 的旧配置文件中有手动区域时不自动定位"""
+        import configparser
+        config = configparser.ConfigParser()
+        config.read_dict({'Minimap': {'offset_x': '10', 'offset_y': '10', 'width': '150', 'height': '150'}})
+        assert calibrator_from_config(config, str(tmp_path)) is None
+        config.set('Minimap', 'auto_calibrate', 'true')
+        assert calibrator_from_config(config, str(tmp_path)) is not None
+        assert calibrator_from_config(configparser.ConfigParser(), str(tmp_path)) is not None
+
+
+class TestGameWindow:
+    """窗口集成测试类"""
+
+    def test_window_uses_calibrated_region(self, tmp_path):
+        """测试小地图不在配置位置时窗口使用定位结果，边框移动后定时校验重新定位"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Minimap]\nrevalidate_interval = 0\n[Watcher]\nenabled = false\n', encoding='utf-8')
+        sources = {}
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: sources.setdefault(
+                                 h, SyntheticMinimapSource(minimap_region=(600, 40, 170, 140))))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+        assert gw.minimap_region == (600, 40, 170, 140)
+        assert gw.capture_minimap().shape[:2] == (140, 170)
+        assert os.path.exists(tmp_path / 'minimap_calibration.json')
+
+        # 界面布局变化：小地图移动到另一位置
+        gw.frame_source.close()
+        gw.frame_source = SyntheticMinimapSource(minimap_region=(20, 20, 150, 150))
+        gw._check_minimap_region()
+        assert gw.minimap_region == (20, 20, 150, 150)
+        assert gw.capture_minimap().shape[:2] == (150, 150)
+        gw.release()
+
+    def test_falls_back_to_config(self, tmp_path):
+        """测试定位失败时使用配置的区域"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Watcher]\nenabled = false\n', encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: SyntheticMinimapSource(border=0))
+        bot.scan_windows()
+        assert bot.windows[hwnd].minimap_region == (640, 10, 150, 150)
+        bot.windows[hwnd].release()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+minimap_classifier 单元测试
+测试颜色框解析、类别查找表（精确和量化）、一次查表的多类别分类，以及检测器按触发类别返回点
+"""
+
+import pytest
+import configparser
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from minimap_classifier import MinimapClassifier, parse_boxes, format_boxes, build_class_lut
+from minimap_detector import MinimapDetector
+
+CLASSES = [
+    ('player', [((250, 250, 0), (255, 255, 5))]),
+    ('guild', [((200, 0, 200), (255, 60, 255)), ((0, 200, 200), (40, 255, 255))]),
+    ('monster', [((0, 120, 0), (40, 180, 40))]),
+]
+
+
+def _minimap() -> np.ndarray:
+    """两个玩家、两个行会成员（两种颜色）、三个怪物"""
+    image = np.full((150, 150, 3), (40, 30, 30), dtype=np.uint8)
+    for x, y in ((20, 20), (100, 30)):
+        cv2.circle(image, (x, y), 2, (0, 255, 255), -1)      # RGB(255,255,0)
+    cv2.circle(image, (40, 100), 2, (230, 30, 230), -1)      # RGB(230,30,230)
+    cv2.circle(image, (120, 120), 2, (230, 230, 20), -1)     # RGB(20,230,230)
+    for x, y in ((60, 60), (70, 130), (130, 80)):
+        cv2.circle(image, (x, y), 2, (0, 150, 0), -1)        # RGB(0,150,0)
+    return image
+
+
+class TestConfig:
+    """配置解析测试类"""
+
+    def test_parse_and_format(self):
+        boxes = parse_boxes('250,250,0-255,255,5; 0,200,200-40,255,255')
+        assert boxes == [((250, 250, 0), (255, 255, 5)), ((0, 200, 200), (40, 255, 255))]
+        assert parse_boxes(format_boxes(boxes)) == boxes
+        for text in ('250,250-255,255,5', '10,0,0-5,0,0', '', '1,2,3'):
+            with pytest.raises(ValueError):
+                parse_boxes(text)
+
+
+class TestLookupTable:
+    """查找表测试类"""
+
+    def test_first_class_wins_on_overlap(self):
+        lut = build_class_lut([('a', [((0, 0, 0), (10, 10, 10))]), ('b', [((5, 5, 5), (20, 20, 20))])])
+        cube = lut.reshape(256, 256, 256)
+        assert cube[7, 7, 7] == 1 and cube[15, 15, 15] == 2 and cube[30, 30, 30] == 0
+
+    def test_quantized_table(self):
+        """测试32x32x32量化表只有32KB，点的颜色与精确表分类一致"""
+        exact = MinimapClassifier(CLASSES)
+        quantized = MinimapClassifier(CLASSES, bits=5)
+        assert quantized.lut.nbytes == 32 * 1024
+        image = _minimap()
+        assert np.array_equal(exact.label(image), quantized.label(image))
+
+
+class TestClassify:
+    """分类测试类"""
+
+    def test_counts_and_blobs(self):
+        results = MinimapClassifier(CLASSES).classify(_minimap())
+        assert sorted((x, y) for x, y, _ in results['player']['blobs']) == [(20, 20), (100, 30)]
+        assert len(results['guild']['blobs']) == 2
+        assert len(results['monster']['blobs']) == 3
+        assert results['player']['pixels'] == sum(area for _, _, area in results['player']['blobs'])
+        assert results['monster']['pixels'] > 0
+
+    def test_shared_table(self):
+        """测试相同类别配置的分类器共用同一个查找表"""
+        assert MinimapClassifier(CLASSES).lut is MinimapClassifier(list(CLASSES)).lut
+
+    def test_empty(self):
+        results = MinimapClassifier(CLASSES).classify(np.zeros((50, 50, 3), dtype=np.uint8))
+        assert results == {name: {'pixels': 0, 'blobs': []} for name, _ in CLASSES}
+
+
+class TestDetector:
+    """检测器集成测试类"""
+
+    def test_trigger_classes(self):
+        """测试配置类别后detect只返回触发类别的点，其他类别的统计保留在last_classes"""
+        config = configparser.ConfigParser()
+        config.read_dict({'MinimapClasses': {name: format_boxes(boxes) for name, boxes in CLASSES},
+                          'Detection': {'trigger_classes': 'player, guild'}})
+        detector = MinimapDetector()
+        detector.configure(config)
+        assert len(detector.detect(_minimap())) == 4
+        assert len(detector.last_classes['monster']['blobs']) == 3
+
+        config.remove_option('Detection', 'trigger_classes')
+        detector.configure(config)
+        assert detector.trigger_classes == ['player']
+        assert len(detector.detect(_minimap())) == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
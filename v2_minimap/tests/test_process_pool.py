@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+process_pool 单元测试
+测试多进程窗口分配、崩溃重启和统计汇总
+"""
+
+import pytest
+import time
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from frame_source import VirtualWindowProvider
+from process_pool import ProcessPoolSupervisor, register_virtual_window, synthetic_source
+
+
+def _wait_until(condition, timeout: float = 20.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'pool.ini'
+    path.write_text('[Detection]\ndetection_interval = 0.01\n[Teleport]\nenabled = false\n'
+                    '[Watcher]\nenabled = false\n', encoding='utf-8')
+    return str(path)
+
+
+def _supervisor(config_file, workers=2):
+    return ProcessPoolSupervisor(config_file, workers, provider_factory=VirtualWindowProvider,
+                                 source_factory=synthetic_source, window_setup=register_virtual_window,
+                                 stats_interval=0.2)
+
+
+class TestProcessPoolSupervisor:
+    """ProcessPoolSupervisor测试类"""
+
+    def test_assign_balanced(self, config_file):
+        """测试窗口均匀分配并汇总统计"""
+        supervisor = _supervisor(config_file)
+        supervisor.start()
+        try:
+            workers = [supervisor.assign(0x1000 + i * 2, f'九五沉默 - {i}') for i in range(4)]
+            assert sorted(workers) == [0, 0, 1, 1]
+            assert supervisor.assign(0x1000, '九五沉默 - 0') == workers[0]  # 重复分配
+
+            assert _wait_until(lambda: len(supervisor.window_stats()) == 4 and
+                               all(s['detection_runs'] > 0 for s in supervisor.window_stats().values()))
+            assert supervisor.collect_counters()['detection_runs'] >= 4
+
+            supervisor.remove(0x1000)
+            assert _wait_until(lambda: 0x1000 not in supervisor.window_stats())
+        finally:
+            supervisor.stop()
+        assert all(not w.process.is_alive() for w in supervisor.workers)
+        assert supervisor.assign(0x2000, 'late') is None
+
+    def test_restart_crashed_worker(self, config_file):
+        """测试工作进程崩溃后重启并重新分配窗口，累计计数不回退"""
+        supervisor = _supervisor(config_file)
+        supervisor.start()
+        try:
+            for i in range(4):
+                supervisor.assign(0x1000 + i * 2, f'九五沉默 - {i}')
+            assert _wait_until(lambda: len(supervisor.window_stats()) == 4)
+            assert _wait_until(lambda: supervisor.workers[0].counters().get('detection_runs', 0) > 0)
+            before = supervisor.collect_counters()['detection_runs']
+
+            crashed = supervisor.workers[0]
+            crashed.process.kill()
+            assert _wait_until(lambda: supervisor.restarts == 1)
+            assert supervisor.collect_counters()['detection_runs'] >= before
+
+            restarted = supervisor.workers[0]
+            assert restarted is not crashed and restarted.restarts == 1
+            assert restarted.windows == crashed.windows
+            assert _wait_until(lambda: restarted.snapshot is not None and
+                               set(restarted.snapshot['windows']) == set(crashed.windows))
+        finally:
+            supervisor.stop()
+
+
+class TestMultiWindowBotPool:
+    """MultiWindowBot多进程模式测试类"""
+
+    def test_pool_mode(self, config_file):
+        """测试多进程模式下窗口在工作进程中运行，运行中指标和状态取自上报，停止后统计写回"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        for i in range(3):
+            provider.add_window(f'九五沉默 - {i}')
+        bot = MultiWindowBot(config_file, window_provider=provider, source_factory=synthetic_source)
+        bot.scan_windows()
+        bot.running = True
+        bot.start_process_pool(2, VirtualWindowProvider, register_virtual_window)
+        try:
+            new_hwnd = provider.add_window('九五沉默 - 3')
+            bot.attach_window(new_hwnd, '九五沉默 - 3')
+            assert _wait_until(lambda: len(bot.supervisor.window_stats()) == 4 and
+                               bot._collect_counters()['detection_runs'] >= 4)
+            # 本进程不运行检测线程
+            assert not any(gw.running for gw in bot.windows.values())
+
+            # 运行中的监控指标和守护进程状态使用工作进程上报的计数
+            from bot_daemon import collect_state
+
+            assert _wait_until(lambda: all(w['counters']['detection_runs'] > 0 and w['gauges']['running'] == 1
+                                           for w in bot.collect_metrics()['windows']))
+            metrics = bot.collect_metrics()
+            assert metrics['gauges']['windows_alive'] == 4
+            assert set(metrics['queues']) == {'input', 'frame_ring'}
+            rows = collect_state(bot)['windows']
+            assert len(rows) == 4 and all(row['running'] and row['stats']['detection_runs'] > 0 for row in rows)
+
+            # 分阶段耗时直方图和窗口状态同样取自上报
+            assert all(w['histograms']['capture'].count > 0 for w in metrics['windows'])
+            assert all(row['capture_p95_ms'] is not None and row['state'] is not None for row in rows)
+            assert not bot.start_profiling(0.1)  # 检测循环不在本进程中
+        finally:
+            bot.stop()
+        assert all(gw.stats['detection_runs'] > 0 for gw in bot.windows.values())
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
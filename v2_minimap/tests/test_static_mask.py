@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+static_mask 单元测试
+测试静态像素学习、按位压缩保存和启动时加载、按尺寸切换，以及检测器和分类器在提取点之前排除静态特征
+"""
+
+import pytest
+import configparser
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from static_mask import StaticMask, load_static_mask
+from minimap_detector import MinimapDetector
+from minimap_classifier import format_boxes
+
+
+def _minimap(seed: int) -> np.ndarray:
+    """固定位置的黄色界面标记（方块）加上随机位置的黄点"""
+    rng = np.random.default_rng(seed)
+    image = np.full((150, 150, 3), (40, 30, 30), dtype=np.uint8)
+    image[130:140, 10:20] = (0, 255, 255)
+    for _ in range(3):
+        x, y = rng.integers(30, 120, 2)
+        cv2.circle(image, (int(x), int(y)), 2, (0, 255, 255), -1)
+    return image
+
+
+def _config(**options) -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+    config.read_dict({'StaticMask': dict({'enabled': 'true', 'learn_frames': '20'}, **options)})
+    return config
+
+
+class TestLearning:
+    """学习和保存测试类"""
+
+    def test_learns_only_static_pixels(self, tmp_path):
+        mask = StaticMask(str(tmp_path), learn_frames=20, dilate=0)
+        detector = MinimapDetector()
+        for seed in range(19):
+            mask.apply(detector.mask(_minimap(seed)))
+        assert mask.learning and mask.keep is None
+        mask.apply(detector.mask(_minimap(19)))
+        assert not mask.learning
+        static = mask.keep == 0
+        assert static[130:140, 10:20].all()
+        assert static.sum() == 100
+
+        path = tmp_path / 'static_mask_150x150.npz'
+        assert path.exists() and path.stat().st_size < 1024
+        assert np.array_equal(load_static_mask(str(path)), static)
+
+    def test_reloaded_at_startup(self, tmp_path):
+        first = StaticMask(str(tmp_path), learn_frames=5)
+        for seed in range(5):
+            first.apply(MinimapDetector().mask(_minimap(seed)))
+        second = StaticMask(str(tmp_path), learn_frames=5)
+        second.select((150, 150))
+        assert not second.learning
+        assert np.array_equal(second.keep, first.keep)
+
+    def test_shape_change_relearns(self, tmp_path):
+        mask = StaticMask(str(tmp_path), learn_frames=2)
+        for _ in range(2):
+            mask.apply(np.zeros((150, 150), dtype=np.uint8))
+        assert not mask.learning
+        mask.apply(np.zeros((200, 180), dtype=np.uint8))
+        assert mask.learning and mask.shape == (200, 180)
+        assert mask.path_for(mask.shape).endswith('static_mask_180x200.npz')
+
+    def test_map_key_in_file_name(self, tmp_path):
+        mask = StaticMask(str(tmp_path))
+        mask.select((150, 150), map_key='a1b2')
+        assert mask.path_for((150, 150)).endswith('static_mask_150x150_a1b2.npz')
+
+
+class TestDetection:
+    """检测排除测试类"""
+
+    def test_detector_excludes_static_feature(self, tmp_path):
+        detector = MinimapDetector()
+        detector.configure(_config(), str(tmp_path))
+        for seed in range(20):
+            detector.detect(_minimap(seed))  # 学习阶段不排除
+        assert len(detector.detect(_minimap(100))) == 3
+        assert (tmp_path / 'static_mask_150x150.npz').exists()
+
+        reloaded = MinimapDetector()
+        reloaded.configure(_config(), str(tmp_path))
+        assert len(reloaded.detect(_minimap(101))) == 3
+
+    def test_disabled_by_default(self):
+        detector = MinimapDetector()
+        detector.configure(configparser.ConfigParser())
+        assert detector.static_mask is None
+        assert len(detector.detect(_minimap(0))) == 4
+
+    def test_classifier_excludes_static_feature(self, tmp_path):
+        config = _config()
+        config.read_dict({'MinimapClasses': {'player': format_boxes([((250, 250, 0), (255, 255, 5))])}})
+        detector = MinimapDetector()
+        detector.configure(config, str(tmp_path))
+        for seed in range(20):
+            detector.detect(_minimap(seed))
+        assert len(detector.detect(_minimap(100))) == 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
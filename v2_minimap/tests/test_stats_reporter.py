@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+stats_reporter 单元测试
+测试定时统计报告的增量、速率和调度
+"""
+
+import pytest
+import time
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from stats_reporter import StatsReport, StatsReporter
+
+
+class TestStatsReport:
+    """StatsReport测试类"""
+
+    def test_rates(self):
+        """测试速率换算"""
+        report = StatsReport(120.0, 60.0, {'detection_runs': 400, 'teleports_used': 3},
+                             {'detection_runs': 200, 'teleports_used': 1})
+        assert report.rate('detection_runs') == pytest.approx(200 / 60.0)
+        assert report.rate('teleports_used', 3600) == pytest.approx(60.0)
+        assert report.rate('missing') == 0.0
+
+    def test_format(self):
+        """测试格式化"""
+        report = StatsReport(120.0, 60.0, {'detection_runs': 400, 'teleports_used': 3},
+                             {'detection_runs': 200, 'teleports_used': 1})
+        line = report.format()
+        assert line.startswith("运行时间: 2分钟")
+        assert "检测次数: 400 (+200, 3.33次/秒)" in line
+        assert "使用传送: 3 (+1, 60.00次/小时)" in line
+
+
+class TestStatsReporter:
+    """StatsReporter测试类"""
+
+    def test_deltas_between_reports(self):
+        """测试两次报告之间的增量"""
+        counters = {'detection_runs': 0}
+        lines = []
+        reporter = StatsReporter(lambda: counters, interval=3600, log=lines.append)
+        reporter.start()
+        try:
+            counters = {'detection_runs': 10}
+            first = reporter.report_now()
+            counters = {'detection_runs': 25}
+            second = reporter.report_now()
+        finally:
+            reporter.stop()
+        assert first.deltas['detection_runs'] == 10
+        assert second.deltas['detection_runs'] == 15
+        assert len(lines) == 2
+
+    def test_periodic_reports_and_tasks(self):
+        """测试定时报告和附加任务在独立线程执行"""
+        lines = []
+        ticks = []
+        reporter = StatsReporter(lambda: {'detection_runs': 1}, interval=0.05, log=lines.append)
+        reporter.add_task(0.05, lambda: ticks.append(1))
+        reporter.start()
+        time.sleep(0.3)
+        reporter.stop()
+        assert 2 <= len(lines) <= 7
+        assert len(ticks) >= 2
+
+    def test_advance_skips_missed_periods(self):
+        """测试落后时跳过错过的周期"""
+        assert StatsReporter._advance(10.0, 5.0, 12.0) == 15.0
+        assert StatsReporter._advance(10.0, 5.0, 31.0) == 35.0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
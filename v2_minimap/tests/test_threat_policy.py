@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+threat_policy 单元测试
+测试预计进入危险半径的时间、轨迹帧数门限、配置读取，以及窗口按策略决策并统计两种策略的结果
+"""
+
+import pytest
+import configparser
+import sys
+import os
+import timeit
+
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from threat_policy import ThreatPolicy, POLICY_PREDICTIVE
+from blob_stats import Blobs
+from dot_tracker import DotTracker
+from farm_simulator import FarmWindowProvider
+from frame_source import SyntheticMinimapSource
+
+SHAPE = (150, 150, 3)  # 自己在 (75, 75)
+
+
+def _contact(policy, positions, velocities, hits=5):
+    positions = np.array(positions, dtype=np.float64).reshape(-1, 2)
+    velocities = np.array(velocities, dtype=np.float64).reshape(-1, 2)
+    return policy.time_to_contact(positions, velocities, np.full(len(positions), hits), SHAPE)
+
+
+class TestTimeToContact:
+    """进入危险半径时间测试类"""
+
+    def test_inside_radius(self):
+        assert _contact(ThreatPolicy(danger_radius=20), [(80, 80)], [(0, 0)]) == 0.0
+
+    def test_approaching(self):
+        """测试正对自己接近：距离55，半径25，速度30像素/秒，1秒后进入"""
+        assert _contact(ThreatPolicy(danger_radius=25), [(130, 75)], [(-30, 0)]) == pytest.approx(1.0)
+
+    def test_receding_or_passing_by(self):
+        policy = ThreatPolicy(danger_radius=20)
+        assert _contact(policy, [(130, 75)], [(30, 0)]) == float('inf')
+        assert _contact(policy, [(130, 120)], [(-30, 0)]) == float('inf')  # 从半径外经过
+        assert _contact(policy, [], []) == float('inf')
+
+    def test_earliest_of_several(self):
+        policy = ThreatPolicy(danger_radius=25)
+        assert _contact(policy, [(130, 75), (75, 10), (10, 10)], [(-30, 0), (0, 40), (0, 0)]) == \
+            pytest.approx(1.0)
+
+    def test_new_tracks_not_predicted(self):
+        """测试连续检测帧数不足的轨迹只看当前位置"""
+        policy = ThreatPolicy(danger_radius=25, min_hits=3)
+        assert _contact(policy, [(130, 75)], [(-30, 0)], hits=2) == float('inf')
+
+    def test_microseconds(self):
+        policy = ThreatPolicy()
+        positions = np.random.default_rng(0).uniform(0, 30, (20, 2))
+        velocities = np.random.default_rng(1).uniform(-5, 5, (20, 2))
+        hits = np.full(20, 5)
+        elapsed = timeit.timeit(lambda: policy.time_to_contact(positions, velocities, hits, SHAPE), number=200)
+        assert elapsed / 200 < 1e-3
+
+    def test_with_tracker(self):
+        tracker = DotTracker(smoothing=1.0)
+        policy = ThreatPolicy(danger_radius=25, horizon=1.0)
+        tracker.update([(140, 75, 12)], 0.0)
+        tracker.update([(137, 75, 12)], 0.1)
+        assert not policy.threatened(tracker, SHAPE)  # 30像素/秒，约1.2秒后进入
+        tracker.update([(134, 75, 12)], 0.2)
+        tracker.update([(128, 75, 12)], 0.3)
+        assert policy.threatened(tracker, SHAPE)
+
+
+class TestConfig:
+    """配置测试类"""
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        assert not ThreatPolicy.from_config(config).predictive
+        config.read_dict({'Threat': {'policy': 'Predictive', 'danger_radius': '40', 'own_x': '70', 'own_y': '80'}})
+        policy = ThreatPolicy.from_config(config)
+        assert policy.policy == POLICY_PREDICTIVE
+        assert policy.danger_radius == 40.0 and policy.own_position == (70.0, 80.0)
+        config.set('Threat', 'policy', 'sometimes')
+        with pytest.raises(ValueError):
+            ThreatPolicy.from_config(config)
+
+
+class TestWindowDecision:
+    """窗口决策测试类"""
+
+    def _window(self, tmp_path, settings: str):
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = FarmWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text(settings, encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: SyntheticMinimapSource(dots=0, seed=h))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+        gw.detector.detect_blobs = lambda minimap: Blobs(np.array([[5.0, 5.0]]), np.array([12]),  # 远处角落里静止的玩家
+                                                         np.array([[4, 4, 3, 3]], dtype=np.int32))
+        return bot, gw
+
+    @pytest.mark.parametrize('policy, teleports', [('any_dot', True), ('predictive', False)])
+    def test_distant_player(self, tmp_path, policy, teleports):
+        """测试远处静止的玩家：原策略传送，预测策略不传送，两种判断都计入统计"""
+        bot, gw = self._window(tmp_path, f'[Threat]\npolicy = {policy}\n')
+        assert gw.detect_players() is teleports
+        assert gw.stats['threat_frames_any_dot'] == 1
+        assert gw.stats['threat_frames_predicted'] == 0
+        bot.stop()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+window_registry 单元测试
+测试增量扫描的变化检测、排除缓存和多窗口监控同步
+"""
+
+import pytest
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from frame_source import SyntheticMinimapSource, VirtualWindowProvider
+from window_registry import WindowRegistry
+
+
+class CountingProvider(VirtualWindowProvider):
+    """记录客户区查询次数"""
+
+    def __init__(self):
+        super().__init__()
+        self.client_rect_calls = 0
+
+    def get_client_rect(self, hwnd):
+        self.client_rect_calls += 1
+        return super().get_client_rect(hwnd)
+
+
+class TestWindowRegistry:
+    """WindowRegistry测试类"""
+
+    def test_added_removed_renamed(self):
+        """测试新增、关闭、改名"""
+        provider = VirtualWindowProvider()
+        first = provider.add_window('九五沉默 - 1')
+        provider.add_window('记事本')
+        registry = WindowRegistry(provider, ['九五沉默'])
+
+        diff = registry.rescan()
+        assert [info.hwnd for info in diff.added] == [first]
+        assert not diff.removed and not diff.renamed
+
+        second = provider.add_window('九五沉默 - 2')
+        provider.set_title(first, '九五沉默 - 角色A')
+        diff = registry.rescan()
+        assert [info.hwnd for info in diff.added] == [second]
+        assert [info.hwnd for info in diff.renamed] == [first]
+        assert registry.list() == [(first, '九五沉默 - 角色A'), (second, '九五沉默 - 2')]
+
+        provider.close_window(second)
+        diff = registry.rescan()
+        assert [info.hwnd for info in diff.removed] == [second]
+        assert second not in registry
+        assert len(registry) == 1
+
+    def test_unchanged_rescan_skips_queries(self):
+        """测试状态不变时不再查询客户区"""
+        provider = CountingProvider()
+        for i in range(20):
+            provider.add_window(f'九五沉默 - {i}')
+        for i in range(20):
+            provider.add_window(f'其他程序 {i}')
+        registry = WindowRegistry(provider, ['九五沉默'])
+
+        registry.rescan()
+        assert provider.client_rect_calls == 20
+        diff = registry.rescan()
+        assert not diff
+        assert provider.client_rect_calls == 20
+        assert registry.scans == 2
+
+    def test_rejected_window_renamed(self):
+        """测试被排除的窗口改成游戏标题后被发现"""
+        provider = VirtualWindowProvider()
+        hwnd = provider.add_window('加载中')
+        registry = WindowRegistry(provider, ['九五沉默'])
+        assert not registry.rescan()
+
+        provider.set_title(hwnd, '九五沉默')
+        diff = registry.rescan()
+        assert [info.hwnd for info in diff.added] == [hwnd]
+
+    def test_set_titles(self):
+        """测试修改标题关键字后重新匹配"""
+        provider = VirtualWindowProvider()
+        mir = provider.add_window('Legend of Mir2')
+        other = provider.add_window('热血传奇')
+        registry = WindowRegistry(provider, ['legend of mir2'])
+        assert [info.hwnd for info in registry.rescan().added] == [mir]
+
+        registry.set_titles(['传奇'])
+        diff = registry.rescan()
+        assert [info.hwnd for info in diff.added] == [other]
+        assert [info.hwnd for info in diff.removed] == [mir]
+
+    def test_prune(self):
+        """测试只检查已知窗口"""
+        provider = VirtualWindowProvider()
+        first = provider.add_window('九五沉默 - 1')
+        second = provider.add_window('九五沉默 - 2')
+        registry = WindowRegistry(provider, ['九五沉默'])
+        registry.rescan()
+
+        provider.close_window(first)
+        assert [info.hwnd for info in registry.prune()] == [first]
+        assert registry.list() == [(second, '九五沉默 - 2')]
+        assert not registry.prune()
+
+
+class TestMultiWindowScan:
+    """MultiWindowBot增量扫描测试类"""
+
+    def test_scan_keeps_running_windows(self, tmp_path):
+        """测试重新扫描保留未变化的窗口对象并启动新窗口"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        first = provider.add_window('九五沉默 - 1')
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Detection]\ndetection_interval = 0.05\n', encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda hwnd: SyntheticMinimapSource(dots=0, seed=hwnd))
+        assert bot.scan_windows() == 1
+        original = bot.windows[first]
+
+        bot.running = True
+        original.start(0.05)
+        try:
+            second = provider.add_window('九五沉默 - 2')
+            assert bot.scan_windows() == 2
+            assert bot.windows[first] is original
+            assert original.running
+            assert bot.windows[second].running
+
+            provider.close_window(first)
+            assert bot.scan_windows() == 1
+            assert first not in bot.windows
+            assert not original.running
+        finally:
+            bot.stop()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+window_state 单元测试
+测试窗口状态切换、传送后稳定判断和超时、各状态的轮询间隔，以及窗口在传送后暂停检测、不重复传送
+"""
+
+import pytest
+import configparser
+import sys
+import os
+
+import cv2
+import numpy as np
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from window_state import WindowStateMachine, IDLE, ALERT, TELEPORTING, SETTLING, COOLDOWN
+from blob_stats import Blobs
+from farm_simulator import FarmWindowProvider
+from frame_source import ReplaySource
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _minimap(seed: int) -> np.ndarray:
+    """不同的随机色块画面（过渡画面每帧不同）"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (15, 15, 3), dtype=np.uint8)
+    return cv2.resize(blocks, (150, 150), interpolation=cv2.INTER_NEAREST)
+
+
+def _machine(**options):
+    clock = FakeClock()
+    options = dict({'cooldown': 4.0, 'teleport_delay': 0.25, 'settle_timeout': 3.0}, **options)
+    return WindowStateMachine(clock=clock, **options), clock
+
+
+class TestTransitions:
+    """状态切换测试类"""
+
+    def test_alert(self):
+        machine, _ = _machine()
+        machine.on_detection(True)
+        assert machine.state == ALERT and machine.can_teleport
+        machine.on_detection(False)
+        assert machine.state == IDLE
+
+    def test_teleport_settle_cooldown(self):
+        machine, clock = _machine()
+        machine.on_teleport()
+        assert machine.tick() == TELEPORTING
+        assert not machine.capturing and not machine.detecting and not machine.can_teleport
+
+        clock.now += 0.25
+        assert machine.tick() == SETTLING
+        assert machine.capturing and not machine.detecting
+        assert not machine.on_settle_frame(_minimap(1))
+        assert not machine.on_settle_frame(_minimap(2))  # 过渡画面变化
+        assert machine.on_settle_frame(_minimap(2))
+        assert machine.state == COOLDOWN and machine.detecting and not machine.can_teleport
+
+        clock.now += 3.75
+        assert machine.tick() == IDLE
+        assert machine.transitions[COOLDOWN] == 1
+
+    def test_settle_timeout(self):
+        machine, clock = _machine()
+        machine.on_teleport()
+        clock.now += 0.25
+        machine.tick()
+        clock.now += 3.0
+        assert machine.tick() == COOLDOWN
+        assert machine.settle_timeouts == 1
+
+    def test_no_cooldown_goes_idle(self):
+        machine, clock = _machine(cooldown=0.0)
+        machine.on_teleport()
+        clock.now += 0.25
+        machine.tick()
+        machine.on_settle_frame(_minimap(1))
+        machine.on_settle_frame(_minimap(1))
+        assert machine.state == IDLE
+
+    def test_intervals(self):
+        machine, clock = _machine(alert_interval=0.05, cooldown_interval=1.0)
+        assert machine.interval(0.3) == 0.3
+        machine.on_detection(True)
+        assert machine.interval(0.3) == 0.05
+        machine.on_teleport()
+        clock.now += 0.125
+        assert machine.interval(0.3) == 0.125
+        clock.now += 0.125
+        machine.tick()
+        assert machine.interval(0.3) == 0.1
+        machine.on_settle_frame(_minimap(1))
+        machine.on_settle_frame(_minimap(1))
+        assert machine.interval(0.3) == 1.0    # 冷却中降低频率
+        clock.now += 3.5
+        assert machine.interval(0.3) == 0.25  # 不超过剩余冷却时间
+
+    def test_from_config(self):
+        config = configparser.ConfigParser()
+        config.read_dict({'Teleport': {'cooldown': '6'}, 'WindowState': {'stable_frames': '3'}})
+        machine = WindowStateMachine.from_config(config)
+        assert machine.cooldown == 6.0 and machine.stable_frames == 3
+        config.set('WindowState', 'enabled', 'false')
+        assert WindowStateMachine.from_config(config) is None
+
+
+class TestWindow:
+    """窗口集成测试类"""
+
+    def test_no_detection_while_settling(self, tmp_path):
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = FarmWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Minimap]\nauto_calibrate = false\n[Teleport]\ncooldown = 0\n'
+                               '[WindowState]\nteleport_delay = 0\n', encoding='utf-8')
+        minimaps = [_minimap(0), _minimap(1), _minimap(2), _minimap(2), _minimap(3)]
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: ReplaySource(minimaps, loop=False))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+        gw.detector.detect_blobs = lambda minimap: Blobs(np.array([[20.0, 20.0]]), np.array([12]),
+                                                         np.array([[19, 19, 3, 3]], dtype=np.int32))
+
+        assert gw.detect_players()
+        gw.teleport()
+        gw.teleport()  # 传送中不重复传送
+        assert gw.stats['teleports_used'] == 1
+        assert gw.window_state.tick() == SETTLING
+        for _ in range(3):
+            gw._probe_settling()
+        assert gw.window_state.state == IDLE
+        assert gw.stats['detection_runs'] == 1
+        assert gw.detect_players()
+        bot.stop()
+
+    def test_disabled_window_skips_capture(self, tmp_path):
+        import time
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = FarmWindowProvider()
+        hwnd = provider.add_window()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Minimap]\nauto_calibrate = false\n', encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda h: ReplaySource([_minimap(0)]))
+        bot.scan_windows()
+        gw = bot.windows[hwnd]
+        gw.enabled = False  # 界面中禁用的窗口：线程运行但不截图
+        gw.start(0.01)
+        time.sleep(0.2)
+        assert gw.stats['detection_runs'] == 0
+        gw.enabled = True
+        deadline = time.monotonic() + 2.0
+        while gw.stats['detection_runs'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert gw.stats['detection_runs'] > 0
+        bot.stop()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+window_watcher 单元测试
+测试窗口热插拔的自动接入、移除和统计历史
+"""
+
+import pytest
+import threading
+import time
+import sys
+import os
+
+# 添加父目录到路径
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from frame_source import SyntheticMinimapSource, VirtualWindowProvider
+from window_registry import WindowRegistry
+from window_watcher import WindowWatcher, WindowHistory, REASON_CLOSED
+
+
+def _wait_until(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class TestWindowHistory:
+    """WindowHistory测试类"""
+
+    def test_totals(self):
+        """测试移除窗口的计数累加"""
+        history = WindowHistory(max_records=2)
+        history.record(1, 'a', time.monotonic(), {'teleports_used': 2, 'detection_runs': 10})
+        history.record(2, 'b', time.monotonic(), {'teleports_used': 1, 'detection_runs': 5})
+        history.record(3, 'c', time.monotonic(), {'teleports_used': 1, 'detection_runs': 5})
+        assert len(history) == 2  # 只保留最近的记录
+        assert history.totals == {'teleports_used': 4, 'detection_runs': 20}
+        assert history.add_totals({'teleports_used': 1}) == {'teleports_used': 5}
+        assert history.records[-1].reason == REASON_CLOSED
+
+
+class TestWindowWatcher:
+    """WindowWatcher测试类"""
+
+    def _watcher(self, provider):
+        events = []
+        watcher = WindowWatcher(
+            WindowRegistry(provider, ['九五沉默']),
+            on_attach=lambda info: events.append(('attach', info.hwnd)),
+            on_detach=lambda info, reason: events.append(('detach', info.hwnd, reason)),
+            scan_interval=1.0, prune_interval=0.1,
+        )
+        return watcher, events
+
+    def test_poll(self):
+        """测试全量扫描接入和存活检查移除"""
+        provider = VirtualWindowProvider()
+        first = provider.add_window('九五沉默 - 1')
+        watcher, events = self._watcher(provider)
+        watcher.poll()
+        assert events == [('attach', first)]
+
+        second = provider.add_window('九五沉默 - 2')
+        provider.close_window(first)
+        watcher.poll(full=False)  # 只检查已知窗口，不发现新窗口
+        assert events[1:] == [('detach', first, REASON_CLOSED)]
+        watcher.poll()
+        assert events[2:] == [('attach', second)]
+        assert (watcher.attached, watcher.detached) == (2, 1)
+
+    def test_tick_interval(self):
+        """测试按扫描间隔决定是否全量枚举"""
+        provider = VirtualWindowProvider()
+        watcher, events = self._watcher(provider)
+        watcher.tick(now=100.0)
+        hwnd = provider.add_window('九五沉默')
+        watcher.tick(now=100.5)
+        assert events == []
+        watcher.tick(now=101.0)
+        assert events == [('attach', hwnd)]
+
+    def test_callback_error_isolated(self):
+        """测试回调异常不影响其他窗口"""
+        provider = VirtualWindowProvider()
+        provider.add_window('九五沉默 - 1')
+        provider.add_window('九五沉默 - 2')
+        attached = []
+
+        def on_attach(info):
+            if not attached:
+                attached.append(None)
+                raise RuntimeError('boom')
+            attached.append(info.hwnd)
+
+        watcher = WindowWatcher(WindowRegistry(provider, ['九五沉默']), on_attach, lambda info, reason: None)
+        watcher.poll()
+        assert len(attached) == 2
+
+
+class TestMultiWindowHotPlug:
+    """MultiWindowBot热插拔测试类"""
+
+    def test_attach_and_detach_while_running(self, tmp_path):
+        """测试运行中客户端重启"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        first = provider.add_window('九五沉默 - 1')
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Detection]\ndetection_interval = 0.02\n'
+                               '[Watcher]\nenabled = true\nscan_interval = 0.05\nprune_interval = 0.02\n',
+                               encoding='utf-8')
+        sources = {}
+
+        def source_factory(hwnd):
+            sources[hwnd] = SyntheticMinimapSource(dots=0, seed=hwnd)
+            return sources[hwnd]
+
+        bot = MultiWindowBot(str(config_file), window_provider=provider, source_factory=source_factory)
+        bot.scan_windows()
+        runner = threading.Thread(target=bot.run, daemon=True)
+        runner.start()
+        try:
+            assert _wait_until(lambda: bot.windows[first].stats['detection_runs'] > 0)
+
+            # 客户端重启：旧窗口关闭，新窗口出现
+            provider.close_window(first)
+            second = provider.add_window('九五沉默 - 1')
+            assert _wait_until(lambda: second in bot.windows and bot.windows[second].running)
+            assert _wait_until(lambda: first not in bot.windows)
+
+            record = bot.history.records[-1]
+            assert record.hwnd == first and record.reason == REASON_CLOSED
+            assert record.stats['detection_runs'] > 0
+            assert _wait_until(lambda: sources[first].hwnd is None)  # 截图资源已释放
+
+            # 累计计数包含已移除窗口
+            assert bot._collect_counters()['detection_runs'] >= record.stats['detection_runs']
+        finally:
+            bot.stop()
+            runner.join(3.0)
+        assert not runner.is_alive()
+        assert bot.window_watcher.thread is None
+
+    def test_run_without_windows(self, tmp_path):
+        """测试启动时没有窗口，游戏启动后自动接入"""
+        from mir2_multi_window_bot import MultiWindowBot
+
+        provider = VirtualWindowProvider()
+        config_file = tmp_path / 'bot.ini'
+        config_file.write_text('[Watcher]\nscan_interval = 0.05\n', encoding='utf-8')
+        bot = MultiWindowBot(str(config_file), window_provider=provider,
+                             source_factory=lambda hwnd: SyntheticMinimapSource(dots=0, seed=hwnd))
+        runner = threading.Thread(target=bot.run, daemon=True)
+        runner.start()
+        try:
+            hwnd = provider.add_window('九五沉默')
+            assert _wait_until(lambda: hwnd in bot.windows and bot.windows[hwnd].running)
+        finally:
+            bot.stop()
+            runner.join(3.0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+传送决策策略
+功能: 根据黄点相对自己（小地图中心的标记）的位置和接近速度判断是否需要传送，
+      只在玩家已进入危险半径、或按当前速度预计 horizon 秒内进入时触发，避免远处经过的玩家引起不必要的传送
+特性: 所有轨迹一起做向量计算（求运动方程与危险圆的最早交点），每帧只需几十微秒；
+      可切换回"出现黄点即传送"的原策略，两种策略的判断结果都计入统计，用于对比
+
+配置:
+  [Threat]
+  policy = any_dot          # any_dot 出现黄点即传送（默认，原策略）；predictive 按预测接近传送
+  danger_radius = 30        # 危险半径（小地图像素）
+  horizon = 1.0             # 预测时间（秒）
+  min_hits = 2              # 参与预测的轨迹至少连续检测到的帧数（已在危险半径内的不受限制）
+  own_x =                   # 自己标记在小地图中的位置，留空为中心
+  own_y =
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+POLICY_ANY_DOT = 'any_dot'
+POLICY_PREDICTIVE = 'predictive'
+POLICIES = (POLICY_ANY_DOT, POLICY_PREDICTIVE)
+
+DEFAULT_DANGER_RADIUS = 30.0
+DEFAULT_HORIZON = 1.0
+DEFAULT_MIN_HITS = 2
+
+
+class ThreatPolicy:
+    """按预测接近判断威胁（单个窗口使用，无内部状态）"""
+
+    def __init__(self, policy: str = POLICY_ANY_DOT, danger_radius: float = DEFAULT_DANGER_RADIUS,
+                 horizon: float = DEFAULT_HORIZON, min_hits: int = DEFAULT_MIN_HITS,
+                 own_position: Optional[Tuple[float, float]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"未知的传送策略: {policy}（可选 {', '.join(POLICIES)}）")
+        self.policy = policy
+        self.danger_radius = danger_radius
+        self.horizon = horizon
+        self.min_hits = min_hits
+        self.own_position = own_position
+
+    @classmethod
+    def from_config(cls, config) -> 'ThreatPolicy':
+        own_x = config.get('Threat', 'own_x', fallback='').strip()
+        own_y = config.get('Threat', 'own_y', fallback='').strip()
+        return cls(policy=config.get('Threat', 'policy', fallback=POLICY_ANY_DOT).strip().lower(),
+                   danger_radius=config.getfloat('Threat', 'danger_radius', fallback=DEFAULT_DANGER_RADIUS),
+                   horizon=config.getfloat('Threat', 'horizon', fallback=DEFAULT_HORIZON),
+                   min_hits=config.getint('Threat', 'min_hits', fallback=DEFAULT_MIN_HITS),
+                   own_position=(float(own_x), float(own_y)) if own_x and own_y else None)
+
+    @property
+    def predictive(self) -> bool:
+        return self.policy == POLICY_PREDICTIVE
+
+    def time_to_contact(self, positions: np.ndarray, velocities: np.ndarray, hits: np.ndarray,
+                        minimap_shape: Tuple[int, ...]) -> float:
+        """
+        最早进入危险半径的时间
+
+        解 |p + v*t| = R（p为相对自己的位置），取最早的非负解；已在半径内为0，
+        不在接近或不会进入为无穷大；连续检测帧数不足的轨迹只看当前位置
+
+        Args:
+            positions: 轨迹位置 (N, 2)
+            velocities: 轨迹速度 (N, 2)，像素/秒
+            hits: 轨迹连续检测到的帧数 (N,)
+            minimap_shape: 小地图图像的shape（用于取中心）
+
+        Returns:
+            秒
+        """
+        if len(positions) == 0:
+            return float('inf')
+        own = self.own_position or (minimap_shape[1] / 2.0, minimap_shape[0] / 2.0)
+        relative = positions - own
+        radius_sq = self.danger_radius * self.danger_radius
+        c = np.einsum('ij,ij->i', relative, relative) - radius_sq
+        if c.min() <= 0:
+            return 0.0
+
+        velocities = velocities * (hits >= self.min_hits)[:, None]
+        a = np.einsum('ij,ij->i', velocities, velocities)
+        half_b = np.einsum('ij,ij->i', relative, velocities)
+        discriminant = half_b * half_b - a * c
+        # 接近中（half_b < 0）且轨迹与危险圆相交时有解
+        approaching = (half_b < 0) & (discriminant >= 0)
+        if not approaching.any():
+            return float('inf')
+        a, half_b, discriminant = a[approaching], half_b[approaching], discriminant[approaching]
+        return float(((-half_b - np.sqrt(discriminant)) / a).min())
+
+    def threatened(self, tracker, minimap_shape: Tuple[int, ...]) -> bool:
+        """按跟踪器本帧的轨迹判断预测策略是否传送"""
+        return self.time_to_contact(*tracker.motion(), minimap_shape) <= self.horizon
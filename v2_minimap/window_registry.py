@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+游戏窗口注册表
+功能: 维护 hwnd -> 窗口信息 的索引，重新扫描时只返回变化（新增、关闭、改名）
+特性: 标题匹配正则只编译一次；已知窗口和已排除窗口在标题不变时不再查询客户区，
+      不变状态下的扫描只剩枚举本身的开销，不会打断正在运行的监控
+"""
+
+import configparser
+import logging
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from frame_source import WindowProvider, compile_title_pattern
+
+logger = logging.getLogger(__name__)
+
+# 除配置的窗口标题外，始终匹配的标题关键字
+EXTRA_TITLES = ('Legend of Mir2', '传奇')
+
+
+def game_title_keywords(config: configparser.ConfigParser) -> List[str]:
+    """配置中的游戏窗口标题关键字"""
+    window_title = config.get('Game', 'window_title', fallback='九五沉默')
+    return [window_title, *EXTRA_TITLES]
+
+
+class WindowInfo:
+    """已注册窗口的信息"""
+
+    __slots__ = ('hwnd', 'title', 'client_size', 'first_seen', 'last_seen')
+
+    def __init__(self, hwnd: int, title: str, client_size: Tuple[int, int], now: float):
+        self.hwnd = hwnd
+        self.title = title
+        self.client_size = client_size
+        self.first_seen = now
+        self.last_seen = now
+
+    def __repr__(self):
+        return f"WindowInfo({self.hwnd}, {self.title!r}, {self.client_size})"
+
+
+class WindowDiff:
+    """一次扫描的变化"""
+
+    __slots__ = ('added', 'removed', 'renamed')
+
+    def __init__(self, added: List[WindowInfo] = None, removed: List[WindowInfo] = None,
+                 renamed: List[WindowInfo] = None):
+        self.added = added or []
+        self.removed = removed or []
+        self.renamed = renamed or []
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed)
+
+    def __repr__(self):
+        return f"WindowDiff(added={len(self.added)}, removed={len(self.removed)}, renamed={len(self.renamed)})"
+
+
+class WindowRegistry:
+    """游戏窗口注册表（线程安全）"""
+
+    def __init__(self, provider: WindowProvider, titles: Sequence[str]):
+        """
+        Args:
+            provider: 窗口提供者
+            titles: 标题关键字（不区分大小写的子串匹配）
+        """
+        self.provider = provider
+        self.titles = tuple(titles)
+        self.pattern = compile_title_pattern(titles)
+        self.windows: Dict[int, WindowInfo] = {}  # 按首次发现顺序
+        self.lock = threading.Lock()
+        self.scans = 0
+        self.last_scan_seconds = 0.0
+
+        # 上次扫描时不匹配的窗口: hwnd -> 标题（标题不变时跳过匹配）
+        self._rejected: Dict[int, str] = {}
+        self._recheck = False
+
+    def set_titles(self, titles: Sequence[str]):
+        """修改标题关键字（有变化时重新编译，下次扫描重新匹配所有窗口）"""
+        titles = tuple(titles)
+        with self.lock:
+            if titles == self.titles:
+                return
+            self.titles = titles
+            self.pattern = compile_title_pattern(titles)
+            self._rejected.clear()
+            self._recheck = True  # 已注册的窗口在下次扫描时按新关键字重新判断
+
+    def _client_size(self, hwnd: int):
+        try:
+            left, top, right, bottom = self.provider.get_client_rect(hwnd)
+        except Exception:
+            return None
+        if right - left > 0 and bottom - top > 0:
+            return (right - left, bottom - top)
+        return None
+
+    def rescan(self) -> WindowDiff:
+        """
+        重新枚举窗口并与索引比较
+
+        Returns:
+            新增、关闭（或不再匹配）、改名的窗口
+        """
+        started = time.perf_counter()
+        enumerated = self.provider.enum_windows()
+        now = time.monotonic()
+        diff = WindowDiff()
+
+        with self.lock:
+            recheck, self._recheck = self._recheck, False
+            seen = set()
+            rejected = {}
+            for hwnd, title in enumerated:
+                info = self.windows.get(hwnd)
+                if info is not None and info.title == title and not recheck:
+                    # 已知窗口、标题不变
+                    info.last_seen = now
+                    seen.add(hwnd)
+                    continue
+                if info is None and self._rejected.get(hwnd) == title:
+                    rejected[hwnd] = title
+                    continue
+
+                if not self.pattern.search(title):
+                    rejected[hwnd] = title
+                    continue
+                client_size = self._client_size(hwnd)
+                if client_size is None:
+                    continue  # 客户区无效（最小化等），下次扫描重新检查
+
+                seen.add(hwnd)
+                if info is None:
+                    info = self.windows[hwnd] = WindowInfo(hwnd, title, client_size, now)
+                    diff.added.append(info)
+                    continue
+                if info.title != title:
+                    diff.renamed.append(info)
+                info.title, info.client_size, info.last_seen = title, client_size, now
+
+            for hwnd in [hwnd for hwnd in self.windows if hwnd not in seen]:
+                diff.removed.append(self.windows.pop(hwnd))
+            self._rejected = rejected
+            self.scans += 1
+            self.last_scan_seconds = time.perf_counter() - started
+
+        if diff:
+            logger.debug(f"窗口扫描: {diff} ({self.last_scan_seconds * 1e6:.0f}us)")
+        return diff
+
+    def prune(self) -> List[WindowInfo]:
+        """只检查已知窗口是否仍然存在（不枚举），返回已关闭的窗口"""
+        with self.lock:
+            closed = [info for hwnd, info in self.windows.items() if not self.provider.is_window(hwnd)]
+            for info in closed:
+                del self.windows[info.hwnd]
+        return closed
+
+    def list(self) -> List[Tuple[int, str]]:
+        """当前窗口 [(hwnd, 标题), ...]，按首次发现顺序"""
+        with self.lock:
+            return [(info.hwnd, info.title) for info in self.windows.values()]
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __contains__(self, hwnd: int):
+        return hwnd in self.windows
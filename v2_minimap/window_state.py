@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+窗口状态机（传送后的过渡处理）
+功能: 每个窗口在 空闲 -> 警戒 -> 传送中 -> 稳定中 -> 冷却 之间切换，按状态决定是否截图、是否检测和轮询间隔
+特性: 传送后客户端会短暂显示加载/过渡画面，期间的帧不参与检测（避免误检和重复传送）；
+      稳定中只做低频的小地图指纹探测，连续几帧指纹一致后进入冷却；冷却期间无法再次传送，降低轮询频率节省CPU
+
+状态:
+  idle        空闲，按 detection_interval 检测
+  alert       上一帧检测到玩家，按 alert_interval 检测（默认同 detection_interval）
+  teleporting 已发送传送按键，等待 teleport_delay 秒，不截图
+  settling    只截图计算小地图指纹，连续 stable_frames 帧一致（或超过 settle_timeout）后进入冷却
+  cooldown    传送冷却中，按 cooldown_interval 检测，冷却结束后回到空闲
+
+配置:
+  [WindowState]
+  enabled = true
+  alert_interval = 0        # 0 表示与 detection_interval 相同
+  cooldown_interval = 1.0
+  teleport_delay = 0.3
+  settle_interval = 0.1
+  settle_timeout = 3.0
+  stable_frames = 2
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from map_fingerprint import map_fingerprint, DEFAULT_THRESHOLD
+
+IDLE = 'idle'
+ALERT = 'alert'
+TELEPORTING = 'teleporting'
+SETTLING = 'settling'
+COOLDOWN = 'cooldown'
+STATES = (IDLE, ALERT, TELEPORTING, SETTLING, COOLDOWN)
+
+
+class WindowStateMachine:
+    """
+    单个窗口的状态机
+
+    流水线模式下截图线程和检测线程都会调用，状态切换在锁内进行
+    """
+
+    def __init__(self, cooldown: float = 4.0, alert_interval: float = 0.0, cooldown_interval: float = 1.0,
+                 teleport_delay: float = 0.3, settle_interval: float = 0.1, settle_timeout: float = 3.0,
+                 stable_frames: int = 2, stable_threshold: float = DEFAULT_THRESHOLD,
+                 clock: Callable[[], float] = time.monotonic):
+        self.cooldown = cooldown
+        self.alert_interval = alert_interval
+        self.cooldown_interval = cooldown_interval
+        self.teleport_delay = teleport_delay
+        self.settle_interval = settle_interval
+        self.settle_timeout = settle_timeout
+        self.stable_frames = stable_frames
+        self.stable_threshold = stable_threshold
+        self.clock = clock
+
+        self.state = IDLE
+        self.since = clock()
+        self.teleported_at: Optional[float] = None
+        self.settle_timeouts = 0
+        self.transitions: Dict[str, int] = {state: 0 for state in STATES}  # 进入各状态的次数
+        self._fingerprint: Optional[np.ndarray] = None
+        self._stable_count = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> Optional['WindowStateMachine']:
+        """根据 [WindowState] 配置创建，未启用时返回None；冷却时间取 [Teleport] cooldown"""
+        if not config.getboolean('WindowState', 'enabled', fallback=True):
+            return None
+        return cls(cooldown=config.getfloat('Teleport', 'cooldown', fallback=4.0),
+                   alert_interval=config.getfloat('WindowState', 'alert_interval', fallback=0.0),
+                   cooldown_interval=config.getfloat('WindowState', 'cooldown_interval', fallback=1.0),
+                   teleport_delay=config.getfloat('WindowState', 'teleport_delay', fallback=0.3),
+                   settle_interval=config.getfloat('WindowState', 'settle_interval', fallback=0.1),
+                   settle_timeout=config.getfloat('WindowState', 'settle_timeout', fallback=3.0),
+                   stable_frames=config.getint('WindowState', 'stable_frames', fallback=2))
+
+    def _enter(self, state: str, now: float):
+        self.state = state
+        self.since = now
+        self.transitions[state] += 1
+
+    def _after_cooldown(self, now: float) -> bool:
+        return self.teleported_at is None or now - self.teleported_at >= self.cooldown
+
+    def tick(self) -> str:
+        """按时间推进状态（每次循环开始时调用），返回当前状态"""
+        with self.lock:
+            now = self.clock()
+            if self.state == TELEPORTING and now - self.since >= self.teleport_delay:
+                self._fingerprint = None
+                self._stable_count = 0
+                self._enter(SETTLING, now)
+            elif self.state == SETTLING and now - self.since >= self.settle_timeout:
+                self.settle_timeouts += 1
+                self._enter(COOLDOWN, now)
+            if self.state == COOLDOWN and self._after_cooldown(now):
+                self._enter(IDLE, now)
+            return self.state
+
+    @property
+    def capturing(self) -> bool:
+        """是否截图（传送中不截图）"""
+        return self.state != TELEPORTING
+
+    @property
+    def detecting(self) -> bool:
+        """截图是否用于检测（传送中和稳定中不检测）"""
+        return self.state not in (TELEPORTING, SETTLING)
+
+    @property
+    def can_teleport(self) -> bool:
+        return self.state in (IDLE, ALERT)
+
+    def on_detection(self, players_found: bool):
+        """一帧检测完成"""
+        with self.lock:
+            if self.state == IDLE and players_found:
+                self._enter(ALERT, self.clock())
+            elif self.state == ALERT and not players_found:
+                self._enter(IDLE, self.clock())
+
+    def on_teleport(self):
+        """传送按键已发送"""
+        with self.lock:
+            now = self.clock()
+            self.teleported_at = now
+            self._enter(TELEPORTING, now)
+
+    def on_settle_frame(self, minimap: np.ndarray) -> bool:
+        """
+        稳定中的探测帧
+
+        Returns:
+            小地图是否已稳定（已进入冷却）
+        """
+        fingerprint = map_fingerprint(minimap)
+        with self.lock:
+            if self.state != SETTLING:
+                return self.state != TELEPORTING
+            previous = self._fingerprint
+            self._fingerprint = fingerprint
+            if previous is not None and np.abs(previous - fingerprint).sum() <= self.stable_threshold:
+                self._stable_count += 1
+            else:
+                self._stable_count = 1
+            if self._stable_count < self.stable_frames:
+                return False
+            now = self.clock()
+            self._enter(COOLDOWN if not self._after_cooldown(now) else IDLE, now)
+            return True
+
+    def interval(self, detection_interval: float) -> float:
+        """当前状态下到下一次循环的间隔"""
+        with self.lock:
+            now = self.clock()
+            if self.state == ALERT:
+                return self.alert_interval or detection_interval
+            if self.state == TELEPORTING:
+                return max(0.0, self.teleport_delay - (now - self.since))
+            if self.state == SETTLING:
+                return self.settle_interval
+            if self.state == COOLDOWN:
+                remaining = self.cooldown - (now - self.teleported_at)
+                return max(0.0, min(max(detection_interval, self.cooldown_interval), remaining))
+            return detection_interval
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+窗口热插拔监视模块
+功能: 后台定时扫描游戏窗口，新客户端自动接入监控，已关闭的客户端自动移除
+特性: 已知窗口高频检查是否存活（只调用IsWindow），全量枚举按较低频率进行，
+      接入延迟不超过扫描间隔；移除的窗口统计并入历史记录，累计计数不会回退
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from window_registry import WindowDiff, WindowInfo, WindowRegistry
+
+logger = logging.getLogger(__name__)
+
+# 移除原因
+REASON_CLOSED = 'closed'      # 窗口已关闭
+REASON_REMOVED = 'removed'    # 手动移除
+
+
+class WindowRecord:
+    """已移除窗口的历史记录"""
+
+    __slots__ = ('hwnd', 'title', 'attached_at', 'detached_at', 'reason', 'stats')
+
+    def __init__(self, hwnd: int, title: str, attached_at: float, detached_at: float,
+                 reason: str, stats: Dict[str, int]):
+        self.hwnd = hwnd
+        self.title = title
+        self.attached_at = attached_at    # time.monotonic()
+        self.detached_at = detached_at
+        self.reason = reason
+        self.stats = stats
+
+    @property
+    def duration(self) -> float:
+        """监控时长（秒）"""
+        return self.detached_at - self.attached_at
+
+    def __repr__(self):
+        return f"WindowRecord({self.hwnd}, {self.title!r}, {self.reason}, {self.duration:.0f}s)"
+
+
+class WindowHistory:
+    """已移除窗口的统计历史（线程安全）"""
+
+    def __init__(self, max_records: int = 200):
+        self.records: Deque[WindowRecord] = deque(maxlen=max_records)
+        self.totals: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, hwnd: int, title: str, attached_at: float, stats: Dict[str, int],
+               reason: str = REASON_CLOSED) -> WindowRecord:
+        """记录一个已移除的窗口，并把计数累加到总计"""
+        record = WindowRecord(hwnd, title, attached_at, time.monotonic(), reason, dict(stats))
+        with self.lock:
+            self.records.append(record)
+            for name, value in record.stats.items():
+                self.totals[name] = self.totals.get(name, 0) + value
+        return record
+
+    def add_totals(self, counters: Dict[str, int]) -> Dict[str, int]:
+        """把历史总计加到当前窗口的计数上（原地修改并返回）"""
+        with self.lock:
+            for name in counters:
+                counters[name] += self.totals.get(name, 0)
+        return counters
+
+    def __len__(self):
+        return len(self.records)
+
+
+class WindowWatcher:
+    """
+    窗口热插拔监视器
+
+    可在后台线程中运行（start/stop），也可由调用方定时调用 poll()（如GUI的after循环）。
+    回调在监视线程（或调用poll的线程）中执行
+    """
+
+    def __init__(self, registry: WindowRegistry,
+                 on_attach: Callable[[WindowInfo], None],
+                 on_detach: Callable[[WindowInfo, str], None],
+                 on_rename: Callable[[WindowInfo], None] = None,
+                 scan_interval: float = 2.0, prune_interval: float = 0.5):
+        """
+        Args:
+            registry: 窗口注册表
+            on_attach: 新窗口回调
+            on_detach: 窗口移除回调，参数为窗口信息和原因
+            on_rename: 窗口改名回调
+            scan_interval: 全量枚举间隔（秒），即新窗口的最大接入延迟
+            prune_interval: 已知窗口存活检查间隔（秒）
+        """
+        self.registry = registry
+        self.on_attach = on_attach
+        self.on_detach = on_detach
+        self.on_rename = on_rename
+        self.scan_interval = scan_interval
+        self.prune_interval = min(prune_interval, scan_interval)
+
+        self.attached = 0
+        self.detached = 0
+        self._next_scan = 0.0
+        self._stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def poll(self, full: bool = True) -> WindowDiff:
+        """
+        执行一次检查
+
+        Args:
+            full: True时全量枚举（发现新窗口），False时只检查已知窗口是否存活
+        """
+        if full:
+            diff = self.registry.rescan()
+        else:
+            diff = WindowDiff(removed=self.registry.prune())
+
+        for info in diff.removed:
+            self.detached += 1
+            self._call(self.on_detach, info, REASON_CLOSED)
+        if self.on_rename is not None:
+            for info in diff.renamed:
+                self._call(self.on_rename, info)
+        for info in diff.added:
+            self.attached += 1
+            self._call(self.on_attach, info)
+        return diff
+
+    def tick(self, now: float = None) -> WindowDiff:
+        """按间隔决定全量扫描或存活检查（调用方定时调用）"""
+        now = time.monotonic() if now is None else now
+        full = now >= self._next_scan
+        if full:
+            self._next_scan = now + self.scan_interval
+        return self.poll(full)
+
+    def _call(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"窗口监视回调失败 ({args[0]}): {e}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"窗口扫描失败: {e}")
+            self._stop_event.wait(self.prune_interval)
+
+    def start(self):
+        """在后台线程中开始监视"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._next_scan = 0.0
+        self.thread = threading.Thread(target=self._run, name='window-watcher', daemon=True)
+        self.thread.start()
+        logger.info(f"窗口热插拔监视已启动 (扫描间隔 {self.scan_interval}s)")
+
+    def stop(self, timeout: float = 2.0):
+        """停止监视（等待正在执行的回调完成）"""
+        self._stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()